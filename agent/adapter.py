@@ -6,6 +6,10 @@
 import logging
 from typing import Dict, Any, Optional, List
 
+from config import ADJUST_PLAN_REWORD_DESCRIPTIONS
+from macrocycle import plan_continuation_from_macrocycle
+from plan_adjuster import adjust_plan_locally, reword_changed_days
+from units import day_distance_km
 from .tools.generate_plan import GeneratePlanUseCase, RunnerProfile, RecentRun
 
 
@@ -22,7 +26,8 @@ class AgentAdapter:
     def generate_training_plan_continuation(self, runner_profile: Dict[str, Any], total_distance: float, 
                                   current_plan: Dict[str, Any], 
                                   force_adjustment_mode: bool = False, 
-                                  explicit_adjustment_note: Optional[str] = None) -> Dict[str, Any]:
+                                  explicit_adjustment_note: Optional[str] = None,
+                                  training_load: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
         """
         Генерирует продолжение тренировочного плана на основе уже выполненных тренировок.
         
@@ -35,10 +40,22 @@ class AgentAdapter:
             current_plan: Текущий план тренировок
             force_adjustment_mode: Принудительно использовать режим корректировки
             explicit_adjustment_note: Явное текстовое описание корректировки для промпта
+            training_load: Нагрузка бегуна (training_load.load_summary)
             
         Returns:
             Новый план тренировок в формате, совместимом с ботом
         """
+        # Если в профиле есть дата соревнования, неделя строится из макроцикла без запроса к модели
+        if not force_adjustment_mode and not explicit_adjustment_note:
+            try:
+                plan = plan_continuation_from_macrocycle(runner_profile, current_plan, total_distance,
+                                                         training_load=training_load)
+                if plan:
+                    logging.info(f"AgentAdapter: Продолжение плана построено из макроцикла (неделя {plan['macrocycle_week']})")
+                    return plan
+            except Exception as e:
+                logging.error(f"AgentAdapter: Ошибка при построении недели из макроцикла: {e}")
+        
         try:
             logging.info(f"AgentAdapter: Запуск генерации продолжения плана через MCP-инструмент")
             
@@ -52,6 +69,8 @@ class AgentAdapter:
             
             # Добавляем информацию о выполненных тренировках в профиль
             mcp_profile.recent_runs = self._extract_completed_trainings(current_plan, total_distance)
+            # Нагрузка передается несколькими числами вместо истории пробежек
+            mcp_profile.training_load = training_load
             
             # Проверяем дополнительные параметры
             if force_adjustment_mode:
@@ -82,7 +101,8 @@ class AgentAdapter:
             from openai_service import OpenAIService
             logging.info(f"AgentAdapter: Переключение на оригинальный OpenAIService для генерации продолжения плана")
             openai_service = OpenAIService()
-            return openai_service.generate_training_plan_continuation(runner_profile, total_distance, current_plan)
+            return openai_service.generate_training_plan_continuation(runner_profile, total_distance, current_plan,
+                                                                      training_load=training_load)
             
     def _extract_completed_trainings(self, current_plan: Dict[str, Any], total_distance: float) -> List[RecentRun]:
         """
@@ -119,15 +139,8 @@ class AgentAdapter:
                         if len(date_parts) == 3:
                             date_str = f"{date_parts[2]}-{date_parts[1]}-{date_parts[0]}"
                     
-                    # Получаем дистанцию
-                    distance_str = day.get('distance', '0')
-                    distance = 0.0
-                    
-                    # Извлекаем числовое значение дистанции
-                    import re
-                    distance_match = re.search(r'(\d+(?:\.\d+)?)', str(distance_str))
-                    if distance_match:
-                        distance = float(distance_match.group(1))
+                    # Получаем дистанцию (разобрана в число при сохранении плана)
+                    distance = day_distance_km(day)
                     
                     # Получаем темп
                     pace = day.get('pace', '0:00')
@@ -212,12 +225,17 @@ class AgentAdapter:
     
     def adjust_training_plan(self, runner_profile: Dict[str, Any], current_plan: Dict[str, Any], 
                        day_num: int, planned_distance: float, actual_distance: float,
-                       force_adjustment_mode: bool = False, explicit_adjustment_note: Optional[str] = None) -> Dict[str, Any]:
+                       force_adjustment_mode: bool = False, explicit_adjustment_note: Optional[str] = None,
+                       processed_days: Optional[List[int]] = None,
+                       training_load: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
         """
         Корректирует тренировочный план на основе фактических результатов выполнения тренировки.
         
-        Этот метод имитирует интерфейс существующего OpenAIService.adjust_training_plan,
-        но использует MCP-инструмент для корректировки планов.
+        Этот метод имитирует интерфейс существующего OpenAIService.adjust_training_plan.
+        Оставшиеся дни пересчитываются локально (plan_adjuster); MCP-инструмент
+        используется, если локальная корректировка не удалась или передан
+        force_adjustment_mode либо explicit_adjustment_note — локальный
+        пересчет их не учитывает.
         
         Args:
             runner_profile: Профиль бегуна
@@ -227,10 +245,31 @@ class AgentAdapter:
             actual_distance: Фактически выполненная дистанция
             force_adjustment_mode: Принудительно использовать режим корректировки
             explicit_adjustment_note: Явное текстовое описание корректировки для промпта
+            processed_days: Номера уже выполненных или отмененных дней
+            training_load: Нагрузка бегуна (training_load.load_summary)
             
         Returns:
             Скорректированный план тренировок
         """
+        # Принудительный режим и явная заметка передаются только MCP-инструменту
+        if not force_adjustment_mode and not explicit_adjustment_note:
+            try:
+                adjusted_plan, changed_days = adjust_plan_locally(
+                    current_plan, day_num, planned_distance, actual_distance, processed_days,
+                    training_load=training_load
+                )
+                logging.info(f"AgentAdapter: План скорректирован локально, изменено дней: {len(changed_days)}")
+                
+                if ADJUST_PLAN_REWORD_DESCRIPTIONS and changed_days:
+                    if self._generate_plan_tool is None:
+                        self._generate_plan_tool = GeneratePlanUseCase()
+                    adjusted_plan = reword_changed_days(
+                        self._generate_plan_tool.client, "gpt-4o", adjusted_plan, changed_days
+                    )
+                return adjusted_plan
+            except Exception as e:
+                logging.error(f"AgentAdapter: Ошибка локальной корректировки плана: {e}")
+        
         try:
             logging.info(f"AgentAdapter: Запуск корректировки плана через MCP-инструмент")
             
@@ -281,7 +320,7 @@ class AgentAdapter:
                         day=day.get('day', ''),
                         date=day.get('date', ''),
                         type=day.get('training_type', ''),
-                        distance=day.get('distance', 0),
+                        distance=day_distance_km(day),
                         completed=day.get('completed', False),
                         canceled=day.get('canceled', False)
                     ))
@@ -346,7 +385,8 @@ class AgentAdapter:
                     logging.warning("MCP-инструмент вернул пустой план, используем резервный вариант")
                     from openai_service import OpenAIService
                     openai_service = OpenAIService()
-                    adjusted_plan = openai_service.adjust_training_plan(runner_profile, current_plan, day_num, planned_distance, actual_distance)
+                    adjusted_plan = openai_service.adjust_training_plan(runner_profile, current_plan, day_num, planned_distance, actual_distance,
+                                                                        training_load=training_load)
                 else:
                     # Обновляем описание в плане, чтобы указать корректировку
                     if "plan_description" in adjusted_plan:
@@ -371,7 +411,8 @@ class AgentAdapter:
             from openai_service import OpenAIService
             logging.info(f"AgentAdapter: Переключение на оригинальный OpenAIService для корректировки плана")
             openai_service = OpenAIService()
-            fallback_plan = openai_service.adjust_training_plan(runner_profile, current_plan, day_num, planned_distance, actual_distance)
+            fallback_plan = openai_service.adjust_training_plan(runner_profile, current_plan, day_num, planned_distance, actual_distance,
+                                                                training_load=training_load)
             
             # Гарантируем, что возвращаем словарь даже при сбое резервного метода
             if fallback_plan:
@@ -430,6 +471,7 @@ class AgentAdapter:
         
         # Создаем профиль в формате MCP-инструмента
         return RunnerProfile(
+            user_id=bot_profile.get('user_id'),
             age=bot_profile.get('age'),
             gender=bot_profile.get('gender'),
             weight=bot_profile.get('weight'),
@@ -11,10 +11,17 @@ import json
 import logging
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
-import pytz
 from dataclasses import dataclass
 from pydantic import BaseModel, Field
 
+from metrics import REGISTRY
+from plan_index import retitle_plan, suggest_plan
+from pace_calculator import PaceProfile, apply_pace_zones, pace_profile
+from plan_validator import repair_plan
+from training_calendar import schedule_for_profile
+from training_load import format_load_summary
+from workout_log import recent_performances
+
 
 class RecentRun(BaseModel):
     """Модель для представления недавней тренировки бегуна."""
@@ -53,6 +60,7 @@ class AdjustmentInfo(BaseModel):
 
 class RunnerProfile(BaseModel):
     """Модель профиля бегуна для генерации персонализированного плана тренировок."""
+    user_id: Optional[int] = Field(None, description="ID пользователя в базе данных (для недавних пробежек из журнала)")
     age: Optional[int] = Field(None, description="Возраст бегуна")
     gender: Optional[str] = Field(None, description="Пол бегуна (Мужской/Женский)")
     weight: Optional[float] = Field(None, description="Вес бегуна в кг")
@@ -71,6 +79,7 @@ class RunnerProfile(BaseModel):
     # Поля для прямого управления поведением генерации плана
     force_adjustment_mode: Optional[bool] = Field(False, description="Принудительно использовать режим корректировки")
     explicit_adjustment_note: Optional[str] = Field(None, description="Явное текстовое описание корректировки для промпта")
+    training_load: Optional[Dict[str, float]] = Field(None, description="Нагрузка бегуна (training_load.load_summary)")
 
 
 class GeneratePlanUseCase:
@@ -121,8 +130,12 @@ class GeneratePlanUseCase:
         # Конвертируем профиль в формат, подходящий для существующего кода бота
         bot_profile = self._convert_to_bot_profile(profile)
         
+        # Готовые планы похожих бегунов используем только для новых планов
+        allow_reuse = not (profile.recent_runs or profile.adjustment_info or profile.current_plan
+                           or profile.force_adjustment_mode or profile.explicit_adjustment_note)
+        
         # Генерируем план тренировок
-        return self._generate_plan(bot_profile)
+        return self._generate_plan(bot_profile, allow_reuse=allow_reuse)
     
     def _convert_to_bot_profile(self, profile: RunnerProfile) -> Dict[str, Any]:
         """
@@ -177,6 +190,7 @@ class GeneratePlanUseCase:
         
         # Создаем профиль в формате, используемом ботом
         bot_profile = {
+            "user_id": profile.user_id,
             "distance": distance,
             "competition_date": competition_date,
             "gender": profile.gender or "Не указан",
@@ -192,17 +206,19 @@ class GeneratePlanUseCase:
             "training_days_per_week": len(profile.available_days),
             "preferred_training_days": preferred_days_str,
             "training_start_date": datetime.now().strftime("%d.%m.%Y"),
-            "training_start_date_text": "Сегодня"
+            "training_start_date_text": "Сегодня",
+            "training_load": profile.training_load
         }
         
         return bot_profile
     
-    def _generate_plan(self, profile: Dict[str, Any]) -> Dict[str, Any]:
+    def _generate_plan(self, profile: Dict[str, Any], allow_reuse: bool = False) -> Dict[str, Any]:
         """
         Генерирует план тренировок с использованием OpenAI API.
         
         Args:
             profile: Профиль бегуна в формате, используемом ботом
+            allow_reuse: Разрешить использование плана похожего бегуна из индекса
         
         Returns:
             План тренировок в формате JSON
@@ -213,11 +229,28 @@ class GeneratePlanUseCase:
             # Получаем даты для тренировок
             dates_info = self._calculate_training_dates(profile)
             
+            # Зоны темпа рассчитываются один раз: для промпта и для проверки темпа плана
+            paces = pace_profile(profile, recent_performances(profile))
+            
             # Создаем системный промт на основе книг о тренировках
             system_prompt = self._get_expert_system_prompt(profile, dates_info)
             
             # Создаем пользовательский промт с профилем бегуна
-            user_prompt = self._create_user_prompt(profile, dates_info)
+            user_prompt = self._create_user_prompt(profile, dates_info, paces)
+            
+            # Ищем план похожего бегуна: очень близкий используем сразу, похожий добавляем как пример
+            if allow_reuse:
+                try:
+                    reused_plan, plan_seed = suggest_plan(profile, dates_info["dates"])
+                    if reused_plan:
+                        # План другого бегуна проверяется, а темп пересчитывается по зонам нового
+                        reused_plan = repair_plan(reused_plan, expected_dates=dates_info["dates"])
+                        apply_pace_zones(reused_plan, paces)
+                        return retitle_plan(reused_plan, profile)
+                    if plan_seed:
+                        user_prompt += plan_seed
+                except Exception as e:
+                    logging.warning(f"Ошибка при поиске похожего плана: {e}")
             
             # Вызываем OpenAI API с увеличенным таймаутом
             logging.info("Отправляем запрос к OpenAI API (с таймаутом 120 секунд)")
@@ -286,16 +319,17 @@ class GeneratePlanUseCase:
             logging.info(user_prompt)
             logging.info("=" * 80)
             
-            response = self.client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                response_format={"type": "json_object"},
-                temperature=temperature,
-                timeout=timeout
-            )
+            with REGISTRY.timed("llm_call_seconds", site="agent.generate_plan"):
+                response = self.client.chat.completions.create(
+                    model=model,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt}
+                    ],
+                    response_format={"type": "json_object"},
+                    temperature=temperature,
+                    timeout=timeout
+                )
             
             # Получаем и парсим ответ
             content = response.choices[0].message.content
@@ -305,6 +339,11 @@ class GeneratePlanUseCase:
             else:
                 raise ValueError("Пустой ответ от API OpenAI")
             
+            # Проверяем план локально и дозапрашиваем только недостающие поля;
+            # темп дней заполняется и проверяется по зонам бегуна
+            plan_json = repair_plan(plan_json, self.client, model, expected_dates=dates_info["dates"])
+            apply_pace_zones(plan_json, paces)
+            
             return plan_json
             
         except Exception as e:
@@ -384,13 +423,19 @@ class GeneratePlanUseCase:
             f"Отвечай только в указанном JSON формате на русском языке."
         )
     
-    def _create_user_prompt(self, profile: Dict[str, Any], dates_info: Dict[str, Any]) -> str:
+    def _pace_zones_text(self, paces: Optional[PaceProfile]) -> str:
+        """Зоны темпа и прогнозы бегуна для промпта (рассчитываются локально)."""
+        return paces.format_for_prompt() if paces else ""
+    
+    def _create_user_prompt(self, profile: Dict[str, Any], dates_info: Dict[str, Any],
+                            paces: Optional[PaceProfile] = None) -> str:
         """
         Создает пользовательский промпт с профилем бегуна для запроса к OpenAI.
         
         Args:
             profile: Профиль бегуна
             dates_info: Информация о датах тренировок
+            paces: Зоны темпа бегуна (pace_calculator.pace_profile)
             
         Returns:
             Пользовательский промпт
@@ -479,7 +524,8 @@ class GeneratePlanUseCase:
                 f"- Дистанция: {profile.get('distance', 'Неизвестно')} км\n"
                 f"- Уровень: {profile.get('experience', 'intermediate')}\n"
                 f"- Еженедельный объем: {profile.get('weekly_volume', 'Неизвестно')} км\n"
-                f"- Комфортный темп: {profile.get('comfortable_pace', 'Неизвестно')}\n\n"
+                f"- Комфортный темп: {profile.get('comfortable_pace', 'Неизвестно')}\n"
+                f"{self._pace_zones_text(paces)}\n"
                 
                 f"⚠️ КОРРЕКТИРОВКА ПЛАНА: В день {day_num} ({training_type}) "
                 f"спортсмен пробежал {actual_distance} км вместо запланированных {planned_distance} км "
@@ -543,7 +589,9 @@ class GeneratePlanUseCase:
                 
             prompt += (
                 f"- Комфортный темп бега: {profile.get('comfortable_pace', 'Неизвестно')}\n"
-                f"- Еженедельный объем бега: {profile.get('weekly_volume_text', profile.get('weekly_volume', 'Неизвестно'))} км\n\n"
+                f"- Еженедельный объем бега: {profile.get('weekly_volume_text', profile.get('weekly_volume', 'Неизвестно'))} км\n"
+                f"{self._pace_zones_text(paces)}"
+                f"{format_load_summary(profile.get('training_load'))}\n"
             )
             
             # Проверяем наличие явной заметки о корректировке
@@ -618,173 +666,17 @@ class GeneratePlanUseCase:
         Returns:
             Dict: Информация о датах тренировок
         """
-        # Используем Московское время (UTC+3)
-        moscow_tz = pytz.timezone('Europe/Moscow')
-        
-        # Проверяем, указал ли пользователь дату начала тренировок
-        user_start_date = profile.get('training_start_date_text', profile.get('training_start_date', None))
-        
-        # Попытка распарсить дату начала тренировок
-        start_date = None
-        
-        if user_start_date and user_start_date.lower() != 'сегодня' and user_start_date.lower() != 'не знаю':
-            try:
-                # Попробуем распарсить дату в формате "ДД.ММ.ГГГГ"
-                logging.info(f"Пытаемся распарсить дату начала тренировок: {user_start_date}")
-                
-                # Обрабатываем несколько возможных форматов
-                formats = ["%d.%m.%Y", "%Y-%m-%d", "%d/%m/%Y", "%d.%m"]
-                
-                for fmt in formats:
-                    try:
-                        if fmt == "%d.%m":
-                            # Для формата без года добавляем текущий год
-                            current_year = datetime.now().year
-                            date_with_year = f"{user_start_date}.{current_year}"
-                            start_date = datetime.strptime(date_with_year, "%d.%m.%Y")
-                        else:
-                            start_date = datetime.strptime(user_start_date, fmt)
-                        
-                        start_date = moscow_tz.localize(start_date)
-                        logging.info(f"Успешно распарсили дату: {start_date.strftime('%d.%m.%Y')}")
-                        break
-                    except ValueError:
-                        continue
-            except Exception as e:
-                logging.error(f"Ошибка при парсинге даты начала тренировок: {e}")
-        
-        # Если не удалось распарсить дату или она не была указана, используем текущую дату
-        if not start_date:
-            start_date = datetime.now(pytz.UTC).astimezone(moscow_tz)
-            logging.info(f"Используем текущую дату: {start_date.strftime('%d.%m.%Y')}")
-        
-        logging.info(f"Дата начала тренировок: {start_date.strftime('%d.%m.%Y %H:%M:%S')}")
-        
-        # Получаем предпочитаемые дни тренировок
-        preferred_days_str = profile.get('preferred_training_days', '')
-        preferred_days = []
-        
-        if preferred_days_str:
-            # Словарь для преобразования сокращений дней недели в числа (0 - понедельник, 6 - воскресенье)
-            day_name_to_number = {
-                'пн': 0, 'вт': 1, 'ср': 2, 'чт': 3, 'пт': 4, 'сб': 5, 'вс': 6,
-                'понедельник': 0, 'вторник': 1, 'среда': 2, 'четверг': 3, 
-                'пятница': 4, 'суббота': 5, 'воскресенье': 6
-            }
-            
-            # Разбиваем строку предпочитаемых дней и преобразуем в числа
-            for day in preferred_days_str.lower().split(','):
-                day = day.strip()
-                if day in day_name_to_number:
-                    preferred_days.append(day_name_to_number[day])
-        
-        logging.info(f"Предпочитаемые дни недели: {preferred_days}")
-        
-        # Если предпочитаемые дни не указаны, используем все дни недели
-        if not preferred_days:
-            preferred_days = list(range(7))  # 0 - понедельник, 6 - воскресенье
-        
-        # Количество тренировочных дней в неделю (по умолчанию 3)
-        training_days_count = int(profile.get('training_days_per_week', 3))
-        
-        # Убедимся, что у нас достаточно дней для тренировок
-        if len(preferred_days) < training_days_count:
-            logging.warning(f"Недостаточно предпочитаемых дней ({len(preferred_days)}) для требуемого количества тренировок ({training_days_count}). Добавляем дополнительные дни.")
-            for i in range(7):
-                if i not in preferred_days:
-                    preferred_days.append(i)
-                    if len(preferred_days) >= training_days_count:
-                        break
-        
-        # Если указано больше предпочитаемых дней, чем нужно для тренировок, используем первые N дней
-        if len(preferred_days) > training_days_count:
-            preferred_days = preferred_days[:training_days_count]
-        
-        # Сортируем дни недели, чтобы они шли по порядку
-        preferred_days.sort()
-        
-        logging.info(f"Отсортированные предпочитаемые дни недели: {preferred_days}")
-        
-        # Определяем ближайшие даты для тренировок с учетом предпочитаемых дней недели
-        training_dates = []
-        current_date = start_date
-        
-        # Проверяем, если стартовая дата раньше текущей даты, используем текущую
-        now = datetime.now(pytz.UTC).astimezone(moscow_tz)
-        if current_date.date() < now.date():
-            current_date = now
-            logging.warning(f"Стартовая дата в прошлом, используем текущую: {current_date.strftime('%d.%m.%Y')}")
-        
-        # Получаем день недели для стартовой даты (0 - понедельник, 6 - воскресенье)
-        start_weekday = current_date.weekday()
-        logging.info(f"День недели стартовой даты: {start_weekday} ({current_date.strftime('%A')})")
-        
-        # Находим первый подходящий день для начала тренировок
-        days_to_add = 0
-        if preferred_days:
-            # Ищем ближайший предпочитаемый день недели, начиная со стартовой даты
-            min_days_to_add = float('inf')
-            for day in preferred_days:
-                # Вычисляем, сколько дней нужно добавить к стартовой дате
-                if day >= start_weekday:
-                    days = day - start_weekday
-                else:
-                    days = 7 - start_weekday + day
-                
-                if days < min_days_to_add:
-                    min_days_to_add = days
-            
-            days_to_add = min_days_to_add
-        
-        # Добавляем дни к стартовой дате, чтобы получить первый день тренировки
-        first_training_date = current_date + timedelta(days=days_to_add)
-        logging.info(f"Первый день тренировки: {first_training_date.strftime('%d.%m.%Y (%A)')}")
-        
-        # Генерируем даты для всех тренировочных дней
-        training_day_counter = 0
-        date_to_check = first_training_date
-        
-        while training_day_counter < training_days_count:
-            weekday = date_to_check.weekday()
-            
-            if weekday in preferred_days:
-                training_dates.append(date_to_check)
-                training_day_counter += 1
-                logging.info(f"Добавлена дата тренировки: {date_to_check.strftime('%d.%m.%Y (%A)')}")
-            
-            date_to_check = date_to_check + timedelta(days=1)
-        
-        # Преобразуем даты в строки формата "ДД.ММ.YYYY" для использования в плане
-        dates = [date.strftime("%d.%m.%Y") for date in training_dates]
-        
-        # Преобразуем числовые дни недели в названия для промпта
-        day_number_to_name = {
-            0: "Понедельник (Пн)", 
-            1: "Вторник (Вт)", 
-            2: "Среда (Ср)", 
-            3: "Четверг (Чт)", 
-            4: "Пятница (Пт)", 
-            5: "Суббота (Сб)", 
-            6: "Воскресенье (Вс)"
-        }
-        
-        preferred_days_names = [day_number_to_name[day] for day in preferred_days]
-        
-        # Получаем словарь дат тренировок с днями недели
-        training_dates_with_weekdays = {}
-        for date in training_dates:
-            weekday_num = date.weekday()
-            weekday_name = day_number_to_name[weekday_num]
-            date_str = date.strftime("%d.%m.%Y")
-            training_dates_with_weekdays[date_str] = weekday_name
+        schedule = schedule_for_profile(profile)
+        dates = schedule.date_strings
+        logging.info(f"Даты тренировок: {dates}")
         
         return {
             "dates": dates,
             "first_day": dates[0] if dates else None,
             "second_day": dates[1] if len(dates) > 1 else None,
-            "preferred_days": preferred_days,
-            "preferred_days_names": preferred_days_names,
-            "training_dates_with_weekdays": training_dates_with_weekdays
+            "preferred_days": list(schedule.weekdays),
+            "preferred_days_names": schedule.weekday_names(with_short=True),
+            "training_dates_with_weekdays": schedule.dates_with_weekdays(with_short=True)
         }
     
     def _generate_fallback_plan(self, profile: Dict[str, Any]) -> Dict[str, Any]:
@@ -7,7 +7,7 @@ import logging
 import threading
 import subprocess
 from datetime import datetime
-from flask import Flask, render_template, jsonify
+from flask import Flask, Response, render_template, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 
@@ -77,19 +77,13 @@ def start_bot():
         # Запускаем процесс бота
         add_log("Запуск бота...")
         
-        # Предварительно сбрасываем вебхук
-        try:
-            import requests
-            token = os.environ.get("TELEGRAM_TOKEN")
-            if token:
-                url = f"https://api.telegram.org/bot{token}/deleteWebhook?drop_pending_updates=true"
-                response = requests.get(url, timeout=10)
-                add_log(f"Сброс вебхука: {response.text}")
-        except Exception as e:
-            add_log(f"Ошибка при сбросе вебхука: {e}", "WARNING")
-        
-        # Используем bot_runner.py для запуска полной функциональности
-        cmd = [sys.executable, "bot_runner.py"]
+        if os.environ.get("WEBHOOK_URL"):
+            # Режим вебхука: сервер сам регистрирует вебхук и запускает обработчики
+            cmd = [sys.executable, "webhook_server.py"]
+        else:
+            # Вебхук снимает сам bot_runner.py при запуске polling
+            # Используем bot_runner.py для запуска полной функциональности
+            cmd = [sys.executable, "bot_runner.py"]
         bot_process = subprocess.Popen(
             cmd,
             stdout=subprocess.PIPE,
@@ -173,16 +167,13 @@ def stop_bot():
         return False
 
 
-# При запуске сервера автоматически инициализируем БД
-# Инициализация БД при запуске
-try:
-    # Создаем контекст приложения Flask
-    with app.app_context():
-        # Напрямую вызываем create_all от SQLAlchemy
-        db.create_all()
-        add_log("База данных инициализирована при запуске")
-except Exception as e:
-    add_log(f"Ошибка при инициализации БД при запуске: {e}", "ERROR")
+# При запуске сервера проверяем версию схемы БД: миграции (migrations.py)
+# применяются при деплое, здесь применяются только недостающие
+from migrations import ensure_schema
+if ensure_schema():
+    add_log("База данных инициализирована при запуске")
+else:
+    add_log("Схема базы данных не приведена к последней версии", "ERROR")
 
 # Дополнительная инициализация при запросе
 @app.before_request
@@ -275,5 +266,21 @@ def status():
     })
 
 
+@app.route('/metrics')
+def metrics():
+    """Метрики процессов бота в формате Prometheus."""
+    from config import HEALTH_HOST, HEALTH_PORT, WEBHOOK_URL, WEBHOOK_WORKERS
+    from metrics import fetch_snapshot, merge_snapshots, render_prometheus
+
+    # Реестры метрик живут в процессах бота: снимки собираются с их эндпоинтов
+    # живости (обработчики вебхука слушают следующие порты после HEALTH_PORT)
+    ports = [HEALTH_PORT]
+    if WEBHOOK_URL:
+        ports += [HEALTH_PORT + 1 + index for index in range(WEBHOOK_WORKERS)]
+    snapshots = [fetch_snapshot(HEALTH_HOST, port) for port in ports if port]
+    body = render_prometheus(merge_snapshots(snapshot for snapshot in snapshots if snapshot))
+    return Response(body, mimetype="text/plain; version=0.0.4")
+
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
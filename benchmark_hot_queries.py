@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк горячих запросов DBManager и TrainingPlanManager.
+
+Скрипт создает во временной схеме базы данных таблицы через миграции
+(migrations.py) и заполняет их синтетическими данными. Затем вызывает горячие
+методы менеджеров, перехватывая выполненные ими запросы: каждый запрос
+проверяется через EXPLAIN на использование индекса, а время вызова метода — на
+соответствие бюджету. Рабочие таблицы не затрагиваются: изменения каждого
+вызова откатываются, временная схема удаляется после запуска.
+
+Использование:
+    python benchmark_hot_queries.py --users 50000 --budget-ms 5
+"""
+
+import argparse
+import copy
+import logging
+import os
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import psycopg2
+
+from config import DB_CONFIG
+from db_manager import DBManager
+from migrations import BACKFILL_WORKOUT_EVENTS_SQL, run_migrations
+from training_calendar import parse_date
+from training_load import TrainingLoadManager
+from training_plan_manager import TrainingPlanManager
+from workout_log import WorkoutLogManager
+
+# Таблицы, для которых последовательное сканирование считается регрессией
+INDEXED_TABLES = {"users", "runner_profiles", "user_payments", "training_plans", "completed_trainings",
+                  "workout_weekly_rollups", "workout_user_stats", "training_loads"}
+INDEX_NODE_TYPES = {"Index Scan", "Index Only Scan", "Bitmap Index Scan"}
+
+
+class HotCall(NamedTuple):
+    """Горячий метод менеджера и имена параметров из образца данных."""
+    manager: Any
+    method: str
+    params: Tuple[str, ...]
+    # Серверные функции не раскрывают план запросов в EXPLAIN, для них проверяется только время
+    check_plan: bool = True
+
+    @property
+    def name(self) -> str:
+        return f"{self.manager.__name__}.{self.method}"
+
+
+# Методы вызываются как есть; выполненные ими запросы перехватываются и проверяются через EXPLAIN
+HOT_CALLS = [
+    HotCall(DBManager, "get_user_id", ("telegram_id",)),
+    HotCall(DBManager, "save_runner_profile", ("user_id", "profile")),
+    HotCall(DBManager, "get_runner_profile", ("user_id",)),
+    HotCall(DBManager, "refresh_weekly_volume", ("user_id",), check_plan=False),
+    HotCall(DBManager, "save_payment_status", ("user_id", "payment_agreed")),
+    HotCall(DBManager, "get_payment_status", ("user_id",)),
+    HotCall(DBManager, "check_active_subscription", ("user_id",)),
+    HotCall(TrainingPlanManager, "get_training_plan", ("user_id", "plan_id")),
+    HotCall(TrainingPlanManager, "get_latest_training_plan", ("user_id",)),
+    HotCall(TrainingPlanManager, "get_all_training_plans", ("user_id",)),
+    HotCall(TrainingPlanManager, "mark_training_completed", ("user_id", "plan_id", "training_day"),
+            check_plan=False),
+    HotCall(TrainingPlanManager, "get_completed_trainings", ("user_id", "plan_id")),
+    HotCall(TrainingPlanManager, "get_canceled_trainings", ("user_id", "plan_id")),
+    HotCall(TrainingPlanManager, "get_all_processed_trainings", ("user_id", "plan_id")),
+    HotCall(TrainingPlanManager, "get_plan_days", ("user_id", "plan_id")),
+    HotCall(TrainingPlanManager, "get_sessions_on_date", ("session_date",)),
+    HotCall(WorkoutLogManager, "get_stats", ("user_id",)),
+    HotCall(WorkoutLogManager, "get_weekly_volumes", ("user_id",)),
+    HotCall(WorkoutLogManager, "get_recent_runs", ("user_id",)),
+    HotCall(TrainingLoadManager, "get_summary", ("user_id",)),
+]
+
+# Запросы, план которых проверяется (INSERT ... VALUES таблицы не читает)
+PLANNED_STATEMENTS = ("SELECT", "WITH", "UPDATE", "DELETE")
+
+
+class CapturingCursor:
+    """
+    Курсор соединения бенчмарка, который запоминает выполненные запросы с
+    подставленными параметрами и ошибки их выполнения (менеджеры ошибки не пробрасывают).
+    """
+
+    def __init__(self, cursor, statements: List[str], errors: List[str]):
+        self._cursor = cursor
+        self._statements = statements
+        self._errors = errors
+
+    def execute(self, query, vars=None):
+        self._statements.append(self._cursor.mogrify(query, vars).decode())
+        try:
+            return self._cursor.execute(query, vars)
+        except psycopg2.Error as e:
+            self._errors.append(str(e).strip())
+            raise
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._cursor.close()
+        return False
+
+
+class CapturingConnection:
+    """
+    Соединение, которое менеджеры получают вместо psycopg2.connect.
+
+    Запросы выполняются в соединении бенчмарка (во временной схеме); commit,
+    close и autocommit игнорируются, чтобы вызов можно было откатить.
+    """
+
+    def __init__(self, conn, statements: List[str], errors: List[str]):
+        object.__setattr__(self, "_conn", conn)
+        object.__setattr__(self, "_statements", statements)
+        object.__setattr__(self, "_errors", errors)
+
+    def cursor(self, *args, **kwargs):
+        return CapturingCursor(self._conn.cursor(*args, **kwargs), self._statements, self._errors)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        if name != "autocommit":
+            setattr(self._conn, name, value)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+@contextmanager
+def capture_connections(conn, statements: List[str], errors: List[str]):
+    """Подменяет psycopg2.connect: менеджеры работают через соединение бенчмарка."""
+    original = psycopg2.connect
+    psycopg2.connect = lambda *args, **kwargs: CapturingConnection(conn, statements, errors)
+    try:
+        yield
+    finally:
+        psycopg2.connect = original
+
+
+SEED_SQL = """
+INSERT INTO users (telegram_id, username, first_name)
+SELECT 100000000 + g, 'runner_' || g, 'Бегун ' || g
+FROM generate_series(1, %(users)s) AS g;
+
+INSERT INTO runner_profiles (user_id, distance, weekly_volume, weekly_volume_km, comfortable_pace,
+                             comfortable_pace_sec, training_days_per_week, updated_at)
+SELECT u.id, '10', (u.id %% 40)::text, u.id %% 40, '6:00', 360, '3',
+       NOW() - make_interval(days => k * 30)
+FROM users u, generate_series(0, %(profiles_per_user)s - 1) AS k;
+
+INSERT INTO user_payments (user_id, payment_agreed, payment_date, expiry_date, updated_at)
+SELECT u.id, u.id %% 2 = 0, NOW() - INTERVAL '10 days', NOW() + INTERVAL '20 days', NOW()
+FROM users u;
+
+-- Пять тренировок в неделю; даты начала планов разнесены на несколько лет
+INSERT INTO training_plans (user_id, plan_name, plan_description, plan_data, created_at, updated_at)
+SELECT u.id, 'План ' || k, 'Синтетический план',
+       (SELECT jsonb_build_object('plan_name', 'План ' || k, 'training_days', jsonb_agg(jsonb_build_object(
+                   'day', 'День ' || d.num,
+                   'date', to_char(s.start_date + d.offset_days, 'DD.MM.YYYY'),
+                   'training_type', 'Легкий бег',
+                   'distance', d.km || ' км',
+                   'distance_km', d.km,
+                   'pace', '6:00',
+                   'pace_sec_per_km', 360) ORDER BY d.num))
+        FROM (VALUES (1, 0, 5), (2, 2, 8), (3, 4, 6), (4, 5, 14), (5, 6, 4)) AS d(num, offset_days, km)),
+       NOW() - make_interval(days => k * 7), NOW() - make_interval(days => k * 7)
+FROM users u, generate_series(0, %(plans_per_user)s - 1) AS k,
+     LATERAL (SELECT DATE '2026-01-01' + (u.id * 7 + k * 3) %% 1500 AS start_date) AS s;
+
+INSERT INTO completed_trainings (user_id, plan_id, training_day, status)
+SELECT tp.user_id, tp.id, d, CASE WHEN d %% 4 = 0 THEN 'canceled' ELSE 'completed' END
+FROM training_plans tp, generate_series(1, 5) AS d;
+"""
+
+
+def plan_nodes(node: Dict[str, Any]) -> Iterable[Dict[str, Any]]:
+    """Обходит все узлы плана запроса из EXPLAIN (FORMAT JSON)."""
+    yield node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def check_plan(plan: Dict[str, Any]) -> Optional[str]:
+    """
+    Проверяет, что план использует индекс и не сканирует горячие таблицы целиком.
+
+    Args:
+        plan: Корневой узел плана запроса
+
+    Returns:
+        Optional[str]: Описание проблемы или None, если план в порядке
+    """
+    nodes = list(plan_nodes(plan))
+    seq_scans = [node.get("Relation Name") for node in nodes
+                 if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in INDEXED_TABLES]
+    if seq_scans:
+        return f"Seq Scan по {', '.join(seq_scans)}"
+    if not any(node["Node Type"] in INDEX_NODE_TYPES for node in nodes):
+        return "индекс не используется"
+    return None
+
+
+def seed(conn, users: int, profiles_per_user: int, plans_per_user: int) -> Dict[str, Any]:
+    """
+    Заполняет таблицы временной схемы синтетическими данными.
+
+    Returns:
+        Dict[str, Any]: Параметры образца данных для запросов
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(SEED_SQL, {
+            "users": users,
+            "profiles_per_user": profiles_per_user,
+            "plans_per_user": plans_per_user,
+        })
+        # Журнал тренировок заполняется из статусов дней так же, как при миграции
+        cursor.execute(BACKFILL_WORKOUT_EVENTS_SQL)
+        conn.commit()
+
+        # ANALYZE и VACUUM вне транзакции: статистика для планировщика и карта видимости
+        # для index-only scan
+        conn.autocommit = True
+        cursor.execute("VACUUM ANALYZE users, runner_profiles, user_payments, training_plans, completed_trainings, "
+                       "workout_events, workout_weekly_rollups, workout_user_stats, training_loads")
+        conn.autocommit = False
+
+        cursor.execute(
+            """
+            SELECT u.id, u.telegram_id, tp.id, tp.plan_data->'training_days'->2->>'date'
+            FROM users u JOIN training_plans tp ON tp.user_id = u.id
+            WHERE u.id = (SELECT MIN(id) + %s FROM users)
+            ORDER BY tp.created_at DESC
+            LIMIT 1
+            """,
+            (users // 2,)
+        )
+        user_id, telegram_id, plan_id, session_date = cursor.fetchone()
+    return {"user_id": user_id, "telegram_id": telegram_id, "plan_id": plan_id, "training_day": 3,
+            "session_date": parse_date(session_date), "payment_agreed": True,
+            "profile": {"distance": "10", "weekly_volume": "20", "comfortable_pace": "6:00",
+                        "training_days_per_week": "3"}}
+
+
+def measure(conn, call: HotCall, sample: Dict[str, Any], repeat: int) -> Tuple[Optional[str], float, float]:
+    """
+    Вызывает метод менеджера, проверяет планы выполненных им запросов и измеряет время вызова.
+
+    Returns:
+        Tuple: (проблема или None, медиана в мс, p95 в мс)
+    """
+    method = getattr(call.manager, call.method)
+    timings = []
+    statements: List[str] = []
+    errors: List[str] = []
+    with capture_connections(conn, statements, errors):
+        for _ in range(repeat):
+            # Менеджеры могут изменять переданные словари, поэтому аргументы копируются
+            args = [copy.copy(sample[name]) for name in call.params]
+            statements.clear()
+            started = time.perf_counter()
+            method(*args)
+            timings.append((time.perf_counter() - started) * 1000)
+            # Каждый вызов начинается с данных образца
+            conn.rollback()
+
+    timings.sort()
+    median = statistics.median(timings)
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    if errors:
+        return f"ошибка запроса: {errors[0]}", median, p95
+    if not statements:
+        return "метод не выполнил запросов", median, p95
+
+    problem = None
+    if call.check_plan:
+        with conn.cursor() as cursor:
+            for statement in statements:
+                if not statement.lstrip().upper().startswith(PLANNED_STATEMENTS):
+                    continue
+                cursor.execute("EXPLAIN (FORMAT JSON) " + statement)
+                problem = check_plan(cursor.fetchone()[0][0]["Plan"])
+                if problem:
+                    break
+        conn.rollback()
+    return problem, median, p95
+
+
+def run_benchmark(users: int, profiles_per_user: int, plans_per_user: int,
+                  repeat: int, budget_ms: float) -> List[str]:
+    """
+    Создает временную схему, заполняет ее данными и проверяет горячие запросы.
+
+    Returns:
+        List[str]: Список нарушений (пустой, если все запросы в порядке)
+    """
+    schema = f"bench_hot_queries_{os.getpid()}"
+    conn = psycopg2.connect(**DB_CONFIG)
+    failures = []
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"CREATE SCHEMA {schema}")
+            # SET без LOCAL действует до конца сессии, включая последующие транзакции
+            cursor.execute(f"SET search_path TO {schema}")
+        conn.commit()
+
+        run_migrations(conn)
+        logging.info(f"Заполняем схему {schema}: {users} пользователей")
+        started = time.perf_counter()
+        sample = seed(conn, users, profiles_per_user, plans_per_user)
+        logging.info(f"Данные подготовлены за {time.perf_counter() - started:.1f} с")
+
+        print(f"{'Метод':<48} {'медиана, мс':>12} {'p95, мс':>10}  Результат")
+        for call in HOT_CALLS:
+            problem, median, p95 = measure(conn, call, sample, repeat)
+            if problem is None and p95 > budget_ms:
+                problem = f"p95 {p95:.2f} мс превышает бюджет {budget_ms} мс"
+            print(f"{call.name:<48} {median:>12.2f} {p95:>10.2f}  {problem or 'OK'}")
+            if problem:
+                failures.append(f"{call.name}: {problem}")
+    finally:
+        conn.rollback()
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        conn.commit()
+        conn.close()
+    return failures
+
+
+def main():
+    """Запускает бенчмарк горячих запросов."""
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Бенчмарк горячих запросов к базе данных")
+    parser.add_argument("--users", type=int, default=50000, help="Количество синтетических пользователей")
+    parser.add_argument("--profiles-per-user", type=int, default=3, help="Версий профиля на пользователя")
+    parser.add_argument("--plans-per-user", type=int, default=4, help="Планов на пользователя")
+    parser.add_argument("--repeat", type=int, default=50, help="Повторов вызова каждого метода")
+    parser.add_argument("--budget-ms", type=float, default=5.0, help="Бюджет p95 на вызов метода, мс")
+    args = parser.parse_args()
+
+    failures = run_benchmark(args.users, args.profiles_per_user, args.plans_per_user,
+                             args.repeat, args.budget_ms)
+    if failures:
+        print("\n❌ Регрессии горячих запросов:")
+        for failure in failures:
+            print(f"  - {failure}")
+        return 1
+
+    print("\n✅ Все горячие запросы используют индексы и укладываются в бюджет")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""
+Быстрый холодный старт бота с замером фаз запуска.
+
+Модуль импортируется первым в точке входа: время запуска отсчитывается от его
+импорта. Путь запуска не содержит пауз и сброса сессии Telegram: сборка
+приложения не обращается к сети, а соединение с базой данных (проверка схемы
+и соединение update_dedup) и HTTP-клиент Telegram (getMe, DNS, TLS и пул
+соединений) прогреваются параллельно. Клиенты OpenAI и анализ изображений
+импортируются при первом использовании.
+
+После запуска polling в журнал пишется длительность каждой фазы, а после
+первого обновления — время от запуска до его обработки (цель — FIRST_UPDATE_TARGET).
+"""
+
+import time
+
+BOOT_STARTED = time.perf_counter()
+
+import asyncio
+import logging
+from typing import Awaitable, List, Optional, Tuple, TypeVar
+
+from telegram import Update
+from telegram.ext import TypeHandler
+
+from migrations import ensure_schema
+from update_dedup import STORE as UPDATE_DEDUP_STORE
+
+T = TypeVar("T")
+
+# Время от запуска до обработки первого обновления (секунды)
+FIRST_UPDATE_TARGET = 2.0
+# Группа отметки первого обновления: раньше захвата update_dedup
+BOOT_PROBE_GROUP = -200
+
+
+class BootTimer:
+    """
+    Длительности фаз запуска.
+
+    Args:
+        started: Момент запуска по time.perf_counter (по умолчанию — импорт модуля)
+    """
+
+    def __init__(self, started: Optional[float] = None):
+        self.started = BOOT_STARTED if started is None else started
+        self._last = self.started
+        self.phases: List[Tuple[str, float]] = []
+        self.first_update: Optional[float] = None
+
+    def elapsed(self) -> float:
+        """Секунды от запуска."""
+        return time.perf_counter() - self.started
+
+    def checkpoint(self, name: str) -> None:
+        """Записывает последовательную фазу, закончившуюся сейчас."""
+        now = time.perf_counter()
+        self.phases.append((name, now - self._last))
+        self._last = now
+
+    async def timed(self, name: str, awaitable: Awaitable[T]) -> T:
+        """Выполняет параллельную фазу и записывает ее длительность."""
+        started = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    def summary(self) -> str:
+        """Фазы запуска одной строкой."""
+        return ", ".join(f"{name} {seconds:.2f} с" for name, seconds in self.phases)
+
+    def report(self, stage: str) -> str:
+        """Пишет в журнал время до этапа запуска и длительности фаз."""
+        message = f"{stage} через {self.elapsed():.2f} с после запуска: {self.summary()}"
+        logging.info(message)
+        return message
+
+    def mark_first_update(self) -> None:
+        """Отмечает первое обновление, дошедшее до обработчиков."""
+        if self.first_update is not None:
+            return
+        self.first_update = self.elapsed()
+        if self.first_update > FIRST_UPDATE_TARGET:
+            logging.warning(f"Первое обновление обработано через {self.first_update:.2f} с после запуска "
+                            f"(цель {FIRST_UPDATE_TARGET:.0f} с): {self.summary()}")
+        else:
+            logging.info(f"Первое обновление обработано через {self.first_update:.2f} с после запуска")
+
+
+BOOT = BootTimer()
+
+
+def install_boot_probe(application, timer: BootTimer = BOOT) -> None:
+    """Подключает отметку первого обновления к приложению."""
+
+    async def first_update(update, context):
+        timer.mark_first_update()
+
+    application.add_handler(TypeHandler(Update, first_update), group=BOOT_PROBE_GROUP)
+
+
+def _warm_database() -> bool:
+    # Проверка схемы заполняет кэш версии, которым пользуется has_capability
+    ready = ensure_schema()
+    UPDATE_DEDUP_STORE.warm()
+    return ready
+
+
+async def prewarm(application, timer: BootTimer = BOOT) -> None:
+    """
+    Параллельно прогревает соединение с базой данных и HTTP-клиент Telegram.
+
+    Ошибки прогрева не останавливают запуск: соответствующее соединение
+    откроется при первом обращении.
+
+    Args:
+        application: Приложение, собранное setup_bot(check_schema=False)
+        timer: Замер фаз запуска
+    """
+    results = await asyncio.gather(
+        timer.timed("база данных", asyncio.to_thread(_warm_database)),
+        timer.timed("Telegram API", application.bot.initialize()),
+        return_exceptions=True,
+    )
+    for name, result in zip(("базы данных", "Telegram API"), results):
+        if isinstance(result, BaseException):
+            logging.error(f"Ошибка при прогреве {name}: {result}")
+    timer.checkpoint("прогрев")
@@ -9,6 +9,9 @@ import logging
 import psutil
 from datetime import datetime
 
+from config import HEALTH_PORT
+from liveness import probe
+
 # Настройка логирования
 logging.basicConfig(
     level=logging.INFO,
@@ -23,6 +26,14 @@ logging.basicConfig(
 BOT_SCRIPT = "main.py"
 # Интервал проверки в секундах
 CHECK_INTERVAL = 300  # 5 минут
+# Подряд неответов эндпоинта живости до перезапуска: один неответ еще не зависание
+HEALTH_FAILURES_BEFORE_RESTART = 3
+# Время после запуска бота, пока эндпоинт живости может еще не слушать порт
+STARTUP_GRACE_PERIOD = 120  # секунд
+
+# Время последнего запуска бота и число подряд неответов эндпоинта живости
+last_start_time = 0.0
+health_failures = 0
 
 def is_bot_running():
     """Проверяет, запущен ли бот"""
@@ -39,7 +50,10 @@ def is_bot_running():
 
 def start_bot():
     """Запускает бота"""
+    global last_start_time, health_failures
     logging.info("Запуск бота...")
+    last_start_time = time.monotonic()
+    health_failures = 0
     try:
         # Запускаем бота в фоновом режиме
         process = subprocess.Popen(["python", BOT_SCRIPT], 
@@ -71,6 +85,7 @@ def stop_bot(pid):
 
 def check_and_restart():
     """Проверяет состояние бота и перезапускает при необходимости"""
+    global health_failures
     running, pid = is_bot_running()
     
     if not running:
@@ -79,18 +94,34 @@ def check_and_restart():
     else:
         logging.info(f"Бот работает (PID: {pid})")
         
-        # Проверка, не завис ли бот (можно добавить дополнительные проверки)
-        try:
-            proc = psutil.Process(pid)
-            # Если CPU использование 0% в течение длительного времени, возможно бот завис
-            if proc.cpu_percent(interval=1.0) == 0.0:
-                logging.warning(f"Бот может быть завис (PID: {pid}), перезапускаем...")
+        # Проверка, не завис ли бот: эндпоинт живости отвечает из отдельного
+        # потока и сообщает, что цикл событий заблокирован. Простой без нагрузки
+        # (0% CPU) зависанием не считается. При HEALTH_PORT=0 эндпоинта нет,
+        # и проверяется только наличие процесса.
+        if not HEALTH_PORT:
+            return
+        health = probe()
+        if health is None:
+            # Неответ — состояние неизвестно: бот мог еще не открыть порт после
+            # запуска. Перезапуск только после нескольких неответов подряд
+            # вне периода запуска
+            if time.monotonic() - last_start_time < STARTUP_GRACE_PERIOD:
+                return
+            health_failures += 1
+            logging.warning(f"Эндпоинт живости бота не отвечает ({health_failures}/{HEALTH_FAILURES_BEFORE_RESTART})")
+            if health_failures >= HEALTH_FAILURES_BEFORE_RESTART:
+                logging.warning(f"Бот не отвечает (PID: {pid}), перезапускаем...")
                 stop_bot(pid)
                 start_bot()
-        except (psutil.NoSuchProcess, psutil.AccessDenied):
-            logging.warning("Не удалось проверить состояние бота, пробуем перезапустить...")
+            return
+        health_failures = 0
+        if health["status"] == "blocked":
+            stall = health.get("current_stall") or {}
+            logging.warning(f"Бот завис (PID: {pid}, вызов: {stall.get('stack')}), перезапускаем...")
             stop_bot(pid)
             start_bot()
+        elif health["status"] == "lagging":
+            logging.warning(f"Цикл событий бота задерживается, очередь обновлений: {health['pending_updates']}")
 
 def main():
     """Основная функция мониторинга"""
@@ -1,3 +1,4 @@
+import asyncio
 import os
 import json
 import io
@@ -6,14 +7,24 @@ from telegram.ext import ApplicationBuilder, CommandHandler, CallbackQueryHandle
 # Определяем константу ConversationHandler.END
 END = ConversationHandler.END
 from telegram import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, ReplyKeyboardRemove
+from telegram.error import BadRequest
 
 from config import TELEGRAM_TOKEN, logging, STATES
-from models import create_tables
+from migrations import ensure_schema
+from update_dedup import install_update_dedup
+from metrics import instrument_application
+from profiler import install_profile_command
+from update_tracing import CONNECTION_POOL_SIZE, TracedApplication, TracedRequest
+from persistence import PostgresPersistence
 from db_manager import DBManager
 from training_plan_manager import TrainingPlanManager
-from openai_service import OpenAIService
+from training_load import TrainingLoadManager
+from continuation_drafts import continuation_in_flight, schedule_continuation_draft, take_continuation_draft
 from conversation import RunnerProfileConversation
-from image_analyzer import ImageAnalyzer
+from marathon_utils import CATALOG as MARATHON_CATALOG, DISTANCE_FILTERS
+from training_calendar import parse_date
+from units import WORKOUT_DISTANCE_KEY, WORKOUT_DURATION_KEY, day_distance_km, format_distance
+from workout_log import WorkoutLogManager
 
 
 async def send_main_menu(update, context, message_text="Что вы хотите сделать?"):
@@ -47,6 +58,10 @@ def format_weekly_volume(volume, default_value="0"):
     if volume is None or volume == "None" or not volume:
         return f"{default_value} км/неделю"
 
+    # Числовой объем (weekly_volume_km) форматируем без повторного разбора
+    if isinstance(volume, (int, float)):
+        return f"{format_distance(volume)}/неделю"
+
     # Если в строке уже содержится единица измерения, возвращаем как есть
     if isinstance(volume, str) and ("км/неделю" in volume or "км" in volume):
         return volume
@@ -404,8 +419,8 @@ async def pending_trainings_command(update, context):
             # Calculate total completed distance
             total_distance = TrainingPlanManager.calculate_total_completed_distance(db_user_id, plan_id)
 
-            # Add total distance to user profile
-            new_volume = DBManager.update_weekly_volume(db_user_id, total_distance)
+            # Weekly volume is derived from the workout log
+            new_volume = DBManager.refresh_weekly_volume(db_user_id)
 
             # Format the weekly volume
             formatted_volume = format_weekly_volume(new_volume, str(total_distance))
@@ -576,6 +591,7 @@ async def generate_plan_command(update, context):
         except Exception as e:
             logging.error(f"Ошибка при использовании MCP-инструмента: {e}")
             # В случае ошибки возвращаемся к старому методу
+            from openai_service import OpenAIService
             openai_service = OpenAIService()
             plan = openai_service.generate_training_plan(profile)
             logging.info("План создан через оригинальный OpenAIService после ошибки MCP")
@@ -686,6 +702,52 @@ async def update_profile_command(update, context):
         if 'profile_update_in_progress' in context.user_data:
             del context.user_data['profile_update_in_progress']
 
+def marathon_keyboard(filter_code, page):
+    """
+    Клавиатура выбора марафона: страница каталога, фильтр по дистанции и навигация.
+
+    Args:
+        filter_code: Код фильтра из DISTANCE_FILTERS
+        page: Номер страницы (с 0)
+
+    Returns:
+        InlineKeyboardMarkup или None, если предстоящих марафонов нет
+    """
+    if filter_code not in DISTANCE_FILTERS:
+        filter_code = "all"
+    marathons, page, pages = MARATHON_CATALOG.page(page, distance_type=DISTANCE_FILTERS[filter_code])
+    if not marathons and filter_code == "all":
+        return None
+
+    # callback_data содержит только короткий ID марафона из каталога
+    keyboard = [
+        [InlineKeyboardButton(f"{marathon.name} ({marathon.date_text})",
+                              callback_data=f"set_marathon_{marathon.id}")]
+        for marathon in marathons
+    ]
+
+    navigation = []
+    if page > 0:
+        navigation.append(InlineKeyboardButton("◀️", callback_data=f"marathons_{filter_code}_{page - 1}"))
+    if pages > 1:
+        navigation.append(InlineKeyboardButton(f"{page + 1}/{pages}", callback_data=f"marathons_{filter_code}_{page}"))
+    if page < pages - 1:
+        navigation.append(InlineKeyboardButton("▶️", callback_data=f"marathons_{filter_code}_{page + 1}"))
+    if navigation:
+        keyboard.append(navigation)
+
+    filter_names = {"all": "Все", "full": "Марафоны", "half": "Полумарафоны"}
+    keyboard.append([
+        InlineKeyboardButton(("✓ " if code == filter_code else "") + filter_names.get(code, code),
+                             callback_data=f"marathons_{code}_0")
+        for code in DISTANCE_FILTERS
+    ])
+
+    # Добавляем кнопку отмены
+    keyboard.append([InlineKeyboardButton("Отмена", callback_data="cancel_marathon_selection")])
+    return InlineKeyboardMarkup(keyboard)
+
+
 async def callback_query_handler(update, context):
     """Handler for inline button callbacks."""
     query = update.callback_query
@@ -698,44 +760,48 @@ async def callback_query_handler(update, context):
     original_callback_data = query.data
     context.user_data['last_callback'] = original_callback_data
     
-    # Проверяем, не является ли это выбором марафона
-    if query.data == "select_marathon":
-        # Импортируем функцию для выбора марафона
-        from marathon_utils import get_marathons_list
-        
-        # Получаем список марафонов
-        marathons = get_marathons_list()
-        
-        # Создаем клавиатуру с марафонами
-        keyboard = []
-        for i, marathon in enumerate(marathons[:10]):  # Показываем только первые 10 марафонов
-            # Формируем callback_data в формате: set_marathon_YYYY-MM-DD
-            callback_data = f"set_marathon_{marathon['Дата']}"
-            # Добавляем кнопку с названием и датой марафона
-            button = InlineKeyboardButton(
-                f"{marathon['Название']} ({marathon['Дата']})", 
-                callback_data=callback_data
+    # Проверяем, не является ли это выбором марафона или переходом по страницам каталога
+    if query.data == "select_marathon" or query.data.startswith("marathons_"):
+        if query.data == "select_marathon":
+            filter_code, page = "all", 0
+        else:
+            filter_code, _, page_text = query.data[len("marathons_"):].partition("_")
+            page = int(page_text) if page_text.isdigit() else 0
+
+        reply_markup = marathon_keyboard(filter_code, page)
+        if reply_markup is None:
+            await query.message.reply_text(
+                "К сожалению, в каталоге нет предстоящих марафонов. "
+                "Вы можете указать дату соревнования позже через меню обновления профиля."
             )
-            keyboard.append([button])
-        
-        # Добавляем кнопку отмены
-        keyboard.append([InlineKeyboardButton("Отмена", callback_data="cancel_marathon_selection")])
-        
-        # Создаем разметку клавиатуры
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        # Отправляем сообщение с выбором марафона
-        await query.message.reply_text(
-            "Выберите марафон из списка:",
-            reply_markup=reply_markup
-        )
+            return
+
+        if query.data == "select_marathon":
+            # Отправляем сообщение с выбором марафона
+            await query.message.reply_text(
+                "Выберите марафон из списка:",
+                reply_markup=reply_markup
+            )
+        else:
+            # Листание и фильтр меняют только кнопки того же сообщения
+            try:
+                await query.edit_message_reply_markup(reply_markup=reply_markup)
+            except BadRequest as e:
+                # Повторное нажатие на текущую страницу или фильтр ничего не меняет
+                logging.debug(f"Клавиатура марафонов не изменена: {e}")
         return
-        
-    # Проверяем, не является ли это выбором даты марафона
+
+    # Проверяем, не является ли это выбором марафона из каталога
     if query.data.startswith("set_marathon_"):
-        # Извлекаем дату из callback_data
-        date_str = query.data.replace("set_marathon_", "")
-        
+        # Извлекаем ID марафона из callback_data
+        marathon = MARATHON_CATALOG.get(query.data.replace("set_marathon_", ""))
+        if not marathon:
+            # Кнопка из старого сообщения или марафон удален из каталога
+            await query.message.reply_text(
+                "❌ Этот марафон больше не найден в каталоге. Пожалуйста, откройте список марафонов заново."
+            )
+            return
+
         # Получаем профиль пользователя
         profile = DBManager.get_runner_profile(db_user_id)
         if not profile:
@@ -744,22 +810,23 @@ async def callback_query_handler(update, context):
                 "Пожалуйста, создайте профиль заново."
             )
             return
-            
-        # Обновляем дату соревнования в профиле
-        profile["competition_date"] = date_str
+
+        # Обновляем дату соревнования в профиле датой начала марафона
+        profile["competition_date"] = marathon.start_date
         DBManager.save_runner_profile(db_user_id, profile)
-        
+
         # Отправляем сообщение об успешном обновлении
         await query.message.reply_text(
-            f"✅ Дата соревнования успешно обновлена на {date_str}."
+            f"✅ Дата соревнования успешно обновлена: {marathon.name}, "
+            f"{marathon.start_date.strftime('%d.%m.%Y')}."
         )
-        
+
         # Показываем главное меню
-        await send_main_menu(update, context, 
+        await send_main_menu(update, context,
             "Теперь вы можете получить персонализированный план тренировок, основанный на вашем профиле."
         )
         return
-        
+
     # Проверяем, не является ли это отменой выбора марафона
     if query.data == "cancel_marathon_selection":
         await query.message.reply_text(
@@ -846,6 +913,7 @@ async def callback_query_handler(update, context):
             except Exception as e:
                 logging.error(f"Ошибка при использовании MCP-инструмента: {e}")
                 # В случае ошибки возвращаемся к старому методу
+                from openai_service import OpenAIService
                 openai_service = OpenAIService()
                 plan = openai_service.generate_training_plan(profile)
                 logging.info("План создан через оригинальный OpenAIService после ошибки MCP")
@@ -998,9 +1066,9 @@ async def callback_query_handler(update, context):
             day_number = int(day_number)
 
             # Отмечаем тренировку как выполненную
-            success = TrainingPlanManager.mark_training_completed(db_user_id, plan_id, day_number)
+            progress = TrainingPlanManager.record_training_status(db_user_id, plan_id, day_number, 'completed')
 
-            if success:
+            if progress:
                 # Получаем план снова, чтобы увидеть обновленные отметки о выполнении
                 plan = TrainingPlanManager.get_latest_training_plan(db_user_id)
                 if not plan:
@@ -1029,27 +1097,19 @@ async def callback_query_handler(update, context):
                         f"✅ Тренировка на день {day_number} отмечена как выполненная!"
                     )
 
-                # Проверяем, все ли тренировки выполнены или отменены
-                completed_days = TrainingPlanManager.get_completed_trainings(db_user_id, plan_id)
-                canceled_days = TrainingPlanManager.get_canceled_trainings(db_user_id, plan_id)
-                processed_days = completed_days + canceled_days
-
-                # Количество тренировок в плане
-                total_days = len(plan['plan_data']['training_days'])
+                # Обработанные дни, дистанция и объем уже пересчитаны при записи статуса
+                processed_days = progress['processed_days']
+                total_days = progress['total_days']
 
-                # Проверка, все ли тренировки выполнены или отменены
-                has_pending_trainings = any(day_num not in processed_days for day_num in range(1, total_days + 1))
+                # Заранее готовим продолжение плана, если остался последний день
+                schedule_continuation_draft(db_user_id, plan_id, total_days, processed_days)
 
                 # Если все тренировки выполнены или отменены, отправляем поздравительное сообщение
-                if not has_pending_trainings:
-                    # Расчет общего пройденного расстояния
-                    total_distance = TrainingPlanManager.calculate_total_completed_distance(db_user_id, plan_id)
-
-                    # Обновление еженедельного объема в профиле пользователя
-                    new_volume = DBManager.update_weekly_volume(db_user_id, total_distance)
+                if progress['plan_finished']:
+                    total_distance = progress['total_distance']
 
                     # Форматирование объема бега для отображения
-                    formatted_volume = format_weekly_volume(new_volume, str(total_distance))
+                    formatted_volume = format_weekly_volume(progress['weekly_volume'], str(total_distance))
 
                     # Создание кнопки для продолжения тренировок
                     keyboard = InlineKeyboardMarkup([
@@ -1079,9 +1139,9 @@ async def callback_query_handler(update, context):
             day_number = int(day_number)
 
             # Отмечаем тренировку как отмененную
-            success = TrainingPlanManager.mark_training_canceled(db_user_id, plan_id, day_number)
+            progress = TrainingPlanManager.record_training_status(db_user_id, plan_id, day_number, 'canceled')
 
-            if success:
+            if progress:
                 # Получаем план снова, чтобы увидеть обновленные отметки
                 plan = TrainingPlanManager.get_latest_training_plan(db_user_id)
                 if not plan:
@@ -1110,27 +1170,19 @@ async def callback_query_handler(update, context):
                         f"❌ Тренировка на день {day_number} отмечена как отмененная!"
                     )
 
-                # Проверяем, все ли тренировки выполнены или отменены
-                completed_days = TrainingPlanManager.get_completed_trainings(db_user_id, plan_id)
-                canceled_days = TrainingPlanManager.get_canceled_trainings(db_user_id, plan_id)
-                processed_days = completed_days + canceled_days
-
-                # Количество тренировок в плане
-                total_days = len(plan['plan_data']['training_days'])
+                # Обработанные дни, дистанция и объем уже пересчитаны при записи статуса
+                processed_days = progress['processed_days']
+                total_days = progress['total_days']
 
-                # Проверка, все ли тренировки выполнены или отменены
-                has_pending_trainings = any(day_num not in processed_days for day_num in range(1, total_days + 1))
+                # Заранее готовим продолжение плана, если остался последний день
+                schedule_continuation_draft(db_user_id, plan_id, total_days, processed_days)
 
                 # Если все тренировки выполнены или отменены, отправляем поздравительное сообщение
-                if not has_pending_trainings:
-                    # Расчет общего пройденного расстояния
-                    total_distance = TrainingPlanManager.calculate_total_completed_distance(db_user_id, plan_id)
-
-                    # Обновление еженедельного объема в профиле пользователя
-                    new_volume = DBManager.update_weekly_volume(db_user_id, total_distance)
+                if progress['plan_finished']:
+                    total_distance = progress['total_distance']
 
                     # Форматирование объема бега для отображения
-                    formatted_volume = format_weekly_volume(new_volume, str(total_distance))
+                    formatted_volume = format_weekly_volume(progress['weekly_volume'], str(total_distance))
 
                     # Создание кнопки для продолжения тренировок
                     keyboard = InlineKeyboardMarkup([
@@ -1336,6 +1388,7 @@ async def callback_query_handler(update, context):
                     except Exception as mcp_error:
                         logging.error(f"Ошибка при использовании MCP-инструмента для пользователя {telegram_id}: {mcp_error}")
                         # В случае ошибки возвращаемся к старому методу
+                        from openai_service import OpenAIService
                         openai_service = OpenAIService()
                         plan = openai_service.generate_training_plan(profile)
                         logging.info(f"План для пользователя {telegram_id} создан через оригинальный OpenAIService после ошибки MCP")
@@ -1480,6 +1533,7 @@ async def callback_query_handler(update, context):
                 except Exception as e:
                     logging.error(f"Ошибка при использовании MCP-инструмента: {e}")
                     # В случае ошибки возвращаемся к старому методу
+                    from openai_service import OpenAIService
                     openai_service = OpenAIService()
                     plan = openai_service.generate_training_plan(profile)
                     logging.info("План создан через оригинальный OpenAIService после ошибки MCP")
@@ -1546,16 +1600,16 @@ async def callback_query_handler(update, context):
             _, _, plan_id = query.data.split('_')
             plan_id = int(plan_id)
 
-            # Получаем информацию о плане тренировок
-            plan = TrainingPlanManager.get_training_plan(db_user_id, plan_id)
-            if not plan:
-                await query.message.reply_text("❌ Не удалось найти план тренировок.")
-                return
-
             # Получаем выполненные и отмененные тренировки
             completed = TrainingPlanManager.get_completed_trainings(db_user_id, plan_id)
             canceled = TrainingPlanManager.get_canceled_trainings(db_user_id, plan_id)
 
+            # Из плана загружаем только обработанные дни
+            plan_days = TrainingPlanManager.get_plan_days(db_user_id, plan_id, day_numbers=completed + canceled)
+            if (completed or canceled) and not plan_days:
+                await query.message.reply_text("❌ Не удалось найти план тренировок.")
+                return
+
             # Отправляем заголовок истории тренировок
             await query.message.reply_text(
                 "📜 *История тренировок:*",
@@ -1571,21 +1625,10 @@ async def callback_query_handler(update, context):
 
                 # Отправляем информацию о выполненных тренировках
                 for day_num in sorted(completed):
-                    # Определяем день тренировки
-                    day_idx = day_num - 1
-
-                    # Определяем структуру плана
-                    training_days = []
-                    if 'training_days' in plan:
-                        training_days = plan['training_days']
-                    elif 'plan_data' in plan and isinstance(plan['plan_data'], dict) and 'training_days' in plan['plan_data']:
-                        training_days = plan['plan_data']['training_days']
-
-                    if day_idx < 0 or day_idx >= len(training_days):
+                    day = plan_days.get(day_num)
+                    if not day:
                         continue
 
-                    day = training_days[day_idx]
-
                     # Определяем тип тренировки
                     training_type = day.get('training_type') or day.get('type', 'Не указан')
 
@@ -1608,21 +1651,10 @@ async def callback_query_handler(update, context):
 
                 # Отправляем информацию об отмененных тренировках
                 for day_num in sorted(canceled):
-                    # Определяем день тренировки
-                    day_idx = day_num - 1
-
-                    # Определяем структуру плана
-                    training_days = []
-                    if 'training_days' in plan:
-                        training_days = plan['training_days']
-                    elif 'plan_data' in plan and isinstance(plan['plan_data'], dict) and 'training_days' in plan['plan_data']:
-                        training_days = plan['plan_data']['training_days']
-
-                    if day_idx < 0 or day_idx >= len(training_days):
+                    day = plan_days.get(day_num)
+                    if not day:
                         continue
 
-                    day = training_days[day_idx]
-
                     # Определяем тип тренировки
                     training_type = day.get('training_type') or day.get('type', 'Не указан')
 
@@ -1649,7 +1681,7 @@ async def callback_query_handler(update, context):
     # Обработка ручного сопоставления тренировки со скриншота
     elif query.data.startswith("manual_match_"):
         try:
-            # Разбираем callback data: manual_match_{plan_id}_{day_num}_{workout_distance}
+            # Разбираем callback data: manual_match_{plan_id}_{day_num}_{workout_distance}[_{duration_sec}]
             parts = query.data.split('_')
 
             # Проверяем, правильный ли формат
@@ -1661,6 +1693,7 @@ async def callback_query_handler(update, context):
             plan_id = int(parts[2])
             day_num = int(parts[3])
             workout_distance = float(parts[4])
+            workout_duration = int(parts[5]) if len(parts) > 5 else 0
 
             # Получаем текущий план
             plan = TrainingPlanManager.get_training_plan(db_user_id, plan_id)
@@ -1697,26 +1730,20 @@ async def callback_query_handler(update, context):
                 )
                 return
 
-            # Отмечаем тренировку как выполненную
-            success = TrainingPlanManager.mark_training_completed(db_user_id, plan_id, day_num)
+            # Отмечаем тренировку как выполненную с фактической дистанцией;
+            # журнал тренировок пересчитывает еженедельный объем в профиле
+            progress = TrainingPlanManager.record_training_status(
+                db_user_id, plan_id, day_num, 'completed',
+                distance_km=workout_distance or None, source='screenshot'
+            )
+            success = progress is not None
+            # Фактическое время пробежки уточняет уровень бегуна при расчете зон темпа
+            if success and workout_distance and workout_duration:
+                WorkoutLogManager.save_duration(db_user_id, plan_id, day_num, workout_distance, workout_duration)
 
             if success:
-                # Обновляем еженедельный объем в профиле пользователя
-                DBManager.update_weekly_volume(db_user_id, workout_distance)
-
-                # Извлекаем запланированную дистанцию
-                planned_distance = 0
-                try:
-                    # Извлекаем числовое значение из строки с дистанцией (напр., "5 км" -> 5)
-                    import re
-                    distance_match = re.search(r'(\d+(\.\d+)?)', matched_day['distance'])
-                    if distance_match:
-                        planned_distance = float(distance_match.group(1))
-                        logging.info(f"Успешно извлечена плановая дистанция: {planned_distance} км из '{matched_day['distance']}'")
-                    else:
-                        logging.warning(f"Не удалось извлечь числовое значение дистанции из строки: '{matched_day['distance']}'")
-                except Exception as e:
-                    logging.warning(f"Error extracting planned distance: {e}")
+                # Запланированная дистанция (разобрана в число при сохранении плана)
+                planned_distance = day_distance_km(matched_day)
 
                 # Проверяем, значительно ли отличается фактическая дистанция от запланированной
                 diff_percent = 0
@@ -1771,6 +1798,7 @@ async def callback_query_handler(update, context):
 
                 # Проверяем, все ли тренировки теперь выполнены
                 all_processed_days = TrainingPlanManager.get_all_processed_trainings(db_user_id, plan_id)
+                schedule_continuation_draft(db_user_id, plan_id, len(training_days), all_processed_days)
                 if len(all_processed_days) == len(training_days):
                     # Вычисляем общую пройденную дистанцию
                     total_distance = TrainingPlanManager.calculate_total_completed_distance(db_user_id, plan_id)
@@ -1839,6 +1867,11 @@ async def callback_query_handler(update, context):
                 "Это может занять некоторое время."
             )
 
+            # Уже выполненные и отмененные дни при корректировке не меняются
+            processed_days = TrainingPlanManager.get_all_processed_trainings(db_user_id, plan_id)
+            # Нагрузка бегуна ограничивает рост объема при накопленной усталости
+            training_load = TrainingLoadManager.get_summary(db_user_id)
+
             # Сначала пробуем использовать MCP-адаптер для корректировки плана
             try:
                 logging.info("Инициализация AgentAdapter для корректировки плана")
@@ -1852,19 +1885,24 @@ async def callback_query_handler(update, context):
                     current_plan['plan_data'],
                     day_num,
                     planned_distance,
-                    actual_distance
+                    actual_distance,
+                    processed_days=processed_days,
+                    training_load=training_load
                 )
                 logging.info("План успешно скорректирован через MCP-инструмент")
             except Exception as adapter_error:
                 # Если произошла ошибка, используем стандартный OpenAIService
                 logging.error(f"Ошибка при использовании AgentAdapter для корректировки: {adapter_error}")
+                from openai_service import OpenAIService
                 openai_service = OpenAIService()
                 adjusted_plan = openai_service.adjust_training_plan(
                     runner_profile,
                     current_plan['plan_data'],
                     day_num,
                     planned_distance,
-                    actual_distance
+                    actual_distance,
+                    processed_days=processed_days,
+                    training_load=training_load
                 )
                 logging.info("План скорректирован через OpenAIService после ошибки адаптера")
 
@@ -1999,33 +2037,58 @@ async def callback_query_handler(update, context):
             # Расчет общего пройденного расстояния
             total_distance = TrainingPlanManager.calculate_total_completed_distance(db_user_id, plan_id)
 
-            # Сообщаем пользователю о начале генерации нового плана
-            with open("attached_assets/котик.jpeg", "rb") as photo:
-                await query.message.reply_photo(
-                    photo=photo,
-                    caption=f"⏳ Генерирую продолжение плана тренировок с учетом вашего прогресса ({total_distance:.1f} км). Это может занять некоторое время...\n\nМой котик всегда готов к любой задаче! 🐱💪"
-                )
+            # Черновик, подготовленный заранее, выдаем сразу, если входные данные не изменились.
+            # Если черновик еще генерируется, дожидаемся его, а не запускаем вторую генерацию.
+            generating_message_sent = False
+
+            async def notify_generating():
+                # Сообщаем пользователю о начале генерации нового плана
+                with open("attached_assets/котик.jpeg", "rb") as photo:
+                    await query.message.reply_photo(
+                        photo=photo,
+                        caption=f"⏳ Генерирую продолжение плана тренировок с учетом вашего прогресса ({total_distance:.1f} км). Это может занять некоторое время...\n\nМой котик всегда готов к любой задаче! 🐱💪"
+                    )
+
+            if continuation_in_flight(db_user_id, current_plan['id']):
+                await notify_generating()
+                generating_message_sent = True
+            new_plan = await asyncio.to_thread(
+                take_continuation_draft, db_user_id, current_plan['id'], profile, current_plan
+            )
+            if new_plan:
+                logging.info(f"Используем заранее подготовленное продолжение плана {current_plan['id']}")
+            elif not generating_message_sent:
+                await notify_generating()
 
             # Получаем сервис OpenAI и генерируем продолжение плана
             try:
                 # Сначала пробуем использовать MCP-инструмент через адаптер
-                try:
-                    logging.info("Инициализация AgentAdapter для продолжения плана")
-                    from agent.adapter import AgentAdapter
-                    agent_adapter = AgentAdapter()
+                if not new_plan:
+                    training_load = TrainingLoadManager.get_summary(db_user_id)
+                    try:
+                        logging.info("Инициализация AgentAdapter для продолжения плана")
+                        from agent.adapter import AgentAdapter
+                        agent_adapter = AgentAdapter()
                     
-                    logging.info(f"Вызов agent_adapter.generate_training_plan_continuation с параметрами: profile_id={profile['id']}, total_distance={total_distance}")
-                    new_plan = agent_adapter.generate_training_plan_continuation(profile, total_distance, current_plan['plan_data'])
-                    logging.info(f"Получен новый план через MCP-инструмент: {new_plan.get('plan_name', 'Неизвестный план')}")
-                except Exception as adapter_error:
-                    # Если произошла ошибка с адаптером, используем старый сервис
-                    logging.error(f"Ошибка при использовании AgentAdapter: {adapter_error}")
-                    logging.info("Переключение на OpenAIService для продолжения плана")
+                        logging.info(f"Вызов agent_adapter.generate_training_plan_continuation с параметрами: profile_id={profile['id']}, total_distance={total_distance}")
+                        new_plan = agent_adapter.generate_training_plan_continuation(
+                            profile, total_distance, current_plan['plan_data'],
+                            training_load=training_load
+                        )
+                        logging.info(f"Получен новый план через MCP-инструмент: {new_plan.get('plan_name', 'Неизвестный план')}")
+                    except Exception as adapter_error:
+                        # Если произошла ошибка с адаптером, используем старый сервис
+                        logging.error(f"Ошибка при использовании AgentAdapter: {adapter_error}")
+                        logging.info("Переключение на OpenAIService для продолжения плана")
                     
-                    openai_service = OpenAIService()
-                    logging.info(f"Вызов openai_service.generate_training_plan_continuation с параметрами: profile_id={profile['id']}, total_distance={total_distance}")
-                    new_plan = openai_service.generate_training_plan_continuation(profile, total_distance, current_plan['plan_data'])
-                    logging.info(f"Получен новый план через OpenAIService: {new_plan.get('plan_name', 'Неизвестный план')}")
+                        from openai_service import OpenAIService
+                        openai_service = OpenAIService()
+                        logging.info(f"Вызов openai_service.generate_training_plan_continuation с параметрами: profile_id={profile['id']}, total_distance={total_distance}")
+                        new_plan = openai_service.generate_training_plan_continuation(
+                            profile, total_distance, current_plan['plan_data'],
+                            training_load=training_load
+                        )
+                        logging.info(f"Получен новый план через OpenAIService: {new_plan.get('plan_name', 'Неизвестный план')}")
 
                 # Сохраняем новый план в базу данных
                 logging.info(f"Сохранение нового плана в БД для пользователя {db_user_id}")
@@ -2112,6 +2175,7 @@ async def handle_photo(update, context):
         photo_bytes = await photo_file.download_as_bytearray()
 
         # Analyze the screenshot
+        from image_analyzer import ImageAnalyzer
         analyzer = ImageAnalyzer()
         workout_data = analyzer.analyze_workout_screenshot(photo_bytes)
 
@@ -2218,18 +2282,11 @@ async def handle_photo(update, context):
         forced_match_idx = None
         if workout_date_obj:
             for i, day in enumerate(training_days):
-                day_date_str = day.get('date', '')
-                try:
-                    # Преобразуем дату из плана "DD.MM.YYYY" в объект datetime
-                    day_date_obj = datetime.strptime(day_date_str, "%d.%m.%Y")
-
-                    # Если даты совпадают, устанавливаем принудительное сопоставление
-                    if day_date_obj.date() == workout_date_obj.date():
-                        forced_match_idx = i
-                        logging.info(f"Принудительное сопоставление по дате: День {i+1} ({day_date_str})")
-                        break
-                except ValueError:
-                    logging.warning(f"Не удалось преобразовать дату '{day_date_str}' из плана.")
+                # Если даты совпадают, устанавливаем принудительное сопоставление
+                if parse_date(day.get('date')) == workout_date_obj.date():
+                    forced_match_idx = i
+                    logging.info(f"Принудительное сопоставление по дате: День {i+1} ({day.get('date')})")
+                    break
 
         # Если есть принудительное сопоставление по дате, используем его, иначе используем алгоритм
         if forced_match_idx is not None:
@@ -2273,38 +2330,27 @@ async def handle_photo(update, context):
                 )
                 return
 
-            # Mark training as completed
-            success = TrainingPlanManager.mark_training_completed(db_user_id, plan_id, matched_day_num)
+            # Mark training as completed with the actual distance;
+            # the workout log refreshes the weekly volume in the profile
+            distance_km = workout_data.get(WORKOUT_DISTANCE_KEY)
+            if not distance_km:
+                logging.warning(f"Could not parse workout distance, logging planned distance: {workout_distance}")
+            progress = TrainingPlanManager.record_training_status(
+                db_user_id, plan_id, matched_day_num, 'completed',
+                distance_km=distance_km, source='screenshot'
+            )
+            success = progress is not None
+            # Фактическое время пробежки уточняет уровень бегуна при расчете зон темпа
+            duration_sec = workout_data.get(WORKOUT_DURATION_KEY)
+            if success and distance_km and duration_sec:
+                WorkoutLogManager.save_duration(db_user_id, plan_id, matched_day_num, distance_km, duration_sec)
 
             if success:
-                # Update weekly volume in profile (add completed distance)
-                try:
-                    distance_km = float(workout_distance)
-                    DBManager.update_weekly_volume(db_user_id, distance_km)
-                except (ValueError, TypeError):
-                    logging.warning(f"Could not update weekly volume with distance: {workout_distance}")
-
-                # Extract planned distance
-                planned_distance = 0
-                try:
-                    # Extract numeric value from distance string (e.g., "5 км" -> 5)
-                    import re
-                    distance_match = re.search(r'(\d+(\.\d+)?)', matched_day['distance'])
-                    if distance_match:
-                        planned_distance = float(distance_match.group(1))
-                        logging.info(f"Успешно извлечена плановая дистанция: {planned_distance} км из '{matched_day['distance']}'")
-                    else:
-                        logging.warning(f"Не удалось извлечь числовое значение дистанции из строки: '{matched_day['distance']}'")
-                except Exception as e:
-                    logging.warning(f"Error extracting planned distance: {e}")
+                # Extract planned distance (parsed into a number on plan save)
+                planned_distance = day_distance_km(matched_day)
 
                 # Check if actual distance significantly differs from planned distance
-                try:
-                    actual_distance = float(workout_distance)
-                    logging.info(f"Преобразована фактическая дистанция в число: {actual_distance} км")
-                except ValueError as e:
-                    logging.error(f"Ошибка преобразования фактической дистанции '{workout_distance}' в число: {e}")
-                    actual_distance = 0
+                actual_distance = workout_data.get(WORKOUT_DISTANCE_KEY) or 0
 
                 diff_percent = 0
                 if planned_distance > 0 and actual_distance > 0:
@@ -2378,6 +2424,7 @@ async def handle_photo(update, context):
 
                 # Check if all trainings are now completed
                 all_processed_days = TrainingPlanManager.get_all_processed_trainings(db_user_id, plan_id)
+                schedule_continuation_draft(db_user_id, plan_id, len(training_days), all_processed_days)
                 if len(all_processed_days) == len(training_days):
                     # Calculate total completed distance
                     total_distance = TrainingPlanManager.calculate_total_completed_distance(db_user_id, plan_id)
@@ -2406,7 +2453,8 @@ async def handle_photo(update, context):
                 if day_num not in processed_days:
                     buttons.append([InlineKeyboardButton(
                         f"День {day_num}: {day['day']} ({day['date']}) - {day['distance']}",
-                        callback_data=f"manual_match_{plan_id}_{day_num}_{workout_distance}"
+                        callback_data=(f"manual_match_{plan_id}_{day_num}_{workout_data.get(WORKOUT_DISTANCE_KEY) or 0}"
+                                       f"_{workout_data.get(WORKOUT_DURATION_KEY) or 0}")
                     )])
 
             # Добавляем кнопку "Это дополнительная тренировка"
@@ -2434,13 +2482,31 @@ async def handle_photo(update, context):
         await send_main_menu(update, context)
 
 
-def setup_bot():
-    """Configure and return the bot application."""
-    # Create the Application object
-    application = ApplicationBuilder().token(TELEGRAM_TOKEN).build()
+def setup_bot(check_schema=True):
+    """
+    Configure and return the bot application.
 
-    # Create database tables if they don't exist
-    create_tables()
+    Args:
+        check_schema: Check the schema version while building; the fast boot path
+            (boot.prewarm) checks it in parallel with the Telegram client instead
+    """
+    # Create the Application object; dialogue states and user_data survive restarts
+    # Каждое обновление обрабатывается в своей трассе, запросы к Bot API — ее интервалы (см. tracing.py)
+    application = (
+        ApplicationBuilder()
+        .token(TELEGRAM_TOKEN)
+        .application_class(TracedApplication)
+        .request(TracedRequest(connection_pool_size=CONNECTION_POOL_SIZE))
+        .persistence(PostgresPersistence())
+        .build()
+    )
+
+    # Check the schema version; migrations normally run at deploy time
+    if check_schema:
+        ensure_schema()
+
+    # Повторно доставленные обновления не доходят до обработчиков
+    install_update_dedup(application)
 
     # Add command handlers
     application.add_handler(CommandHandler("help", help_command))
@@ -2486,7 +2552,7 @@ def setup_bot():
 
     # Add conversation handlers for profile creation and update
     conversation = RunnerProfileConversation()
-    conv_handlers = conversation.get_conversation_handler()
+    conv_handlers = conversation.get_conversation_handler(persistent=True)
 
     # Если get_conversation_handler вернул список обработчиков, добавляем каждый отдельно
     # Используем группу 1, чтобы они имели более низкий приоритет, чем прямой обработчик /start
@@ -2750,6 +2816,7 @@ def setup_bot():
             # Генерируем новый план
             try:
                 # Инициализируем сервис OpenAI
+                from openai_service import OpenAIService
                 openai_service = OpenAIService()
 
                 # Генерируем план
@@ -2888,4 +2955,10 @@ def setup_bot():
     # Add callback query handler for inline buttons с группой более низкого приоритета
     application.add_handler(CallbackQueryHandler(callback_query_handler), group=2)
 
+    # /profile [секунды] для администраторов (см. profiler.py)
+    install_profile_command(application)
+
+    # Длительность и ошибки обработчиков, маршруты кнопок и типы обновлений (см. metrics.py)
+    instrument_application(application)
+
     return application
\ No newline at end of file
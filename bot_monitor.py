@@ -12,6 +12,9 @@ import logging
 import subprocess
 from datetime import datetime, timedelta
 
+from config import HEALTH_PORT
+from liveness import probe
+
 # Настройка логирования
 logging.basicConfig(
     level=logging.INFO,
@@ -28,10 +31,10 @@ BOT_PROCESS_NAME = "main.py"
 CHECK_INTERVAL = 60  # секунд между проверками
 MAX_MEMORY_PERCENT = 90  # максимальный процент памяти
 RESTART_COOLDOWN = 300  # минимальное время между перезапусками (5 минут)
-HEALTH_CHECK_FILE = "bot_health.txt"
-HEALTH_CHECK_TIMEOUT = 180  # время в секундах, после которого считаем бот неактивным
+HEALTH_FAILURES_BEFORE_RESTART = 3  # подряд неудачных опросов эндпоинта живости до перезапуска
 
 last_restart_time = datetime.now() - timedelta(seconds=RESTART_COOLDOWN * 2)
+health_failures = 0
 
 def kill_bot_processes():
     """Находит и завершает все процессы бота."""
@@ -70,34 +73,26 @@ def start_bot():
     except Exception as e:
         logger.error(f"Ошибка при запуске бота: {e}")
 
-def update_health_check():
-    """Обновляет файл проверки здоровья текущим временем."""
-    try:
-        with open(HEALTH_CHECK_FILE, "w") as f:
-            f.write(datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-    except Exception as e:
-        logger.error(f"Ошибка при обновлении файла проверки здоровья: {e}")
-
 def check_bot_health():
     """Проверяет, что бот работает и отвечает."""
     try:
-        # Проверяем, существует ли файл здоровья
-        if not os.path.exists(HEALTH_CHECK_FILE):
-            logger.warning("Файл проверки здоровья не найден")
+        # Спрашиваем процесс бота: эндпоинт отвечает из отдельного потока,
+        # поэтому видит и заблокированный цикл событий. При HEALTH_PORT=0
+        # эндпоинта нет, и опрос пропускается
+        health = probe() if HEALTH_PORT else {"status": "ok"}
+        if health is None:
+            logger.warning("Эндпоинт живости бота не отвечает")
             return False
         
-        # Проверяем время последнего обновления
-        with open(HEALTH_CHECK_FILE, "r") as f:
-            health_time_str = f.read().strip()
-        
-        health_time = datetime.strptime(health_time_str, "%Y-%m-%d %H:%M:%S")
-        current_time = datetime.now()
-        
-        # Если файл не обновлялся слишком долго, считаем бот неактивным
-        if (current_time - health_time).total_seconds() > HEALTH_CHECK_TIMEOUT:
-            logger.warning(f"Последнее обновление здоровья: {health_time_str}, текущее время: {current_time}. Бот неактивен.")
+        if health["status"] == "blocked":
+            stall = health.get("current_stall") or {}
+            logger.warning(f"Цикл событий бота не отвечает {health['heartbeat_age']} с, "
+                           f"вызов: {stall.get('stack')}")
             return False
         
+        if health["status"] == "lagging":
+            logger.warning(f"Цикл событий бота задерживается, очередь обновлений: {health['pending_updates']}")
+        
         # Проверяем использование памяти
         for proc in psutil.process_iter(['pid', 'name', 'cmdline', 'memory_percent']):
             try:
@@ -130,7 +125,7 @@ def is_bot_running():
 
 def check_and_restart_if_needed():
     """Проверяет состояние бота и перезапускает его при необходимости."""
-    global last_restart_time
+    global last_restart_time, health_failures
     
     # Проверяем, не слишком ли часто перезапускается бот
     if (datetime.now() - last_restart_time).total_seconds() < RESTART_COOLDOWN:
@@ -144,8 +139,14 @@ def check_and_restart_if_needed():
         start_bot()
         return
     
-    # Если бот запущен, проверяем его здоровье
-    if not check_bot_health():
+    # Если бот запущен, проверяем его здоровье; разовая неудача опроса
+    # (например, долгий запуск) перезапуск не вызывает
+    if check_bot_health():
+        health_failures = 0
+        return
+    health_failures += 1
+    if health_failures >= HEALTH_FAILURES_BEFORE_RESTART:
+        health_failures = 0
         logger.warning("Бот нездоров, перезапускаем")
         kill_bot_processes()
         time.sleep(2)  # Даем время на корректное завершение
@@ -155,9 +156,6 @@ def main():
     """Основная функция мониторинга."""
     logger.info("Запуск монитора бота")
     
-    # Инициализируем файл здоровья
-    update_health_check()
-    
     # Проверяем, запущен ли бот, и запускаем, если нет
     if not is_bot_running():
         logger.info("Бот не запущен, запускаем")
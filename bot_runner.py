@@ -1,92 +1,103 @@
 """
 Запускает бота из bot_modified.py с полной функциональностью.
 """
-import os
+# Отсчет времени запуска начинается с импорта boot (см. boot.py)
+from boot import BOOT, install_boot_probe, prewarm
 import logging
 import asyncio
 from bot_modified import setup_bot
+from leader_election import LeaderLease, replica_name
+from liveness import LivenessMonitor
+from metrics import MetricsFlusher
+from profiler import install_profile_signal
 
 # Настройка логирования
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
 )
 logger = logging.getLogger(__name__)
+BOOT.checkpoint("импорт модулей")
+
+async def stop_application(application):
+    """Останавливает updater и приложение, если они запущены."""
+    logger.info("Останавливаем updater...")
+    try:
+        if application.updater.running:
+            await application.updater.stop()
+    except Exception as e:
+        logger.error(f"Ошибка при остановке updater: {e}")
+        
+    logger.info("Останавливаем бота...")
+    try:
+        if application.running:
+            await application.stop()
+    except Exception as e:
+        logger.error(f"Ошибка при остановке бота: {e}")
+        
+    logger.info("Завершаем работу бота...")
+    try:
+        await application.shutdown()
+    except Exception as e:
+        logger.error(f"Ошибка при завершении работы бота: {e}")
+        
+    logger.info("Бот остановлен корректно")
 
 async def main():
     """Точка входа для запуска бота."""
-    # Объявляем переменную application в глобальной области видимости функции
-    application = None
+    monitor = None
+    flusher = None
     
     try:
         logger.info("Запуск бота из bot_modified.py...")
         
-        # Сначала сбрасываем Telegram API для решения проблем с конфликтами
-        try:
-            import requests
-            import os
-            
-            token = os.environ.get("TELEGRAM_TOKEN")
-            if token:
-                url = f"https://api.telegram.org/bot{token}/deleteWebhook?drop_pending_updates=true"
-                response = requests.get(url, timeout=10)
-                logger.info(f"Сброс вебхука: {response.text}")
-        except Exception as e:
-            logger.warning(f"Ошибка при сбросе вебхука: {e}")
-        
-        # Предварительно инициализируем БД
-        try:
-            # Импортируем app и создаем контекст приложения
-            from app import app, db
-            with app.app_context():
-                # Создаем все таблицы
-                db.create_all()
-                logger.info("База данных инициализирована в bot_runner.py")
-        except Exception as db_error:
-            logger.error(f"Ошибка при инициализации БД в bot_runner.py: {db_error}")
-            
-        # Получаем настроенное приложение бота из bot_modified.py
-        application = setup_bot()
-        
-        # Запускаем бот в режиме long polling
-        logger.info("Инициализация бота...")
-        await application.initialize()
+        # Получаем настроенное приложение бота из bot_modified.py;
+        # схема проверяется при прогреве, параллельно с подключением к Telegram
+        application = setup_bot(check_schema=False)
+        install_boot_probe(application)
+        BOOT.checkpoint("сборка приложения")
         
-        logger.info("Запуск бота...")
-        await application.start()
+        # Эндпоинт живости для мониторов: задержка цикла, очередь и медленные вызовы
+        monitor = LivenessMonitor(application.update_queue.qsize)
+        monitor.start()
+        # Метрики процесса раз в интервал записываются в bot_metrics
+        flusher = MetricsFlusher(replica_name()).start()
+        # kill -USR2 <pid> — сеанс профилирования процесса (см. profiler.py)
+        install_profile_signal(asyncio.get_running_loop())
         
-        logger.info("Запуск long polling...")
-        await application.updater.start_polling()
+        # Вебхук снимает start_polling, накопившиеся обновления сохраняются
+        # (повторы отсекает update_dedup). Polling работает только на реплике,
+        # которая держит блокировку роли poller (см. leader_election.py);
+        # прогрев идет параллельно с получением роли
+        warm_up = asyncio.create_task(prewarm(application))
         
-        logger.info("Бот успешно запущен!")
+        async def poll():
+            logger.info("Инициализация бота...")
+            await warm_up
+            await application.initialize()
+            
+            logger.info("Запуск бота...")
+            await application.start()
+            
+            logger.info("Запуск long polling...")
+            await application.updater.start_polling(drop_pending_updates=False)
+            
+            BOOT.report("Бот успешно запущен")
+            
+            # Работа продолжается, пока аренда не потеряна или задача не отменена
+            try:
+                await asyncio.Event().wait()
+            finally:
+                await stop_application(application)
         
-        # Бесконечный цикл для поддержания работы бота
-        while True:
-            await asyncio.sleep(1)
+        await LeaderLease("poller").run_as_leader(poll)
             
     except Exception as e:
         logger.error(f"Ошибка при запуске бота: {e}", exc_info=True)
     finally:
-        # Корректное завершение при остановке
-        if application:
-            logger.info("Останавливаем updater...")
-            try:
-                await application.updater.stop()
-            except Exception as e:
-                logger.error(f"Ошибка при остановке updater: {e}")
-                
-            logger.info("Останавливаем бота...")
-            try:
-                await application.stop()
-            except Exception as e:
-                logger.error(f"Ошибка при остановке бота: {e}")
-                
-            logger.info("Завершаем работу бота...")
-            try:
-                await application.shutdown()
-            except Exception as e:
-                logger.error(f"Ошибка при завершении работы бота: {e}")
-                
-            logger.info("Бот остановлен корректно")
+        if monitor:
+            monitor.stop()
+        if flusher:
+            await asyncio.to_thread(flusher.stop)
 
 if __name__ == "__main__":
     try:
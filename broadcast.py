@@ -0,0 +1,715 @@
+#!/usr/bin/env python3
+"""
+Рассылки сообщений пользователям бота.
+
+Кампания (broadcast_campaigns) хранит текст сообщения и имя аудитории;
+получатели выбираются SQL-запросом из AUDIENCES, и для каждого создается строка
+состояния доставки (broadcast_deliveries). Отправка идет пачками: пачка
+забирается из базы (pending -> sending), сообщения отправляются параллельно
+через один клиент Bot с общим ограничением скорости, а результаты пачки
+записываются одним запросом. После сбоя повторный запуск продолжает с того же
+места: получатели в sending возвращаются в pending, доставленные не трогаются
+(сообщение, отправленное прямо перед сбоем, может уйти повторно).
+
+    python broadcast.py create profile_reminder --audience without_profile --message-file text.txt
+    python broadcast.py run profile_reminder --concurrency 20 --rate 25
+    python broadcast.py status profile_reminder
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import psycopg2
+import psycopg2.extras
+from telegram import Bot
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TelegramError
+from telegram.request import HTTPXRequest
+
+from config import DB_CONFIG, TELEGRAM_TOKEN
+
+# Аудитории рассылок: имя -> запрос (id, telegram_id, first_name).
+# Параметры запроса (%(name)s) берутся из audience_params кампании.
+AUDIENCES = {
+    "all": "SELECT u.id, u.telegram_id, u.first_name FROM users u",
+    "without_profile": """
+        SELECT u.id, u.telegram_id, u.first_name
+        FROM users u
+        WHERE NOT EXISTS (SELECT 1 FROM runner_profiles rp WHERE rp.user_id = u.id)
+    """,
+    "username": "SELECT u.id, u.telegram_id, u.first_name FROM users u WHERE u.username = %(username)s",
+}
+
+# Ключ advisory-блокировки: одну кампанию одновременно отправляет только один процесс
+BROADCAST_LOCK_ID = 727402
+# Одновременных запросов к Bot API
+DEFAULT_CONCURRENCY = 20
+# Сообщений в секунду (общий лимит Telegram — около 30)
+DEFAULT_RATE = 25.0
+# Получателей в одной пачке
+DEFAULT_BATCH_SIZE = 200
+# Попыток отправки одному получателю при временных ошибках
+MAX_ATTEMPTS = 3
+# Интервал между сообщениями о прогрессе (секунды)
+PROGRESS_INTERVAL = 10.0
+
+# Итоговые статусы доставки
+FINAL_STATUSES = ("sent", "failed", "blocked")
+
+
+class Delivery(NamedTuple):
+    """Получатель из пачки рассылки."""
+    user_id: int
+    telegram_id: int
+    first_name: Optional[str]
+
+
+def render_message(template: str, first_name: Optional[str]) -> str:
+    """
+    Подставляет имя получателя в текст рассылки.
+
+    В тексте можно использовать {first_name} и {name_suffix} (", Имя" или пустая
+    строка). Остальные фигурные скобки остаются как есть.
+
+    Args:
+        template: Текст сообщения кампании
+        first_name: Имя получателя
+
+    Returns:
+        str: Текст для отправки
+    """
+    name = (first_name or "").strip()
+    return (template
+            .replace("{first_name}", name)
+            .replace("{name_suffix}", f", {name}" if name else ""))
+
+
+def classify_error(error: Exception) -> Tuple[str, Optional[float]]:
+    """
+    Определяет, что делать с получателем после ошибки отправки.
+
+    Args:
+        error: Исключение при отправке
+
+    Returns:
+        Tuple: (статус: "retry", "blocked" или "failed"; пауза перед повтором в секундах)
+    """
+    if isinstance(error, RetryAfter):
+        retry_after = error.retry_after
+        seconds = retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else float(retry_after)
+        return "retry", seconds
+    if isinstance(error, Forbidden):
+        # Бот заблокирован пользователем или пользователь удален
+        return "blocked", None
+    if isinstance(error, BadRequest):
+        return "failed", None
+    if isinstance(error, NetworkError):
+        return "retry", None
+    return "failed", None
+
+
+class RateLimiter:
+    """
+    Ограничитель скорости (token bucket) для всех отправок процесса.
+
+    Args:
+        rate: Допустимое число вызовов в секунду
+        burst: Размер запаса (по умолчанию — число вызовов за секунду)
+        clock: Источник монотонного времени
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self._clock = clock
+        self._tokens = self.burst
+        self._updated = clock()
+        self._paused_until = 0.0
+
+    def pause(self, seconds: float) -> None:
+        """Останавливает все отправки на заданное время (после RetryAfter)."""
+        self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+    def reserve(self) -> float:
+        """Резервирует один вызов и возвращает, сколько секунд до него нужно подождать."""
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        # Отрицательный запас — очередь уже зарезервированных вызовов
+        self._tokens -= 1
+        delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        return max(delay, self._paused_until - now)
+
+    async def acquire(self) -> None:
+        """Ждет своей очереди на вызов."""
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+@dataclass
+class BroadcastProgress:
+    """Счетчики рассылки за текущий запуск."""
+    total: int
+    counts: Dict[str, int] = field(default_factory=lambda: {status: 0 for status in FINAL_STATUSES})
+    started: float = field(default_factory=time.monotonic)
+
+    def add(self, status: str) -> None:
+        self.counts[status] = self.counts.get(status, 0) + 1
+
+    @property
+    def done(self) -> int:
+        return sum(self.counts.values())
+
+    def throughput(self, now: Optional[float] = None) -> float:
+        """Обработанных получателей в секунду."""
+        elapsed = (now if now is not None else time.monotonic()) - self.started
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def summary(self, now: Optional[float] = None) -> str:
+        return (f"{self.done}/{self.total}: отправлено {self.counts['sent']}, "
+                f"заблокировали бота {self.counts['blocked']}, ошибок {self.counts['failed']}, "
+                f"{self.throughput(now):.1f} сообщ./с")
+
+
+async def _deliver(bot: Bot, template: str, delivery: Delivery, limiter: RateLimiter,
+                   semaphore: asyncio.Semaphore) -> Tuple[int, str, Optional[str]]:
+    """Отправляет сообщение одному получателю с повторами при временных ошибках."""
+    text = render_message(template, delivery.first_name)
+    error = None
+    async with semaphore:
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            await limiter.acquire()
+            try:
+                await bot.send_message(chat_id=delivery.telegram_id, text=text)
+                return delivery.user_id, "sent", None
+            except TelegramError as e:
+                error = e
+                status, retry_after = classify_error(e)
+                if status != "retry":
+                    return delivery.user_id, status, str(e)
+                if retry_after:
+                    limiter.pause(retry_after)
+                elif attempt < MAX_ATTEMPTS:
+                    await asyncio.sleep(2 ** attempt)
+    return delivery.user_id, "failed", str(error)
+
+
+async def send_batch(bot: Bot, template: str, deliveries: Iterable[Delivery], limiter: RateLimiter,
+                     semaphore: asyncio.Semaphore,
+                     progress: Optional[BroadcastProgress] = None) -> List[Tuple[int, str, Optional[str]]]:
+    """
+    Отправляет сообщения пачке получателей параллельно.
+
+    Args:
+        bot: Общий клиент Bot
+        template: Текст сообщения кампании
+        deliveries: Получатели пачки
+        limiter: Общий ограничитель скорости
+        semaphore: Ограничение числа одновременных запросов
+        progress: Счетчики запуска
+
+    Returns:
+        List[Tuple]: (user_id, итоговый статус, текст ошибки) для каждого получателя
+    """
+    results = await asyncio.gather(*(_deliver(bot, template, delivery, limiter, semaphore)
+                                     for delivery in deliveries))
+    if progress is not None:
+        for _, status, _ in results:
+            progress.add(status)
+    return list(results)
+
+
+class BroadcastManager:
+    """Manager for broadcast campaigns and their per-recipient delivery state."""
+
+    @staticmethod
+    def create_campaign(name, audience, message, audience_params=None):
+        """
+        Create a campaign, or return the existing campaign with the same name.
+
+        Args:
+            name: Unique campaign name
+            audience: Audience name from AUDIENCES
+            message: Message template (see render_message)
+            audience_params: Parameters of the audience query
+
+        Returns:
+            Campaign ID if successful, None otherwise
+        """
+        if audience not in AUDIENCES:
+            logging.error(f"Unknown broadcast audience: {audience}")
+            return None
+        conn = None
+        try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    INSERT INTO broadcast_campaigns (name, audience, audience_params, message)
+                    VALUES (%s, %s, %s, %s)
+                    ON CONFLICT (name) DO NOTHING
+                    """,
+                    (name, audience, json.dumps(audience_params or {}), message)
+                )
+                cursor.execute("SELECT id FROM broadcast_campaigns WHERE name = %s", (name,))
+                campaign_id = cursor.fetchone()[0]
+            conn.commit()
+            return campaign_id
+        except Exception as e:
+            logging.error(f"Error creating broadcast campaign: {e}")
+            if conn:
+                conn.rollback()
+            return None
+        finally:
+            if conn:
+                conn.close()
+
+    @staticmethod
+    def get_campaign(name):
+        """
+        Get a campaign by name.
+
+        Returns:
+            Dictionary with the campaign columns if found, None otherwise
+        """
+        conn = None
+        try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+                cursor.execute("SELECT * FROM broadcast_campaigns WHERE name = %s", (name,))
+                row = cursor.fetchone()
+                return dict(row) if row else None
+        except Exception as e:
+            logging.error(f"Error getting broadcast campaign: {e}")
+            return None
+        finally:
+            if conn:
+                conn.close()
+
+    @staticmethod
+    def enqueue_audience(campaign_id):
+        """
+        Add new audience members as pending deliveries and drop pending deliveries
+        of users who left the audience.
+
+        Args:
+            campaign_id: Campaign ID
+
+        Returns:
+            Tuple (added, removed) if successful, None otherwise
+        """
+        conn = None
+        try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT audience, audience_params FROM broadcast_campaigns WHERE id = %s",
+                    (campaign_id,)
+                )
+                audience, params = cursor.fetchone()
+                audience_sql = AUDIENCES[audience]
+                params = dict(params or {}, campaign_id=campaign_id)
+                cursor.execute(
+                    f"""
+                    INSERT INTO broadcast_deliveries (campaign_id, user_id, telegram_id, first_name)
+                    SELECT %(campaign_id)s, a.id, a.telegram_id, a.first_name
+                    FROM ({audience_sql}) AS a (id, telegram_id, first_name)
+                    ON CONFLICT (campaign_id, user_id) DO NOTHING
+                    """,
+                    params
+                )
+                added = cursor.rowcount
+                cursor.execute(
+                    f"""
+                    DELETE FROM broadcast_deliveries d
+                    WHERE d.campaign_id = %(campaign_id)s AND d.status = 'pending'
+                      AND NOT EXISTS (
+                          SELECT 1 FROM ({audience_sql}) AS a (id, telegram_id, first_name)
+                          WHERE a.id = d.user_id
+                      )
+                    """,
+                    params
+                )
+                removed = cursor.rowcount
+            conn.commit()
+            return added, removed
+        except Exception as e:
+            logging.error(f"Error enqueueing broadcast audience: {e}")
+            if conn:
+                conn.rollback()
+            return None
+        finally:
+            if conn:
+                conn.close()
+
+    @staticmethod
+    def mark_sent(campaign_id, telegram_ids):
+        """
+        Mark pending deliveries as sent without sending (recipients notified before
+        the campaign existed).
+
+        Returns:
+            Number of deliveries marked if successful, None otherwise
+        """
+        conn = None
+        try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    UPDATE broadcast_deliveries
+                    SET status = 'sent', updated_at = NOW()
+                    WHERE campaign_id = %s AND status = 'pending' AND telegram_id = ANY(%s)
+                    """,
+                    (campaign_id, list(telegram_ids))
+                )
+                marked = cursor.rowcount
+            conn.commit()
+            return marked
+        except Exception as e:
+            logging.error(f"Error marking broadcast deliveries as sent: {e}")
+            if conn:
+                conn.rollback()
+            return None
+        finally:
+            if conn:
+                conn.close()
+
+    @staticmethod
+    def start(campaign_id):
+        """
+        Return deliveries left in 'sending' by a crashed run to 'pending' and mark
+        the campaign as running. Called under the campaign lock.
+
+        Returns:
+            Number of deliveries resumed if successful, None otherwise
+        """
+        conn = None
+        try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    UPDATE broadcast_deliveries
+                    SET status = 'pending', updated_at = NOW()
+                    WHERE campaign_id = %s AND status = 'sending'
+                    """,
+                    (campaign_id,)
+                )
+                resumed = cursor.rowcount
+                cursor.execute(
+                    """
+                    UPDATE broadcast_campaigns
+                    SET status = 'running', started_at = COALESCE(started_at, NOW()), finished_at = NULL
+                    WHERE id = %s
+                    """,
+                    (campaign_id,)
+                )
+            conn.commit()
+            return resumed
+        except Exception as e:
+            logging.error(f"Error starting broadcast campaign: {e}")
+            if conn:
+                conn.rollback()
+            return None
+        finally:
+            if conn:
+                conn.close()
+
+    @staticmethod
+    def claim_batch(campaign_id, limit):
+        """
+        Move up to limit pending deliveries to 'sending' and return them.
+
+        Returns:
+            List of Delivery; an empty list if nothing is pending or on error
+        """
+        conn = None
+        try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    UPDATE broadcast_deliveries d
+                    SET status = 'sending', attempts = d.attempts + 1, updated_at = NOW()
+                    FROM (
+                        SELECT user_id FROM broadcast_deliveries
+                        WHERE campaign_id = %s AND status = 'pending'
+                        ORDER BY user_id
+                        LIMIT %s
+                        FOR UPDATE SKIP LOCKED
+                    ) batch
+                    WHERE d.campaign_id = %s AND d.user_id = batch.user_id
+                    RETURNING d.user_id, d.telegram_id, d.first_name
+                    """,
+                    (campaign_id, limit, campaign_id)
+                )
+                batch = [Delivery(*row) for row in cursor.fetchall()]
+            conn.commit()
+            return batch
+        except Exception as e:
+            logging.error(f"Error claiming broadcast batch: {e}")
+            if conn:
+                conn.rollback()
+            return []
+        finally:
+            if conn:
+                conn.close()
+
+    @staticmethod
+    def record_results(campaign_id, results):
+        """
+        Store the outcome of a batch with one statement.
+
+        Args:
+            campaign_id: Campaign ID
+            results: Iterable of (user_id, status, error)
+
+        Returns:
+            True if successful, False otherwise
+        """
+        conn = None
+        try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            with conn.cursor() as cursor:
+                psycopg2.extras.execute_values(
+                    cursor,
+                    """
+                    UPDATE broadcast_deliveries d
+                    SET status = r.status, error = r.error, updated_at = NOW()
+                    FROM (VALUES %s) AS r (campaign_id, user_id, status, error)
+                    WHERE d.campaign_id = r.campaign_id AND d.user_id = r.user_id
+                    """,
+                    [(campaign_id, user_id, status, error) for user_id, status, error in results]
+                )
+            conn.commit()
+            return True
+        except Exception as e:
+            logging.error(f"Error recording broadcast results: {e}")
+            if conn:
+                conn.rollback()
+            return False
+        finally:
+            if conn:
+                conn.close()
+
+    @staticmethod
+    def finish(campaign_id):
+        """
+        Mark the campaign as done if no deliveries are left open.
+
+        Returns:
+            True if the campaign is done, False otherwise
+        """
+        conn = None
+        try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    UPDATE broadcast_campaigns c
+                    SET status = 'done', finished_at = NOW()
+                    WHERE c.id = %s AND NOT EXISTS (
+                        SELECT 1 FROM broadcast_deliveries d
+                        WHERE d.campaign_id = c.id AND d.status IN ('pending', 'sending')
+                    )
+                    """,
+                    (campaign_id,)
+                )
+                done = cursor.rowcount == 1
+            conn.commit()
+            return done
+        except Exception as e:
+            logging.error(f"Error finishing broadcast campaign: {e}")
+            if conn:
+                conn.rollback()
+            return False
+        finally:
+            if conn:
+                conn.close()
+
+    @staticmethod
+    def get_progress(campaign_id):
+        """
+        Count deliveries of a campaign by status.
+
+        Returns:
+            Dictionary status -> count; an empty dictionary on error
+        """
+        conn = None
+        try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    SELECT status, COUNT(*) FROM broadcast_deliveries
+                    WHERE campaign_id = %s
+                    GROUP BY status
+                    """,
+                    (campaign_id,)
+                )
+                return dict(cursor.fetchall())
+        except Exception as e:
+            logging.error(f"Error getting broadcast progress: {e}")
+            return {}
+        finally:
+            if conn:
+                conn.close()
+
+
+def _try_lock(campaign_id):
+    """Берет блокировку кампании; соединение держит ее до закрытия."""
+    conn = psycopg2.connect(**DB_CONFIG)
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s, %s)", (BROADCAST_LOCK_ID, campaign_id))
+        if cursor.fetchone()[0]:
+            return conn
+    conn.close()
+    return None
+
+
+async def run_campaign(name: str, concurrency: int = DEFAULT_CONCURRENCY, rate: float = DEFAULT_RATE,
+                       batch_size: int = DEFAULT_BATCH_SIZE,
+                       token: Optional[str] = None) -> Optional[BroadcastProgress]:
+    """
+    Отправляет кампанию всем получателям, которым она еще не доставлена.
+
+    Args:
+        name: Имя кампании
+        concurrency: Одновременных запросов к Bot API
+        rate: Сообщений в секунду
+        batch_size: Получателей в одной пачке
+        token: Токен бота (по умолчанию TELEGRAM_TOKEN)
+
+    Returns:
+        Optional[BroadcastProgress]: Счетчики запуска или None, если рассылка не выполнялась
+    """
+    token = token or TELEGRAM_TOKEN
+    if not token:
+        logging.error("Токен бота не найден. Убедитесь, что переменная окружения TELEGRAM_TOKEN установлена.")
+        return None
+    campaign = await asyncio.to_thread(BroadcastManager.get_campaign, name)
+    if not campaign:
+        logging.error(f"Кампания рассылки {name!r} не найдена")
+        return None
+    campaign_id = campaign["id"]
+
+    try:
+        lock_conn = await asyncio.to_thread(_try_lock, campaign_id)
+    except Exception as e:
+        logging.error(f"Не удалось взять блокировку рассылки: {e}")
+        return None
+    if lock_conn is None:
+        logging.warning(f"Кампания {name!r} уже отправляется другим процессом")
+        return None
+
+    try:
+        if await asyncio.to_thread(BroadcastManager.enqueue_audience, campaign_id) is None:
+            return None
+        resumed = await asyncio.to_thread(BroadcastManager.start, campaign_id)
+        if resumed is None:
+            return None
+        if resumed:
+            logging.info(f"Продолжаем прерванную рассылку: {resumed} получателей возвращены в очередь")
+
+        counts = await asyncio.to_thread(BroadcastManager.get_progress, campaign_id)
+        progress = BroadcastProgress(total=counts.get("pending", 0))
+        logging.info(f"Рассылка {name!r}: получателей в очереди {progress.total}, "
+                     f"уже обработано {sum(counts.get(status, 0) for status in FINAL_STATUSES)}")
+
+        limiter = RateLimiter(rate)
+        semaphore = asyncio.Semaphore(concurrency)
+        # Пул соединений клиента должен вмещать все одновременные запросы
+        request = HTTPXRequest(connection_pool_size=concurrency)
+        last_report = time.monotonic()
+        async with Bot(token=token, request=request) as bot:
+            while True:
+                batch = await asyncio.to_thread(BroadcastManager.claim_batch, campaign_id, batch_size)
+                if not batch:
+                    break
+                results = await send_batch(bot, campaign["message"], batch, limiter, semaphore, progress)
+                if not await asyncio.to_thread(BroadcastManager.record_results, campaign_id, results):
+                    # Без записи результатов пачка будет отправлена повторно при следующем запуске
+                    logging.error("Не удалось сохранить результаты пачки, рассылка остановлена")
+                    return progress
+                if time.monotonic() - last_report >= PROGRESS_INTERVAL:
+                    logging.info(f"Рассылка {name!r}: {progress.summary()}")
+                    last_report = time.monotonic()
+
+        done = await asyncio.to_thread(BroadcastManager.finish, campaign_id)
+        logging.info(f"Рассылка {name!r} {'завершена' if done else 'остановлена'}: {progress.summary()}")
+        return progress
+    finally:
+        lock_conn.close()
+
+
+def _parse_params(values: Optional[List[str]]) -> Dict[str, Any]:
+    params = {}
+    for value in values or []:
+        key, _, param = value.partition("=")
+        params[key] = param
+    return params
+
+
+def main():
+    """Создание, отправка и просмотр прогресса рассылок."""
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Рассылки пользователям бота")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    create = commands.add_parser("create", help="Создать кампанию")
+    create.add_argument("name")
+    create.add_argument("--audience", choices=sorted(AUDIENCES), required=True)
+    create.add_argument("--param", action="append", help="Параметр аудитории key=value")
+    message = create.add_mutually_exclusive_group(required=True)
+    message.add_argument("--message", help="Текст сообщения ({first_name}, {name_suffix})")
+    message.add_argument("--message-file", help="Файл с текстом сообщения")
+
+    run = commands.add_parser("run", help="Отправить или продолжить кампанию")
+    run.add_argument("name")
+    run.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    run.add_argument("--rate", type=float, default=DEFAULT_RATE, help="Сообщений в секунду")
+    run.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+
+    status = commands.add_parser("status", help="Показать прогресс кампании")
+    status.add_argument("name")
+
+    args = parser.parse_args()
+
+    if args.command == "create":
+        text = args.message
+        if args.message_file:
+            with open(args.message_file, encoding="utf-8") as f:
+                text = f.read()
+        campaign_id = BroadcastManager.create_campaign(args.name, args.audience, text, _parse_params(args.param))
+        if campaign_id is None:
+            return 1
+        added = BroadcastManager.enqueue_audience(campaign_id)
+        print(f"Кампания {args.name!r} (ID {campaign_id}), добавлено получателей: {added[0] if added else 0}")
+        return 0
+
+    if args.command == "run":
+        progress = asyncio.run(run_campaign(args.name, args.concurrency, args.rate, args.batch_size))
+        return 0 if progress is not None else 1
+
+    campaign = BroadcastManager.get_campaign(args.name)
+    if not campaign:
+        print(f"Кампания {args.name!r} не найдена")
+        return 1
+    counts = BroadcastManager.get_progress(campaign["id"])
+    print(f"Кампания {args.name!r}: {campaign['status']}")
+    for name in ("pending", "sending") + FINAL_STATUSES:
+        print(f"  {name}: {counts.get(name, 0)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
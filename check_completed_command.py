@@ -63,8 +63,8 @@ async def check_plan_status_for_user(telegram_id, username=''):
             # Расчет общего пройденного расстояния
             total_distance = TrainingPlanManager.calculate_total_completed_distance(db_user_id, plan_id)
             
-            # Обновление еженедельного объема в профиле пользователя
-            new_volume = DBManager.update_weekly_volume(db_user_id, total_distance)
+            # Еженедельный объем рассчитывается по журналу тренировок
+            new_volume = DBManager.refresh_weekly_volume(db_user_id)
             
             # Создание кнопки для продолжения тренировок
             keyboard = InlineKeyboardMarkup([
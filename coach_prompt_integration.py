@@ -11,10 +11,12 @@
 import os
 import json
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
 import pytz
 from typing import Dict, Any, List, Optional
 
+from training_calendar import WEEKDAY_NAMES, schedule_for_profile
+
 # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
 # do not change this unless explicitly requested by the user
 MODEL = "gpt-4o"
@@ -140,159 +142,28 @@ class RunningCoachPrompt:
             Dict: Информация о датах тренировок
         """
         try:
-            # Получаем дату начала тренировок из профиля
-            user_start_date = profile.get('training_start_date_text', profile.get('training_start_date', None))
-            
-            # Пытаемся распарсить дату начала
-            start_date = None
-            
-            if user_start_date and user_start_date.lower() not in ['сегодня', 'не знаю']:
-                try:
-                    # Пробуем разные форматы даты
-                    formats = ["%d.%m.%Y", "%Y-%m-%d", "%d/%m/%Y", "%d.%m"]
-                    
-                    for fmt in formats:
-                        try:
-                            if fmt == "%d.%m":
-                                # Для формата без года добавляем текущий год
-                                current_year = datetime.now().year
-                                date_with_year = f"{user_start_date}.{current_year}"
-                                start_date = datetime.strptime(date_with_year, "%d.%m.%Y")
-                            else:
-                                start_date = datetime.strptime(user_start_date, fmt)
-                            
-                            start_date = self.moscow_tz.localize(start_date)
-                            logger.info(f"Успешно распарсили дату: {start_date.strftime('%d.%m.%Y')}")
-                            break
-                        except ValueError:
-                            continue
-                except Exception as e:
-                    logger.error(f"Ошибка при парсинге даты: {e}")
-            
-            # Если дата не указана или не удалось распарсить, используем текущую
-            if not start_date:
-                start_date = datetime.now(pytz.UTC).astimezone(self.moscow_tz)
-                logger.info(f"Используем текущую дату: {start_date.strftime('%d.%m.%Y')}")
-            
-            # Получаем предпочитаемые дни тренировок
-            preferred_days_str = profile.get('preferred_training_days', '')
-            preferred_days = []
-            
-            # Словарь для преобразования названий дней в числа
-            day_name_to_number = {
-                'пн': 0, 'вт': 1, 'ср': 2, 'чт': 3, 'пт': 4, 'сб': 5, 'вс': 6,
-                'понедельник': 0, 'вторник': 1, 'среда': 2, 'четверг': 3, 
-                'пятница': 4, 'суббота': 5, 'воскресенье': 6
-            }
-            
-            # Обратный словарь для преобразования чисел в названия дней
-            day_number_to_name = {
-                0: "Понедельник", 
-                1: "Вторник", 
-                2: "Среда", 
-                3: "Четверг", 
-                4: "Пятница", 
-                5: "Суббота", 
-                6: "Воскресенье"
-            }
-            
-            # Парсим предпочитаемые дни
-            if preferred_days_str:
-                for day in preferred_days_str.lower().split(','):
-                    day = day.strip()
-                    if day in day_name_to_number:
-                        preferred_days.append(day_name_to_number[day])
-            
-            # Если дни не указаны, используем все дни недели
-            if not preferred_days:
-                preferred_days = list(range(7))
-            
-            # Количество тренировочных дней
-            training_days_count = int(profile.get('training_days_per_week', 3))
-            
-            # Убедимся, что у нас достаточно дней для тренировок
-            if len(preferred_days) < training_days_count:
-                for i in range(7):
-                    if i not in preferred_days:
-                        preferred_days.append(i)
-                        if len(preferred_days) >= training_days_count:
-                            break
-            
-            # Если указано больше предпочитаемых дней, чем нужно, используем первые N
-            if len(preferred_days) > training_days_count:
-                preferred_days = preferred_days[:training_days_count]
-            
-            # Сортируем дни
-            preferred_days.sort()
-            
-            # Проверяем, если дата в прошлом - используем текущую
-            now = datetime.now(pytz.UTC).astimezone(self.moscow_tz)
-            current_date = start_date
-            if current_date.date() < now.date():
-                current_date = now
-                logger.info(f"Стартовая дата в прошлом, используем текущую: {current_date.strftime('%d.%m.%Y')}")
-            
-            # День недели для стартовой даты
-            start_weekday = current_date.weekday()
-            
-            # Находим первый подходящий день для начала тренировок
-            days_to_add = 0
-            if preferred_days:
-                # Ищем ближайший предпочитаемый день недели
-                min_days_to_add = float('inf')
-                for day in preferred_days:
-                    # Количество дней до следующего предпочитаемого дня
-                    days = (day - start_weekday) % 7
-                    if days < min_days_to_add:
-                        min_days_to_add = days
-                
-                days_to_add = min_days_to_add
-            
-            # Первый день тренировки
-            first_training_date = current_date + timedelta(days=days_to_add)
-            
-            # Генерируем даты для всех тренировочных дней
-            training_dates = []
-            date_to_check = first_training_date
-            training_day_counter = 0
-            
-            while training_day_counter < training_days_count:
-                weekday = date_to_check.weekday()
-                
-                if weekday in preferred_days:
-                    training_dates.append(date_to_check)
-                    training_day_counter += 1
-                
-                date_to_check = date_to_check + timedelta(days=1)
-            
-            # Создаем информацию о тренировочных днях
-            training_dates_info = []
-            
-            for date in training_dates:
-                weekday_num = date.weekday()
-                weekday_name = day_number_to_name[weekday_num]
-                date_str = date.strftime("%d.%m.%Y")
-                training_dates_info.append({
-                    "date": date_str,
-                    "weekday": weekday_name,
-                    "weekday_num": weekday_num
-                })
-            
-            # Преобразуем предпочитаемые дни в названия для лога
-            preferred_days_names = [day_number_to_name[day] for day in preferred_days]
-            preferred_days_text = ", ".join(preferred_days_names)
+            schedule = schedule_for_profile(profile)
+            training_dates_info = [
+                {
+                    "date": date.strftime("%d.%m.%Y"),
+                    "weekday": WEEKDAY_NAMES[date.weekday()],
+                    "weekday_num": date.weekday()
+                }
+                for date in schedule.dates
+            ]
+            preferred_days_text = ", ".join(schedule.weekday_names())
             
             logger.info(f"Предпочитаемые дни: {preferred_days_text}")
             logger.info(f"Даты тренировок: {[d['date'] for d in training_dates_info]}")
             
             # Создаем результат
             return {
-                "start_date": start_date.strftime("%d.%m.%Y"),
-                "preferred_days": preferred_days,
+                "start_date": schedule.requested_start.strftime("%d.%m.%Y"),
+                "preferred_days": list(schedule.weekdays),
                 "preferred_days_text": preferred_days_text,
-                "training_days_count": training_days_count,
+                "training_days_count": len(schedule.dates),
                 "training_dates": training_dates_info,
-                "first_training_date": first_training_date.strftime("%d.%m.%Y")
+                "first_training_date": schedule.first_date.strftime("%d.%m.%Y")
             }
             
         except Exception as e:
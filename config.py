@@ -22,6 +22,36 @@ DB_CONFIG = {
 # Database URL for SQLAlchemy
 DATABASE_URL = os.environ.get("DATABASE_URL")
 
+# Режим вебхука (webhook_server.py): публичный URL, секрет заголовка
+# X-Telegram-Bot-Api-Secret-Token и число процессов-обработчиков.
+# Если WEBHOOK_URL не задан, бот работает через polling.
+WEBHOOK_URL = os.environ.get("WEBHOOK_URL")
+WEBHOOK_SECRET = os.environ.get("WEBHOOK_SECRET")
+WEBHOOK_PATH = os.environ.get("WEBHOOK_PATH", "/telegram/webhook")
+WEBHOOK_HOST = os.environ.get("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.environ.get("WEBHOOK_PORT", "8443"))
+WEBHOOK_WORKERS = int(os.environ.get("WEBHOOK_WORKERS", str(os.cpu_count() or 1)))
+
+# Эндпоинт живости процесса бота (liveness.py), который опрашивают мониторы;
+# HEALTH_PORT=0 отключает эндпоинт и опрос мониторами. В режиме вебхука HEALTH_PORT
+# слушает основной процесс, а обработчики — следующие порты.
+HEALTH_HOST = os.environ.get("HEALTH_HOST", "127.0.0.1")
+HEALTH_PORT = int(os.environ.get("HEALTH_PORT", "8081"))
+
+# Трассировка обновлений (tracing.py): доля сохраняемых трасс, порог медленной
+# трассы, которая сохраняется всегда, и файл трасс с ротацией (пустой — отключено)
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", "0.05"))
+TRACE_SLOW_SECONDS = float(os.environ.get("TRACE_SLOW_SECONDS", "3.0"))
+TRACE_FILE = os.environ.get("TRACE_FILE", "logs/traces.jsonl")
+
+# Администраторы бота (Telegram ID через запятую): команда /profile (profiler.py)
+ADMIN_TELEGRAM_IDS = [int(item) for item in os.environ.get("ADMIN_TELEGRAM_IDS", "").replace(" ", "").split(",") if item]
+# Каталог отчетов профилирования
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "logs/profiles")
+
+# Переформулировать через OpenAI описания дней, измененных локальной корректировкой плана
+ADJUST_PLAN_REWORD_DESCRIPTIONS = os.environ.get("ADJUST_PLAN_REWORD_DESCRIPTIONS", "false").lower() == "true"
+
 # Define conversation states for the questionnaire
 STATES = {
     'START': 0,
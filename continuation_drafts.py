@@ -0,0 +1,418 @@
+"""
+Спекулятивная предварительная генерация продолжения плана тренировок.
+
+Когда в плане остается последний необработанный день, продолжение плана
+генерируется в фоновом потоке в предположении, что этот день будет выполнен
+по плану, и сохраняется как черновик. При нажатии кнопки
+"🔄 Продолжить тренировки" черновик выдается сразу, если отпечаток входных
+данных (профиль, план, выполненные и отмененные дни) совпадает с фактическим.
+Если генерация черновика еще идет, нажатие дожидается ее, а не запускает
+вторую. Если итог последнего дня изменил входные данные, черновик
+отбрасывается и план генерируется как раньше. Черновики планов, которые уже не
+являются текущими, удаляются.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import timedelta
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import psycopg2
+
+from config import DB_CONFIG
+from db_manager import DBManager
+from training_calendar import parse_date, today_moscow
+from training_load import TrainingLoadManager
+from units import day_distance_km
+from training_plan_manager import TrainingPlanManager
+
+# Предгенерация запускается, когда необработанных дней остается не больше этого числа
+PREGENERATE_PENDING_DAYS = 1
+
+# Поля профиля, которые меняются при каждой отметке тренировки и не влияют на черновик
+# (прогресс учитывается через выполненные дни и пройденную дистанцию)
+VOLATILE_PROFILE_KEYS = ("weekly_volume", "weekly_volume_km", "updated_at", "created_at")
+
+# Сколько ждать идущей генерации черновика при нажатии "Продолжить" (секунды)
+IN_FLIGHT_WAIT_SECONDS = 180
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="continuation-draft")
+# Идущие генерации черновиков: (user_id, plan_id) -> Future
+_in_flight: Dict[Tuple[int, int], Future] = {}
+_in_flight_lock = threading.Lock()
+
+
+def build_fingerprint(profile: Dict[str, Any], plan_id: int, plan_data: Dict[str, Any],
+                      completed_days: Iterable[int], canceled_days: Iterable[int]) -> str:
+    """
+    Вычисляет отпечаток входных данных для генерации продолжения плана.
+
+    Args:
+        profile: Профиль бегуна
+        plan_id: ID текущего плана
+        plan_data: Данные текущего плана
+        completed_days: Номера выполненных дней
+        canceled_days: Номера отмененных дней
+
+    Returns:
+        str: SHA-256 отпечаток в шестнадцатеричном виде
+    """
+    stable_profile = {key: value for key, value in (profile or {}).items() if key not in VOLATILE_PROFILE_KEYS}
+    payload = {
+        "profile": stable_profile,
+        "plan_id": plan_id,
+        "plan_data": plan_data,
+        "completed": sorted(set(completed_days)),
+        "canceled": sorted(set(canceled_days)),
+    }
+    encoded = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def _completed_distance(plan_data: Dict[str, Any], completed_days: Iterable[int]) -> float:
+    """Суммирует запланированные дистанции выполненных дней."""
+    training_days = plan_data.get("training_days", [])
+    total = 0.0
+    for day_num in completed_days:
+        if 0 < day_num <= len(training_days):
+            total += day_distance_km(training_days[day_num - 1])
+    return total
+
+
+def _continuation_start_date(plan_data: Dict[str, Any]) -> str:
+    """
+    Возвращает дату начала продолжения: день после последней тренировки плана,
+    но не раньше сегодняшнего дня.
+    """
+    today = today_moscow()
+    dates = [parse_date(day.get("date")) for day in plan_data.get("training_days", [])]
+    last_date = max((day_date for day_date in dates if day_date), default=None)
+    start = max(today, last_date + timedelta(days=1)) if last_date else today
+    return start.strftime("%d.%m.%Y")
+
+
+def _is_draft_current(draft: Dict[str, Any]) -> bool:
+    """Проверяет, что ни одна дата черновика еще не прошла."""
+    today = today_moscow()
+    for day in draft.get("training_days", []):
+        day_date = parse_date(day.get("date"))
+        if day_date is None or day_date < today:
+            return False
+    return True
+
+
+class ContinuationDraftManager:
+    """Manager for speculative plan continuation drafts."""
+
+    @staticmethod
+    def save_draft(user_id, plan_id, fingerprint, plan_data):
+        """
+        Save or replace the continuation draft for a plan.
+
+        Args:
+            user_id: Database user ID
+            plan_id: ID of the plan being continued
+            fingerprint: Fingerprint of the generation inputs
+            plan_data: Dictionary containing the generated continuation
+
+        Returns:
+            True if successful, False otherwise
+        """
+        conn = None
+        try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    INSERT INTO plan_continuation_drafts (user_id, plan_id, fingerprint, plan_data, created_at)
+                    VALUES (%s, %s, %s, %s, NOW())
+                    ON CONFLICT (user_id, plan_id) DO UPDATE
+                    SET fingerprint = EXCLUDED.fingerprint,
+                        plan_data = EXCLUDED.plan_data,
+                        created_at = EXCLUDED.created_at
+                    """,
+                    (user_id, plan_id, fingerprint, json.dumps(plan_data, ensure_ascii=False))
+                )
+            conn.commit()
+            return True
+        except Exception as e:
+            logging.error(f"Error saving continuation draft: {e}")
+            if conn:
+                conn.rollback()
+            return False
+        finally:
+            if conn:
+                conn.close()
+
+    @staticmethod
+    def get_draft_fingerprint(user_id, plan_id):
+        """
+        Get the fingerprint of the stored draft for a plan.
+
+        Args:
+            user_id: Database user ID
+            plan_id: ID of the plan being continued
+
+        Returns:
+            Fingerprint string if a draft exists, None otherwise
+        """
+        conn = None
+        try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT fingerprint FROM plan_continuation_drafts WHERE user_id = %s AND plan_id = %s",
+                    (user_id, plan_id)
+                )
+                row = cursor.fetchone()
+                return row[0] if row else None
+        except Exception as e:
+            logging.error(f"Error getting continuation draft fingerprint: {e}")
+            return None
+        finally:
+            if conn:
+                conn.close()
+
+    @staticmethod
+    def pop_draft(user_id, plan_id, fingerprint):
+        """
+        Remove the draft for a plan and return it if its fingerprint matches.
+
+        A draft with a different fingerprint is removed as stale.
+
+        Args:
+            user_id: Database user ID
+            plan_id: ID of the plan being continued
+            fingerprint: Fingerprint of the actual generation inputs
+
+        Returns:
+            Dictionary containing the continuation if the draft matches, None otherwise
+        """
+        conn = None
+        try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    DELETE FROM plan_continuation_drafts
+                    WHERE user_id = %s AND plan_id = %s
+                    RETURNING fingerprint, plan_data
+                    """,
+                    (user_id, plan_id)
+                )
+                row = cursor.fetchone()
+            conn.commit()
+
+            if not row:
+                return None
+            if row[0] != fingerprint:
+                logging.info(f"Черновик продолжения плана {plan_id} устарел: входные данные изменились")
+                return None
+            return json.loads(row[1])
+        except Exception as e:
+            logging.error(f"Error taking continuation draft: {e}")
+            if conn:
+                conn.rollback()
+            return None
+        finally:
+            if conn:
+                conn.close()
+
+    @staticmethod
+    def prune_drafts(user_id):
+        """
+        Remove the user's drafts for plans that are no longer the latest plan.
+
+        Args:
+            user_id: Database user ID
+
+        Returns:
+            Number of removed drafts, or None on error
+        """
+        conn = None
+        try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    DELETE FROM plan_continuation_drafts d
+                    WHERE d.user_id = %s
+                      AND d.plan_id IS DISTINCT FROM (
+                          SELECT p.id FROM training_plans p
+                          WHERE p.user_id = d.user_id
+                          ORDER BY p.created_at DESC
+                          LIMIT 1
+                      )
+                    """,
+                    (user_id,)
+                )
+                removed = cursor.rowcount
+            conn.commit()
+            return removed
+        except Exception as e:
+            logging.error(f"Error pruning continuation drafts: {e}")
+            if conn:
+                conn.rollback()
+            return None
+        finally:
+            if conn:
+                conn.close()
+
+
+def _generate_continuation(profile: Dict[str, Any], total_distance: float,
+                           plan_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Генерирует продолжение плана через AgentAdapter с запасным вариантом OpenAIService."""
+    training_load = TrainingLoadManager.get_summary(profile.get("user_id"))
+    try:
+        from agent.adapter import AgentAdapter
+        return AgentAdapter().generate_training_plan_continuation(profile, total_distance, plan_data,
+                                                                  training_load=training_load)
+    except Exception as e:
+        logging.error(f"Ошибка при использовании AgentAdapter для черновика продолжения: {e}")
+        from openai_service import OpenAIService
+        return OpenAIService().generate_training_plan_continuation(profile, total_distance, plan_data,
+                                                                   training_load=training_load)
+
+
+def pregenerate_continuation(user_id: int, plan_id: int) -> bool:
+    """
+    Генерирует и сохраняет черновик продолжения плана.
+
+    Оставшиеся необработанные дни считаются выполненными по плану.
+
+    Args:
+        user_id: ID пользователя в базе данных
+        plan_id: ID текущего плана
+
+    Returns:
+        bool: True, если черновик сохранен или уже актуален
+    """
+    plan = TrainingPlanManager.get_training_plan(user_id, plan_id)
+    profile = DBManager.get_runner_profile(user_id)
+    if not plan or not profile:
+        return False
+
+    plan_data = plan["plan_data"]
+    total_days = len(plan_data.get("training_days", []))
+    completed = TrainingPlanManager.get_completed_trainings(user_id, plan_id)
+    canceled = TrainingPlanManager.get_canceled_trainings(user_id, plan_id)
+    pending = [day_num for day_num in range(1, total_days + 1) if day_num not in completed and day_num not in canceled]
+    if len(pending) > PREGENERATE_PENDING_DAYS:
+        return False
+
+    projected_completed = list(completed) + pending
+    fingerprint = build_fingerprint(profile, plan_id, plan_data, projected_completed, canceled)
+    if ContinuationDraftManager.get_draft_fingerprint(user_id, plan_id) == fingerprint:
+        logging.info(f"Черновик продолжения плана {plan_id} уже актуален")
+        return True
+
+    total_distance = _completed_distance(plan_data, projected_completed)
+    generation_profile = dict(profile)
+    generation_profile["training_start_date_text"] = _continuation_start_date(plan_data)
+    draft = _generate_continuation(generation_profile, total_distance, plan_data)
+
+    logging.info(f"Черновик продолжения плана {plan_id} сгенерирован для пользователя {user_id}")
+    saved = ContinuationDraftManager.save_draft(user_id, plan_id, fingerprint, draft)
+    # План мог смениться за время генерации: такой черновик уже не понадобится
+    ContinuationDraftManager.prune_drafts(user_id)
+    return saved
+
+
+def _run_pregeneration(key):
+    """Выполняет предгенерацию в фоновом потоке и снимает отметку о выполнении."""
+    try:
+        return pregenerate_continuation(*key)
+    except Exception as e:
+        logging.error(f"Ошибка при предгенерации продолжения плана {key[1]}: {e}")
+        return False
+    finally:
+        with _in_flight_lock:
+            _in_flight.pop(key, None)
+
+
+def _complete_future(future: Future, key: Tuple[int, int]) -> None:
+    future.set_result(_run_pregeneration(key))
+
+
+def continuation_in_flight(user_id: int, plan_id: int) -> bool:
+    """Идет ли фоновая генерация черновика продолжения плана."""
+    with _in_flight_lock:
+        return (user_id, plan_id) in _in_flight
+
+
+def wait_for_draft(user_id: int, plan_id: int, timeout: float = IN_FLIGHT_WAIT_SECONDS) -> None:
+    """Дожидается идущей фоновой генерации черновика, если она есть."""
+    with _in_flight_lock:
+        future = _in_flight.get((user_id, plan_id))
+    if future is None:
+        return
+    logging.info(f"Ожидаем фоновую генерацию продолжения плана {plan_id}")
+    try:
+        future.result(timeout=timeout)
+    except FutureTimeoutError:
+        logging.warning(f"Фоновая генерация продолжения плана {plan_id} не завершилась за {timeout} с")
+
+
+def schedule_continuation_draft(user_id: int, plan_id: int, total_days: int,
+                                processed_days: Iterable[int]) -> bool:
+    """
+    Ставит предгенерацию продолжения в фоновую очередь, если план подходит к концу.
+
+    Args:
+        user_id: ID пользователя в базе данных
+        plan_id: ID текущего плана
+        total_days: Количество дней в плане
+        processed_days: Номера выполненных или отмененных дней
+
+    Returns:
+        bool: True, если задача поставлена в очередь
+    """
+    pending = total_days - len(set(processed_days))
+    if pending > PREGENERATE_PENDING_DAYS:
+        return False
+
+    key = (user_id, plan_id)
+    with _in_flight_lock:
+        if key in _in_flight:
+            return False
+        # Отметка ставится до запуска: задача снимает ее сама по завершении
+        future: Future = Future()
+        _in_flight[key] = future
+    _executor.submit(_complete_future, future, key)
+    logging.info(f"Запущена предгенерация продолжения плана {plan_id} для пользователя {user_id}")
+    return True
+
+
+def take_continuation_draft(user_id: int, plan_id: int, profile: Dict[str, Any],
+                            current_plan: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Возвращает готовый черновик продолжения, если он соответствует фактическим данным.
+
+    Функция дожидается идущей фоновой генерации черновика и потому блокирующая
+    (в обработчиках вызывается через asyncio.to_thread). Черновики других планов
+    пользователя удаляются.
+
+    Args:
+        user_id: ID пользователя в базе данных
+        plan_id: ID текущего плана
+        profile: Профиль бегуна
+        current_plan: Текущий план (запись из training_plans)
+
+    Returns:
+        Optional[Dict]: Продолжение плана или None, если черновика нет или он устарел
+    """
+    wait_for_draft(user_id, plan_id)
+    completed = TrainingPlanManager.get_completed_trainings(user_id, plan_id)
+    canceled = TrainingPlanManager.get_canceled_trainings(user_id, plan_id)
+    fingerprint = build_fingerprint(profile, plan_id, current_plan["plan_data"], completed, canceled)
+
+    draft = ContinuationDraftManager.pop_draft(user_id, plan_id, fingerprint)
+    ContinuationDraftManager.prune_drafts(user_id)
+    if draft and not _is_draft_current(draft):
+        logging.info(f"Черновик продолжения плана {plan_id} содержит прошедшие даты, генерируем заново")
+        return None
+    return draft
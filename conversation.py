@@ -1203,8 +1203,14 @@ class RunnerProfileConversation:
         
         return ConversationHandler.END
     
-    def get_conversation_handler(self):
-        """Return the ConversationHandler with all states defined."""
+    def get_conversation_handler(self, persistent=False):
+        """
+        Return the ConversationHandler with all states defined.
+
+        Args:
+            persistent: Keep conversation states in the application persistence
+                (requires an application built with persistence, see persistence.py)
+        """
         from telegram.ext import (
             CommandHandler, MessageHandler, filters, ConversationHandler
         )
@@ -1230,7 +1236,7 @@ class RunnerProfileConversation:
             },
             fallbacks=[CommandHandler('cancel', self.cancel)],
             name="runner_profile_conversation",
-            persistent=False,
+            persistent=persistent,
         )
         
         # Создаем обработчик для обновления профиля
@@ -1262,7 +1268,7 @@ class RunnerProfileConversation:
             },
             fallbacks=[CommandHandler('cancel', self.cancel)],
             name="update_profile_conversation",
-            persistent=False,
+            persistent=persistent,
         )
         
         return [main_handler, update_handler]
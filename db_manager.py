@@ -2,6 +2,8 @@ import psycopg2
 import psycopg2.extras
 from datetime import datetime
 from config import DB_CONFIG, logging
+from units import normalize_profile
+from metrics import instrument_methods
 
 # Определяем функцию format_date здесь, чтобы избежать циклического импорта
 def format_date(date_obj):
@@ -118,6 +120,9 @@ class DBManager:
                 if "competition_date" in profile_data:
                     profile_data["competition_date"] = format_date(profile_data["competition_date"])
                 
+                # Parse numeric units once, on save
+                normalize_profile(profile_data)
+                
                 if profile:
                     # Update existing profile
                     query = """
@@ -134,6 +139,9 @@ class DBManager:
                         fitness_level = %(fitness_level)s,
                         comfortable_pace = %(comfortable_pace)s,
                         weekly_volume = %(weekly_volume)s,
+                        weekly_volume_km = %(weekly_volume_km)s,
+                        comfortable_pace_sec = %(comfortable_pace_sec)s,
+                        goal_distance_km = %(goal_distance_km)s,
                         training_start_date = %(training_start_date)s,
                         training_days_per_week = %(training_days_per_week)s,
                         preferred_training_days = %(preferred_training_days)s,
@@ -148,12 +156,14 @@ class DBManager:
                         user_id, distance, competition_date, gender, age, 
                         height, weight, experience, goal, target_time, 
                         fitness_level, comfortable_pace, weekly_volume, training_start_date,
-                        training_days_per_week, preferred_training_days
+                        training_days_per_week, preferred_training_days,
+                        weekly_volume_km, comfortable_pace_sec, goal_distance_km
                     ) VALUES (
                         %(user_id)s, %(distance)s, %(competition_date)s, %(gender)s, %(age)s,
                         %(height)s, %(weight)s, %(experience)s, %(goal)s, %(target_time)s,
                         %(fitness_level)s, %(comfortable_pace)s, %(weekly_volume)s, %(training_start_date)s,
-                        %(training_days_per_week)s, %(preferred_training_days)s
+                        %(training_days_per_week)s, %(preferred_training_days)s,
+                        %(weekly_volume_km)s, %(comfortable_pace_sec)s, %(goal_distance_km)s
                     )
                     """
                     cursor.execute(query, {**profile_data, "user_id": user_id})
@@ -240,20 +250,6 @@ class DBManager:
                 return None
                 
             with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cursor:
-                # Проверим существование таблицы
-                cursor.execute(
-                    """
-                    SELECT EXISTS (
-                        SELECT FROM information_schema.tables 
-                        WHERE table_name = 'runner_profiles'
-                    )
-                    """
-                )
-                table_exists = cursor.fetchone()[0]
-                if not table_exists:
-                    logging.error("Table 'runner_profiles' does not exist")
-                    return None
-                
                 # Получаем профиль бегуна
                 cursor.execute(
                     """
@@ -307,20 +303,6 @@ class DBManager:
             
             # Создаем стандартный профиль для пользователя
             with conn.cursor() as cursor:
-                # Проверим существование таблицы
-                cursor.execute(
-                    """
-                    SELECT EXISTS (
-                        SELECT FROM information_schema.tables 
-                        WHERE table_name = 'runner_profiles'
-                    )
-                    """
-                )
-                table_exists = cursor.fetchone()[0]
-                if not table_exists:
-                    logging.error("Table 'runner_profiles' does not exist")
-                    return None
-                
                 # Значения по умолчанию
                 default_profile = {
                     "distance": "10", 
@@ -339,18 +321,21 @@ class DBManager:
                     "training_days_per_week": "3",
                     "preferred_training_days": "Пн,Ср,Пт"
                 }
+                normalize_profile(default_profile)
                 
                 # Вставляем профиль
                 query = """
                 INSERT INTO runner_profiles (
                     user_id, distance, competition_date, gender, age, 
                     height, weight, experience, goal, target_time, 
-                    fitness_level, comfortable_pace, weekly_volume, training_start_date,
+                    fitness_level, comfortable_pace, weekly_volume, weekly_volume_km,
+                    comfortable_pace_sec, goal_distance_km, training_start_date,
                     training_days_per_week, preferred_training_days
                 ) VALUES (
                     %(user_id)s, %(distance)s, %(competition_date)s, %(gender)s, %(age)s,
                     %(height)s, %(weight)s, %(experience)s, %(goal)s, %(target_time)s,
-                    %(fitness_level)s, %(comfortable_pace)s, %(weekly_volume)s, %(training_start_date)s,
+                    %(fitness_level)s, %(comfortable_pace)s, %(weekly_volume)s, %(weekly_volume_km)s,
+                    %(comfortable_pace_sec)s, %(goal_distance_km)s, %(training_start_date)s,
                     %(training_days_per_week)s, %(preferred_training_days)s
                 ) RETURNING *
                 """
@@ -392,97 +377,58 @@ class DBManager:
                 conn.close()
     
     @staticmethod
-    def update_weekly_volume(user_id, additional_km):
+    def refresh_weekly_volume(user_id):
         """
-        Update the weekly volume in the runner profile by adding completed kilometers.
+        Recalculate the weekly volume in the runner profile from the workout log.
+        
+        The volume is the average distance of the active weeks among the last
+        four, read from the weekly rollups of workout_events. If none of the
+        last four weeks has a workout, the stored volume is halved (not below
+        10 km).
         
         Args:
             user_id: Database user ID
-            additional_km: Additional kilometers to add to the weekly volume
             
         Returns:
-            Updated weekly volume if successful, None otherwise
+            Updated weekly volume in kilometers, None if the profile has no
+            volume or on error
         """
         conn = None
         try:
             conn = DBManager.get_connection()
             with conn.cursor() as cursor:
-                # Get current weekly volume
-                cursor.execute(
-                    """
-                    SELECT weekly_volume FROM runner_profiles 
-                    WHERE user_id = %s 
-                    ORDER BY updated_at DESC 
-                    LIMIT 1
-                    """,
-                    (user_id,)
-                )
-                
-                profile = cursor.fetchone()
-                if not profile:
-                    return None
-                
-                # Parse current weekly volume
-                current_volume = profile[0]
-                new_weekly_volume = ""
-                
-                # Try to parse the weekly volume
-                try:
-                    # Если weekly_volume - строка с числом, конвертируем в число
-                    if current_volume and current_volume.lower() != "none":
-                        # Обрабатываем возможность, что значение может быть с запятой или с точкой
-                        if "," in current_volume:
-                            current_volume_float = float(current_volume.replace(",", "."))
-                        else:
-                            current_volume_float = float(current_volume)
-                        
-                        # Прибавляем новые километры
-                        new_value = current_volume_float + additional_km
-                        
-                        # Форматируем обратно в строку с 1 знаком после запятой
-                        new_weekly_volume = f"{new_value:.1f}"
-                    else:
-                        # Если формат не определен, используем просто число
-                        new_weekly_volume = f"{additional_km:.1f}"
-                except (ValueError, TypeError, IndexError) as parsing_error:
-                    # Логируем ошибку парсинга для отладки
-                    print(f"Error parsing weekly volume: {parsing_error}")
-                    # Если парсинг не удался, используем дополнительные километры
-                    new_weekly_volume = f"{additional_km:.1f}"
-                
-                # Важно: убедимся, что new_weekly_volume не None
-                if new_weekly_volume is None or new_weekly_volume == "None":
-                    new_weekly_volume = f"{additional_km:.1f}"
-                
-                # Update weekly volume
-                cursor.execute(
-                    """
-                    UPDATE runner_profiles 
-                    SET weekly_volume = %s, updated_at = CURRENT_TIMESTAMP
-                    WHERE user_id = %s
-                    RETURNING weekly_volume
-                    """,
-                    (new_weekly_volume, user_id)
-                )
-                
-                result = cursor.fetchone()
+                cursor.execute("SELECT refresh_weekly_volume(%s)", (user_id,))
+                volume = cursor.fetchone()[0]
                 conn.commit()
-                
-                # Проверяем результат перед возвратом
-                if result and result[0]:
-                    return result[0]
-                else:
-                    return f"{additional_km:.1f}"
+                return volume
                 
         except Exception as e:
-            logging.error(f"Error updating weekly volume: {e}")
+            logging.error(f"Error refreshing weekly volume: {e}")
             if conn:
                 conn.rollback()
             return None
         finally:
             if conn:
                 conn.close()
-                
+    
+    @staticmethod
+    def update_weekly_volume(user_id, additional_km):
+        """
+        Deprecated: the weekly volume is derived from the workout log.
+        
+        Completed workouts are logged by TrainingPlanManager.record_training_status,
+        so additional_km is not added again; the volume is only refreshed.
+        
+        Args:
+            user_id: Database user ID
+            additional_km: Ignored
+            
+        Returns:
+            Updated weekly volume in kilometers if successful, None otherwise
+        """
+        logging.warning("DBManager.update_weekly_volume is deprecated, use refresh_weekly_volume")
+        return DBManager.refresh_weekly_volume(user_id)
+    
     @staticmethod
     def save_payment_status(user_id, payment_agreed):
         """
@@ -664,4 +610,8 @@ class DBManager:
             return []
         finally:
             if conn:
-                conn.close()
\ No newline at end of file
+                conn.close()
+
+
+# Длительность каждого запроса попадает в db_query_seconds (см. metrics.py)
+instrument_methods(DBManager)
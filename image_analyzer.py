@@ -4,6 +4,9 @@ import io
 from datetime import datetime, timedelta
 from openai import OpenAI
 from config import logging
+from metrics import REGISTRY
+from training_calendar import parse_date
+from units import WORKOUT_DISTANCE_KEY, day_distance_km, normalize_workout
 
 # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
 # do not change this unless explicitly requested by the user
@@ -34,38 +37,39 @@ class ImageAnalyzer:
             base64_image = base64.b64encode(image_data).decode('utf-8')
             
             # Call OpenAI API
-            response = self.client.chat.completions.create(
-                model=MODEL,
-                messages=[
-                    {"role": "system", "content": 
-                     "Ты эксперт по анализу скриншотов фитнес-трекеров. "
-                     "Твоя задача - извлечь всю доступную информацию о тренировке из скриншота. "
-                     "Дай ответ ТОЛЬКО в формате JSON со следующими полями (если информация доступна): "
-                     "дата (в формате ДД.ММ.ГГГГ), "
-                     "время тренировки (если указано, в формате ЧЧ:ММ), "
-                     "дистанция_км (в километрах, только число), "
-                     "длительность (в формате ММ:СС или ЧЧ:ММ:СС), "
-                     "темп (в формате ММ:СС/км), "
-                     "калории, "
-                     "набор_высоты, "
-                     "тип_тренировки (например, бег, ходьба и т.д.), "
-                     "название_приложения (Nike Run, Strava, Garmin и т.д.). "
-                     "Обязательно укажи хотя бы дату и дистанцию_км, если они видны на скриншоте."
-                    },
-                    {"role": "user", "content": [
-                        {
-                            "type": "text", 
-                            "text": "Проанализируй этот скриншот фитнес-трекера и извлеки информацию о тренировке."
+            with REGISTRY.timed("llm_call_seconds", site="image_analyzer.analyze_workout_screenshot"):
+                response = self.client.chat.completions.create(
+                    model=MODEL,
+                    messages=[
+                        {"role": "system", "content": 
+                         "Ты эксперт по анализу скриншотов фитнес-трекеров. "
+                         "Твоя задача - извлечь всю доступную информацию о тренировке из скриншота. "
+                         "Дай ответ ТОЛЬКО в формате JSON со следующими полями (если информация доступна): "
+                         "дата (в формате ДД.ММ.ГГГГ), "
+                         "время тренировки (если указано, в формате ЧЧ:ММ), "
+                         "дистанция_км (в километрах, только число), "
+                         "длительность (в формате ММ:СС или ЧЧ:ММ:СС), "
+                         "темп (в формате ММ:СС/км), "
+                         "калории, "
+                         "набор_высоты, "
+                         "тип_тренировки (например, бег, ходьба и т.д.), "
+                         "название_приложения (Nike Run, Strava, Garmin и т.д.). "
+                         "Обязательно укажи хотя бы дату и дистанцию_км, если они видны на скриншоте."
                         },
-                        {
-                            "type": "image_url",
-                            "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}
-                        }
-                    ]}
-                ],
-                response_format={"type": "json_object"},
-                temperature=0
-            )
+                        {"role": "user", "content": [
+                            {
+                                "type": "text", 
+                                "text": "Проанализируй этот скриншот фитнес-трекера и извлеки информацию о тренировке."
+                            },
+                            {
+                                "type": "image_url",
+                                "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}
+                            }
+                        ]}
+                    ],
+                    response_format={"type": "json_object"},
+                    temperature=0
+                )
             
             # Get the response content
             result = response.choices[0].message.content
@@ -103,7 +107,8 @@ class ImageAnalyzer:
                     except Exception as inner_e:
                         logging.warning(f"Alternative date format conversion failed: {inner_e}")
             
-            return workout_data
+            # Parse distance, duration and pace into numbers once
+            return normalize_workout(workout_data)
             
         except Exception as e:
             logging.error(f"Error analyzing workout screenshot: {e}")
@@ -130,19 +135,16 @@ class ImageAnalyzer:
         best_score = 0
         
         # Get the workout date
-        workout_date = None
-        if "formatted_date" in workout_data:
-            workout_date = workout_data["formatted_date"]
+        workout_date = parse_date(workout_data.get("formatted_date"))
+        if workout_date:
             logging.info(f"Дата тренировки из скриншота: {workout_date}")
         
-        # Get workout distance
-        workout_distance = None
-        if "дистанция_км" in workout_data:
-            try:
-                workout_distance = float(workout_data["дистанция_км"])
-                logging.info(f"Дистанция тренировки из скриншота: {workout_distance} км")
-            except ValueError:
-                logging.warning(f"Could not convert distance to float: {workout_data['дистанция_км']}")
+        # Get workout distance (parsed on analysis; older callers may pass only the raw field)
+        if WORKOUT_DISTANCE_KEY not in workout_data:
+            normalize_workout(workout_data)
+        workout_distance = workout_data[WORKOUT_DISTANCE_KEY]
+        if workout_distance:
+            logging.info(f"Дистанция тренировки из скриншота: {workout_distance} км")
         
         # Log all training days for debugging
         for i, day in enumerate(training_days):
@@ -154,30 +156,13 @@ class ImageAnalyzer:
             score = 0
             day_log = f"День {i+1}: {day.get('day', 'Неизвестно')} ({day.get('date', 'Неизвестно')})"
             
-            # Extract date from training plan
-            training_date = None
-            if "date" in day:
-                try:
-                    # Convert from "ДД.ММ.ГГГГ" to "YYYY-MM-DD"
-                    date_parts = day["date"].split(".")
-                    if len(date_parts) == 3:
-                        training_date = f"{date_parts[2]}-{date_parts[1]}-{date_parts[0]}"
-                        day_log += f", дата: {training_date}"
-                except Exception as e:
-                    logging.warning(f"Error parsing training date: {e}")
-            
-            # Extract distance from training plan
-            training_distance = None
-            if "distance" in day:
-                try:
-                    # Extract numeric value from distance string (e.g., "5 км" -> 5)
-                    import re
-                    distance_match = re.search(r'(\d+(\.\d+)?)', day["distance"])
-                    if distance_match:
-                        training_distance = float(distance_match.group(1))
-                        day_log += f", дистанция: {training_distance} км"
-                except Exception as e:
-                    logging.warning(f"Error parsing training distance: {e}")
+            # Date and distance of the training day (distance is stored as a number on plan save)
+            training_date = parse_date(day.get("date"))
+            if training_date:
+                day_log += f", дата: {training_date}"
+            training_distance = day_distance_km(day)
+            if training_distance:
+                day_log += f", дистанция: {training_distance} км"
             
             # Compare dates (highest priority)
             date_score = 0
@@ -186,15 +171,10 @@ class ImageAnalyzer:
                 day_log += f", точное совпадение даты (+10)"
             elif workout_date and training_date:
                 # Check if dates are close (within 1 day)
-                try:
-                    workout_date_obj = datetime.strptime(workout_date, "%Y-%m-%d")
-                    training_date_obj = datetime.strptime(training_date, "%Y-%m-%d")
-                    days_diff = abs((workout_date_obj - training_date_obj).days)
-                    if days_diff <= 1:
-                        date_score = 5  # Medium score for close dates
-                        day_log += f", близкая дата (разница {days_diff} дней) (+5)"
-                except Exception as e:
-                    logging.warning(f"Error comparing dates: {e}")
+                days_diff = abs((workout_date - training_date).days)
+                if days_diff <= 1:
+                    date_score = 5  # Medium score for close dates
+                    day_log += f", близкая дата (разница {days_diff} дней) (+5)"
             score += date_score
             
             # Compare distances (second priority)
@@ -12,10 +12,12 @@
 import os
 import json
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
 import pytz
 from typing import Dict, Any
 
+from training_calendar import WEEKDAY_NAMES, schedule_for_profile
+
 # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
 # do not change this unless explicitly requested by the user
 MODEL = "gpt-4o"
@@ -112,149 +114,21 @@ class ImprovedCoachingService:
             Dict: Информация о датах тренировок
         """
         try:
-            # Проверяем, указал ли пользователь дату начала тренировок
-            user_start_date = profile.get('training_start_date_text', profile.get('training_start_date', None))
-            
-            # Попытка распарсить дату начала тренировок
-            start_date = None
-            
-            if user_start_date and user_start_date.lower() != 'сегодня' and user_start_date.lower() != 'не знаю':
-                try:
-                    # Попробуем распарсить дату в нескольких форматах
-                    formats = ["%d.%m.%Y", "%Y-%m-%d", "%d/%m/%Y", "%d.%m"]
-                    
-                    for fmt in formats:
-                        try:
-                            if fmt == "%d.%m":
-                                # Для формата без года добавляем текущий год
-                                current_year = datetime.now().year
-                                date_with_year = f"{user_start_date}.{current_year}"
-                                start_date = datetime.strptime(date_with_year, "%d.%m.%Y")
-                            else:
-                                start_date = datetime.strptime(user_start_date, fmt)
-                            
-                            start_date = self.moscow_tz.localize(start_date)
-                            logger.info(f"Успешно распарсили дату: {start_date.strftime('%d.%m.%Y')}")
-                            break
-                        except ValueError:
-                            continue
-                except Exception as e:
-                    logger.error(f"Ошибка при парсинге даты начала тренировок: {e}")
-            
-            # Если не удалось распарсить дату или она не была указана, используем текущую дату
-            if not start_date:
-                start_date = datetime.now(pytz.UTC).astimezone(self.moscow_tz)
-                logger.info(f"Используем текущую дату: {start_date.strftime('%d.%m.%Y')}")
-            
-            # Получаем предпочитаемые дни тренировок
-            preferred_days_str = profile.get('preferred_training_days', '')
-            preferred_days = []
-            
-            if preferred_days_str:
-                # Словарь для преобразования сокращений дней недели в числа (0 - понедельник, 6 - воскресенье)
-                day_name_to_number = {
-                    'пн': 0, 'вт': 1, 'ср': 2, 'чт': 3, 'пт': 4, 'сб': 5, 'вс': 6,
-                    'понедельник': 0, 'вторник': 1, 'среда': 2, 'четверг': 3, 
-                    'пятница': 4, 'суббота': 5, 'воскресенье': 6
+            schedule = schedule_for_profile(profile)
+            training_dates_info = [
+                {
+                    "date": date.strftime("%d.%m.%Y"),
+                    "weekday": WEEKDAY_NAMES[date.weekday()],
+                    "weekday_num": date.weekday()
                 }
-                
-                # Разбиваем строку предпочитаемых дней и преобразуем в числа
-                for day in preferred_days_str.lower().split(','):
-                    day = day.strip()
-                    if day in day_name_to_number:
-                        preferred_days.append(day_name_to_number[day])
-            
-            # Если предпочитаемые дни не указаны, используем все дни недели
-            if not preferred_days:
-                preferred_days = list(range(7))  # 0 - понедельник, 6 - воскресенье
-            
-            # Количество тренировочных дней в неделю (по умолчанию 3)
-            training_days_count = int(profile.get('training_days_per_week', 3))
-            
-            # Убедимся, что у нас достаточно дней для тренировок
-            if len(preferred_days) < training_days_count:
-                for i in range(7):
-                    if i not in preferred_days:
-                        preferred_days.append(i)
-                        if len(preferred_days) >= training_days_count:
-                            break
-            
-            # Если указано больше предпочитаемых дней, чем нужно для тренировок, используем первые N дней
-            if len(preferred_days) > training_days_count:
-                preferred_days = preferred_days[:training_days_count]
-            
-            # Сортируем дни недели, чтобы они шли по порядку
-            preferred_days.sort()
-            
-            # Проверяем, если стартовая дата раньше текущей даты, используем текущую
-            now = datetime.now(pytz.UTC).astimezone(self.moscow_tz)
-            current_date = start_date
-            if current_date.date() < now.date():
-                current_date = now
-            
-            # Получаем день недели для стартовой даты (0 - понедельник, 6 - воскресенье)
-            start_weekday = current_date.weekday()
-            
-            # Находим первый подходящий день для начала тренировок
-            days_to_add = 0
-            if preferred_days:
-                # Ищем ближайший предпочитаемый день недели, начиная со стартовой даты
-                min_days_to_add = float('inf')
-                for day in preferred_days:
-                    # Вычисляем, сколько дней нужно добавить к стартовой дате
-                    days = (day - start_weekday) % 7
-                    if days < min_days_to_add:
-                        min_days_to_add = days
-                
-                days_to_add = min_days_to_add
-            
-            # Добавляем дни к стартовой дате, чтобы получить первый день тренировки
-            first_training_date = current_date + timedelta(days=days_to_add)
-            
-            # Генерируем даты для всех тренировочных дней
-            training_dates = []
-            date_to_check = first_training_date
-            training_day_counter = 0
-            
-            while training_day_counter < training_days_count:
-                weekday = date_to_check.weekday()
-                
-                if weekday in preferred_days:
-                    training_dates.append(date_to_check)
-                    training_day_counter += 1
-                    logger.info(f"Добавлена дата тренировки: {date_to_check.strftime('%d.%m.%Y (%A)')}")
-                
-                date_to_check = date_to_check + timedelta(days=1)
-            
-            # Словарь для названий дней недели
-            day_number_to_name = {
-                0: "Понедельник", 
-                1: "Вторник", 
-                2: "Среда", 
-                3: "Четверг", 
-                4: "Пятница", 
-                5: "Суббота", 
-                6: "Воскресенье"
-            }
-            
-            # Формируем окончательный словарь с информацией о тренировочных днях
-            training_dates_info = []
-            
-            for date in training_dates:
-                weekday_num = date.weekday()
-                weekday_name = day_number_to_name[weekday_num]
-                date_str = date.strftime("%d.%m.%Y")
-                training_dates_info.append({
-                    "date": date_str,
-                    "weekday": weekday_name,
-                    "weekday_num": weekday_num
-                })
+                for date in schedule.dates
+            ]
             
             # Возвращаем результат
             return {
-                "start_date": start_date.strftime("%d.%m.%Y"),
-                "preferred_days": preferred_days,
-                "training_days_count": training_days_count,
+                "start_date": schedule.requested_start.strftime("%d.%m.%Y"),
+                "preferred_days": list(schedule.weekdays),
+                "training_days_count": len(schedule.dates),
                 "training_dates": training_dates_info
             }
             
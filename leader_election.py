@@ -0,0 +1,179 @@
+"""
+Выбор лидера через advisory-блокировки Postgres.
+
+Компоненты, которые должны работать в одном экземпляре (polling, прием вебхука
+и планировщик напоминаний), запускаются через LeaderLease.run_as_leader на всех репликах, но
+работают только на той, что держит блокировку роли (pg_try_advisory_lock).
+Блокировка принадлежит отдельному соединению: если процесс лидера завершается
+или теряет связь с базой, Postgres снимает блокировку вместе с сессией, и одна
+из резервных реплик забирает роль при следующей попытке (RETRY_INTERVAL).
+Лидер продлевает аренду каждые RENEW_INTERVAL секунд, проверяя, что его сессия
+все еще держит блокировку; если проверка не прошла, работа роли останавливается
+до того, как роль заберет другая реплика.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+from contextlib import suppress
+from typing import Any, Awaitable, Callable
+
+import psycopg2
+
+from config import DB_CONFIG
+
+# Пространство ключей advisory-блокировок лидеров (второй ключ — роль)
+LEADER_LOCK_NAMESPACE = 727403
+LEADER_ROLES = {
+    "poller": 1,
+    "reminders": 2,
+    "webhook": 3,
+}
+# Интервал продления аренды лидером (секунды)
+RENEW_INTERVAL = 5.0
+# Интервал попыток резервной реплики стать лидером (секунды)
+RETRY_INTERVAL = 2.0
+
+# Обрыв соединения с базой обнаруживается за несколько секунд, а не за часы:
+# keepalive-пакеты шлет и клиент, и сервер (tcp_keepalives_*), чтобы Postgres
+# сам закрыл сессию пропавшего лидера и снял его блокировку
+_CONNECTION_OPTIONS = {
+    "connect_timeout": 5,
+    "keepalives": 1,
+    "keepalives_idle": 5,
+    "keepalives_interval": 2,
+    "keepalives_count": 2,
+    "options": "-c statement_timeout=5000 -c tcp_keepalives_idle=5 -c tcp_keepalives_interval=2 "
+               "-c tcp_keepalives_count=2",
+}
+
+
+def replica_name() -> str:
+    """Имя реплики для журналов и pg_stat_activity."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _connect(role: str):
+    conn = psycopg2.connect(**DB_CONFIG, **_CONNECTION_OPTIONS, application_name=f"leader-{role}")
+    conn.autocommit = True
+    return conn
+
+
+class LeaderLease:
+    """
+    Аренда роли лидера на отдельном соединении с базой.
+
+    Args:
+        role: Роль из LEADER_ROLES
+        renew_interval: Интервал продления аренды (секунды)
+        retry_interval: Интервал попыток стать лидером (секунды)
+        connect: Функция, открывающая соединение для роли
+    """
+
+    def __init__(self, role: str, renew_interval: float = RENEW_INTERVAL, retry_interval: float = RETRY_INTERVAL,
+                 connect: Callable[[str], Any] = _connect):
+        self.role = role
+        self.key = LEADER_ROLES[role]
+        self.renew_interval = renew_interval
+        self.retry_interval = retry_interval
+        self._connect = connect
+        self._conn = None
+        self.is_leader = False
+
+    def _close(self) -> None:
+        # Закрытие сессии снимает блокировку
+        if self._conn is not None:
+            with suppress(Exception):
+                self._conn.close()
+        self._conn = None
+        self.is_leader = False
+
+    def try_acquire(self) -> bool:
+        """
+        Пытается стать лидером без ожидания.
+
+        Returns:
+            bool: True, если блокировка роли получена
+        """
+        try:
+            if self._conn is None or self._conn.closed:
+                self._conn = self._connect(self.role)
+            with self._conn.cursor() as cursor:
+                cursor.execute("SELECT pg_try_advisory_lock(%s, %s)", (LEADER_LOCK_NAMESPACE, self.key))
+                self.is_leader = bool(cursor.fetchone()[0])
+            return self.is_leader
+        except Exception as e:
+            logging.error(f"Ошибка при получении роли {self.role}: {e}")
+            self._close()
+            return False
+
+    def renew(self) -> bool:
+        """
+        Продлевает аренду: проверяет, что сессия жива и держит блокировку роли.
+
+        Returns:
+            bool: True, если реплика остается лидером
+        """
+        if self._conn is None:
+            return False
+        try:
+            with self._conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    SELECT EXISTS (
+                        SELECT 1 FROM pg_locks
+                        WHERE locktype = 'advisory' AND pid = pg_backend_pid()
+                          AND classid = %s AND objid = %s AND objsubid = 2 AND granted
+                    )
+                    """,
+                    (LEADER_LOCK_NAMESPACE, self.key)
+                )
+                held = bool(cursor.fetchone()[0])
+        except Exception as e:
+            logging.error(f"Ошибка при продлении роли {self.role}: {e}")
+            held = False
+        if not held:
+            self._close()
+        return held
+
+    def release(self) -> None:
+        """Отказывается от роли."""
+        self._close()
+
+    async def run_as_leader(self, work: Callable[[], Awaitable[Any]]) -> None:
+        """
+        Выполняет work, пока реплика остается лидером роли; работает до отмены.
+
+        Резервная реплика ждет роль, а лидер, потерявший аренду, отменяет work
+        и снова становится резервной репликой.
+
+        Args:
+            work: Функция, создающая корутину работы роли
+        """
+        try:
+            while True:
+                if not await asyncio.to_thread(self.try_acquire):
+                    await asyncio.sleep(self.retry_interval)
+                    continue
+
+                logging.info(f"Реплика {replica_name()} стала лидером роли {self.role}")
+                task = asyncio.create_task(work())
+                try:
+                    while not task.done():
+                        done, _ = await asyncio.wait({task}, timeout=self.renew_interval)
+                        if not done and not await asyncio.to_thread(self.renew):
+                            logging.error(f"Реплика {replica_name()} потеряла роль {self.role}, работа остановлена")
+                            break
+                finally:
+                    if not task.done():
+                        task.cancel()
+                    with suppress(asyncio.CancelledError, Exception):
+                        await task
+                    await asyncio.to_thread(self.release)
+
+                if task.done() and not task.cancelled() and task.exception():
+                    logging.error(f"Роль {self.role} завершилась с ошибкой: {task.exception()}")
+                await asyncio.sleep(self.retry_interval)
+        finally:
+            self.release()
@@ -0,0 +1,279 @@
+"""
+Живость процесса бота: задержка цикла событий, очередь обновлений и самые
+медленные блокирующие вызовы.
+
+Задача-пульс в цикле событий просыпается каждые LAG_INTERVAL секунд; опоздание
+пробуждения — задержка цикла. Сторожевой поток следит за возрастом пульса:
+если цикл не отвечает дольше BLOCKED_AFTER секунд, поток снимает стек потока
+цикла (sys._current_frames) — это стек вызова, который держит цикл, например
+синхронного запроса к OpenAI. После восстановления цикла вызов попадает в
+список самых медленных (SLOW_CALLBACKS_KEPT).
+
+Состояние отдает HTTP-сервер в отдельном потоке, поэтому он отвечает и при
+заблокированном цикле:
+    GET /healthz     — сводка; 503, если пульса нет дольше UNHEALTHY_AFTER секунд
+    GET /debug/slow  — самые медленные вызовы со стеками
+    GET /metrics     — метрики процесса в формате Prometheus (см. metrics.py)
+    GET /metrics.json — снимок метрик процесса для сбора в app.py
+Мониторы (bot_monitor.py, bot_health_monitor.py) опрашивают его через probe().
+"""
+
+import asyncio
+import json
+import logging
+import sys
+import threading
+import time
+import traceback
+import urllib.error
+import urllib.request
+from collections import deque
+from contextlib import suppress
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+from config import HEALTH_HOST, HEALTH_PORT
+from metrics import REGISTRY, render_prometheus
+
+# Период пульса цикла событий (секунды)
+LAG_INTERVAL = 0.5
+# Остановка цикла дольше этого срока записывается со стеком (секунды)
+BLOCKED_AFTER = 1.0
+# Процесс считается неживым, если пульса нет дольше этого срока (секунды)
+UNHEALTHY_AFTER = 30.0
+# Количество хранимых самых медленных вызовов
+SLOW_CALLBACKS_KEPT = 10
+# Количество замеров задержки для максимума (около минуты)
+LAG_WINDOW = 120
+
+
+@dataclass
+class SlowCallback:
+    """Остановка цикла событий: длительность, время начала и стек вызова."""
+    duration: float
+    started_at: float
+    stack: str
+
+    def as_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["duration"] = round(self.duration, 3)
+        data["started_at"] = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started_at))
+        return data
+
+
+class LivenessMonitor:
+    """
+    Измерения живости цикла событий процесса.
+
+    Args:
+        queue_depth: Функция, возвращающая число ожидающих обновлений
+        interval: Период пульса (секунды)
+        blocked_after: Порог записи остановки цикла (секунды)
+        unhealthy_after: Порог неживого процесса (секунды)
+        kept: Количество хранимых самых медленных вызовов
+    """
+
+    def __init__(self, queue_depth: Callable[[], int] = lambda: 0, interval: float = LAG_INTERVAL,
+                 blocked_after: float = BLOCKED_AFTER, unhealthy_after: float = UNHEALTHY_AFTER,
+                 kept: int = SLOW_CALLBACKS_KEPT):
+        self.queue_depth = queue_depth
+        self.interval = interval
+        self.blocked_after = blocked_after
+        self.unhealthy_after = unhealthy_after
+        self.kept = kept
+        self.started = time.monotonic()
+        self.heartbeat = self.started
+        self.lag = 0.0
+        self.slow: List[SlowCallback] = []
+        self._lags: deque = deque(maxlen=LAG_WINDOW)
+        self._stall: Optional[SlowCallback] = None
+        self._lock = threading.Lock()
+        self._loop_thread: Optional[int] = None
+        self._stop = threading.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    async def _beat(self) -> None:
+        self._loop_thread = threading.get_ident()
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            with self._lock:
+                self.heartbeat = now
+                self.lag = lag
+                self._lags.append(lag)
+                stall, self._stall = self._stall, None
+            if stall is not None and lag >= self.blocked_after:
+                stall.duration = lag
+                self._record(stall)
+
+    def _record(self, stall: SlowCallback) -> None:
+        logging.warning(f"Цикл событий был заблокирован {stall.duration:.2f} с:\n{stall.stack}")
+        with self._lock:
+            self.slow.append(stall)
+            self.slow.sort(key=lambda item: item.duration, reverse=True)
+            del self.slow[self.kept:]
+
+    def check_stall(self) -> None:
+        """Снимает стек потока цикла, если цикл не отвечает дольше порога (вызывается сторожевым потоком)."""
+        with self._lock:
+            blocked = time.monotonic() - self.heartbeat - self.interval
+            if blocked < self.blocked_after or self._stall is not None:
+                return
+        frame = sys._current_frames().get(self._loop_thread) if self._loop_thread else None
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+        with self._lock:
+            self._stall = SlowCallback(duration=blocked, started_at=time.time() - blocked, stack=stack)
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.check_stall()
+
+    def healthy(self) -> bool:
+        """Пульс цикла событий не старше порога неживого процесса."""
+        return time.monotonic() - self.heartbeat <= self.unhealthy_after
+
+    def snapshot(self, with_stacks: bool = False) -> Dict[str, Any]:
+        """
+        Текущее состояние.
+
+        Args:
+            with_stacks: Включить стеки самых медленных вызовов
+
+        Returns:
+            Dict[str, Any]: Статус, задержка цикла, глубина очереди и остановки цикла
+        """
+        with self._lock:
+            age = time.monotonic() - self.heartbeat
+            stall = self._stall
+            if stall is not None:
+                stall = SlowCallback(duration=age - self.interval, started_at=stall.started_at, stack=stall.stack)
+            slow = list(self.slow)
+            max_lag = max(self._lags, default=0.0)
+            lag = self.lag
+        try:
+            pending = self.queue_depth()
+        except Exception:
+            pending = None
+
+        status = "ok"
+        if age > self.unhealthy_after:
+            status = "blocked"
+        elif stall is not None:
+            status = "lagging"
+        payload = {
+            "status": status,
+            "uptime_seconds": round(time.monotonic() - self.started),
+            "heartbeat_age": round(age, 3),
+            "loop_lag_ms": round(lag * 1000, 1),
+            "max_lag_ms": round(max_lag * 1000, 1),
+            "pending_updates": pending,
+            "current_stall": stall.as_dict() if stall is not None else None,
+            "slow_callbacks": [item.as_dict() for item in slow],
+        }
+        if not with_stacks:
+            if payload["current_stall"]:
+                payload["current_stall"]["stack"] = payload["current_stall"]["stack"].splitlines()[-2:]
+            for item in payload["slow_callbacks"]:
+                item["stack"] = item["stack"].splitlines()[-2:]
+        return payload
+
+    def handle(self, path: str):
+        """
+        Обрабатывает GET-запрос эндпоинта.
+
+        Returns:
+            Tuple[int, bytes]: HTTP-статус и тело ответа
+        """
+        if path == "/healthz":
+            status = 200 if self.healthy() else 503
+            return status, json.dumps(self.snapshot(), ensure_ascii=False).encode()
+        if path == "/debug/slow":
+            return 200, json.dumps(self.snapshot(with_stacks=True), ensure_ascii=False, indent=2).encode()
+        if path == "/metrics":
+            return 200, render_prometheus(REGISTRY.snapshot()).encode()
+        if path == "/metrics.json":
+            return 200, json.dumps(REGISTRY.snapshot(), ensure_ascii=False).encode()
+        return 404, b'{"error": "not found"}'
+
+    def serve(self, host: str, port: int) -> Optional[int]:
+        """
+        Запускает HTTP-эндпоинт в отдельном потоке.
+
+        Returns:
+            Optional[int]: Порт эндпоинта или None, если порт занят
+        """
+        monitor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, body = monitor.handle(self.path.split("?")[0])
+                self.send_response(status)
+                content_type = "text/plain; version=0.0.4" if self.path == "/metrics" else "application/json"
+                self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer((host, port), Handler)
+        except OSError as e:
+            logging.error(f"Эндпоинт живости {host}:{port} не запущен: {e}")
+            return None
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="liveness-http", daemon=True).start()
+        port = self._server.server_address[1]
+        logging.info(f"Эндпоинт живости: http://{host}:{port}/healthz")
+        return port
+
+    def start(self, host: Optional[str] = HEALTH_HOST, port: int = HEALTH_PORT) -> Optional[int]:
+        """
+        Запускает пульс, сторожевой поток и эндпоинт; вызывается внутри цикла событий.
+
+        Args:
+            host: Адрес эндпоинта
+            port: Порт эндпоинта (0 или None host — без эндпоинта)
+
+        Returns:
+            Optional[int]: Порт эндпоинта
+        """
+        self._task = asyncio.get_running_loop().create_task(self._beat())
+        threading.Thread(target=self._watch, name="liveness-watchdog", daemon=True).start()
+        if host and port:
+            return self.serve(host, port)
+        return None
+
+    def stop(self) -> None:
+        """Останавливает пульс, сторожевой поток и эндпоинт."""
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+        if self._server is not None:
+            with suppress(Exception):
+                self._server.shutdown()
+                self._server.server_close()
+
+
+def probe(host: str = HEALTH_HOST, port: int = HEALTH_PORT, timeout: float = 5.0) -> Optional[Dict[str, Any]]:
+    """
+    Опрашивает эндпоинт живости процесса бота.
+
+    Returns:
+        Optional[Dict[str, Any]]: Состояние процесса или None, если эндпоинт не отвечает
+    """
+    try:
+        with urllib.request.urlopen(f"http://{host}:{port}/healthz", timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        # 503 с телом: процесс отвечает, но цикл событий не работает
+        with suppress(Exception):
+            return json.loads(e.read())
+        return None
+    except Exception:
+        return None
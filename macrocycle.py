@@ -0,0 +1,410 @@
+"""
+Макроцикл подготовки к соревнованию.
+
+Скелет макроцикла (базовый, развивающий, пиковый этапы и подводка) с недельным
+объемом, длительной тренировкой и ключевыми тренировками каждой недели
+рассчитывается локально один раз для профиля и хранится в базе данных.
+Подробный план очередной недели материализуется из скелета по запросу, поэтому
+продолжение плана не требует обращения к OpenAI. Неделя проходит ту же проверку
+(plan_validator) и расстановку зон темпа (pace_calculator), что и план модели.
+"""
+
+import json
+import logging
+import math
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+import psycopg2
+
+from config import DB_CONFIG
+from pace_calculator import apply_pace_zones, pace_profile
+from plan_adjuster import calculate_load_factor, shift_pace
+from plan_validator import repair_plan
+from training_calendar import (WEEKDAY_NAMES, days_per_week, parse_date, parse_weekdays, session_dates,
+                               today_moscow, weekday_mask)
+from training_load import limits_increase
+from units import (format_distance, format_pace, plan_distance_km, profile_distance_km, profile_pace_seconds,
+                   profile_volume_km)
+from workout_log import recent_performances
+
+PHASE_NAMES = {
+    "base": "Базовый",
+    "build": "Развивающий",
+    "peak": "Пиковый",
+    "taper": "Подводящий",
+}
+
+# Ключевые тренировки каждого этапа (помимо длительной)
+PHASE_KEY_SESSIONS = {
+    "base": ["Фартлек"],
+    "build": ["Темповой бег", "Интервалы"],
+    "peak": ["Интервалы", "Бег в соревновательном темпе"],
+    "taper": ["Бег в соревновательном темпе"],
+}
+
+# Максимальный недельный объем на пике по целевой дистанции: (дистанция до, км в неделю)
+PEAK_VOLUME_CAPS = ((5, 30), (10, 40), (21.1, 55), (float("inf"), 70))
+# Минимальный недельный объем, с которого начинается макроцикл
+MIN_WEEKLY_VOLUME = 10.0
+# Недельный прирост объема (правило 10%)
+WEEKLY_GROWTH = 0.10
+# Каждая N-я неделя базового и развивающего этапов — разгрузочная
+RECOVERY_WEEK_EVERY = 4
+RECOVERY_FACTOR = 0.8
+# Объем недель подводки относительно пикового, последняя — неделя старта
+TAPER_FACTORS = (0.75, 0.6, 0.45)
+# Доля длительной тренировки в недельном объеме
+LONG_RUN_SHARE = 0.3
+# Доля каждой ключевой тренировки в недельном объеме
+KEY_SESSION_SHARE = 0.2
+# Минимальная дистанция легкой тренировки
+MIN_EASY_RUN_KM = 3.0
+
+# Комфортный темп, если в профиле он не указан или не распознан (секунды на км)
+DEFAULT_COMFORTABLE_PACE = 360
+# Сдвиг темпа относительно комфортного (секунды на км)
+PACE_OFFSETS = {
+    "Легкий бег": 0,
+    "Длительный бег": 15,
+    "Фартлек": -15,
+    "Темповой бег": -30,
+    "Интервалы": -50,
+    "Бег в соревновательном темпе": -25,
+    "Соревнование": -30,
+}
+
+SESSION_DESCRIPTIONS = {
+    "Легкий бег": "Разминка: 5 минут ходьбы. Основная часть: равномерный бег в разговорном темпе. "
+                  "Заминка: 5 минут ходьбы и растяжка.",
+    "Длительный бег": "Разминка: 10 минут легкого бега. Основная часть: равномерный длительный бег, "
+                      "последние 2 км можно чуть быстрее. Заминка: 5 минут ходьбы и растяжка.",
+    "Фартлек": "Разминка: 15 минут легкого бега. Основная часть: 6-8 ускорений по 1 минуте "
+               "с 2 минутами легкого бега между ними. Заминка: 10 минут легкого бега.",
+    "Темповой бег": "Разминка: 15 минут легкого бега. Основная часть: 20-30 минут в комфортно-тяжелом "
+                    "темпе. Заминка: 10 минут легкого бега.",
+    "Интервалы": "Разминка: 15 минут легкого бега и 3 ускорения. Основная часть: 5-6 отрезков по 800 м "
+                 "с 400 м трусцы. Заминка: 10 минут легкого бега.",
+    "Бег в соревновательном темпе": "Разминка: 15 минут легкого бега. Основная часть: 2-3 отрезка "
+                                    "по 2 км в целевом темпе соревнования. Заминка: 10 минут легкого бега.",
+    "Соревнование": "День старта! Легкая разминка 10-15 минут, ровный темп по плану на гонку. Удачи!",
+}
+
+
+def _round_half(km: float) -> float:
+    """Округляет дистанцию до 0.5 км."""
+    return round(km * 2) / 2
+
+
+def _peak_volume_cap(distance_km: float) -> float:
+    """Возвращает максимальный недельный объем для целевой дистанции."""
+    for max_distance, cap in PEAK_VOLUME_CAPS:
+        if distance_km <= max_distance:
+            return cap
+    return PEAK_VOLUME_CAPS[-1][1]
+
+
+def _taper_weeks(distance_km: float) -> int:
+    """Возвращает количество недель подводки для целевой дистанции."""
+    if distance_km >= 42:
+        return 3
+    if distance_km >= 21:
+        return 2
+    return 1
+
+
+def _split_phases(total_weeks: int, distance_km: float) -> List[str]:
+    """Распределяет недели макроцикла по этапам."""
+    taper = min(_taper_weeks(distance_km), total_weeks)
+    rest = total_weeks - taper
+    peak = max(1, round(rest * 0.2)) if rest >= 3 else 0
+    build = round(rest * 0.4) if rest >= 2 else 0
+    base = rest - peak - build
+    return ["base"] * base + ["build"] * build + ["peak"] * peak + ["taper"] * taper
+
+
+def build_macrocycle(profile: Dict[str, Any], start_date: date) -> Optional[Dict[str, Any]]:
+    """
+    Рассчитывает скелет макроцикла от даты начала до дня соревнования.
+
+    Args:
+        profile: Профиль бегуна (distance, competition_date, weekly_volume)
+        start_date: Дата начала макроцикла
+
+    Returns:
+        Optional[Dict]: Скелет макроцикла или None, если дата соревнования не задана или прошла
+    """
+    race_date = parse_date(profile.get("competition_date"))
+    distance_km = profile_distance_km(profile)
+    if not race_date or not distance_km or race_date < start_date:
+        return None
+
+    total_weeks = max(1, math.ceil(((race_date - start_date).days + 1) / 7))
+    phases = _split_phases(total_weeks, distance_km)
+
+    volume = max(profile_volume_km(profile) or 0.0, MIN_WEEKLY_VOLUME)
+    peak_cap = max(_peak_volume_cap(distance_km), volume)
+    long_run_cap = min(32.0, max(8.0, distance_km))
+
+    weeks = []
+    peak_volume = volume
+    taper_index = 0
+    for idx, phase in enumerate(phases):
+        week_start = start_date + timedelta(days=idx * 7)
+        recovery = False
+        if phase == "taper":
+            factor = TAPER_FACTORS[min(taper_index, len(TAPER_FACTORS) - 1)]
+            # Последняя неделя всегда с минимальным объемом
+            if idx == len(phases) - 1:
+                factor = TAPER_FACTORS[-1]
+            week_volume = peak_volume * factor
+            taper_index += 1
+        else:
+            if idx > 0:
+                volume = min(volume * (1 + WEEKLY_GROWTH), peak_cap)
+            recovery = phase != "peak" and (idx + 1) % RECOVERY_WEEK_EVERY == 0
+            week_volume = volume * RECOVERY_FACTOR if recovery else volume
+            peak_volume = max(peak_volume, week_volume)
+
+        week_volume = _round_half(week_volume)
+        weeks.append({
+            "week": idx + 1,
+            "start_date": week_start.strftime("%d.%m.%Y"),
+            "end_date": min(week_start + timedelta(days=6), race_date).strftime("%d.%m.%Y"),
+            "phase": phase,
+            "phase_name": PHASE_NAMES[phase],
+            "recovery": recovery,
+            "volume_km": week_volume,
+            "long_run_km": _round_half(min(week_volume * LONG_RUN_SHARE, long_run_cap)),
+            "key_sessions": [] if recovery else list(PHASE_KEY_SESSIONS[phase]),
+        })
+
+    return {
+        "race_date": race_date.strftime("%d.%m.%Y"),
+        "distance_km": distance_km,
+        "start_date": start_date.strftime("%d.%m.%Y"),
+        "weeks": weeks,
+    }
+
+
+def materialize_week(macrocycle: Dict[str, Any], profile: Dict[str, Any], start_date: date,
+                     load_factor: float = 1.0) -> Optional[Dict[str, Any]]:
+    """
+    Строит подробный план на 7 дней, начиная с start_date, из недели скелета.
+
+    Args:
+        macrocycle: Скелет макроцикла
+        profile: Профиль бегуна
+        start_date: Первый день недельного плана
+        load_factor: Множитель объема по результатам предыдущей недели
+
+    Returns:
+        Optional[Dict]: План в формате бота или None, если дата вне макроцикла
+    """
+    cycle_start = parse_date(macrocycle["start_date"])
+    race_date = parse_date(macrocycle["race_date"])
+    week_idx = (start_date - cycle_start).days // 7
+    if start_date > race_date or not 0 <= week_idx < len(macrocycle["weeks"]):
+        return None
+    week = macrocycle["weeks"][week_idx]
+
+    # Продолжение сохраняет все предпочитаемые дни, как и остальные продолжения плана
+    weekdays = parse_weekdays(profile.get("preferred_training_days"),
+                              days_per_week(profile.get("training_days_per_week")), keep_all=True)
+    dates = [day for day in session_dates(start_date, weekday_mask(weekdays), len(weekdays)) if day < race_date]
+    if (race_date - start_date).days < 7:
+        dates.append(race_date)
+    if not dates:
+        return None
+
+    volume = week["volume_km"] * load_factor
+    sessions = {}
+    if dates[-1] == race_date:
+        sessions[race_date] = ("Соревнование", macrocycle["distance_km"])
+    else:
+        sessions[dates[-1]] = ("Длительный бег", week["long_run_km"] * load_factor)
+    free_dates = [day for day in dates if day not in sessions]
+    # Ключевые тренировки ставим через день, начиная с первой даты
+    for key_session, day in zip(week["key_sessions"], free_dates[::2]):
+        sessions[day] = (key_session, volume * KEY_SESSION_SHARE)
+
+    easy_dates = [day for day in dates if day not in sessions]
+    # В неделю старта сама гонка входит в объем, легкие пробежки остаются короткими
+    used = sum(km for _, km in sessions.values())
+    easy_km = max(MIN_EASY_RUN_KM, (volume - used) / len(easy_dates)) if easy_dates else 0
+    for day in easy_dates:
+        sessions[day] = ("Легкий бег", easy_km)
+
+    # Черновой темп от комфортного; зоны темпа уточняет apply_pace_zones
+    base_pace = format_pace(profile_pace_seconds(profile) or DEFAULT_COMFORTABLE_PACE)
+    training_days = []
+    total = 0.0
+    for day in dates:
+        session, km = sessions[day]
+        km = km if session == "Соревнование" else max(MIN_EASY_RUN_KM, _round_half(km))
+        total += km
+        training_days.append({
+            "day": WEEKDAY_NAMES[day.weekday()],
+            "date": day.strftime("%d.%m.%Y"),
+            "training_type": session,
+            "distance": format_distance(km),
+            "pace": shift_pace(base_pace, PACE_OFFSETS[session]),
+            "description": SESSION_DESCRIPTIONS[session],
+        })
+
+    total_weeks = len(macrocycle["weeks"])
+    description = (
+        f"{week['phase_name']} этап, неделя {week['week']} из {total_weeks} до старта "
+        f"{macrocycle['race_date']}. Целевой объем недели: {format_distance(_round_half(volume))}."
+    )
+    if week["recovery"]:
+        description += " Разгрузочная неделя: сниженный объем для восстановления."
+
+    return {
+        "plan_name": f"Продолжение тренировок: неделя {week['week']} из {total_weeks} ({week['phase_name'].lower()} этап)",
+        "plan_description": description,
+        "total_distance": round(total, 1),
+        "macrocycle_week": week["week"],
+        "training_days": training_days,
+    }
+
+
+class MacrocycleManager:
+    """Manager for stored macrocycle skeletons."""
+
+    @staticmethod
+    def get_macrocycle(profile_id):
+        """
+        Get the stored macrocycle skeleton for a runner profile.
+
+        Args:
+            profile_id: Runner profile ID
+
+        Returns:
+            Dictionary containing the skeleton if found, None otherwise
+        """
+        conn = None
+        try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT skeleton FROM training_macrocycles WHERE profile_id = %s", (profile_id,))
+                row = cursor.fetchone()
+                return json.loads(row[0]) if row else None
+        except Exception as e:
+            logging.error(f"Error getting macrocycle: {e}")
+            return None
+        finally:
+            if conn:
+                conn.close()
+
+    @staticmethod
+    def save_macrocycle(profile_id, macrocycle):
+        """
+        Save or replace the macrocycle skeleton for a runner profile.
+
+        Args:
+            profile_id: Runner profile ID
+            macrocycle: Dictionary containing the skeleton
+
+        Returns:
+            True if successful, False otherwise
+        """
+        conn = None
+        try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    INSERT INTO training_macrocycles (profile_id, race_date, distance, skeleton, created_at)
+                    VALUES (%s, %s, %s, %s, NOW())
+                    ON CONFLICT (profile_id) DO UPDATE
+                    SET race_date = EXCLUDED.race_date,
+                        distance = EXCLUDED.distance,
+                        skeleton = EXCLUDED.skeleton,
+                        created_at = EXCLUDED.created_at
+                    """,
+                    (profile_id, macrocycle["race_date"], macrocycle["distance_km"],
+                     json.dumps(macrocycle, ensure_ascii=False))
+                )
+            conn.commit()
+            return True
+        except Exception as e:
+            logging.error(f"Error saving macrocycle: {e}")
+            if conn:
+                conn.rollback()
+            return False
+        finally:
+            if conn:
+                conn.close()
+
+
+def get_or_create_macrocycle(profile: Dict[str, Any], start_date: date) -> Optional[Dict[str, Any]]:
+    """
+    Возвращает сохраненный макроцикл профиля или рассчитывает и сохраняет новый.
+
+    Макроцикл пересчитывается, если в профиле изменились дата соревнования или дистанция.
+
+    Args:
+        profile: Профиль бегуна
+        start_date: Дата начала, если макроцикл создается впервые
+
+    Returns:
+        Optional[Dict]: Скелет макроцикла или None
+    """
+    profile_id = profile.get("id")
+    race_date = parse_date(profile.get("competition_date"))
+    distance_km = profile_distance_km(profile)
+    if not profile_id or not race_date or not distance_km:
+        return None
+
+    stored = MacrocycleManager.get_macrocycle(profile_id)
+    if (stored and stored["race_date"] == race_date.strftime("%d.%m.%Y")
+            and stored["distance_km"] == distance_km):
+        return stored
+
+    macrocycle = build_macrocycle(profile, start_date)
+    if macrocycle:
+        MacrocycleManager.save_macrocycle(profile_id, macrocycle)
+        logging.info(f"Рассчитан макроцикл для профиля {profile_id}: {len(macrocycle['weeks'])} недель до старта")
+    return macrocycle
+
+
+def plan_continuation_from_macrocycle(profile: Dict[str, Any], current_plan: Dict[str, Any],
+                                      total_distance: float,
+                                      training_load: Optional[Dict[str, float]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Материализует следующую неделю макроцикла как продолжение плана.
+
+    Объем недели корректируется по отношению выполненной дистанции к запланированной
+    в текущем плане; при усталости бегуна объем не увеличивается. Неделя проверяется
+    repair_plan, темп дней расставляется по зонам бегуна.
+
+    Args:
+        profile: Профиль бегуна
+        current_plan: Текущий план тренировок
+        total_distance: Выполненная дистанция текущего плана
+        training_load: Нагрузка бегуна (training_load.load_summary)
+
+    Returns:
+        Optional[Dict]: План на неделю или None, если макроцикл неприменим
+    """
+    today = today_moscow()
+    start_date = parse_date(profile.get("training_start_date_text"))
+    if not start_date or start_date < today:
+        start_date = today
+
+    macrocycle = get_or_create_macrocycle(profile, start_date)
+    if not macrocycle:
+        return None
+
+    planned_distance = plan_distance_km(current_plan)
+    load_factor = calculate_load_factor(planned_distance, total_distance or 0.0)
+    if load_factor > 1 and limits_increase(training_load):
+        load_factor = 1.0
+    plan = materialize_week(macrocycle, profile, start_date, load_factor)
+    if not plan:
+        return None
+
+    plan = repair_plan(plan, expected_dates=[day["date"] for day in plan["training_days"]])
+    apply_pace_zones(plan, pace_profile(profile, recent_performances(profile)))
+    return plan
@@ -1,23 +1,19 @@
 
+# Отсчет времени запуска начинается с импорта boot (см. boot.py)
+from boot import BOOT, install_boot_probe, prewarm
 import logging
 import sys
-import time
 import os
 import traceback
 import signal
-import psutil
-import fcntl
-import datetime
 import asyncio
-import threading
 from bot_modified import setup_bot
-from app import app  # Импортируем Flask-приложение из app.py
 from training_reminder import schedule_reminders
-
-# Константы для мониторинга здоровья
-HEALTH_CHECK_FILE = "bot_health.txt"
-LOCK_FILE = "/tmp/telegram_bot.lock"
-BOT_PROCESS_NAME = "main.py"
+from config import WEBHOOK_URL
+from leader_election import LeaderLease, replica_name
+from liveness import LivenessMonitor
+from metrics import MetricsFlusher
+from profiler import install_profile_signal
 
 # Настройка логирования в файл и консоль
 def setup_logging():
@@ -53,163 +49,82 @@ def setup_logging():
     # Устанавливаем обработчик необработанных исключений
     sys.excepthook = handle_exception
 
-def update_health_check():
-    """Обновляет файл проверки здоровья текущим временем."""
-    try:
-        with open(HEALTH_CHECK_FILE, "w") as f:
-            f.write(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-    except Exception as e:
-        logging.error(f"Ошибка при обновлении файла проверки здоровья: {e}")
-
-def check_and_kill_other_instances():
-    """Проверяет наличие других экземпляров бота и завершает их."""
-    current_pid = os.getpid()
-    
-    try:
-        # Ищем экземпляры бота с тем же именем скрипта
-        for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-            try:
-                # Пропускаем текущий процесс
-                if proc.info['pid'] == current_pid:
-                    continue
-                
-                # Проверяем, не является ли процесс экземпляром бота
-                if proc.info['cmdline'] and any(BOT_PROCESS_NAME in cmd for cmd in proc.info['cmdline']):
-                    logging.warning(f"Найден другой экземпляр бота (PID: {proc.info['pid']}), завершаем его")
-                    
-                    # Пытаемся мягко завершить процесс
-                    os.kill(proc.info['pid'], signal.SIGTERM)
-                    time.sleep(2)  # Даем время на завершение
-                    
-                    # Если процесс все еще жив, применяем SIGKILL
-                    if psutil.pid_exists(proc.info['pid']):
-                        os.kill(proc.info['pid'], signal.SIGKILL)
-                        logging.warning(f"Процесс {proc.info['pid']} принудительно завершен")
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess) as e:
-                logging.warning(f"Ошибка при проверке процесса: {e}")
-    except Exception as e:
-        logging.error(f"Ошибка при проверке других экземпляров: {e}")
-
-def try_lock_file():
-    """Пытается получить блокировку файла для предотвращения запуска нескольких экземпляров."""
+async def poll_updates(application):
+    """Получает обновления через polling, пока задача не отменена."""
+    await application.initialize()
+    await application.start()
+    # Накопившиеся обновления не отбрасываются: их обрабатывает новый лидер
+    await application.updater.start_polling(drop_pending_updates=False)
+    BOOT.report("Polling запущен")
     try:
-        # Создаем файл блокировки, если он не существует
-        lock_file_handle = open(LOCK_FILE, 'w')
-        
-        # Пытаемся получить эксклюзивную блокировку файла
-        fcntl.lockf(lock_file_handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
-        
-        # Если блокировка получена успешно, возвращаем дескриптор файла
-        return lock_file_handle
-    except IOError:
-        # Не удалось получить блокировку - другой экземпляр уже запущен
-        logging.error("Не удалось получить блокировку файла. Другой экземпляр бота уже запущен.")
-        
-        # Проверяем и убиваем другие экземпляры
-        check_and_kill_other_instances()
-        
-        # Пробуем еще раз получить блокировку
-        time.sleep(2)
-        return try_lock_file()
-    except Exception as e:
-        logging.error(f"Неожиданная ошибка при получении блокировки: {e}")
-        return None
+        await asyncio.Event().wait()
+    finally:
+        if application.updater.running:
+            await application.updater.stop()
+        if application.running:
+            await application.stop()
+        await application.shutdown()
+        logging.info("Polling остановлен")
 
-def release_lock(lock_file_handle):
-    """Освобождает блокировку файла."""
-    if lock_file_handle:
-        try:
-            fcntl.lockf(lock_file_handle, fcntl.LOCK_UN)
-            lock_file_handle.close()
-            logging.info("Блокировка файла освобождена")
-        except Exception as e:
-            logging.error(f"Ошибка при освобождении блокировки: {e}")
+async def run_replica(application):
+    """
+    Запускает роли реплики: polling и планировщик напоминаний работают только
+    на реплике, которая держит их блокировку (см. leader_election.py).
+    """
+    loop = asyncio.get_running_loop()
+    # Эндпоинт живости для мониторов: задержка цикла, очередь и медленные вызовы
+    monitor = LivenessMonitor(application.update_queue.qsize)
+    monitor.start()
+    # Метрики реплики раз в интервал записываются в bot_metrics
+    flusher = MetricsFlusher(replica_name()).start()
+    # Прогрев идет параллельно с получением ролей; polling ждет его окончания
+    warm_up = asyncio.create_task(prewarm(application))
 
-def setup_health_update():
-    """Настраивает регулярное обновление файла здоровья."""
-    # Обновляем файл здоровья при запуске
-    update_health_check()
-    
-    # Настраиваем сигнальный обработчик для обновления файла здоровья
-    def health_signal_handler(signum, frame):
-        update_health_check()
-    
-    # Регистрируем обработчик для сигнала SIGUSR1
-    signal.signal(signal.SIGUSR1, health_signal_handler)
-    
-    # Запускаем процесс регулярного обновления файла здоровья
-    def send_health_signal():
-        """Функция для отправки сигнала SIGUSR1 себе."""
-        while True:
-            try:
-                os.kill(os.getpid(), signal.SIGUSR1)
-            except:
-                pass
-            time.sleep(30)  # Обновляем каждые 30 секунд
-    
-    # Запускаем функцию в отдельном потоке
-    import threading
-    health_thread = threading.Thread(target=send_health_signal, daemon=True)
-    health_thread.start()
+    async def poll():
+        await warm_up
+        await poll_updates(application)
 
-def start_reminder_loop():
-    """Запускает планировщик напоминаний о тренировках."""
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+    roles = asyncio.gather(
+        LeaderLease("poller").run_as_leader(poll),
+        LeaderLease("reminders").run_as_leader(schedule_reminders),
+    )
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, roles.cancel)
+    # kill -USR2 <pid> — сеанс профилирования процесса (см. profiler.py)
+    install_profile_signal(loop)
     try:
-        logging.info("Запуск планировщика напоминаний о тренировках...")
-        loop.run_until_complete(schedule_reminders())
-    except Exception as e:
-        logging.error(f"Ошибка в планировщике напоминаний: {e}")
+        await roles
+    except asyncio.CancelledError:
+        logging.info("Реплика остановлена")
     finally:
-        loop.close()
+        monitor.stop()
+        await asyncio.to_thread(flusher.stop)
 
 def main():
     """Main function to start the Telegram bot."""
     # Setup logging
     setup_logging()
+    BOOT.checkpoint("импорт модулей")
     
-    # Сбрасываем сессию Telegram API
-    logging.info("Сброс сессии Telegram API...")
-    try:
-        # Импортируем функцию сброса из нашего скрипта
-        from start_bot_directly import reset_telegram_api
-        reset_telegram_api()
-        logging.info("Сессия Telegram API успешно сброшена")
-    except Exception as e:
-        logging.error(f"Ошибка при сбросе сессии Telegram API: {e}")
-    
-    # Пытаемся получить блокировку файла
-    lock_file_handle = try_lock_file()
-    if not lock_file_handle:
-        logging.critical("Не удалось получить блокировку файла после нескольких попыток. Выход.")
+    # В режиме вебхука обновления принимает webhook_server.py
+    if WEBHOOK_URL:
+        from webhook_server import main as webhook_main
+        webhook_main()
         return
     
-    # Настраиваем обновление файла здоровья
-    setup_health_update()
-    
     try:
-        # Проверяем и убиваем другие экземпляры бота
-        check_and_kill_other_instances()
-        
-        # Запускаем планировщик напоминаний в отдельном потоке
-        reminder_thread = threading.Thread(target=start_reminder_loop, daemon=True)
-        reminder_thread.start()
-        logging.info("Планировщик напоминаний о тренировках запущен в отдельном потоке")
-        
-        # Запускаем бота напрямую
-        application = setup_bot()
+        # Запускаем бота напрямую; несколько реплик могут работать одновременно,
+        # polling и напоминания выполняет только лидер соответствующей роли
+        # Схема проверяется при прогреве, параллельно с подключением к Telegram
+        application = setup_bot(check_schema=False)
+        install_boot_probe(application)
+        BOOT.checkpoint("сборка приложения")
         logging.info("Telegram бот успешно настроен и запускается...")
-        
-        # Запускаем бота в режиме polling с параметрами по умолчанию
-        application.run_polling(drop_pending_updates=True)  # Игнорируем накопившиеся обновления
+        asyncio.run(run_replica(application))
         
     except Exception as e:
         logging.error(f"Ошибка при запуске бота: {e}")
         logging.error(traceback.format_exc())
-    finally:
-        # Освобождаем блокировку файла перед выходом
-        release_lock(lock_file_handle)
 
 if __name__ == '__main__':
     main()
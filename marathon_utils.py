@@ -1,37 +1,260 @@
 """
 Утилиты для работы с данными о марафонах.
+
+Каталог марафонов (MarathonCatalog) загружается из data/marathons.csv один раз
+и перечитывается, только когда меняется время изменения файла. Даты вида
+"10–11 мая 2025" разбираются в настоящие даты; события хранятся отсортированными
+по дате начала с индексом по типу дистанции, прошедшие события не показываются.
+У каждого события есть короткий ID (хеш названия и даты), который помещается в
+callback_data кнопки вместо исходных строк.
 """
 import csv
+import hashlib
+import logging
 import os
-from typing import List, Dict
+import re
+import threading
+from bisect import bisect_left
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from training_calendar import today_moscow
+
+# Путь к файлу каталога
+CATALOG_PATH = os.path.join('data', 'marathons.csv')
+# Количество марафонов на одной странице выбора
+PAGE_SIZE = 5
+# Фильтры по типу дистанции для кнопок: короткий код -> тип
+DISTANCE_FILTERS = {
+    "all": None,
+    "full": "марафон",
+    "half": "полумарафон",
+}
+
+MONTHS_GENITIVE = {
+    "января": 1, "февраля": 2, "марта": 3, "апреля": 4, "мая": 5, "июня": 6,
+    "июля": 7, "августа": 8, "сентября": 9, "октября": 10, "ноября": 11, "декабря": 12,
+}
+
+# "17 мая 2025", "10–11 мая 2025", "30 апреля – 1 мая 2025"
+_DATE_RANGE_RE = re.compile(
+    r"^\s*(\d{1,2})(?:\s+([а-яё]+))?(?:\s*[–—-]\s*(\d{1,2}))?\s+([а-яё]+)\s+(\d{4})\s*$"
+)
+_TYPE_DETAILS_RE = re.compile(r"\(.*?\)")
+
+
+def parse_event_dates(text: str) -> Optional[Tuple[date, date]]:
+    """
+    Разбирает дату или диапазон дат события.
+
+    Args:
+        text: Дата в формате "17 мая 2025", "10–11 мая 2025" или "30 апреля – 1 мая 2025"
+
+    Returns:
+        Optional[Tuple[date, date]]: Даты начала и окончания или None, если дата не распознана
+    """
+    match = _DATE_RANGE_RE.match(str(text or "").lower())
+    if not match:
+        return None
+    first_day, first_month, last_day, last_month, year = match.groups()
+    end_month = MONTHS_GENITIVE.get(last_month)
+    start_month = MONTHS_GENITIVE.get(first_month) if first_month else end_month
+    if not start_month or not end_month or (first_month and not last_day):
+        return None
+    try:
+        start = date(int(year), start_month, int(first_day))
+        end = date(int(year), end_month, int(last_day or first_day))
+    except ValueError:
+        return None
+    if end < start:
+        return None
+    return start, end
+
+
+def parse_distance_types(text: str) -> Tuple[str, ...]:
+    """
+    Разбирает типы дистанций события ("марафон, полумарафон", "марафон (горный)").
+
+    Returns:
+        Tuple[str, ...]: Типы без уточнений в скобках, в нижнем регистре
+    """
+    types = (_TYPE_DETAILS_RE.sub("", part).strip().lower() for part in str(text or "").split(","))
+    return tuple(dict.fromkeys(t for t in types if t))
+
+
+def marathon_id(name: str, start: date) -> str:
+    """Короткий ID события: не меняется при перечитывании файла и перестановке строк."""
+    return hashlib.blake2s(f"{name}|{start.isoformat()}".encode("utf-8"), digest_size=4).hexdigest()
+
+
+@dataclass(frozen=True)
+class Marathon:
+    """Событие каталога."""
+    id: str
+    name: str
+    date_text: str
+    start_date: date
+    end_date: date
+    place: str
+    distance_types: Tuple[str, ...]
+    type_text: str
+    site: str
+
+    def as_dict(self) -> Dict[str, str]:
+        """Событие в формате строки CSV (Название, Дата, Место, Тип, Сайт)."""
+        return {
+            "Название": self.name,
+            "Дата": self.date_text,
+            "Место": self.place,
+            "Тип": self.type_text,
+            "Сайт": self.site,
+        }
+
+
+def _date_index(events: List[Marathon]) -> Tuple[List[date], List[Marathon]]:
+    """Даты начала для бинарного поиска и события в том же порядке."""
+    return [event.start_date for event in events], events
+
+
+class MarathonCatalog:
+    """
+    Каталог марафонов в памяти с перечитыванием при изменении файла.
+
+    Args:
+        path: Путь к CSV-файлу каталога
+    """
+
+    def __init__(self, path: str = CATALOG_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        # Индексы заменяются целиком, чтобы читатели не видели их частично обновленными
+        self._max_span = timedelta(0)
+        self._by_date: Tuple[List[date], List[Marathon]] = ([], [])
+        self._by_type: Dict[str, Tuple[List[date], List[Marathon]]] = {}
+        self._by_id: Dict[str, Marathon] = {}
+
+    def _load(self) -> List[Marathon]:
+        """Читает и разбирает файл; строки с нераспознанной датой пропускаются."""
+        events = {}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                dates = parse_event_dates(row.get('Дата'))
+                if not dates:
+                    logging.warning(f"Не удалось разобрать дату марафона {row.get('Название')!r}: {row.get('Дата')!r}")
+                    continue
+                name = (row.get('Название') or '').strip()
+                event = Marathon(
+                    id=marathon_id(name, dates[0]),
+                    name=name,
+                    date_text=(row.get('Дата') or '').strip(),
+                    start_date=dates[0],
+                    end_date=dates[1],
+                    place=(row.get('Место') or '').strip(),
+                    distance_types=parse_distance_types(row.get('Тип')),
+                    type_text=(row.get('Тип') or '').strip(),
+                    site=(row.get('Сайт') or '').strip(),
+                )
+                events[event.id] = event
+        return sorted(events.values(), key=lambda event: (event.start_date, event.name))
+
+    def _refresh(self) -> None:
+        """Перечитывает каталог, если файл изменился с прошлой загрузки."""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError as e:
+            logging.error(f"Ошибка при чтении файла марафонов: {e}")
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            try:
+                events = self._load()
+            except Exception as e:
+                # Оставляем прошлую версию каталога
+                logging.error(f"Ошибка при чтении файла марафонов: {e}")
+                return
+            by_type: Dict[str, List[Marathon]] = {}
+            for event in events:
+                for distance_type in event.distance_types:
+                    by_type.setdefault(distance_type, []).append(event)
+            self._max_span = max((event.end_date - event.start_date for event in events), default=timedelta(0))
+            self._by_date = _date_index(events)
+            self._by_type = {name: _date_index(typed) for name, typed in by_type.items()}
+            self._by_id = {event.id: event for event in events}
+            self._mtime = mtime
+
+    def upcoming(self, today: Optional[date] = None, distance_type: Optional[str] = None) -> List[Marathon]:
+        """
+        Предстоящие события по дате начала.
+
+        Событие считается предстоящим до дня окончания включительно.
+
+        Args:
+            today: Текущая дата (по Москве, если не указана)
+            distance_type: Тип дистанции ("марафон", "полумарафон") или None для всех
+
+        Returns:
+            List[Marathon]: События, отсортированные по дате начала
+        """
+        self._refresh()
+        today = today or today_moscow()
+        starts, events = self._by_type.get(distance_type.lower(), ([], [])) if distance_type else self._by_date
+        # Начавшиеся многодневные события не старше самого длинного события в каталоге
+        first = bisect_left(starts, today - self._max_span)
+        return [event for event in events[first:] if event.end_date >= today]
+
+    def page(self, page: int, page_size: int = PAGE_SIZE, today: Optional[date] = None,
+             distance_type: Optional[str] = None) -> Tuple[List[Marathon], int, int]:
+        """
+        Страница предстоящих событий.
+
+        Args:
+            page: Номер страницы (с 0); номер вне диапазона приводится к ближайшей странице
+            page_size: Количество событий на странице
+            today: Текущая дата (по Москве, если не указана)
+            distance_type: Тип дистанции или None для всех
+
+        Returns:
+            Tuple: (события страницы, номер страницы, количество страниц)
+        """
+        events = self.upcoming(today, distance_type)
+        pages = max(1, -(-len(events) // page_size))
+        page = min(max(0, page), pages - 1)
+        return events[page * page_size:(page + 1) * page_size], page, pages
+
+    def get(self, event_id: str) -> Optional[Marathon]:
+        """Событие по ID или None, если его нет в каталоге."""
+        self._refresh()
+        return self._by_id.get(event_id)
+
+    def distance_types(self) -> List[str]:
+        """Типы дистанций, встречающиеся в каталоге."""
+        self._refresh()
+        return sorted(self._by_type)
+
+
+# Каталог по умолчанию
+CATALOG = MarathonCatalog()
+
 
 def get_marathons_list() -> List[Dict[str, str]]:
     """
-    Читает файл с данными о марафонах и возвращает список словарей с информацией.
-    
+    Возвращает предстоящие марафоны из каталога.
+
     Returns:
         List[Dict[str, str]]: Список марафонов с полями: Название, Дата, Место, Тип, Сайт
     """
-    marathons = []
-    csv_path = os.path.join('data', 'marathons.csv')
-    
-    try:
-        with open(csv_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                marathons.append(row)
-        return marathons
-    except Exception as e:
-        print(f"Ошибка при чтении файла марафонов: {e}")
-        return []
+    return [event.as_dict() for event in CATALOG.upcoming()]
 
 def format_marathon_info(marathon: Dict[str, str]) -> str:
     """
     Форматирует информацию о марафоне для отображения пользователю.
-    
+
     Args:
         marathon: Словарь с информацией о марафоне
-        
+
     Returns:
         str: Отформатированная строка с информацией
     """
@@ -44,20 +267,20 @@ def format_marathon_info(marathon: Dict[str, str]) -> str:
 def get_marathon_message_text() -> str:
     """
     Формирует текст сообщения со списком марафонов.
-    
+
     Returns:
         str: Текст сообщения с информацией о марафонах
     """
-    marathons = get_marathons_list()
+    marathons, _, _ = CATALOG.page(0)
     if not marathons:
-        return "К сожалению, информация о марафонах недоступна."
-    
+        return "К сожалению, информация о предстоящих марафонах недоступна."
+
     message = "📅 *Ближайшие марафоны*\n\n"
     message += "Вот список ближайших марафонов, которые могут вас заинтересовать:\n\n"
-    
-    for i, marathon in enumerate(marathons[:5], 1):  # Показываем первые 5 марафонов
-        message += f"{i}. {format_marathon_info(marathon)}\n\n"
-    
+
+    for i, marathon in enumerate(marathons, 1):
+        message += f"{i}. {format_marathon_info(marathon.as_dict())}\n\n"
+
     message += "Вы можете выбрать один из этих марафонов или указать свою дату позже."
-    
-    return message
\ No newline at end of file
+
+    return message
@@ -0,0 +1,500 @@
+"""
+Метрики процесса бота: счетчики и гистограммы в памяти.
+
+Измерения собираются в реестре процесса REGISTRY без обращения к сети или базе:
+    bot_updates_total{type}            — обновления, прошедшие дедупликацию
+    bot_handler_seconds{handler}       — обработчики python-telegram-bot
+    bot_callback_seconds{route}        — кнопки по маршруту callback_data
+    db_query_seconds{query}            — методы DBManager и других менеджеров
+    llm_call_seconds{site}             — вызовы OpenAI по месту вызова
+Для гистограмм *_seconds ошибки считаются в *_errors_total с теми же метками.
+Внутри обновления каждый замер — интервал трассы (см. tracing.py).
+
+Реестр отдается в формате Prometheus через эндпоинт живости процесса
+(/metrics, /metrics.json, см. liveness.py); app.py собирает снимки процессов
+бота и отдает их на /metrics. MetricsFlusher раз в FLUSH_INTERVAL секунд пишет
+в bot_metrics строку за интервал: обновления, ошибки и p50/p95/p99 каждой серии.
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import re
+import threading
+import time
+import urllib.request
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import psycopg2
+import psycopg2.extras
+
+from config import DB_CONFIG
+from migrations import has_capability
+from tracing import span
+
+# Границы корзин гистограмм (секунды)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+# Наибольшее число серий одной метрики; остальные метки сводятся в "other"
+MAX_SERIES = 500
+# Интервал записи в bot_metrics (секунды)
+FLUSH_INTERVAL = 60
+# Группа счетчика обновлений: после захвата update_dedup
+METRICS_GROUP = -50
+
+LabelKey = Tuple[Tuple[str, str], ...]
+OVERFLOW: LabelKey = (("series", "other"),)
+
+
+class Histogram:
+    """Число наблюдений по корзинам BUCKETS, сумма и количество."""
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def quantile(counts: List[int], q: float) -> Optional[float]:
+    """
+    Квантиль по корзинам гистограммы с линейной интерполяцией внутри корзины.
+
+    Args:
+        counts: Число наблюдений по корзинам (не накопленное)
+        q: Квантиль от 0 до 1
+
+    Returns:
+        Optional[float]: Значение квантиля или None без наблюдений
+    """
+    total = sum(counts)
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    for index, count in enumerate(counts):
+        if count and seen + count >= rank:
+            lower = BUCKETS[index - 1] if index > 0 else 0.0
+            upper = BUCKETS[index] if index < len(BUCKETS) else BUCKETS[-1]
+            return lower + (upper - lower) * (rank - seen) / count
+        seen += count
+    return BUCKETS[-1]
+
+
+def error_metric(name: str) -> str:
+    """Имя счетчика ошибок для гистограммы (bot_handler_seconds -> bot_handler_errors_total)."""
+    return re.sub(r"_seconds$", "", name) + "_errors_total"
+
+
+def span_name(name: str, labels: Dict[str, Any]) -> str:
+    """Имя интервала трассы для замера: db_query_seconds{query=DBManager.get_user_id} -> "db DBManager.get_user_id"."""
+    return " ".join([name.split("_")[0], ".".join(str(value) for value in labels.values())]).strip()
+
+
+class MetricsRegistry:
+    """Счетчики и гистограммы процесса с метками."""
+
+    def __init__(self):
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(series: Dict[Any, Any], labels: Dict[str, Any]) -> LabelKey:
+        key = tuple(sorted((name, str(value)) for name, value in labels.items()))
+        if key not in series and len(series) >= MAX_SERIES:
+            return OVERFLOW
+        return key
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        """Увеличивает счетчик."""
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            key = self._key(series, labels)
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels: Any) -> None:
+        """Добавляет наблюдение в гистограмму."""
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            key = self._key(series, labels)
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timed(self, name: str, **labels: Any) -> Iterator[None]:
+        """Измеряет длительность блока; исключение считается ошибкой."""
+        started = time.perf_counter()
+        try:
+            with span(span_name(name, labels)):
+                yield
+        except Exception:
+            self.inc(error_metric(name), **labels)
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Снимок реестра для JSON.
+
+        Returns:
+            Dict[str, Any]: counters — {имя: [[метки, значение]]},
+                histograms — {имя: [[метки, корзины, сумма, количество]]}
+        """
+        with self._lock:
+            return {
+                "counters": {name: [[dict(key), value] for key, value in series.items()]
+                             for name, series in self._counters.items()},
+                "histograms": {name: [[dict(key), list(h.counts), h.sum, h.count] for key, h in series.items()]
+                               for name, series in self._histograms.items()},
+            }
+
+
+REGISTRY = MetricsRegistry()
+
+
+def instrument(name: str, **labels: Any) -> Callable:
+    """Декоратор: измеряет длительность функции или корутины в гистограмме name."""
+
+    def decorator(func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with REGISTRY.timed(name, **labels):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with REGISTRY.timed(name, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def instrument_methods(cls: type, name: str = "db_query_seconds", label: str = "query") -> type:
+    """
+    Оборачивает публичные статические методы класса-менеджера измерением длительности.
+
+    Метка — имя запроса вида "DBManager.get_user_id".
+    """
+    for attr, value in list(vars(cls).items()):
+        if isinstance(value, staticmethod) and not attr.startswith("_"):
+            wrapped = instrument(name, **{label: f"{cls.__name__}.{attr}"})(value.__func__)
+            setattr(cls, attr, staticmethod(wrapped))
+    return cls
+
+
+def callback_route(data: Optional[str]) -> str:
+    """
+    Маршрут кнопки: callback_data без идентификаторов.
+
+    Части, содержащие цифры, заменяются на N: "complete_12_3" -> "complete_N_N".
+    """
+    if not data:
+        return "none"
+    parts = ["N" if any(char.isdigit() for char in part) else part for part in data.split("_")]
+    return "_".join(parts)[:64]
+
+
+def _handler_name(callback: Callable) -> str:
+    name = getattr(callback, "__qualname__", None) or repr(callback)
+    return name.replace(".<locals>", "")
+
+
+def _instrument_handler(handler: Any) -> None:
+    from telegram.ext import ApplicationHandlerStop, CallbackQueryHandler, ConversationHandler, TypeHandler
+
+    if isinstance(handler, ConversationHandler):
+        nested = list(handler.entry_points) + list(handler.fallbacks)
+        for state_handlers in handler.states.values():
+            nested.extend(state_handlers)
+        for inner in nested:
+            _instrument_handler(inner)
+        return
+    # TypeHandler — служебные обработчики (update_dedup, boot, счетчик обновлений)
+    if isinstance(handler, TypeHandler) or getattr(handler.callback, "__metrics__", False):
+        return
+
+    callback = handler.callback
+    name = _handler_name(callback)
+    is_button = isinstance(handler, CallbackQueryHandler)
+
+    async def timed_callback(update, context):
+        started = time.perf_counter()
+        stop = None
+        try:
+            with span(f"handler {name}"):
+                try:
+                    return await callback(update, context)
+                except ApplicationHandlerStop as e:
+                    # Остановка следующих групп — не ошибка обработчика
+                    stop = e
+            raise stop
+        except ApplicationHandlerStop:
+            raise
+        except Exception:
+            REGISTRY.inc("bot_handler_errors_total", handler=name)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            REGISTRY.observe("bot_handler_seconds", elapsed, handler=name)
+            if is_button and getattr(update, "callback_query", None):
+                REGISTRY.observe("bot_callback_seconds", elapsed, route=callback_route(update.callback_query.data))
+
+    timed_callback.__metrics__ = True
+    handler.callback = timed_callback
+
+
+def update_type(update: Any) -> str:
+    """Тип обновления Telegram: message, callback_query и т. д."""
+    from telegram import Update
+
+    return next((kind for kind in Update.ALL_TYPES if getattr(update, kind, None)), "other")
+
+
+def instrument_application(application) -> None:
+    """
+    Подключает метрики к приложению: счетчик обновлений и длительность
+    каждого обработчика (включая обработчики диалогов) и кнопки.
+    """
+    from telegram import Update
+    from telegram.ext import TypeHandler
+
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            _instrument_handler(handler)
+
+    async def count_update(update, context):
+        REGISTRY.inc("bot_updates_total", type=update_type(update))
+
+    application.add_handler(TypeHandler(Update, count_update), group=METRICS_GROUP)
+
+
+def merge_snapshots(snapshots: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Суммирует снимки нескольких процессов (обработчиков вебхука)."""
+    counters: Dict[str, Dict[LabelKey, float]] = {}
+    histograms: Dict[str, Dict[LabelKey, List[Any]]] = {}
+    for snapshot in snapshots:
+        for name, series in snapshot.get("counters", {}).items():
+            merged = counters.setdefault(name, {})
+            for labels, value in series:
+                key = tuple(sorted(labels.items()))
+                merged[key] = merged.get(key, 0) + value
+        for name, series in snapshot.get("histograms", {}).items():
+            merged = histograms.setdefault(name, {})
+            for labels, counts, total, count in series:
+                key = tuple(sorted(labels.items()))
+                if key in merged:
+                    current = merged[key]
+                    current[0] = [a + b for a, b in zip(current[0], counts)]
+                    current[1] += total
+                    current[2] += count
+                else:
+                    merged[key] = [list(counts), total, count]
+    return {
+        "counters": {name: [[dict(key), value] for key, value in series.items()] for name, series in counters.items()},
+        "histograms": {name: [[dict(key), *values] for key, values in series.items()]
+                       for name, series in histograms.items()},
+    }
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels_text(labels: Dict[str, str], extra: str = "") -> str:
+    items = [f'{name}="{_escape(value)}"' for name, value in labels.items()]
+    if extra:
+        items.append(extra)
+    return "{" + ",".join(items) + "}" if items else ""
+
+
+def render_prometheus(snapshot: Dict[str, Any]) -> str:
+    """Снимок реестра в текстовом формате Prometheus."""
+    lines = []
+    for name, series in sorted(snapshot.get("counters", {}).items()):
+        lines.append(f"# TYPE {name} counter")
+        for labels, value in series:
+            lines.append(f"{name}{_labels_text(labels)} {value:g}")
+    for name, series in sorted(snapshot.get("histograms", {}).items()):
+        lines.append(f"# TYPE {name} histogram")
+        for labels, counts, total, count in series:
+            cumulative = 0
+            for bound, bucket in zip(BUCKETS, counts):
+                cumulative += bucket
+                le = 'le="%g"' % bound
+                lines.append(f"{name}_bucket{_labels_text(labels, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{name}_bucket{_labels_text(labels, le)} {count}")
+            lines.append(f"{name}_sum{_labels_text(labels)} {total:.6f}")
+            lines.append(f"{name}_count{_labels_text(labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def fetch_snapshot(host: str, port: int, timeout: float = 2.0) -> Optional[Dict[str, Any]]:
+    """Снимок реестра процесса бота с его эндпоинта живости или None, если процесс не отвечает."""
+    try:
+        with urllib.request.urlopen(f"http://{host}:{port}/metrics.json", timeout=timeout) as response:
+            return json.loads(response.read())
+    except Exception:
+        return None
+
+
+def interval_summary(previous: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Сводка за интервал между двумя снимками реестра.
+
+    Returns:
+        Dict[str, Any]: processed_messages, errors_count и series —
+            {"имя{метки}": {count, sum, p50, p95, p99}} для серий с наблюдениями
+    """
+    def counter_values(snapshot, predicate):
+        return {(name, tuple(sorted(labels.items()))): value
+                for name, series in snapshot.get("counters", {}).items() if predicate(name)
+                for labels, value in series}
+
+    def delta(predicate):
+        before = counter_values(previous, predicate)
+        return sum(value - before.get(key, 0) for key, value in counter_values(current, predicate).items())
+
+    before = {(name, tuple(sorted(labels.items()))): (counts, count, total)
+              for name, series in previous.get("histograms", {}).items()
+              for labels, counts, total, count in series}
+    series_summary = {}
+    for name, series in current.get("histograms", {}).items():
+        for labels, counts, total, count in series:
+            key = (name, tuple(sorted(labels.items())))
+            old_counts, old_count, old_total = before.get(key, ([0] * len(counts), 0, 0.0))
+            if count == old_count:
+                continue
+            window = [a - b for a, b in zip(counts, old_counts)]
+            series_summary[f"{name}{_labels_text(labels)}"] = {
+                "count": count - old_count,
+                "sum": round(total - old_total, 6),
+                "p50": round(quantile(window, 0.50), 4),
+                "p95": round(quantile(window, 0.95), 4),
+                "p99": round(quantile(window, 0.99), 4),
+            }
+    return {
+        "processed_messages": int(delta(lambda name: name == "bot_updates_total")),
+        "errors_count": int(delta(lambda name: name.endswith("_errors_total"))),
+        "series": series_summary,
+    }
+
+
+class MetricsFlusher:
+    """
+    Периодическая запись метрик процесса в bot_metrics.
+
+    Args:
+        instance: Имя процесса (реплика или обработчик вебхука)
+        interval: Интервал записи (секунды)
+        registry: Реестр метрик
+    """
+
+    def __init__(self, instance: str, interval: float = FLUSH_INTERVAL, registry: MetricsRegistry = REGISTRY):
+        self.instance = instance
+        self.interval = interval
+        self.registry = registry
+        self.started = time.monotonic()
+        self._previous = registry.snapshot()
+        self._window_start = datetime.now()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> "MetricsFlusher":
+        self._thread = threading.Thread(target=self._run, name="metrics-flusher", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def stop(self) -> None:
+        """Останавливает запись и сохраняет последний интервал."""
+        self._stop.set()
+        self.flush()
+
+    def flush(self) -> bool:
+        """
+        Записывает интервал с прошлой записи.
+
+        Returns:
+            bool: True, если запись сохранена или записывать нечего
+        """
+        with self._lock:
+            current = self.registry.snapshot()
+            window_end = datetime.now()
+            summary = interval_summary(self._previous, current)
+            if not summary["series"] and not summary["processed_messages"]:
+                return True
+            row = {
+                "start_time": self._window_start,
+                "end_time": window_end,
+                "uptime_seconds": int(time.monotonic() - self.started),
+                "processed_messages": summary["processed_messages"],
+                "errors_count": summary["errors_count"],
+                "instance": self.instance,
+                "details": summary["series"],
+            }
+            if not BotMetricsManager.save_interval(row):
+                # Интервал не потерян: войдет в следующую запись
+                return False
+            self._previous = current
+            self._window_start = window_end
+            return True
+
+
+class BotMetricsManager:
+    """Writes metric intervals to the bot_metrics table."""
+
+    @staticmethod
+    def save_interval(row):
+        """
+        Save one metrics interval of a process.
+
+        Args:
+            row: Dictionary with start_time, end_time, uptime_seconds, processed_messages,
+                errors_count, instance and details
+
+        Returns:
+            True if successful or the table is not available, False otherwise
+        """
+        if not has_capability("bot_metrics"):
+            return True
+        conn = None
+        try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    INSERT INTO bot_metrics (start_time, end_time, uptime_seconds, processed_messages,
+                                             errors_count, instance, details)
+                    VALUES (%(start_time)s, %(end_time)s, %(uptime_seconds)s, %(processed_messages)s,
+                            %(errors_count)s, %(instance)s, %(details)s)
+                    """,
+                    {**row, "details": psycopg2.extras.Json(row["details"])}
+                )
+            conn.commit()
+            return True
+        except Exception as e:
+            logging.error(f"Error saving bot metrics: {e}")
+            return False
+        finally:
+            if conn:
+                conn.close()
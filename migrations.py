@@ -0,0 +1,1041 @@
+#!/usr/bin/env python3
+"""
+Версионные миграции схемы базы данных.
+
+Схема приводится к известной версии при деплое (`python migrations.py`),
+примененные версии хранятся в таблице schema_migrations. Код приложения не
+обращается к information_schema: доступность возможностей схемы проверяется по
+версии, которая один раз читается из schema_migrations и кэшируется в процессе.
+"""
+
+import logging
+import sys
+import threading
+from typing import List, NamedTuple, Optional
+
+import psycopg2
+
+from config import DB_CONFIG
+
+# Ключ advisory-блокировки, чтобы миграции не применялись двумя процессами одновременно
+MIGRATION_LOCK_ID = 727401
+
+
+class Migration(NamedTuple):
+    """Версия схемы и SQL, который к ней приводит."""
+    version: int
+    description: str
+    sql: str
+
+
+# Функция записи статуса дня тренировки (см. TrainingPlanManager.record_training_status).
+# Блокировка строки плана упорядочивает одновременные нажатия, а недельный объем
+# увеличивает только вызов, который завершает план.
+RECORD_TRAINING_STATUS_SQL = """
+CREATE OR REPLACE FUNCTION record_training_status(
+    p_user_id INTEGER, p_plan_id INTEGER, p_day INTEGER, p_status VARCHAR
+)
+RETURNS TABLE (
+    completed_days INTEGER[],
+    canceled_days INTEGER[],
+    total_days INTEGER,
+    total_distance DOUBLE PRECISION,
+    plan_finished BOOLEAN,
+    just_finished BOOLEAN,
+    weekly_volume TEXT,
+    weekly_volume_km DOUBLE PRECISION
+)
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_plan JSONB;
+    v_was_finished BOOLEAN;
+BEGIN
+    SELECT tp.plan_data::jsonb INTO v_plan
+    FROM training_plans tp
+    WHERE tp.id = p_plan_id AND tp.user_id = p_user_id
+    FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+
+    total_days := jsonb_array_length(COALESCE(v_plan->'training_days', '[]'::jsonb));
+
+    SELECT COUNT(DISTINCT ct.training_day) >= total_days INTO v_was_finished
+    FROM completed_trainings ct
+    WHERE ct.user_id = p_user_id AND ct.plan_id = p_plan_id
+      AND ct.training_day BETWEEN 1 AND total_days;
+
+    UPDATE completed_trainings ct
+    SET status = p_status, updated_at = CURRENT_TIMESTAMP
+    WHERE ct.user_id = p_user_id AND ct.plan_id = p_plan_id AND ct.training_day = p_day;
+    IF NOT FOUND THEN
+        INSERT INTO completed_trainings (user_id, plan_id, training_day, status)
+        VALUES (p_user_id, p_plan_id, p_day, p_status);
+    END IF;
+
+    SELECT COALESCE(array_agg(ct.training_day ORDER BY ct.training_day)
+                        FILTER (WHERE ct.status = 'completed'), '{}'),
+           COALESCE(array_agg(ct.training_day ORDER BY ct.training_day)
+                        FILTER (WHERE ct.status = 'canceled'), '{}'),
+           COUNT(DISTINCT ct.training_day) FILTER (WHERE ct.training_day BETWEEN 1 AND total_days) >= total_days
+    INTO completed_days, canceled_days, plan_finished
+    FROM completed_trainings ct
+    WHERE ct.user_id = p_user_id AND ct.plan_id = p_plan_id;
+
+    -- distance_km is written on plan save; older plans fall back to the number in the text
+    SELECT COALESCE(SUM(COALESCE(
+               (td.value->>'distance_km')::double precision,
+               replace(substring(td.value->>'distance' FROM '[0-9]+(?:[.,][0-9]+)?'), ',', '.')::double precision
+           )), 0)
+    INTO total_distance
+    FROM jsonb_array_elements(COALESCE(v_plan->'training_days', '[]'::jsonb)) WITH ORDINALITY AS td(value, num)
+    WHERE td.num = ANY(completed_days);
+
+    just_finished := plan_finished AND NOT v_was_finished;
+
+    IF just_finished THEN
+        UPDATE runner_profiles rp
+        SET weekly_volume_km = COALESCE(rp.weekly_volume_km, 0) + total_distance,
+            weekly_volume = to_char(COALESCE(rp.weekly_volume_km, 0) + total_distance, 'FM999990.0'),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE rp.user_id = p_user_id;
+    END IF;
+
+    SELECT rp.weekly_volume, rp.weekly_volume_km INTO weekly_volume, weekly_volume_km
+    FROM runner_profiles rp
+    WHERE rp.user_id = p_user_id
+    ORDER BY rp.updated_at DESC
+    LIMIT 1;
+
+    RETURN NEXT;
+END;
+$$;
+"""
+
+# Журнал тренировок только дополняется: смена статуса дня записывается отдельным
+# событием с обратными приращениями, поэтому агрегаты — это суммы по событиям.
+# Триггер поддерживает дневные и недельные агрегаты и статистику пользователя
+# при каждой вставке, rebuild_workout_rollups пересчитывает их из журнала.
+WORKOUT_EVENTS_SQL = """
+CREATE TABLE IF NOT EXISTS workout_events (
+    id BIGSERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    plan_id INTEGER REFERENCES training_plans(id),
+    training_day INTEGER,
+    event_type VARCHAR(20) NOT NULL CHECK (event_type IN ('completed', 'canceled')),
+    source VARCHAR(20) NOT NULL DEFAULT 'plan',
+    distance_km DOUBLE PRECISION NOT NULL DEFAULT 0,
+    workouts SMALLINT NOT NULL DEFAULT 0,
+    cancellations SMALLINT NOT NULL DEFAULT 0,
+    event_date DATE NOT NULL DEFAULT (NOW() AT TIME ZONE 'Europe/Moscow')::date,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_workout_events_user_date ON workout_events (user_id, event_date);
+CREATE INDEX IF NOT EXISTS idx_workout_events_plan_day ON workout_events (user_id, plan_id, training_day);
+
+CREATE TABLE IF NOT EXISTS workout_daily_rollups (
+    user_id INTEGER NOT NULL,
+    day DATE NOT NULL,
+    distance_km DOUBLE PRECISION NOT NULL DEFAULT 0,
+    workouts INTEGER NOT NULL DEFAULT 0,
+    cancellations INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day)
+);
+
+CREATE TABLE IF NOT EXISTS workout_weekly_rollups (
+    user_id INTEGER NOT NULL,
+    week_start DATE NOT NULL,
+    distance_km DOUBLE PRECISION NOT NULL DEFAULT 0,
+    workouts INTEGER NOT NULL DEFAULT 0,
+    cancellations INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, week_start)
+);
+
+CREATE TABLE IF NOT EXISTS workout_user_stats (
+    user_id INTEGER PRIMARY KEY,
+    total_distance_km DOUBLE PRECISION NOT NULL DEFAULT 0,
+    total_workouts INTEGER NOT NULL DEFAULT 0,
+    last_active_week DATE,
+    streak_weeks INTEGER NOT NULL DEFAULT 0,
+    longest_streak_weeks INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE OR REPLACE FUNCTION reject_workout_event_change()
+RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+    RAISE EXCEPTION 'workout_events is append-only';
+END;
+$$;
+
+DROP TRIGGER IF EXISTS workout_events_append_only ON workout_events;
+CREATE TRIGGER workout_events_append_only
+    BEFORE UPDATE OR DELETE ON workout_events
+    FOR EACH ROW EXECUTE FUNCTION reject_workout_event_change();
+
+DROP TRIGGER IF EXISTS workout_events_no_truncate ON workout_events;
+CREATE TRIGGER workout_events_no_truncate
+    BEFORE TRUNCATE ON workout_events
+    FOR EACH STATEMENT EXECUTE FUNCTION reject_workout_event_change();
+
+-- Recomputes the week streak of one user from the weekly rollups (gaps and islands)
+CREATE OR REPLACE FUNCTION refresh_workout_streak(p_user_id INTEGER)
+RETURNS VOID LANGUAGE plpgsql AS $$
+BEGIN
+    WITH active AS (
+        SELECT week_start,
+               week_start - (ROW_NUMBER() OVER (ORDER BY week_start) * 7)::integer AS island
+        FROM workout_weekly_rollups
+        WHERE user_id = p_user_id AND workouts > 0
+    ), runs AS (
+        SELECT COUNT(*) AS weeks, MAX(week_start) AS last_week
+        FROM active
+        GROUP BY island
+    )
+    UPDATE workout_user_stats s
+    SET last_active_week = (SELECT MAX(last_week) FROM runs),
+        streak_weeks = COALESCE((SELECT weeks FROM runs ORDER BY last_week DESC LIMIT 1), 0),
+        longest_streak_weeks = COALESCE((SELECT MAX(weeks) FROM runs), 0),
+        updated_at = NOW()
+    WHERE s.user_id = p_user_id;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION apply_workout_event()
+RETURNS TRIGGER LANGUAGE plpgsql AS $$
+DECLARE
+    v_week DATE := date_trunc('week', NEW.event_date)::date;
+    v_active_week DATE := CASE WHEN NEW.workouts > 0 THEN v_week END;
+BEGIN
+    INSERT INTO workout_daily_rollups AS r (user_id, day, distance_km, workouts, cancellations)
+    VALUES (NEW.user_id, NEW.event_date, NEW.distance_km, NEW.workouts, NEW.cancellations)
+    ON CONFLICT (user_id, day) DO UPDATE
+    SET distance_km = r.distance_km + EXCLUDED.distance_km,
+        workouts = r.workouts + EXCLUDED.workouts,
+        cancellations = r.cancellations + EXCLUDED.cancellations;
+
+    INSERT INTO workout_weekly_rollups AS r (user_id, week_start, distance_km, workouts, cancellations)
+    VALUES (NEW.user_id, v_week, NEW.distance_km, NEW.workouts, NEW.cancellations)
+    ON CONFLICT (user_id, week_start) DO UPDATE
+    SET distance_km = r.distance_km + EXCLUDED.distance_km,
+        workouts = r.workouts + EXCLUDED.workouts,
+        cancellations = r.cancellations + EXCLUDED.cancellations;
+
+    -- A workout in the next week extends the streak, a later one starts a new streak;
+    -- events dated in earlier weeks are settled by rebuild_workout_rollups
+    INSERT INTO workout_user_stats AS s (user_id, total_distance_km, total_workouts, last_active_week,
+                                         streak_weeks, longest_streak_weeks)
+    VALUES (NEW.user_id, NEW.distance_km, NEW.workouts, v_active_week,
+            CASE WHEN v_active_week IS NULL THEN 0 ELSE 1 END,
+            CASE WHEN v_active_week IS NULL THEN 0 ELSE 1 END)
+    ON CONFLICT (user_id) DO UPDATE
+    SET total_distance_km = s.total_distance_km + EXCLUDED.total_distance_km,
+        total_workouts = s.total_workouts + EXCLUDED.total_workouts,
+        streak_weeks = CASE
+            WHEN v_active_week IS NULL OR v_active_week <= s.last_active_week THEN s.streak_weeks
+            WHEN v_active_week = s.last_active_week + 7 THEN s.streak_weeks + 1
+            ELSE 1
+        END,
+        longest_streak_weeks = GREATEST(s.longest_streak_weeks, CASE
+            WHEN v_active_week IS NULL OR v_active_week <= s.last_active_week THEN s.streak_weeks
+            WHEN v_active_week = s.last_active_week + 7 THEN s.streak_weeks + 1
+            ELSE 1
+        END),
+        last_active_week = GREATEST(s.last_active_week, v_active_week),
+        updated_at = NOW();
+
+    -- A reversal can empty a week; the streak is then recomputed from the weekly rollups
+    IF NEW.workouts < 0 THEN
+        PERFORM refresh_workout_streak(NEW.user_id);
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS workout_events_rollup ON workout_events;
+CREATE TRIGGER workout_events_rollup
+    AFTER INSERT ON workout_events
+    FOR EACH ROW EXECUTE FUNCTION apply_workout_event();
+
+-- Rebuilds the rollups of one user (or of everyone) by replaying the event log
+CREATE OR REPLACE FUNCTION rebuild_workout_rollups(p_user_id INTEGER DEFAULT NULL)
+RETURNS INTEGER LANGUAGE plpgsql AS $$
+DECLARE
+    v_user INTEGER;
+    v_users INTEGER := 0;
+BEGIN
+    LOCK TABLE workout_events IN SHARE MODE;
+
+    DELETE FROM workout_daily_rollups WHERE p_user_id IS NULL OR user_id = p_user_id;
+    DELETE FROM workout_weekly_rollups WHERE p_user_id IS NULL OR user_id = p_user_id;
+    DELETE FROM workout_user_stats WHERE p_user_id IS NULL OR user_id = p_user_id;
+
+    INSERT INTO workout_daily_rollups (user_id, day, distance_km, workouts, cancellations)
+    SELECT user_id, event_date, SUM(distance_km), SUM(workouts), SUM(cancellations)
+    FROM workout_events
+    WHERE p_user_id IS NULL OR user_id = p_user_id
+    GROUP BY user_id, event_date;
+
+    INSERT INTO workout_weekly_rollups (user_id, week_start, distance_km, workouts, cancellations)
+    SELECT user_id, date_trunc('week', event_date)::date, SUM(distance_km), SUM(workouts), SUM(cancellations)
+    FROM workout_events
+    WHERE p_user_id IS NULL OR user_id = p_user_id
+    GROUP BY user_id, date_trunc('week', event_date)::date;
+
+    INSERT INTO workout_user_stats (user_id, total_distance_km, total_workouts)
+    SELECT user_id, SUM(distance_km), SUM(workouts)
+    FROM workout_events
+    WHERE p_user_id IS NULL OR user_id = p_user_id
+    GROUP BY user_id;
+
+    FOR v_user IN SELECT user_id FROM workout_user_stats WHERE p_user_id IS NULL OR user_id = p_user_id LOOP
+        PERFORM refresh_workout_streak(v_user);
+        v_users := v_users + 1;
+    END LOOP;
+    RETURN v_users;
+END;
+$$;
+
+-- Weekly volume in the profile: average distance of the active weeks among the last four.
+-- Without a single active week the runner is detraining: the stored volume is halved on
+-- each refresh, but not below 10 km (the macrocycle minimum), so continuations shrink too.
+CREATE OR REPLACE FUNCTION refresh_weekly_volume(p_user_id INTEGER)
+RETURNS DOUBLE PRECISION LANGUAGE plpgsql AS $$
+DECLARE
+    v_volume DOUBLE PRECISION;
+BEGIN
+    SELECT AVG(r.distance_km) INTO v_volume
+    FROM workout_weekly_rollups r
+    WHERE r.user_id = p_user_id
+      AND r.workouts > 0
+      AND r.week_start > date_trunc('week', NOW() AT TIME ZONE 'Europe/Moscow')::date - 28;
+    IF v_volume IS NULL THEN
+        SELECT CASE WHEN rp.weekly_volume_km > 10 THEN GREATEST(10, rp.weekly_volume_km * 0.5)
+                    ELSE rp.weekly_volume_km END
+        INTO v_volume
+        FROM runner_profiles rp
+        WHERE rp.user_id = p_user_id
+        ORDER BY rp.updated_at DESC NULLS LAST
+        LIMIT 1;
+        IF v_volume IS NULL THEN
+            RETURN NULL;
+        END IF;
+    END IF;
+
+    UPDATE runner_profiles rp
+    SET weekly_volume_km = v_volume,
+        weekly_volume = to_char(v_volume, 'FM999990.0'),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE rp.user_id = p_user_id;
+    RETURN v_volume;
+END;
+$$;
+"""
+
+# Статусы дней, записанные до появления журнала, переносятся в него одним событием
+# на день; агрегаты затем пересчитываются из журнала.
+BACKFILL_WORKOUT_EVENTS_SQL = """
+INSERT INTO workout_events (user_id, plan_id, training_day, event_type, source, distance_km,
+                            workouts, cancellations, event_date, created_at)
+SELECT ct.user_id, ct.plan_id, ct.training_day, ct.status, 'backfill',
+       CASE WHEN ct.status = 'completed' THEN COALESCE(
+           (td.value->>'distance_km')::double precision,
+           replace(substring(td.value->>'distance' FROM '[0-9]+(?:[.,][0-9]+)?'), ',', '.')::double precision,
+           0) ELSE 0 END,
+       CASE WHEN ct.status = 'completed' THEN 1 ELSE 0 END,
+       CASE WHEN ct.status = 'canceled' THEN 1 ELSE 0 END,
+       COALESCE(ct.updated_at, ct.created_at, NOW())::date,
+       COALESCE(ct.updated_at, ct.created_at, NOW())
+FROM completed_trainings ct
+JOIN training_plans tp ON tp.id = ct.plan_id
+LEFT JOIN LATERAL jsonb_array_elements(tp.plan_data->'training_days') WITH ORDINALITY AS td(value, num)
+    ON td.num = ct.training_day
+WHERE ct.status IN ('completed', 'canceled')
+  AND NOT EXISTS (SELECT 1 FROM workout_events we WHERE we.user_id = ct.user_id
+                  AND we.plan_id = ct.plan_id AND we.training_day = ct.training_day)
+ORDER BY COALESCE(ct.updated_at, ct.created_at);
+
+SELECT rebuild_workout_rollups();
+"""
+
+# Вторая версия record_training_status: каждая смена статуса дня пишется в журнал
+# тренировок. Для отметки по скриншоту передается фактическая дистанция, недельный
+# объем профиля пересчитывается из недельных агрегатов.
+RECORD_TRAINING_STATUS_V2_SQL = """
+DROP FUNCTION IF EXISTS record_training_status(INTEGER, INTEGER, INTEGER, VARCHAR);
+
+CREATE OR REPLACE FUNCTION record_training_status(
+    p_user_id INTEGER, p_plan_id INTEGER, p_day INTEGER, p_status VARCHAR,
+    p_distance_km DOUBLE PRECISION DEFAULT NULL, p_source VARCHAR DEFAULT 'plan'
+)
+RETURNS TABLE (
+    completed_days INTEGER[],
+    canceled_days INTEGER[],
+    total_days INTEGER,
+    total_distance DOUBLE PRECISION,
+    plan_finished BOOLEAN,
+    just_finished BOOLEAN,
+    weekly_volume TEXT,
+    weekly_volume_km DOUBLE PRECISION
+)
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_plan JSONB;
+    v_was_finished BOOLEAN;
+    v_previous VARCHAR;
+    v_day_distance DOUBLE PRECISION;
+    v_event_date DATE;
+BEGIN
+    SELECT tp.plan_data INTO v_plan
+    FROM training_plans tp
+    WHERE tp.id = p_plan_id AND tp.user_id = p_user_id
+    FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+
+    total_days := jsonb_array_length(COALESCE(v_plan->'training_days', '[]'::jsonb));
+
+    SELECT COUNT(DISTINCT ct.training_day) >= total_days INTO v_was_finished
+    FROM completed_trainings ct
+    WHERE ct.user_id = p_user_id AND ct.plan_id = p_plan_id
+      AND ct.training_day BETWEEN 1 AND total_days;
+
+    SELECT ct.status INTO v_previous
+    FROM completed_trainings ct
+    WHERE ct.user_id = p_user_id AND ct.plan_id = p_plan_id AND ct.training_day = p_day
+    LIMIT 1;
+
+    UPDATE completed_trainings ct
+    SET status = p_status, updated_at = CURRENT_TIMESTAMP
+    WHERE ct.user_id = p_user_id AND ct.plan_id = p_plan_id AND ct.training_day = p_day;
+    IF NOT FOUND THEN
+        INSERT INTO completed_trainings (user_id, plan_id, training_day, status)
+        VALUES (p_user_id, p_plan_id, p_day, p_status);
+    END IF;
+
+    -- Repeated taps do not change the status and are not logged
+    IF v_previous IS DISTINCT FROM p_status THEN
+        IF p_status = 'completed' THEN
+            v_day_distance := COALESCE(
+                p_distance_km,
+                (v_plan->'training_days'->(p_day - 1)->>'distance_km')::double precision,
+                replace(substring(v_plan->'training_days'->(p_day - 1)->>'distance'
+                                  FROM '[0-9]+(?:[.,][0-9]+)?'), ',', '.')::double precision,
+                0);
+            INSERT INTO workout_events (user_id, plan_id, training_day, event_type, source,
+                                        distance_km, workouts, cancellations)
+            VALUES (p_user_id, p_plan_id, p_day, 'completed', p_source, v_day_distance, 1,
+                    CASE WHEN v_previous = 'canceled' THEN -1 ELSE 0 END);
+        ELSE
+            -- Canceling a completed day reverses the distance logged for it in the
+            -- week of that workout, so earlier weekly rollups are corrected as well
+            SELECT we.distance_km, we.event_date INTO v_day_distance, v_event_date
+            FROM workout_events we
+            WHERE we.user_id = p_user_id AND we.plan_id = p_plan_id AND we.training_day = p_day
+              AND we.event_type = 'completed'
+            ORDER BY we.id DESC
+            LIMIT 1;
+            IF v_previous = 'completed' AND v_event_date IS NOT NULL THEN
+                INSERT INTO workout_events (user_id, plan_id, training_day, event_type, source,
+                                            distance_km, workouts, cancellations, event_date)
+                VALUES (p_user_id, p_plan_id, p_day, 'canceled', p_source,
+                        -v_day_distance, -1, 0, v_event_date);
+            END IF;
+            INSERT INTO workout_events (user_id, plan_id, training_day, event_type, source,
+                                        distance_km, workouts, cancellations)
+            VALUES (p_user_id, p_plan_id, p_day, 'canceled', p_source, 0, 0, 1);
+        END IF;
+        PERFORM refresh_weekly_volume(p_user_id);
+    END IF;
+
+    SELECT COALESCE(array_agg(ct.training_day ORDER BY ct.training_day)
+                        FILTER (WHERE ct.status = 'completed'), '{}'),
+           COALESCE(array_agg(ct.training_day ORDER BY ct.training_day)
+                        FILTER (WHERE ct.status = 'canceled'), '{}'),
+           COUNT(DISTINCT ct.training_day) FILTER (WHERE ct.training_day BETWEEN 1 AND total_days) >= total_days
+    INTO completed_days, canceled_days, plan_finished
+    FROM completed_trainings ct
+    WHERE ct.user_id = p_user_id AND ct.plan_id = p_plan_id;
+
+    SELECT COALESCE(SUM(COALESCE(
+               (td.value->>'distance_km')::double precision,
+               replace(substring(td.value->>'distance' FROM '[0-9]+(?:[.,][0-9]+)?'), ',', '.')::double precision
+           )), 0)
+    INTO total_distance
+    FROM jsonb_array_elements(COALESCE(v_plan->'training_days', '[]'::jsonb)) WITH ORDINALITY AS td(value, num)
+    WHERE td.num = ANY(completed_days);
+
+    just_finished := plan_finished AND NOT v_was_finished;
+
+    SELECT rp.weekly_volume, rp.weekly_volume_km INTO weekly_volume, weekly_volume_km
+    FROM runner_profiles rp
+    WHERE rp.user_id = p_user_id
+    ORDER BY rp.updated_at DESC
+    LIMIT 1;
+
+    RETURN NEXT;
+END;
+$$;
+"""
+
+# Тренировочная нагрузка (см. training_load.py). Нагрузка события — дистанция,
+# умноженная на квадрат интенсивности (комфортный темп / темп дня плана); отмена
+# вычитает ровно ту нагрузку, что была записана. Острая (7 дней) и хроническая
+# (42 дня) нагрузки — экспоненциальные средние, которые триггер обновляет при
+# каждой вставке; событие задним числом добавляется с затуханием на свой возраст.
+TRAINING_LOAD_SQL = """
+ALTER TABLE workout_events ADD COLUMN IF NOT EXISTS training_load DOUBLE PRECISION;
+
+CREATE TABLE IF NOT EXISTS training_loads (
+    user_id INTEGER PRIMARY KEY,
+    acute_load DOUBLE PRECISION NOT NULL DEFAULT 0,
+    chronic_load DOUBLE PRECISION NOT NULL DEFAULT 0,
+    load_date DATE NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- Intensity of a plan day: (comfortable pace / planned pace)^2, clamped to [0.49, 1.96]
+CREATE OR REPLACE FUNCTION workout_intensity(p_user_id INTEGER, p_plan_id INTEGER, p_day INTEGER)
+RETURNS DOUBLE PRECISION LANGUAGE plpgsql STABLE AS $$
+DECLARE
+    v_pace DOUBLE PRECISION;
+    v_comfortable DOUBLE PRECISION;
+BEGIN
+    SELECT (tp.plan_data->'training_days'->(p_day - 1)->>'pace_sec_per_km')::double precision INTO v_pace
+    FROM training_plans tp
+    WHERE tp.id = p_plan_id;
+
+    SELECT rp.comfortable_pace_sec INTO v_comfortable
+    FROM runner_profiles rp
+    WHERE rp.user_id = p_user_id
+    ORDER BY rp.updated_at DESC
+    LIMIT 1;
+
+    IF v_pace IS NULL OR v_pace <= 0 OR v_comfortable IS NULL OR v_comfortable <= 0 THEN
+        RETURN 1;
+    END IF;
+    RETURN power(LEAST(1.4, GREATEST(0.7, v_comfortable / v_pace)), 2);
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION set_workout_event_load()
+RETURNS TRIGGER LANGUAGE plpgsql AS $$
+DECLARE
+    v_load DOUBLE PRECISION;
+BEGIN
+    IF NEW.training_load IS NOT NULL THEN
+        RETURN NEW;
+    END IF;
+    IF NEW.workouts < 0 THEN
+        -- A reversal cancels exactly the load logged for the workout
+        SELECT -we.training_load INTO v_load
+        FROM workout_events we
+        WHERE we.user_id = NEW.user_id AND we.plan_id = NEW.plan_id AND we.training_day = NEW.training_day
+          AND we.workouts > 0
+        ORDER BY we.id DESC
+        LIMIT 1;
+    ELSIF NEW.workouts > 0 THEN
+        v_load := NEW.distance_km * workout_intensity(NEW.user_id, NEW.plan_id, NEW.training_day);
+    END IF;
+    NEW.training_load := COALESCE(v_load, 0);
+    RETURN NEW;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION apply_training_load(p_user_id INTEGER, p_date DATE, p_load DOUBLE PRECISION)
+RETURNS VOID LANGUAGE plpgsql AS $$
+DECLARE
+    k_acute CONSTANT DOUBLE PRECISION := exp(-1.0 / 7);
+    k_chronic CONSTANT DOUBLE PRECISION := exp(-1.0 / 42);
+BEGIN
+    INSERT INTO training_loads AS t (user_id, acute_load, chronic_load, load_date)
+    VALUES (p_user_id, p_load * (1 - k_acute), p_load * (1 - k_chronic), p_date)
+    ON CONFLICT (user_id) DO UPDATE
+    SET acute_load = CASE WHEN p_date >= t.load_date
+            THEN t.acute_load * power(k_acute, p_date - t.load_date) + p_load * (1 - k_acute)
+            ELSE t.acute_load + p_load * (1 - k_acute) * power(k_acute, t.load_date - p_date) END,
+        chronic_load = CASE WHEN p_date >= t.load_date
+            THEN t.chronic_load * power(k_chronic, p_date - t.load_date) + p_load * (1 - k_chronic)
+            ELSE t.chronic_load + p_load * (1 - k_chronic) * power(k_chronic, t.load_date - p_date) END,
+        load_date = GREATEST(t.load_date, p_date),
+        updated_at = NOW();
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION apply_workout_event_load()
+RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+    IF NEW.training_load <> 0 THEN
+        PERFORM apply_training_load(NEW.user_id, NEW.event_date, NEW.training_load);
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS workout_events_set_load ON workout_events;
+CREATE TRIGGER workout_events_set_load
+    BEFORE INSERT ON workout_events
+    FOR EACH ROW EXECUTE FUNCTION set_workout_event_load();
+
+DROP TRIGGER IF EXISTS workout_events_training_load ON workout_events;
+CREATE TRIGGER workout_events_training_load
+    AFTER INSERT ON workout_events
+    FOR EACH ROW EXECUTE FUNCTION apply_workout_event_load();
+
+-- Loads of the events logged so far; the log is append-only, so the guard is lifted
+-- for this one derived column
+ALTER TABLE workout_events DISABLE TRIGGER workout_events_append_only;
+UPDATE workout_events
+SET training_load = distance_km * workout_intensity(user_id, plan_id, training_day)
+WHERE training_load IS NULL;
+ALTER TABLE workout_events ENABLE TRIGGER workout_events_append_only;
+
+INSERT INTO training_loads (user_id, acute_load, chronic_load, load_date)
+SELECT we.user_id,
+       SUM(we.training_load * (1 - exp(-1.0 / 7)) * power(exp(-1.0 / 7), last.day - we.event_date)),
+       SUM(we.training_load * (1 - exp(-1.0 / 42)) * power(exp(-1.0 / 42), last.day - we.event_date)),
+       last.day
+FROM workout_events we
+JOIN (SELECT user_id, MAX(event_date) AS day FROM workout_events GROUP BY user_id) last
+    ON last.user_id = we.user_id
+GROUP BY we.user_id, last.day
+ON CONFLICT (user_id) DO NOTHING;
+"""
+
+# Рассылки: кампания с аудиторией и состояние доставки каждому получателю
+# (см. broadcast.py). Получатель переходит pending -> sending -> sent/failed/blocked;
+# строки, оставшиеся в sending после сбоя, возвращаются в pending при следующем запуске.
+BROADCAST_SQL = """
+CREATE TABLE IF NOT EXISTS broadcast_campaigns (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(100) UNIQUE NOT NULL,
+    audience VARCHAR(50) NOT NULL,
+    audience_params JSONB NOT NULL DEFAULT '{}'::jsonb,
+    message TEXT NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'draft',
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS broadcast_deliveries (
+    campaign_id INTEGER NOT NULL REFERENCES broadcast_campaigns(id) ON DELETE CASCADE,
+    user_id INTEGER NOT NULL,
+    telegram_id BIGINT NOT NULL,
+    first_name VARCHAR(255),
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    attempts SMALLINT NOT NULL DEFAULT 0,
+    error TEXT,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (campaign_id, user_id)
+);
+
+-- Only unfinished deliveries are scanned when claiming a batch
+CREATE INDEX IF NOT EXISTS idx_broadcast_deliveries_open
+    ON broadcast_deliveries (campaign_id, status, user_id)
+    WHERE status IN ('pending', 'sending');
+"""
+
+# Обработанные обновления Telegram (см. update_dedup.py). Обновление захватывается
+# перед обработкой и отмечается завершенным после нее; незавершенный захват
+# старше срока аренды считается брошенным упавшим процессом.
+PROCESSED_UPDATES_SQL = """
+CREATE TABLE IF NOT EXISTS processed_updates (
+    update_id BIGINT PRIMARY KEY,
+    claimed_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    completed_at TIMESTAMP
+);
+
+-- Old rows are pruned by claim time
+CREATE INDEX IF NOT EXISTS idx_processed_updates_claimed ON processed_updates (claimed_at);
+"""
+
+BOT_PERSISTENCE_SQL = """
+CREATE TABLE IF NOT EXISTS bot_user_data (
+    user_id BIGINT PRIMARY KEY,
+    data JSONB NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- conversation_key is the JSON array of the ConversationHandler key
+CREATE TABLE IF NOT EXISTS bot_conversations (
+    name TEXT NOT NULL,
+    conversation_key TEXT NOT NULL,
+    state JSONB NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (name, conversation_key)
+);
+"""
+
+BOT_METRICS_SQL = """
+CREATE TABLE IF NOT EXISTS bot_metrics (
+    id SERIAL PRIMARY KEY,
+    start_time TIMESTAMP NOT NULL DEFAULT NOW(),
+    end_time TIMESTAMP,
+    uptime_seconds INTEGER,
+    processed_messages INTEGER DEFAULT 0,
+    errors_count INTEGER DEFAULT 0
+);
+
+-- One row per process and flush interval; details holds count, sum and p50/p95/p99 per series
+ALTER TABLE bot_metrics ADD COLUMN IF NOT EXISTS instance TEXT;
+ALTER TABLE bot_metrics ADD COLUMN IF NOT EXISTS details JSONB;
+CREATE INDEX IF NOT EXISTS idx_bot_metrics_start ON bot_metrics (start_time);
+"""
+
+# Длительность пробежек, распознанная по скриншоту (см. workout_log.py): по недавним
+# пробежкам pace_calculator оценивает текущий уровень бегуна. Журнал workout_events
+# только дополняется, поэтому длительность хранится отдельно, по дню плана.
+WORKOUT_DURATIONS_SQL = """
+CREATE TABLE IF NOT EXISTS workout_durations (
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    plan_id INTEGER NOT NULL REFERENCES training_plans(id),
+    training_day INTEGER NOT NULL,
+    distance_km DOUBLE PRECISION NOT NULL,
+    duration_seconds INTEGER NOT NULL,
+    workout_date DATE NOT NULL DEFAULT (NOW() AT TIME ZONE 'Europe/Moscow')::date,
+    PRIMARY KEY (user_id, plan_id, training_day)
+);
+CREATE INDEX IF NOT EXISTS idx_workout_durations_user_date ON workout_durations (user_id, workout_date);
+"""
+
+_NUMBER_PATTERN = r"[0-9]+(?:[.,][0-9]+)?"
+_RANGE_PATTERN = r"([0-9]+(?:[.,][0-9]+)?)\s*[-–—]\s*([0-9]+(?:[.,][0-9]+)?)"
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "baseline schema used by DBManager and TrainingPlanManager", """
+        CREATE TABLE IF NOT EXISTS users (
+            id SERIAL PRIMARY KEY,
+            telegram_id BIGINT UNIQUE NOT NULL,
+            username VARCHAR(255),
+            first_name VARCHAR(255),
+            last_name VARCHAR(255),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE IF NOT EXISTS runner_profiles (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            distance VARCHAR(50),
+            competition_date VARCHAR(50),
+            gender VARCHAR(20),
+            age VARCHAR(20),
+            height VARCHAR(20),
+            weight VARCHAR(20),
+            experience VARCHAR(100),
+            goal VARCHAR(255),
+            target_time VARCHAR(50),
+            fitness_level VARCHAR(100),
+            comfortable_pace VARCHAR(50),
+            weekly_volume VARCHAR(50),
+            training_start_date VARCHAR(50),
+            training_days_per_week VARCHAR(20),
+            preferred_training_days VARCHAR(255),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE IF NOT EXISTS user_payments (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            payment_agreed BOOLEAN DEFAULT FALSE,
+            payment_date TIMESTAMP,
+            expiry_date TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE IF NOT EXISTS training_plans (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            plan_name VARCHAR(255),
+            plan_description TEXT,
+            plan_data TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE IF NOT EXISTS completed_trainings (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            plan_id INTEGER NOT NULL REFERENCES training_plans(id),
+            training_day INTEGER NOT NULL,
+            status VARCHAR(20) NOT NULL DEFAULT 'completed',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """),
+    Migration(2, "training_plans.updated_at", """
+        ALTER TABLE training_plans ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+    """),
+    Migration(3, "numeric unit columns in runner_profiles", f"""
+        ALTER TABLE runner_profiles
+            ADD COLUMN IF NOT EXISTS weekly_volume_km REAL,
+            ADD COLUMN IF NOT EXISTS comfortable_pace_sec INTEGER,
+            ADD COLUMN IF NOT EXISTS goal_distance_km REAL;
+        UPDATE runner_profiles SET weekly_volume_km = CASE
+            WHEN weekly_volume::text ~ '{_RANGE_PATTERN}' THEN (
+                replace((regexp_match(weekly_volume::text, '{_RANGE_PATTERN}'))[1], ',', '.')::real
+                + replace((regexp_match(weekly_volume::text, '{_RANGE_PATTERN}'))[2], ',', '.')::real) / 2
+            ELSE replace((regexp_match(weekly_volume::text, '{_NUMBER_PATTERN}'))[1], ',', '.')::real
+        END
+        WHERE weekly_volume_km IS NULL;
+        UPDATE runner_profiles SET comfortable_pace_sec =
+            (regexp_match(comfortable_pace::text, '([0-9]{{1,2}}):([0-9]{{2}})'))[1]::integer * 60
+            + (regexp_match(comfortable_pace::text, '([0-9]{{1,2}}):([0-9]{{2}})'))[2]::integer
+        WHERE comfortable_pace_sec IS NULL;
+        UPDATE runner_profiles SET goal_distance_km =
+            replace((regexp_match(distance::text, '{_NUMBER_PATTERN}'))[1], ',', '.')::real
+        WHERE goal_distance_km IS NULL;
+    """),
+    Migration(4, "plan_continuation_drafts", """
+        CREATE TABLE IF NOT EXISTS plan_continuation_drafts (
+            user_id INTEGER NOT NULL,
+            plan_id INTEGER NOT NULL,
+            fingerprint VARCHAR(64) NOT NULL,
+            plan_data TEXT NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (user_id, plan_id)
+        );
+    """),
+    Migration(5, "training_macrocycles", """
+        CREATE TABLE IF NOT EXISTS training_macrocycles (
+            profile_id INTEGER PRIMARY KEY,
+            race_date VARCHAR(20) NOT NULL,
+            distance REAL NOT NULL,
+            skeleton TEXT NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT NOW()
+        );
+    """),
+    # Таблицы, созданные models.create_tables, могли хранить объем числом;
+    # record_training_status и refresh_weekly_volume записывают в weekly_volume текст
+    Migration(6, "record_training_status function", """
+        ALTER TABLE runner_profiles ALTER COLUMN weekly_volume TYPE VARCHAR(50) USING weekly_volume::text;
+    """ + RECORD_TRAINING_STATUS_SQL),
+    Migration(7, "indexes for hot queries", """
+        DO $$
+        BEGIN
+            -- users.telegram_id is UNIQUE in the baseline, but older databases may lack the index
+            IF NOT EXISTS (
+                SELECT 1 FROM pg_index i
+                JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+                WHERE i.indrelid = 'users'::regclass AND a.attname = 'telegram_id'
+            ) THEN
+                CREATE INDEX idx_users_telegram_id ON users (telegram_id);
+            END IF;
+        END
+        $$;
+        CREATE INDEX IF NOT EXISTS idx_runner_profiles_user_updated
+            ON runner_profiles (user_id, updated_at DESC) INCLUDE (weekly_volume, weekly_volume_km);
+        CREATE INDEX IF NOT EXISTS idx_user_payments_user_updated
+            ON user_payments (user_id, updated_at DESC) INCLUDE (payment_agreed, expiry_date);
+        CREATE INDEX IF NOT EXISTS idx_training_plans_user_created
+            ON training_plans (user_id, created_at DESC);
+        CREATE INDEX IF NOT EXISTS idx_completed_trainings_plan_status
+            ON completed_trainings (user_id, plan_id, status, training_day);
+        CREATE INDEX IF NOT EXISTS idx_completed_trainings_plan_day
+            ON completed_trainings (user_id, plan_id, training_day) INCLUDE (status);
+        ANALYZE users, runner_profiles, user_payments, training_plans, completed_trainings;
+    """),
+    # Старые строки с текстом, который не разбирается как JSON, прервали бы приведение типа:
+    # такие планы переносятся в training_plans_quarantine и заменяются пустым планом
+    Migration(8, "training_plans.plan_data as jsonb", """
+        CREATE TABLE IF NOT EXISTS training_plans_quarantine (
+            plan_id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            plan_data TEXT NOT NULL,
+            error TEXT,
+            quarantined_at TIMESTAMP NOT NULL DEFAULT NOW()
+        );
+        DO $$
+        DECLARE
+            r RECORD;
+        BEGIN
+            FOR r IN SELECT id, user_id, plan_data::text AS plan_data FROM training_plans LOOP
+                BEGIN
+                    PERFORM r.plan_data::jsonb;
+                EXCEPTION WHEN others THEN
+                    INSERT INTO training_plans_quarantine (plan_id, user_id, plan_data, error)
+                    VALUES (r.id, r.user_id, r.plan_data, SQLERRM)
+                    ON CONFLICT (plan_id) DO NOTHING;
+                    UPDATE training_plans SET plan_data = '{"training_days": []}' WHERE id = r.id;
+                    RAISE WARNING 'training plan % quarantined: %', r.id, SQLERRM;
+                END;
+            END LOOP;
+        END
+        $$;
+        ALTER TABLE training_plans ALTER COLUMN plan_data TYPE JSONB USING plan_data::jsonb;
+        CREATE INDEX IF NOT EXISTS idx_training_plans_session_dates
+            ON training_plans USING GIN (jsonb_path_query_array(plan_data, '$.training_days[*].date'));
+    """),
+    Migration(9, "workout event log and rollups", WORKOUT_EVENTS_SQL + RECORD_TRAINING_STATUS_V2_SQL),
+    Migration(10, "backfill workout events from training statuses", BACKFILL_WORKOUT_EVENTS_SQL),
+    Migration(11, "training load on workout events", TRAINING_LOAD_SQL),
+    Migration(12, "workout durations from screenshots", WORKOUT_DURATIONS_SQL),
+    Migration(13, "broadcast campaigns and deliveries", BROADCAST_SQL),
+    Migration(14, "processed telegram updates", PROCESSED_UPDATES_SQL),
+    Migration(15, "bot user data and conversation states", BOT_PERSISTENCE_SQL),
+    Migration(16, "bot_metrics intervals per process", BOT_METRICS_SQL),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+# Возможности схемы и версия, начиная с которой они доступны
+SCHEMA_CAPABILITIES = {
+    "training_plans.updated_at": 2,
+    "runner_profiles.unit_columns": 3,
+    "plan_continuation_drafts": 4,
+    "training_macrocycles": 5,
+    "record_training_status": 6,
+    "runner_profiles.weekly_volume_text": 6,
+    "training_plans.jsonb": 8,
+    "workout_events": 9,
+    "training_loads": 11,
+    "workout_durations": 12,
+    "broadcast_campaigns": 13,
+    "processed_updates": 14,
+    "bot_persistence": 15,
+    "bot_metrics": 16,
+}
+
+_schema_version: Optional[int] = None
+_version_lock = threading.Lock()
+
+
+def _read_version(conn) -> int:
+    """Читает текущую версию схемы (0, если миграции еще не применялись)."""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT to_regclass('schema_migrations') IS NOT NULL")
+        if not cursor.fetchone()[0]:
+            return 0
+        cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+        return cursor.fetchone()[0]
+
+
+def run_migrations(conn=None) -> int:
+    """
+    Применяет все недостающие миграции по порядку.
+
+    Каждая миграция выполняется в отдельной транзакции вместе с записью в
+    schema_migrations. Одновременный запуск из нескольких процессов упорядочен
+    advisory-блокировкой.
+
+    Args:
+        conn: Открытое соединение (по умолчанию создается новое)
+
+    Returns:
+        int: Версия схемы после применения миграций
+    """
+    global _schema_version
+    own_connection = conn is None
+    if own_connection:
+        conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+            try:
+                cursor.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS schema_migrations (
+                        version INTEGER PRIMARY KEY,
+                        description TEXT NOT NULL,
+                        applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+                    )
+                    """
+                )
+                conn.commit()
+
+                cursor.execute("SELECT version FROM schema_migrations")
+                applied = {row[0] for row in cursor.fetchall()}
+                for migration in MIGRATIONS:
+                    if migration.version in applied:
+                        continue
+                    logging.info(f"Применяем миграцию {migration.version}: {migration.description}")
+                    try:
+                        cursor.execute(migration.sql)
+                        cursor.execute(
+                            "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                            (migration.version, migration.description)
+                        )
+                        conn.commit()
+                    except Exception:
+                        conn.rollback()
+                        raise
+            finally:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+                conn.commit()
+
+        version = _read_version(conn)
+        with _version_lock:
+            _schema_version = version
+        logging.info(f"Схема базы данных в версии {version}")
+        return version
+    finally:
+        if own_connection:
+            conn.close()
+
+
+def get_schema_version(refresh: bool = False) -> int:
+    """
+    Возвращает версию схемы; значение читается один раз и кэшируется в процессе.
+
+    Args:
+        refresh: Перечитать версию из базы данных
+
+    Returns:
+        int: Версия схемы (0 при ошибке базы данных)
+    """
+    global _schema_version
+    with _version_lock:
+        if _schema_version is not None and not refresh:
+            return _schema_version
+        conn = None
+        try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            _schema_version = _read_version(conn)
+        except Exception as e:
+            logging.error(f"Ошибка при чтении версии схемы: {e}")
+            return 0
+        finally:
+            if conn:
+                conn.close()
+        return _schema_version
+
+
+def has_capability(name: str) -> bool:
+    """Проверяет по кэшированной версии схемы, доступна ли возможность схемы."""
+    return get_schema_version() >= SCHEMA_CAPABILITIES[name]
+
+
+def ensure_schema() -> bool:
+    """
+    Проверяет версию схемы при запуске и применяет недостающие миграции.
+
+    При штатном деплое миграции уже применены, и проверка сводится к одному
+    запросу к schema_migrations.
+
+    Returns:
+        bool: True, если схема в последней версии
+    """
+    try:
+        if get_schema_version(refresh=True) >= LATEST_VERSION:
+            return True
+        logging.warning(f"Схема базы данных устарела, применяем миграции до версии {LATEST_VERSION}")
+        return run_migrations() >= LATEST_VERSION
+    except Exception as e:
+        logging.error(f"Ошибка при применении миграций: {e}")
+        return False
+
+
+def main():
+    """Применяет миграции при деплое."""
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    try:
+        version = run_migrations()
+    except Exception as e:
+        logging.error(f"Миграции не применены: {e}")
+        return 1
+    print(f"Схема базы данных в версии {version}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,19 +2,20 @@
 Модели базы данных для приложения.
 """
 from app import db
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, Float, ForeignKey
+from sqlalchemy import BigInteger, Column, Date, Integer, SmallInteger, String, Text, DateTime, Boolean, Float, ForeignKey
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
 from datetime import datetime
 
-# Эта функция больше не используется, оставлена для совместимости с существующим кодом
 def create_tables():
     """
-    ВНИМАНИЕ: Эта функция устарела и оставлена только для обратной совместимости.
-    Вместо нее следует использовать db.create_all() с контекстом приложения Flask.
+    Приводит схему базы данных к последней версии.
+
+    Схема описывается миграциями в migrations.py; модели ниже повторяют ее для
+    веб-приложения и не используются для создания таблиц.
     """
-    import logging
-    logging.warning("Функция create_tables() устарела, используйте db.create_all() в контексте приложения Flask")
-    return False
+    from migrations import ensure_schema
+    return ensure_schema()
 
 # Функция для форматирования даты
 def format_date(date_obj):
@@ -36,7 +37,7 @@ class User(db.Model):
     __tablename__ = 'users'
     
     id = Column(Integer, primary_key=True)
-    telegram_id = Column(Integer, unique=True, nullable=False)
+    telegram_id = Column(BigInteger, unique=True, nullable=False)
     username = Column(String(255))
     first_name = Column(String(255))
     last_name = Column(String(255))
@@ -53,20 +54,23 @@ class RunnerProfile(db.Model):
     
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
-    distance = Column(Float)  # Дистанция забега
-    competition_date = Column(DateTime)  # Дата соревнования
-    gender = Column(String(10))  # Пол
-    age = Column(Integer)  # Возраст
-    height = Column(Float)  # Рост
-    weight = Column(Float)  # Вес
-    experience = Column(String(50))  # Опыт бега
+    distance = Column(String(50))  # Дистанция забега
+    competition_date = Column(String(50))  # Дата соревнования
+    gender = Column(String(20))  # Пол
+    age = Column(String(20))  # Возраст
+    height = Column(String(20))  # Рост
+    weight = Column(String(20))  # Вес
+    experience = Column(String(100))  # Опыт бега
     goal = Column(String(255))  # Цель тренировок
-    target_time = Column(String(20))  # Целевое время
-    fitness_level = Column(String(50))  # Уровень физической подготовки
-    comfortable_pace = Column(String(20))  # Комфортный пэйс для бега с разговором
-    weekly_volume = Column(Float, default=0)  # Еженедельный объем бега (км)
-    training_start_date = Column(DateTime)  # Дата начала тренировок
-    training_days_per_week = Column(Integer)  # Кол-во тренировочных дней в неделю
+    target_time = Column(String(50))  # Целевое время
+    fitness_level = Column(String(100))  # Уровень физической подготовки
+    comfortable_pace = Column(String(50))  # Комфортный пэйс для бега с разговором
+    weekly_volume = Column(String(50))  # Еженедельный объем бега в виде текста
+    weekly_volume_km = Column(Float)  # Еженедельный объем, разобранный в число
+    comfortable_pace_sec = Column(Integer)  # Комфортный темп, секунд на км
+    goal_distance_km = Column(Float)  # Дистанция цели, км
+    training_start_date = Column(String(50))  # Дата начала тренировок
+    training_days_per_week = Column(String(20))  # Кол-во тренировочных дней в неделю
     preferred_training_days = Column(String(255))  # Предпочитаемые дни для тренировок
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
@@ -75,19 +79,20 @@ class RunnerProfile(db.Model):
         return f"<RunnerProfile {self.id}: User {self.user_id}, Distance {self.distance}km>"
 
 
-class PaymentStatus(db.Model):
+class UserPayment(db.Model):
     """Таблица статуса оплаты."""
-    __tablename__ = 'payment_statuses'
+    __tablename__ = 'user_payments'
     
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey('users.id'), nullable=False, unique=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     payment_agreed = Column(Boolean, default=False)
-    subscription_end_date = Column(DateTime)
+    payment_date = Column(DateTime)
+    expiry_date = Column(DateTime)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
     def __repr__(self):
-        return f"<PaymentStatus {self.id}: User {self.user_id}, Agreed: {self.payment_agreed}>"
+        return f"<UserPayment {self.id}: User {self.user_id}, Agreed: {self.payment_agreed}>"
 
 
 class TrainingPlan(db.Model):
@@ -96,37 +101,173 @@ class TrainingPlan(db.Model):
     
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
-    plan_data = Column(Text)  # JSON-данные плана
+    plan_name = Column(String(255))
+    plan_description = Column(Text)
+    plan_data = Column(JSONB, nullable=False)  # JSON-данные плана
     created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now())
     
     def __repr__(self):
         return f"<TrainingPlan {self.id}: User {self.user_id}>"
 
 
-class TrainingCompletion(db.Model):
-    """Таблица выполненных тренировок."""
-    __tablename__ = 'training_completions'
+class CompletedTraining(db.Model):
+    """Таблица статусов дней плана (выполнено или отменено)."""
+    __tablename__ = 'completed_trainings'
     
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
-    training_id = Column(String(100), nullable=False)  # ID тренировки в плане
-    completed_at = Column(DateTime, default=func.now())
+    plan_id = Column(Integer, ForeignKey('training_plans.id'), nullable=False)
+    training_day = Column(Integer, nullable=False)  # Номер дня в плане
+    status = Column(String(20), nullable=False, default='completed')  # completed или canceled
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now())
     
     def __repr__(self):
-        return f"<TrainingCompletion {self.id}: User {self.user_id}, Training {self.training_id}>"
+        return f"<CompletedTraining {self.id}: Plan {self.plan_id}, Day {self.training_day}, {self.status}>"
 
 
-class TrainingCancellation(db.Model):
-    """Таблица отмененных тренировок."""
-    __tablename__ = 'training_cancellations'
+class PlanContinuationDraft(db.Model):
+    """Таблица заранее сгенерированных продолжений планов."""
+    __tablename__ = 'plan_continuation_drafts'
     
-    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, primary_key=True)
+    plan_id = Column(Integer, primary_key=True)
+    fingerprint = Column(String(64), nullable=False)
+    plan_data = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=func.now())
+    
+    def __repr__(self):
+        return f"<PlanContinuationDraft: User {self.user_id}, Plan {self.plan_id}>"
+
+
+class TrainingMacrocycle(db.Model):
+    """Таблица макроциклов подготовки к старту."""
+    __tablename__ = 'training_macrocycles'
+    
+    profile_id = Column(Integer, primary_key=True)
+    race_date = Column(String(20), nullable=False)
+    distance = Column(Float, nullable=False)
+    skeleton = Column(Text, nullable=False)  # JSON-скелет макроцикла
+    created_at = Column(DateTime, nullable=False, default=func.now())
+    
+    def __repr__(self):
+        return f"<TrainingMacrocycle: Profile {self.profile_id}, Race {self.race_date}>"
+
+
+class WorkoutEvent(db.Model):
+    """Журнал тренировок (только дополняется, изменения — обратными событиями)."""
+    __tablename__ = 'workout_events'
+    
+    id = Column(BigInteger, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
-    training_id = Column(String(100), nullable=False)  # ID тренировки в плане
-    cancelled_at = Column(DateTime, default=func.now())
+    plan_id = Column(Integer, ForeignKey('training_plans.id'))
+    training_day = Column(Integer)
+    event_type = Column(String(20), nullable=False)  # completed, canceled
+    source = Column(String(20), nullable=False, default='plan')  # plan, screenshot, backfill
+    distance_km = Column(Float, nullable=False, default=0)
+    workouts = Column(SmallInteger, nullable=False, default=0)
+    cancellations = Column(SmallInteger, nullable=False, default=0)
+    training_load = Column(Float)  # заполняется триггером при вставке
+    event_date = Column(Date, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=func.now())
+    
+    def __repr__(self):
+        return f"<WorkoutEvent {self.id}: User {self.user_id}, {self.event_type}>"
+
+
+class WorkoutDailyRollup(db.Model):
+    """Дневные агрегаты журнала тренировок (поддерживаются триггером)."""
+    __tablename__ = 'workout_daily_rollups'
+    
+    user_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    distance_km = Column(Float, nullable=False, default=0)
+    workouts = Column(Integer, nullable=False, default=0)
+    cancellations = Column(Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<WorkoutDailyRollup: User {self.user_id}, {self.day}>"
+
+
+class WorkoutWeeklyRollup(db.Model):
+    """Недельные агрегаты журнала тренировок (поддерживаются триггером)."""
+    __tablename__ = 'workout_weekly_rollups'
+    
+    user_id = Column(Integer, primary_key=True)
+    week_start = Column(Date, primary_key=True)
+    distance_km = Column(Float, nullable=False, default=0)
+    workouts = Column(Integer, nullable=False, default=0)
+    cancellations = Column(Integer, nullable=False, default=0)
     
     def __repr__(self):
-        return f"<TrainingCancellation {self.id}: User {self.user_id}, Training {self.training_id}>"
+        return f"<WorkoutWeeklyRollup: User {self.user_id}, {self.week_start}>"
+
+
+class WorkoutUserStats(db.Model):
+    """Итоги и серии недель пользователя по журналу тренировок."""
+    __tablename__ = 'workout_user_stats'
+    
+    user_id = Column(Integer, primary_key=True)
+    total_distance_km = Column(Float, nullable=False, default=0)
+    total_workouts = Column(Integer, nullable=False, default=0)
+    last_active_week = Column(Date)
+    streak_weeks = Column(Integer, nullable=False, default=0)
+    longest_streak_weeks = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False, default=func.now())
+    
+    def __repr__(self):
+        return f"<WorkoutUserStats: User {self.user_id}, {self.streak_weeks} weeks>"
+
+
+class TrainingLoad(db.Model):
+    """Острая и хроническая тренировочная нагрузка пользователя (поддерживается триггером)."""
+    __tablename__ = 'training_loads'
+    
+    user_id = Column(Integer, primary_key=True)
+    acute_load = Column(Float, nullable=False, default=0)
+    chronic_load = Column(Float, nullable=False, default=0)
+    load_date = Column(Date, nullable=False)
+    updated_at = Column(DateTime, nullable=False, default=func.now())
+    
+    def __repr__(self):
+        return f"<TrainingLoad: User {self.user_id}, ATL {self.acute_load:.1f}, CTL {self.chronic_load:.1f}>"
+
+
+class BroadcastCampaign(db.Model):
+    """Кампания рассылки: текст сообщения и аудитория (см. broadcast.py)."""
+    __tablename__ = 'broadcast_campaigns'
+    
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100), unique=True, nullable=False)
+    audience = Column(String(50), nullable=False)
+    audience_params = Column(JSONB, nullable=False, default=dict)
+    message = Column(Text, nullable=False)
+    status = Column(String(20), nullable=False, default='draft')
+    created_at = Column(DateTime, nullable=False, default=func.now())
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    
+    def __repr__(self):
+        return f"<BroadcastCampaign {self.id}: {self.name} ({self.status})>"
+
+
+class BroadcastDelivery(db.Model):
+    """Состояние доставки рассылки одному получателю."""
+    __tablename__ = 'broadcast_deliveries'
+    
+    campaign_id = Column(Integer, ForeignKey('broadcast_campaigns.id', ondelete='CASCADE'), primary_key=True)
+    user_id = Column(Integer, primary_key=True)
+    telegram_id = Column(BigInteger, nullable=False)
+    first_name = Column(String(255))
+    status = Column(String(20), nullable=False, default='pending')
+    attempts = Column(SmallInteger, nullable=False, default=0)
+    error = Column(Text)
+    updated_at = Column(DateTime, nullable=False, default=func.now())
+    
+    def __repr__(self):
+        return f"<BroadcastDelivery: Campaign {self.campaign_id}, User {self.user_id}, {self.status}>"
+
 
 class BotMetrics(db.Model):
     """Таблица метрик работы бота."""
@@ -138,6 +279,9 @@ class BotMetrics(db.Model):
     uptime_seconds = Column(Integer)
     processed_messages = Column(Integer, default=0)
     errors_count = Column(Integer, default=0)
+    # Процесс и сводка серий метрик за интервал (count, sum, p50/p95/p99), см. metrics.py
+    instance = Column(Text)
+    details = Column(JSONB)
     
     def __repr__(self):
         return f"<BotMetrics {self.id}: Start {self.start_time}>"
\ No newline at end of file
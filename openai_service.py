@@ -1,8 +1,19 @@
 import os
 import json
 import logging
+from datetime import timedelta
 from openai import OpenAI
 
+from config import ADJUST_PLAN_REWORD_DESCRIPTIONS
+from macrocycle import plan_continuation_from_macrocycle
+from metrics import REGISTRY
+from pace_calculator import apply_pace_zones, pace_profile
+from plan_adjuster import adjust_plan_locally, reword_changed_days
+from plan_validator import repair_plan
+from training_calendar import schedule_for_profile
+from training_load import format_load_summary, limits_increase
+from workout_log import recent_performances
+
 # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
 # do not change this unless explicitly requested by the user
 MODEL = "gpt-4o"
@@ -30,182 +41,27 @@ class OpenAIService:
         try:
             logging.info(f"Начинаем генерацию плана тренировок для пользователя с профилем: {runner_profile}")
             
+            # Pace zones and race predictions are calculated locally, once per plan
+            paces = pace_profile(runner_profile, recent_performances(runner_profile))
+            
             # Prepare prompt with runner profile information
-            prompt = self._create_prompt(runner_profile)
+            prompt = self._create_prompt(runner_profile, paces)
             logging.info(f"Создан промпт для OpenAI: {prompt[:100]}...")
             
             # Получаем даты для тренировок, учитывая выбранную пользователем дату начала
-            from datetime import datetime, timedelta
-            import pytz
-            
-            # Используем Московское время (UTC+3)
-            moscow_tz = pytz.timezone('Europe/Moscow')
-            
-            # Проверяем, указал ли пользователь дату начала тренировок
-            user_start_date = runner_profile.get('training_start_date_text', runner_profile.get('training_start_date', None))
-            
-            # Попытка распарсить дату начала тренировок
-            start_date = None
-            
-            if user_start_date and user_start_date.lower() != 'сегодня' and user_start_date.lower() != 'не знаю':
-                try:
-                    # Попробуем распарсить дату в формате "ДД.ММ.ГГГГ"
-                    logging.info(f"Пытаемся распарсить дату начала тренировок: {user_start_date}")
-                    
-                    # Обрабатываем несколько возможных форматов
-                    formats = ["%d.%m.%Y", "%Y-%m-%d", "%d/%m/%Y", "%d.%m"]
-                    
-                    for fmt in formats:
-                        try:
-                            if fmt == "%d.%m":
-                                # Для формата без года добавляем текущий год
-                                current_year = datetime.now().year
-                                date_with_year = f"{user_start_date}.{current_year}"
-                                start_date = datetime.strptime(date_with_year, "%d.%m.%Y")
-                            else:
-                                start_date = datetime.strptime(user_start_date, fmt)
-                            
-                            start_date = moscow_tz.localize(start_date)
-                            logging.info(f"Успешно распарсили дату: {start_date.strftime('%d.%m.%Y')}")
-                            break
-                        except ValueError:
-                            continue
-                except Exception as e:
-                    logging.error(f"Ошибка при парсинге даты начала тренировок: {e}")
-            
-            # Если не удалось распарсить дату или она не была указана, используем текущую дату
-            if not start_date:
-                start_date = datetime.now(pytz.UTC).astimezone(moscow_tz)
-                logging.info(f"Используем текущую дату: {start_date.strftime('%d.%m.%Y')}")
-            
-            logging.info(f"Дата начала тренировок: {start_date.strftime('%d.%m.%Y %H:%M:%S')}")
-            
-            # Получаем предпочитаемые дни тренировок
-            preferred_days_str = runner_profile.get('preferred_training_days', '')
-            preferred_days = []
-            
-            if preferred_days_str:
-                # Словарь для преобразования сокращений дней недели в числа (0 - понедельник, 6 - воскресенье)
-                day_name_to_number = {
-                    'пн': 0, 'вт': 1, 'ср': 2, 'чт': 3, 'пт': 4, 'сб': 5, 'вс': 6,
-                    'понедельник': 0, 'вторник': 1, 'среда': 2, 'четверг': 3, 
-                    'пятница': 4, 'суббота': 5, 'воскресенье': 6
-                }
-                
-                # Разбиваем строку предпочитаемых дней и преобразуем в числа
-                for day in preferred_days_str.lower().split(','):
-                    day = day.strip()
-                    if day in day_name_to_number:
-                        preferred_days.append(day_name_to_number[day])
-            
-            logging.info(f"Предпочитаемые дни недели: {preferred_days}")
-            
-            # Если предпочитаемые дни не указаны, используем все дни недели
-            if not preferred_days:
-                preferred_days = list(range(7))  # 0 - понедельник, 6 - воскресенье
-            
-            # Количество тренировочных дней в неделю (по умолчанию 3)
-            training_days_count = int(runner_profile.get('training_days_per_week', 3))
-            
-            # Убедимся, что у нас достаточно дней для тренировок
-            if len(preferred_days) < training_days_count:
-                logging.warning(f"Недостаточно предпочитаемых дней ({len(preferred_days)}) для требуемого количества тренировок ({training_days_count}). Добавляем дополнительные дни.")
-                for i in range(7):
-                    if i not in preferred_days:
-                        preferred_days.append(i)
-                        if len(preferred_days) >= training_days_count:
-                            break
-            
-            # Если указано больше предпочитаемых дней, чем нужно для тренировок, используем первые N дней
-            if len(preferred_days) > training_days_count:
-                preferred_days = preferred_days[:training_days_count]
-            
-            # Сортируем дни недели, чтобы они шли по порядку
-            preferred_days.sort()
-            
-            logging.info(f"Отсортированные предпочитаемые дни недели: {preferred_days}")
-            
-            # Определяем ближайшие даты для тренировок с учетом предпочитаемых дней недели
-            training_dates = []
-            current_date = start_date
-            
-            # Проверяем, если стартовая дата раньше текущей даты, используем текущую
-            now = datetime.now(pytz.UTC).astimezone(moscow_tz)
-            if current_date.date() < now.date():
-                current_date = now
-                logging.warning(f"Стартовая дата в прошлом, используем текущую: {current_date.strftime('%d.%m.%Y')}")
-            
-            # Получаем день недели для стартовой даты (0 - понедельник, 6 - воскресенье)
-            start_weekday = current_date.weekday()
-            logging.info(f"День недели стартовой даты: {start_weekday} ({current_date.strftime('%A')})")
-            
-            # Находим первый подходящий день для начала тренировок
-            days_to_add = 0
-            if preferred_days:
-                # Ищем ближайший предпочитаемый день недели, начиная со стартовой даты
-                min_days_to_add = float('inf')
-                for day in preferred_days:
-                    # Вычисляем, сколько дней нужно добавить к стартовой дате
-                    if day >= start_weekday:
-                        days = day - start_weekday
-                    else:
-                        days = 7 - start_weekday + day
-                    
-                    if days < min_days_to_add:
-                        min_days_to_add = days
-                
-                days_to_add = min_days_to_add
-            
-            # Добавляем дни к стартовой дате, чтобы получить первый день тренировки
-            first_training_date = current_date + timedelta(days=days_to_add)
-            logging.info(f"Первый день тренировки: {first_training_date.strftime('%d.%m.%Y (%A)')}")
-            
-            # Генерируем даты для всех тренировочных дней
-            training_day_counter = 0
-            date_to_check = first_training_date
-            
-            while training_day_counter < training_days_count:
-                weekday = date_to_check.weekday()
-                
-                if weekday in preferred_days:
-                    training_dates.append(date_to_check)
-                    training_day_counter += 1
-                    logging.info(f"Добавлена дата тренировки: {date_to_check.strftime('%d.%m.%Y (%A)')}")
-                
-                date_to_check = date_to_check + timedelta(days=1)
-            
-            # Преобразуем даты в строки формата "ДД.ММ.YYYY" для использования в плане
-            dates = [date.strftime("%d.%m.%Y") for date in training_dates]
+            schedule = schedule_for_profile(runner_profile)
+            dates = schedule.date_strings
             
             # Для промпта OpenAI используем первый день тренировки
             first_day_str = dates[0]
             # Если есть второй день тренировки, используем его, иначе используем день после первого
-            second_day_str = dates[1] if len(dates) > 1 else (training_dates[0] + timedelta(days=1)).strftime("%d.%m.%Y")
+            second_day_str = dates[1] if len(dates) > 1 else (schedule.first_date + timedelta(days=1)).strftime("%d.%m.%Y")
             
             logging.info(f"Сгенерированные даты для плана: {dates}")
             logging.info(f"Первый день: {first_day_str}, второй день: {second_day_str}")
             
-            # Преобразуем числовые дни недели в названия для промпта
-            day_number_to_name = {
-                0: "Понедельник (Пн)", 
-                1: "Вторник (Вт)", 
-                2: "Среда (Ср)", 
-                3: "Четверг (Чт)", 
-                4: "Пятница (Пт)", 
-                5: "Суббота (Сб)", 
-                6: "Воскресенье (Вс)"
-            }
-            
-            preferred_days_names = [day_number_to_name[day] for day in preferred_days]
-            preferred_days_text = ", ".join(preferred_days_names)
-            
-            # Получаем словарь дат тренировок с днями недели
-            training_dates_with_weekdays = {}
-            for date in training_dates:
-                weekday_num = date.weekday()
-                weekday_name = day_number_to_name[weekday_num]
-                date_str = date.strftime("%d.%m.%Y")
-                training_dates_with_weekdays[date_str] = weekday_name
+            preferred_days_text = ", ".join(schedule.weekday_names(with_short=True))
+            training_dates_with_weekdays = schedule.dates_with_weekdays(with_short=True)
             
             # Форматируем информацию о датах тренировок для промпта
             training_dates_info = "\n".join([f"- {date}: {weekday}" for date, weekday in training_dates_with_weekdays.items()])
@@ -213,30 +69,31 @@ class OpenAIService:
             # Call OpenAI API
             logging.info("Отправляем запрос к OpenAI API")
             try:
-                response = self.client.chat.completions.create(
-                    model=MODEL,
-                    messages=[
-                        {"role": "system", "content": 
-                         f"Ты опытный беговой тренер. Твоя задача - создать персонализированный план "
-                         f"тренировок для бегуна, используя ТОЛЬКО указанные даты в точном соответствии с предпочтениями пользователя.\n\n"
-                         f"Пользователь выбрал следующие предпочитаемые дни недели для тренировок: {preferred_days_text}.\n"
-                         f"На основе этого выбора и указанной даты начала тренировок, были определены следующие даты тренировок:\n{training_dates_info}\n\n"
-                         f"ВАЖНО: План тренировок должен включать ТОЛЬКО ЭТИ ДАТЫ и ДНИ НЕДЕЛИ. "
-                         f"НЕ ДОБАВЛЯЙ дополнительные дни тренировок кроме указанных выше дат.\n\n"
-                         f"План должен быть структурирован строго по этим дням недели с указанными датами.\n\n"
-                         f"Каждый день в плане должен обязательно содержать: день недели (например, 'Вторник'), "
-                         f"дату в формате ДД.ММ.YYYY (например, '07.05.2025'), тип тренировки, дистанцию, целевой темп "
-                         f"и детальное описание тренировки.\n\n"
-                         f"План должен включать все важные компоненты тренировочного процесса: длительные пробежки, интервальные тренировки, "
-                         f"темповые тренировки и восстановительные пробежки, в зависимости от цели и уровня подготовки бегуна.\n\n"
-                         f"Учитывай цель бегуна, его физическую подготовку и еженедельный объем.\n\n"
-                         f"Отвечай только в указанном JSON формате на русском языке."
-                        },
-                        {"role": "user", "content": prompt}
-                    ],
-                    response_format={"type": "json_object"},
-                    temperature=0.7
-                )
+                with REGISTRY.timed("llm_call_seconds", site="openai_service.generate_training_plan"):
+                    response = self.client.chat.completions.create(
+                        model=MODEL,
+                        messages=[
+                            {"role": "system", "content": 
+                             f"Ты опытный беговой тренер. Твоя задача - создать персонализированный план "
+                             f"тренировок для бегуна, используя ТОЛЬКО указанные даты в точном соответствии с предпочтениями пользователя.\n\n"
+                             f"Пользователь выбрал следующие предпочитаемые дни недели для тренировок: {preferred_days_text}.\n"
+                             f"На основе этого выбора и указанной даты начала тренировок, были определены следующие даты тренировок:\n{training_dates_info}\n\n"
+                             f"ВАЖНО: План тренировок должен включать ТОЛЬКО ЭТИ ДАТЫ и ДНИ НЕДЕЛИ. "
+                             f"НЕ ДОБАВЛЯЙ дополнительные дни тренировок кроме указанных выше дат.\n\n"
+                             f"План должен быть структурирован строго по этим дням недели с указанными датами.\n\n"
+                             f"Каждый день в плане должен обязательно содержать: день недели (например, 'Вторник'), "
+                             f"дату в формате ДД.ММ.YYYY (например, '07.05.2025'), тип тренировки, дистанцию, целевой темп "
+                             f"и детальное описание тренировки.\n\n"
+                             f"План должен включать все важные компоненты тренировочного процесса: длительные пробежки, интервальные тренировки, "
+                             f"темповые тренировки и восстановительные пробежки, в зависимости от цели и уровня подготовки бегуна.\n\n"
+                             f"Учитывай цель бегуна, его физическую подготовку и еженедельный объем.\n\n"
+                             f"Отвечай только в указанном JSON формате на русском языке."
+                            },
+                            {"role": "user", "content": prompt}
+                        ],
+                        response_format={"type": "json_object"},
+                        temperature=0.7
+                    )
                 logging.info("Получен ответ от OpenAI API")
             except Exception as api_error:
                 logging.error(f"Ошибка при вызове OpenAI API: {api_error}")
@@ -250,18 +107,24 @@ class OpenAIService:
                 logging.error(f"Ошибка при парсинге JSON от OpenAI: {json_error}")
                 logging.error(f"Полученный ответ: {response.choices[0].message.content}")
                 raise
-            return plan_json
+            
+            # Проверяем план и исправляем дефекты локально, не генерируя план заново;
+            # темп дней заполняется и проверяется по зонам бегуна
+            plan = repair_plan(plan_json, self.client, MODEL, expected_dates=dates)
+            apply_pace_zones(plan, paces)
+            return plan
             
         except Exception as e:
             logging.error(f"Error generating training plan: {e}")
             raise
     
-    def _create_prompt(self, profile):
+    def _create_prompt(self, profile, paces):
         """
         Create a prompt for OpenAI API based on runner profile.
         
         Args:
             profile: Dictionary containing runner profile information
+            paces: Pace zones and race predictions (pace_calculator.pace_profile)
             
         Returns:
             String prompt
@@ -289,7 +152,8 @@ class OpenAIService:
             
         prompt += (
             f"- Комфортный темп бега: {profile.get('comfortable_pace', 'Неизвестно')}\n"
-            f"- Еженедельный объем бега: {profile.get('weekly_volume_text', profile.get('weekly_volume', 'Неизвестно'))} км\n\n"
+            f"- Еженедельный объем бега: {profile.get('weekly_volume_text', profile.get('weekly_volume', 'Неизвестно'))} км\n"
+            f"{paces.format_for_prompt() if paces else ''}\n"
             "План должен включать разнообразные тренировки (длительные, темповые, интервальные, восстановительные) "
             "с учетом уровня подготовки бегуна.\n\n"
             "Для каждого дня недели укажи:\n"
@@ -318,21 +182,38 @@ class OpenAIService:
         
         return prompt
         
-    def adjust_training_plan(self, runner_profile, current_plan, completed_day_num, planned_distance, actual_distance):
+    def adjust_training_plan(self, runner_profile, current_plan, completed_day_num, planned_distance, actual_distance,
+                             processed_days=None, training_load=None):
         """
         Adjust the current training plan based on the significant difference between
         planned and actual distances.
         
+        The remaining unprocessed days are rescaled locally by plan_adjuster; the whole
+        plan is sent to OpenAI only if the local adjustment fails.
+        
         Args:
             runner_profile: Dictionary containing runner profile information
             current_plan: Dictionary containing the current training plan
             completed_day_num: The day number (1-based index) that was just completed
             planned_distance: The planned distance for the completed training
             actual_distance: The actual distance that was run
+            processed_days: Day numbers that are already completed or canceled
+            training_load: Training load summary (training_load.load_summary)
             
         Returns:
             Dictionary containing the adjusted training plan
         """
+        try:
+            adjusted_plan, changed_days = adjust_plan_locally(
+                current_plan, completed_day_num, planned_distance, actual_distance, processed_days,
+                training_load=training_load
+            )
+            if ADJUST_PLAN_REWORD_DESCRIPTIONS:
+                adjusted_plan = reword_changed_days(self.client, MODEL, adjusted_plan, changed_days)
+            return adjusted_plan
+        except Exception as e:
+            logging.error(f"Ошибка локальной корректировки плана, используем OpenAI: {e}")
+        
         try:
             # Calculate the difference percentage
             if planned_distance > 0:
@@ -357,7 +238,8 @@ class OpenAIService:
                 f"- Целевое время: {runner_profile.get('target_time', 'Не указано')}\n"
                 f"- Уровень физической подготовки: {runner_profile.get('fitness', 'Не указано')}\n"
                 f"- Комфортный темп бега: {runner_profile.get('comfortable_pace', 'Не указано')}\n"
-                f"- Еженедельный объем бега: {runner_profile.get('weekly_volume', 'Не указано')} км\n\n"
+                f"- Еженедельный объем бега: {runner_profile.get('weekly_volume', 'Не указано')} км\n"
+                f"{format_load_summary(training_load)}\n"
                 
                 f"Текущий план тренировок:\n{json.dumps(current_plan, ensure_ascii=False, indent=2)}\n\n"
                 
@@ -373,25 +255,30 @@ class OpenAIService:
             )
             
             # Call OpenAI API
-            response = self.client.chat.completions.create(
-                model=MODEL,
-                messages=[
-                    {"role": "system", "content": "Ты опытный тренер по бегу, который составляет персонализированные планы тренировок."},
-                    {"role": "user", "content": prompt}
-                ],
-                response_format={"type": "json_object"},
-                temperature=0.7
-            )
+            with REGISTRY.timed("llm_call_seconds", site="openai_service.adjust_training_plan"):
+                response = self.client.chat.completions.create(
+                    model=MODEL,
+                    messages=[
+                        {"role": "system", "content": "Ты опытный тренер по бегу, который составляет персонализированные планы тренировок."},
+                        {"role": "user", "content": prompt}
+                    ],
+                    response_format={"type": "json_object"},
+                    temperature=0.7
+                )
             
             # Parse response
             adjusted_plan = json.loads(response.choices[0].message.content)
             
-            return adjusted_plan
+            # Даты и количество дней корректируемого плана должны остаться прежними
+            current_dates = [day.get('date', '') for day in current_plan.get('training_days', [])]
+            return repair_plan(adjusted_plan, self.client, MODEL,
+                               expected_dates=current_dates if all(current_dates) else None)
         except Exception as e:
             logging.error(f"Error adjusting training plan: {e}")
             return None
     
-    def generate_training_plan_continuation(self, runner_profile, completed_distances, current_plan):
+    def generate_training_plan_continuation(self, runner_profile, completed_distances, current_plan,
+                                            training_load=None):
         """
         Generate a continuation of an existing running training plan based on runner profile
         and completed trainings.
@@ -400,6 +287,7 @@ class OpenAIService:
             runner_profile: Dictionary containing runner profile information
             completed_distances: Total distance in km completed in previous plan
             current_plan: Dictionary containing the current training plan
+            training_load: Training load summary (training_load.load_summary)
             
         Returns:
             Dictionary containing a new training plan for 7 days
@@ -410,6 +298,16 @@ class OpenAIService:
             logging.info(f"Completed distances: {completed_distances} km")
             logging.info(f"Current plan: {current_plan.get('id', 'Unknown')}")
             
+            # Если в профиле есть дата соревнования, неделя строится из макроцикла без запроса к модели
+            try:
+                plan = plan_continuation_from_macrocycle(runner_profile, current_plan, completed_distances,
+                                                         training_load=training_load)
+                if plan:
+                    logging.info(f"Продолжение плана построено из макроцикла (неделя {plan['macrocycle_week']})")
+                    return plan
+            except Exception as e:
+                logging.error(f"Ошибка при построении недели из макроцикла: {e}")
+            
             # Проверяем, как быстро пользователь выполнил предыдущий план
             from datetime import datetime, timedelta
             
@@ -458,6 +356,9 @@ class OpenAIService:
             except Exception as e:
                 logging.warning(f"Error checking plan completion timing: {e}")
             
+            # Зоны темпа и прогнозы рассчитываются локально
+            paces = pace_profile(runner_profile, recent_performances(runner_profile))
+            
             # Создаем основную информацию о профиле
             profile_info = f"""Создай продолжение плана беговых тренировок на 7 дней для бегуна со следующим профилем:
 
@@ -479,14 +380,15 @@ class OpenAIService:
             # Добавляем комфортный темп и недельный объем
             profile_info += f"""- Комфортный темп бега: {runner_profile.get('comfortable_pace', 'Неизвестно')}
 - Еженедельный объем бега: {runner_profile.get('weekly_volume', 'Неизвестно')} км
-
+{paces.format_for_prompt() if paces else ''}{format_load_summary(training_load)}
 - Бегун успешно выполнил предыдущий план тренировок за {days_passed} дней и пробежал в общей сложности {completed_distances:.1f} км.
 
 ВАЖНО: Этот план является ПРОДОЛЖЕНИЕМ предыдущего! Учитывай рост физической подготовки и повышение выносливости бегуна. Увеличь нагрузку и интенсивность тренировок по сравнению с предыдущим планом.
 """
             
-            # Если пользователь выполнил план очень быстро, делаем план еще более интенсивным
-            if rapid_completion:
+            # Если пользователь выполнил план очень быстро, делаем план еще более интенсивным,
+            # но не при накопленной усталости
+            if rapid_completion and not limits_increase(training_load):
                 profile_info += f"""
 ОЧЕНЬ ВАЖНО: Бегун выполнил предыдущий план чрезвычайно быстро (всего за {days_passed} дней)!
 Это однозначно указывает на то, что его физическая форма значительно лучше ожидаемой.
@@ -549,176 +451,18 @@ class OpenAIService:
             # Объединяем все части подсказки
             prompt = profile_info + training_summary + instructions
             
-            # Получаем даты для тренировок
-            import pytz
-            
-            # Используем Московское время (UTC+3)
-            moscow_tz = pytz.timezone('Europe/Moscow')
-            
-            # Проверяем, указал ли пользователь дату начала тренировок в профиле
-            user_start_date = runner_profile.get('training_start_date_text', runner_profile.get('training_start_date', None))
-            
-            # Попытка распарсить дату начала тренировок
-            start_date = None
-            
-            if user_start_date and user_start_date.lower() != 'сегодня' and user_start_date.lower() != 'не знаю':
-                try:
-                    # Попробуем распарсить дату в формате "ДД.ММ.ГГГГ"
-                    logging.info(f"Продолжение плана - пытаемся распарсить дату начала: {user_start_date}")
-                    
-                    # Обрабатываем несколько возможных форматов
-                    formats = ["%d.%m.%Y", "%Y-%m-%d", "%d/%m/%Y", "%d.%m"]
-                    
-                    for fmt in formats:
-                        try:
-                            if fmt == "%d.%m":
-                                # Для формата без года добавляем текущий год
-                                current_year = datetime.now().year
-                                date_with_year = f"{user_start_date}.{current_year}"
-                                start_date = datetime.strptime(date_with_year, "%d.%m.%Y")
-                            else:
-                                start_date = datetime.strptime(user_start_date, fmt)
-                            
-                            start_date = moscow_tz.localize(start_date)
-                            logging.info(f"Успешно распарсили дату продолжения: {start_date.strftime('%d.%m.%Y')}")
-                            break
-                        except ValueError:
-                            continue
-                except Exception as e:
-                    logging.error(f"Ошибка при парсинге даты начала продолжения: {e}")
-            
-            # Если не удалось распарсить дату или она не была указана, используем текущую дату
-            if not start_date:
-                start_date = datetime.now(pytz.UTC).astimezone(moscow_tz)
-                logging.info(f"Используем текущую дату для продолжения: {start_date.strftime('%d.%m.%Y')}")
-            
-            logging.info(f"Дата начала продолжения плана: {start_date.strftime('%d.%m.%Y %H:%M:%S')}")
-            
-            # Получаем предпочитаемые дни тренировок
-            preferred_days_str = runner_profile.get('preferred_training_days', '')
-            preferred_days = []
-            
-            if preferred_days_str:
-                # Словарь для преобразования сокращений дней недели в числа (0 - понедельник, 6 - воскресенье)
-                day_name_to_number = {
-                    'пн': 0, 'вт': 1, 'ср': 2, 'чт': 3, 'пт': 4, 'сб': 5, 'вс': 6,
-                    'понедельник': 0, 'вторник': 1, 'среда': 2, 'четверг': 3, 
-                    'пятница': 4, 'суббота': 5, 'воскресенье': 6
-                }
-                
-                # Разбиваем строку предпочитаемых дней и преобразуем в числа
-                for day in preferred_days_str.lower().split(','):
-                    day = day.strip()
-                    if day in day_name_to_number:
-                        preferred_days.append(day_name_to_number[day])
-            
-            logging.info(f"Предпочитаемые дни недели для продолжения: {preferred_days}")
-            
-            # Если предпочитаемые дни не указаны, используем все дни недели
-            if not preferred_days:
-                preferred_days = list(range(7))  # 0 - понедельник, 6 - воскресенье
-            
-            # Количество тренировочных дней в неделю (по умолчанию 3)
-            training_days_count = int(runner_profile.get('training_days_per_week', 3))
-            
-            # Убедимся, что у нас достаточно дней для тренировок
-            if len(preferred_days) < training_days_count:
-                logging.warning(f"Недостаточно предпочитаемых дней ({len(preferred_days)}) для требуемого количества тренировок ({training_days_count}). Добавляем дополнительные дни.")
-                for i in range(7):
-                    if i not in preferred_days:
-                        preferred_days.append(i)
-                        if len(preferred_days) >= training_days_count:
-                            break
-            
-            # Если указано больше предпочитаемых дней, чем нужно для тренировок, используем все указанные дни
-            # НЕ сокращаем список, потому что это продолжение плана
-            
-            # Сортируем дни недели, чтобы они шли по порядку
-            preferred_days.sort()
-            
-            logging.info(f"Отсортированные предпочитаемые дни недели для продолжения: {preferred_days}")
-            
-            # Определяем ближайшие даты для тренировок с учетом предпочитаемых дней недели
-            training_dates = []
-            current_date = start_date
-            
-            # Проверяем, если стартовая дата раньше текущей даты, используем текущую
-            now = datetime.now(pytz.UTC).astimezone(moscow_tz)
-            if current_date.date() < now.date():
-                current_date = now
-                logging.warning(f"Стартовая дата в прошлом, используем текущую: {current_date.strftime('%d.%m.%Y')}")
-            
-            # Получаем день недели для стартовой даты (0 - понедельник, 6 - воскресенье)
-            start_weekday = current_date.weekday()
-            logging.info(f"День недели стартовой даты продолжения: {start_weekday} ({current_date.strftime('%A')})")
-            
-            # Находим первый подходящий день для начала тренировок
-            days_to_add = 0
-            if preferred_days:
-                # Ищем ближайший предпочитаемый день недели, начиная со стартовой даты
-                min_days_to_add = float('inf')
-                for day in preferred_days:
-                    # Вычисляем, сколько дней нужно добавить к стартовой дате
-                    if day >= start_weekday:
-                        days = day - start_weekday
-                    else:
-                        days = 7 - start_weekday + day
-                    
-                    if days < min_days_to_add:
-                        min_days_to_add = days
-                
-                days_to_add = min_days_to_add
-            
-            # Добавляем дни к стартовой дате, чтобы получить первый день тренировки
-            first_training_date = current_date + timedelta(days=days_to_add)
-            logging.info(f"Первый день продолжения тренировки: {first_training_date.strftime('%d.%m.%Y (%A)')}")
-            
-            # Генерируем даты для всех тренировочных дней
-            training_day_counter = 0
-            date_to_check = first_training_date
-            
-            while training_day_counter < training_days_count:
-                weekday = date_to_check.weekday()
-                
-                if weekday in preferred_days:
-                    training_dates.append(date_to_check)
-                    training_day_counter += 1
-                    logging.info(f"Добавлена дата продолжения тренировки: {date_to_check.strftime('%d.%m.%Y (%A)')}")
-                
-                date_to_check = date_to_check + timedelta(days=1)
-            
-            # Преобразуем даты в строки формата "ДД.ММ.YYYY" для использования в плане
-            dates = [date.strftime("%d.%m.%Y") for date in training_dates]
-            
-            # Преобразуем числовые дни недели в названия для промпта
-            day_number_to_name = {
-                0: "Понедельник (Пн)", 
-                1: "Вторник (Вт)", 
-                2: "Среда (Ср)", 
-                3: "Четверг (Чт)", 
-                4: "Пятница (Пт)", 
-                5: "Суббота (Сб)", 
-                6: "Воскресенье (Вс)"
-            }
-            
-            preferred_days_names = [day_number_to_name[day] for day in preferred_days]
-            preferred_days_text = ", ".join(preferred_days_names)
-            
-            # Получаем словарь дат тренировок с днями недели
-            training_dates_with_weekdays = {}
-            for date in training_dates:
-                weekday_num = date.weekday()
-                weekday_name = day_number_to_name[weekday_num]
-                date_str = date.strftime("%d.%m.%Y")
-                training_dates_with_weekdays[date_str] = weekday_name
-            
-            # Форматируем информацию о датах тренировок для промпта
+            # Получаем даты для тренировок с учетом даты начала и предпочитаемых дней;
+            # список дней НЕ сокращаем, потому что это продолжение плана
+            schedule = schedule_for_profile(runner_profile, continuation=True)
+            dates = schedule.date_strings
+            preferred_days_text = ", ".join(schedule.weekday_names(with_short=True))
+            training_dates_with_weekdays = schedule.dates_with_weekdays(with_short=True)
             training_dates_info = "\n".join([f"- {date}: {weekday}" for date, weekday in training_dates_with_weekdays.items()])
             
             # Для промпта OpenAI используем первый день тренировки
-            first_day_str = dates[0] if dates else start_date.strftime("%d.%m.%Y")
+            first_day_str = dates[0]
             # Если есть второй день тренировки, используем его, иначе используем день после первого
-            second_day_str = dates[1] if len(dates) > 1 else (training_dates[0] + timedelta(days=1)).strftime("%d.%m.%Y") if training_dates else (start_date + timedelta(days=1)).strftime("%d.%m.%Y")
+            second_day_str = dates[1] if len(dates) > 1 else (schedule.first_date + timedelta(days=1)).strftime("%d.%m.%Y")
             
             logging.info(f"Сгенерированные даты для продолжения плана: {dates}")
             logging.info(f"Первый день: {first_day_str}, второй день: {second_day_str}")
@@ -726,37 +470,40 @@ class OpenAIService:
             # Вызываем API OpenAI
             logging.info("Calling OpenAI API for plan continuation")
             try:
-                response = self.client.chat.completions.create(
-                    model=MODEL,
-                    messages=[
-                        {"role": "system", "content": 
-                         f"Ты опытный беговой тренер. Твоя задача - создать продолжение персонализированного плана "
-                         f"тренировок для бегуна, используя ТОЛЬКО указанные даты в точном соответствии с предпочтениями пользователя.\n\n"
-                         f"Пользователь выбрал следующие предпочитаемые дни недели для тренировок: {preferred_days_text}.\n"
-                         f"На основе этого выбора и указанной даты начала тренировок, были определены следующие даты тренировок:\n{training_dates_info}\n\n"
-                         f"ВАЖНО: План тренировок должен включать ТОЛЬКО ЭТИ ДАТЫ и ДНИ НЕДЕЛИ. "
-                         f"НЕ ДОБАВЛЯЙ дополнительные дни тренировок кроме указанных выше дат.\n\n"
-                         f"План должен быть структурирован строго по этим дням недели с указанными датами.\n\n"
-                         f"Каждый день в плане должен обязательно содержать: день недели (например, 'Вторник'), "
-                         f"дату в формате ДД.ММ.YYYY (например, '07.05.2025'), тип тренировки, дистанцию, целевой темп "
-                         f"и детальное описание тренировки.\n\n"
-                         f"Учитывай, что бегун стал сильнее после завершения предыдущего плана, поэтому новый план должен "
-                         f"быть более интенсивным, с увеличенным километражем и сложностью.\n\n"
-                         f"Отвечай только в указанном JSON формате на русском языке."
-                        },
-                        {"role": "user", "content": prompt}
-                    ],
-                    response_format={"type": "json_object"},
-                    temperature=0.7
-                )
+                with REGISTRY.timed("llm_call_seconds", site="openai_service.generate_training_plan_continuation"):
+                    response = self.client.chat.completions.create(
+                        model=MODEL,
+                        messages=[
+                            {"role": "system", "content": 
+                             f"Ты опытный беговой тренер. Твоя задача - создать продолжение персонализированного плана "
+                             f"тренировок для бегуна, используя ТОЛЬКО указанные даты в точном соответствии с предпочтениями пользователя.\n\n"
+                             f"Пользователь выбрал следующие предпочитаемые дни недели для тренировок: {preferred_days_text}.\n"
+                             f"На основе этого выбора и указанной даты начала тренировок, были определены следующие даты тренировок:\n{training_dates_info}\n\n"
+                             f"ВАЖНО: План тренировок должен включать ТОЛЬКО ЭТИ ДАТЫ и ДНИ НЕДЕЛИ. "
+                             f"НЕ ДОБАВЛЯЙ дополнительные дни тренировок кроме указанных выше дат.\n\n"
+                             f"План должен быть структурирован строго по этим дням недели с указанными датами.\n\n"
+                             f"Каждый день в плане должен обязательно содержать: день недели (например, 'Вторник'), "
+                             f"дату в формате ДД.ММ.YYYY (например, '07.05.2025'), тип тренировки, дистанцию, целевой темп "
+                             f"и детальное описание тренировки.\n\n"
+                             f"Учитывай, что бегун стал сильнее после завершения предыдущего плана, поэтому новый план должен "
+                             f"быть более интенсивным, с увеличенным километражем и сложностью.\n\n"
+                             f"Отвечай только в указанном JSON формате на русском языке."
+                            },
+                            {"role": "user", "content": prompt}
+                        ],
+                        response_format={"type": "json_object"},
+                        temperature=0.7
+                    )
                 logging.info("OpenAI API response received successfully")
             except Exception as e:
                 logging.error(f"Error calling OpenAI API: {e}")
                 raise
             
-            # Разбираем и возвращаем ответ
+            # Разбираем ответ и проверяем план; темп дней проверяется по зонам бегуна
             plan_json = json.loads(response.choices[0].message.content)
-            return plan_json
+            plan = repair_plan(plan_json, self.client, MODEL, expected_dates=dates)
+            apply_pace_zones(plan, paces)
+            return plan
             
         except Exception as e:
             logging.error(f"Error generating training plan continuation: {e}")
@@ -0,0 +1,319 @@
+"""
+Локальный расчет прогноза результатов и зон темпа по VDOT (формулы Дэниелса).
+
+Уровень бегуна (VDOT) определяется по целевому времени, комфортному темпу и
+недавним пробежкам; по нему из заранее рассчитанных таблиц берутся прогнозы на
+стандартные дистанции и зоны темпа (легкий, длительный, темповой, интервальный).
+Для нестандартной дистанции прогноз пересчитывается от ближайшей стандартной по
+формуле Ригеля. Модели передаются только готовые зоны, а темп в плане
+заполняется и проверяется локально (apply_pace_zones); у дней отдыха темпа нет.
+"""
+
+import math
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from plan_validator import is_rest_text
+from units import format_pace, parse_duration_seconds, parse_pace_seconds, profile_distance_km, profile_pace_seconds
+
+# Сетка VDOT для таблиц
+VDOT_GRID = np.round(np.arange(20.0, 85.01, 0.1), 1)
+# Стандартные дистанции прогноза (км)
+RACE_DISTANCES = (5.0, 10.0, 21.0975, 42.195)
+# Показатель степени формулы Ригеля
+RIEGEL_EXPONENT = 1.06
+
+# Зоны темпа: доля VDOT на границах зоны (медленная, быстрая)
+ZONE_FRACTIONS = {
+    "easy": (0.62, 0.70),
+    "long": (0.65, 0.74),
+    "tempo": (0.83, 0.88),
+    "interval": (0.95, 1.00),
+}
+ZONE_NAMES = {
+    "easy": "Легкий",
+    "long": "Длительный",
+    "tempo": "Темповой",
+    "interval": "Интервальный",
+}
+# Зона по ключевым словам типа тренировки (проверяются по порядку)
+TRAINING_TYPE_ZONES = (
+    (("восстанов", "легк"), "easy"),
+    (("длительн",), "long"),
+    (("интервал", "фартлек", "повтор", "отрезк"), "interval"),
+    (("темп", "порог", "соревнов"), "tempo"),
+)
+# Темп дня отдыха
+REST_PACE = "-"
+# Комфортный темп соответствует середине легкой зоны
+COMFORTABLE_FRACTION = 0.66
+# Недавние пробежки короче этого не используются для оценки уровня
+MIN_RUN_SECONDS = 6 * 60
+# Допустимое отклонение темпа дня плана от границ зоны (секунды на км)
+PACE_TOLERANCE = 10
+
+_RANGE_DURATION_RE = re.compile(r"^\s*(\d{1,2}):(\d{2})\s*$")
+
+
+def _oxygen_cost(velocity: Any) -> Any:
+    """Потребление кислорода (мл/кг/мин) при скорости в м/мин."""
+    return -4.60 + 0.182258 * velocity + 0.000104 * velocity ** 2
+
+
+def _max_fraction(minutes: Any) -> Any:
+    """Доля VO2max, которую бегун удерживает заданное время (мин)."""
+    return 0.8 + 0.1894393 * np.exp(-0.012778 * minutes) + 0.2989558 * np.exp(-0.1932605 * minutes)
+
+
+def _velocity(oxygen: Any) -> Any:
+    """Скорость (м/мин), при которой потребление кислорода равно заданному."""
+    return (-0.182258 + np.sqrt(0.182258 ** 2 + 4 * 0.000104 * (4.60 + oxygen))) / (2 * 0.000104)
+
+
+def vdot_from_performance(distance_km: float, seconds: float) -> Optional[float]:
+    """
+    Рассчитывает VDOT по результату забега или пробежки.
+
+    Args:
+        distance_km: Дистанция в километрах
+        seconds: Время в секундах
+
+    Returns:
+        Optional[float]: VDOT или None для некорректных значений
+    """
+    if not distance_km or not seconds or distance_km <= 0 or seconds <= 0:
+        return None
+    minutes = seconds / 60
+    return float(_oxygen_cost(distance_km * 1000 / minutes) / _max_fraction(minutes))
+
+
+def _build_race_table() -> np.ndarray:
+    """
+    Таблица прогнозов: [дистанция, VDOT] -> время в секундах.
+
+    Время для каждой точки сетки находится бисекцией сразу для всей сетки.
+    """
+    table = np.zeros((len(RACE_DISTANCES), len(VDOT_GRID)))
+    for row, distance_km in enumerate(RACE_DISTANCES):
+        meters = distance_km * 1000
+        # Время от 2 до 20 минут на километр
+        low = np.full(len(VDOT_GRID), distance_km * 2.0)
+        high = np.full(len(VDOT_GRID), distance_km * 20.0)
+        for _ in range(60):
+            middle = (low + high) / 2
+            too_fast = _oxygen_cost(meters / middle) / _max_fraction(middle) > VDOT_GRID
+            low = np.where(too_fast, middle, low)
+            high = np.where(too_fast, high, middle)
+        table[row] = (low + high) / 2 * 60
+    return table
+
+
+def _build_zone_table() -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """Таблица зон: название -> (быстрый темп, медленный темп) в секундах на км по сетке VDOT."""
+    zones = {}
+    for name, (slow_fraction, fast_fraction) in ZONE_FRACTIONS.items():
+        fast = 60000 / _velocity(VDOT_GRID * fast_fraction)
+        slow = 60000 / _velocity(VDOT_GRID * slow_fraction)
+        zones[name] = (fast, slow)
+    return zones
+
+
+_RACE_TABLE = _build_race_table()
+_ZONE_TABLE = _build_zone_table()
+
+
+def _clamp_vdot(vdot: float) -> float:
+    return float(min(VDOT_GRID[-1], max(VDOT_GRID[0], vdot)))
+
+
+def predict_race_seconds(vdot: float, distance_km: float) -> float:
+    """
+    Прогноз времени на дистанции для уровня VDOT.
+
+    Args:
+        vdot: Уровень бегуна
+        distance_km: Дистанция в километрах
+
+    Returns:
+        float: Время в секундах
+    """
+    vdot = _clamp_vdot(vdot)
+    times = [float(np.interp(vdot, VDOT_GRID, row)) for row in _RACE_TABLE]
+    for base_km, seconds in zip(RACE_DISTANCES, times):
+        if math.isclose(base_km, distance_km, abs_tol=0.2):
+            return seconds
+    # Нестандартная дистанция: формула Ригеля от ближайшей стандартной
+    index = min(range(len(RACE_DISTANCES)), key=lambda i: abs(math.log(RACE_DISTANCES[i] / distance_km)))
+    return times[index] * (distance_km / RACE_DISTANCES[index]) ** RIEGEL_EXPONENT
+
+
+def zone_paces(vdot: float) -> Dict[str, Tuple[int, int]]:
+    """
+    Зоны темпа для уровня VDOT.
+
+    Returns:
+        Dict: Название зоны -> (быстрый темп, медленный темп) в секундах на км
+    """
+    vdot = _clamp_vdot(vdot)
+    return {
+        name: (int(round(float(np.interp(vdot, VDOT_GRID, fast)))),
+               int(round(float(np.interp(vdot, VDOT_GRID, slow)))))
+        for name, (fast, slow) in _ZONE_TABLE.items()
+    }
+
+
+def parse_race_time(value: Any, distance_km: Optional[float]) -> Optional[int]:
+    """
+    Разбирает целевое время забега в секундах.
+
+    Время вида "1:50" для длинной дистанции означает часы и минуты, а не минуты
+    и секунды: вариант выбирается по правдоподобному темпу.
+
+    Args:
+        value: Целевое время ("25:00", "1:50:00", "1 ч 50 мин")
+        distance_km: Дистанция забега
+
+    Returns:
+        Optional[int]: Время в секундах или None
+    """
+    seconds = parse_duration_seconds(value)
+    if not seconds or not distance_km:
+        return seconds
+    if isinstance(value, str) and _RANGE_DURATION_RE.match(value) and seconds / distance_km < 150:
+        seconds *= 60
+    return seconds
+
+
+def _format_time(seconds: float) -> str:
+    """Форматирует время забега (Ч:ММ:СС или ММ:СС)."""
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    if hours:
+        return f"{hours}:{rest // 60:02d}:{rest % 60:02d}"
+    return f"{rest // 60}:{rest % 60:02d}"
+
+
+def _format_distance_name(distance_km: float) -> str:
+    names = {21.0975: "полумарафон", 42.195: "марафон"}
+    return names.get(distance_km, f"{distance_km:g} км")
+
+
+@dataclass(frozen=True)
+class PaceProfile:
+    """Уровень бегуна, прогнозы и зоны темпа."""
+    vdot: float
+    target_vdot: Optional[float]
+    zones: Dict[str, Tuple[int, int]]
+    predictions: Dict[float, float]
+
+    def zone_text(self, name: str) -> str:
+        """Зона темпа в формате плана ("5:07-5:38/км")."""
+        fast, slow = self.zones[name]
+        return f"{format_pace(fast)}-{format_pace(slow)}/км"
+
+    def format_for_prompt(self) -> str:
+        """Зоны темпа и прогнозы для промпта (несколько строк)."""
+        zones = ", ".join(f"{ZONE_NAMES[name].lower()} {self.zone_text(name)}" for name in ZONE_FRACTIONS)
+        predictions = ", ".join(f"{_format_distance_name(distance)} {_format_time(seconds)}"
+                                for distance, seconds in self.predictions.items())
+        return (
+            f"- Зоны темпа (используй их для целевого темпа тренировок): {zones}\n"
+            f"- Прогноз результатов при текущей подготовке: {predictions}\n"
+        )
+
+
+def pace_profile(profile: Dict[str, Any],
+                 recent_runs: Optional[Iterable[Tuple[float, float]]] = None) -> Optional[PaceProfile]:
+    """
+    Рассчитывает уровень, прогнозы и зоны темпа бегуна.
+
+    Текущий уровень — лучший из оценок по комфортному темпу и недавним
+    пробежкам; если их нет, используется уровень целевого времени.
+
+    Args:
+        profile: Профиль бегуна (comfortable_pace, target_time, distance)
+        recent_runs: Недавние пробежки (дистанция в км, время в секундах)
+
+    Returns:
+        Optional[PaceProfile]: Зоны и прогнозы или None, если данных недостаточно
+    """
+    estimates: List[float] = []
+    comfortable = profile_pace_seconds(profile)
+    if comfortable:
+        estimates.append(float(_oxygen_cost(60000 / comfortable)) / COMFORTABLE_FRACTION)
+    for distance_km, seconds in recent_runs or ():
+        if seconds and seconds >= MIN_RUN_SECONDS:
+            vdot = vdot_from_performance(distance_km, seconds)
+            if vdot:
+                estimates.append(vdot)
+
+    goal_km = profile_distance_km(profile)
+    target_seconds = parse_race_time(profile.get("target_time"), goal_km)
+    target_vdot = vdot_from_performance(goal_km, target_seconds) if goal_km and target_seconds else None
+
+    current = max(estimates) if estimates else target_vdot
+    if current is None:
+        return None
+    current = round(_clamp_vdot(current), 1)
+    distances = list(RACE_DISTANCES)
+    if goal_km and not any(math.isclose(goal_km, distance, abs_tol=0.2) for distance in distances):
+        distances = sorted(distances + [goal_km])
+    return PaceProfile(
+        vdot=current,
+        target_vdot=round(target_vdot, 1) if target_vdot else None,
+        zones=zone_paces(current),
+        predictions={distance: predict_race_seconds(current, distance) for distance in distances},
+    )
+
+
+def training_zone(training_type: str) -> Optional[str]:
+    """Зона темпа по типу тренировки или None, если тип не распознан."""
+    text = str(training_type or "").lower()
+    for markers, zone in TRAINING_TYPE_ZONES:
+        if any(marker in text for marker in markers):
+            return zone
+    return None
+
+
+def apply_pace_zones(plan_data: Dict[str, Any], paces: Optional[PaceProfile]) -> List[int]:
+    """
+    Заполняет и проверяет темп дней плана по зонам.
+
+    Темп заменяется зоной, если он не указан, не распознан или отличается от
+    зоны типа тренировки больше чем на PACE_TOLERANCE секунд. Темп дня отдыха
+    заменяется на REST_PACE.
+
+    Args:
+        plan_data: План тренировок (изменяется на месте)
+        paces: Зоны темпа бегуна
+
+    Returns:
+        List[int]: Индексы (с 0) дней, в которых изменен темп
+    """
+    if not paces:
+        return []
+
+    changed = []
+    for idx, day in enumerate(plan_data.get("training_days", []) or []):
+        if not isinstance(day, dict):
+            continue
+        if is_rest_text(day.get("training_type")):
+            if str(day.get("pace") or "").strip() not in ("", REST_PACE):
+                day["pace"] = REST_PACE
+                changed.append(idx)
+            continue
+        pace = parse_pace_seconds(day.get("pace"))
+        zone = training_zone(day.get("training_type"))
+        if zone is None:
+            if pace is not None:
+                continue
+            zone = "easy"
+        fast, slow = paces.zones[zone]
+        if pace is not None and fast - PACE_TOLERANCE <= pace <= slow + PACE_TOLERANCE:
+            continue
+        day["pace"] = paces.zone_text(zone)
+        changed.append(idx)
+    return changed
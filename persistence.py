@@ -0,0 +1,312 @@
+"""
+Хранение состояния диалогов бота в Postgres (python-telegram-bot persistence).
+
+Состояния анкеты профиля (ConversationHandler) и флаги context.user_data
+переживают перезапуск бота. Данные держатся в памяти приложения; python-telegram-bot
+раз в FLUSH_INTERVAL секунд передает только измененные записи, а при остановке —
+все оставшиеся. Записи накапливаются WRITE_DELAY секунд и сохраняются одной
+транзакцией, неизмененные данные пользователя не пишутся повторно.
+
+Флаги выполняющихся операций (TRANSIENT_USER_KEYS) не сохраняются: после
+перезапуска операция уже не выполняется. Ошибочная запись повторяется позже.
+Пока в схеме нет таблиц (миграция 14), состояние хранится только в памяти.
+"""
+
+import asyncio
+import json
+import logging
+from contextlib import suppress
+from typing import Any, Dict, Optional, Tuple
+
+import psycopg2
+import psycopg2.extras
+from telegram.ext import BasePersistence, PersistenceInput
+
+from config import DB_CONFIG
+from migrations import has_capability
+
+# Интервал передачи измененных данных из приложения (секунды)
+FLUSH_INTERVAL = 5
+# Окно накопления записей перед сохранением (секунды)
+WRITE_DELAY = 0.1
+# Флаги выполняющихся операций, которые не переживают перезапуск
+TRANSIENT_USER_KEYS = frozenset({"is_generating_plan", "last_callback"})
+
+
+def encode_user_data(data: Dict[str, Any]) -> Optional[str]:
+    """
+    Сериализует данные пользователя без временных флагов.
+
+    Returns:
+        Optional[str]: JSON или None, если сохранять нечего
+    """
+    stored = {key: value for key, value in data.items() if key not in TRANSIENT_USER_KEYS}
+    if not stored:
+        return None
+    return json.dumps(stored, ensure_ascii=False, sort_keys=True, default=str)
+
+
+def encode_conversation_key(key: Tuple[Any, ...]) -> str:
+    """Ключ диалога (chat_id, user_id, ...) в виде строки для таблицы."""
+    return json.dumps(list(key))
+
+
+def decode_conversation_key(text: str) -> Tuple[Any, ...]:
+    """Ключ диалога из строки таблицы."""
+    return tuple(json.loads(text))
+
+
+class PostgresStateStore:
+    """Postgres tables with bot user data and conversation states."""
+
+    @staticmethod
+    def load_user_data():
+        """
+        Load stored user data.
+
+        Returns:
+            Dictionary of user ID to JSON text
+        """
+        if not has_capability("bot_persistence"):
+            return {}
+        conn = None
+        try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT user_id, data::text FROM bot_user_data")
+                return {user_id: data for user_id, data in cursor.fetchall()}
+        except Exception as e:
+            logging.error(f"Error loading bot user data: {e}")
+            return {}
+        finally:
+            if conn:
+                conn.close()
+
+    @staticmethod
+    def load_conversations(name):
+        """
+        Load stored states of a conversation handler.
+
+        Args:
+            name: ConversationHandler name
+
+        Returns:
+            Dictionary of conversation key to state
+        """
+        if not has_capability("bot_persistence"):
+            return {}
+        conn = None
+        try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT conversation_key, state FROM bot_conversations WHERE name = %s",
+                    (name,)
+                )
+                return {decode_conversation_key(key): state for key, state in cursor.fetchall()}
+        except Exception as e:
+            logging.error(f"Error loading conversations {name}: {e}")
+            return {}
+        finally:
+            if conn:
+                conn.close()
+
+    @staticmethod
+    def write(users, conversations):
+        """
+        Write a batch of changes in one transaction.
+
+        Args:
+            users: Dictionary of user ID to JSON text (None deletes the row)
+            conversations: Dictionary of (name, conversation key) to JSON state
+                (None deletes the row)
+
+        Returns:
+            True if successful or there is nowhere to write, False otherwise
+        """
+        if not has_capability("bot_persistence"):
+            return True
+        conn = None
+        try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            with conn.cursor() as cursor:
+                upserts = [(user_id, data) for user_id, data in users.items() if data is not None]
+                if upserts:
+                    psycopg2.extras.execute_values(
+                        cursor,
+                        """
+                        INSERT INTO bot_user_data (user_id, data) VALUES %s
+                        ON CONFLICT (user_id) DO UPDATE SET data = EXCLUDED.data, updated_at = NOW()
+                        """,
+                        upserts,
+                        template="(%s, %s::jsonb)"
+                    )
+                deletes = [user_id for user_id, data in users.items() if data is None]
+                if deletes:
+                    cursor.execute("DELETE FROM bot_user_data WHERE user_id = ANY(%s)", (deletes,))
+
+                upserts = [(name, key, state) for (name, key), state in conversations.items() if state is not None]
+                if upserts:
+                    psycopg2.extras.execute_values(
+                        cursor,
+                        """
+                        INSERT INTO bot_conversations (name, conversation_key, state) VALUES %s
+                        ON CONFLICT (name, conversation_key)
+                        DO UPDATE SET state = EXCLUDED.state, updated_at = NOW()
+                        """,
+                        upserts,
+                        template="(%s, %s, %s::jsonb)"
+                    )
+                deletes = [(name, key) for (name, key), state in conversations.items() if state is None]
+                if deletes:
+                    psycopg2.extras.execute_values(
+                        cursor,
+                        """
+                        DELETE FROM bot_conversations c USING (VALUES %s) AS d (name, conversation_key)
+                        WHERE c.name = d.name AND c.conversation_key = d.conversation_key
+                        """,
+                        deletes
+                    )
+            conn.commit()
+            return True
+        except Exception as e:
+            logging.error(f"Error writing bot state: {e}")
+            if conn:
+                conn.rollback()
+            return False
+        finally:
+            if conn:
+                conn.close()
+
+
+class PostgresPersistence(BasePersistence):
+    """
+    Persistence python-telegram-bot для user_data и состояний ConversationHandler.
+
+    Args:
+        store: Хранилище (по умолчанию — таблицы Postgres)
+        update_interval: Интервал передачи измененных данных из приложения (секунды)
+        write_delay: Окно накопления записей перед сохранением (секунды)
+    """
+
+    def __init__(self, store=PostgresStateStore, update_interval: float = FLUSH_INTERVAL,
+                 write_delay: float = WRITE_DELAY):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.store = store
+        self.write_delay = write_delay
+        # Сохраненные данные пользователей: неизмененные записи не пишутся повторно
+        self._saved_users: Dict[int, str] = {}
+        # Изменения, ожидающие записи (None — удалить)
+        self._users: Dict[int, Optional[str]] = {}
+        self._conversations: Dict[Tuple[str, str], Optional[str]] = {}
+        self._write_task: Optional[asyncio.Task] = None
+        self._writing = False
+
+    async def get_user_data(self) -> Dict[int, Dict[str, Any]]:
+        rows = await asyncio.to_thread(self.store.load_user_data)
+        user_data = {user_id: json.loads(data) for user_id, data in rows.items()}
+        # Снимок в той же сериализации, что и при записи
+        self._saved_users = {user_id: encode_user_data(data) for user_id, data in user_data.items()}
+        return user_data
+
+    async def get_chat_data(self) -> Dict[int, Dict[Any, Any]]:
+        return {}
+
+    async def get_bot_data(self) -> Dict[Any, Any]:
+        return {}
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def get_conversations(self, name: str) -> Dict[Tuple[Any, ...], object]:
+        return await asyncio.to_thread(self.store.load_conversations, name)
+
+    async def update_conversation(self, name: str, key: Tuple[Any, ...], new_state: Optional[object]) -> None:
+        state = None if new_state is None else json.dumps(new_state)
+        self._conversations[(name, encode_conversation_key(key))] = state
+        self._schedule_write()
+
+    async def update_user_data(self, user_id: int, data: Dict[Any, Any]) -> None:
+        row = encode_user_data(data)
+        if row == self._users.get(user_id, self._saved_users.get(user_id)):
+            return
+        self._users[user_id] = row
+        self._schedule_write()
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._users[user_id] = None
+        self._schedule_write()
+
+    async def update_chat_data(self, chat_id: int, data: Dict[Any, Any]) -> None:
+        pass
+
+    async def update_bot_data(self, data: Dict[Any, Any]) -> None:
+        pass
+
+    async def update_callback_data(self, data: Any) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict[Any, Any]) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict[Any, Any]) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: Dict[Any, Any]) -> None:
+        pass
+
+    async def flush(self) -> None:
+        """Сохраняет все ожидающие изменения (вызывается при остановке приложения)."""
+        task = self._write_task
+        if task is not None and not task.done():
+            # Ожидание окна накопления прерывается, начатая запись дожидается
+            if not self._writing:
+                task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+        await self._write()
+
+    def _schedule_write(self, delay: Optional[float] = None) -> None:
+        if self._write_task is None or self._write_task.done():
+            self._write_task = asyncio.create_task(self._write_later(self.write_delay if delay is None else delay))
+
+    async def _write_later(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        if not await self._write():
+            self._schedule_write(self.update_interval)
+
+    async def _write(self) -> bool:
+        users, self._users = self._users, {}
+        conversations, self._conversations = self._conversations, {}
+        if not users and not conversations:
+            return True
+
+        self._writing = True
+        try:
+            written = await asyncio.to_thread(self.store.write, users, conversations)
+        except Exception as e:
+            logging.error(f"Ошибка при сохранении состояния диалогов: {e}")
+            written = False
+        finally:
+            self._writing = False
+
+        if not written:
+            # Изменения, пришедшие во время записи, новее возвращаемых
+            for user_id, row in users.items():
+                self._users.setdefault(user_id, row)
+            for key, state in conversations.items():
+                self._conversations.setdefault(key, state)
+            return False
+
+        for user_id, row in users.items():
+            if row is None:
+                self._saved_users.pop(user_id, None)
+            else:
+                self._saved_users[user_id] = row
+        return True
@@ -0,0 +1,235 @@
+"""
+Локальная корректировка плана тренировок по фактическому выполнению.
+
+Вместо повторной генерации всего плана через OpenAI пересчитывает дистанции и
+темп только для оставшихся необработанных дней по правилам прогрессии нагрузки.
+Выполненные и отмененные дни не изменяются. Описания измененных дней при
+желании можно переформулировать одним коротким запросом к модели.
+"""
+
+import copy
+import json
+import logging
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from metrics import REGISTRY
+from training_load import limits_increase
+from units import DAY_DISTANCE_KEY, DAY_PACE_KEY, day_distance_km, format_distance, parse_pace_seconds
+
+
+# Максимальное увеличение нагрузки за одну корректировку (правило 10%)
+MAX_INCREASE = 0.10
+# Максимальное снижение нагрузки за одну корректировку
+MAX_DECREASE = 0.30
+# Доля отклонения, которая переносится на оставшиеся тренировки
+DEVIATION_WEIGHT = 0.5
+# Изменение темпа в секундах на км при изменении нагрузки на 10%
+PACE_SHIFT_PER_10_PERCENT = 5
+# Минимальная дистанция тренировки после корректировки
+MIN_DISTANCE_KM = 1.0
+# Тренировки, дистанция которых не увеличивается (восстановительные остаются легкими)
+NO_INCREASE_TYPES = ("восстанов", "отдых")
+# Начало заметок о корректировке: при повторной корректировке прежняя заметка заменяется
+DAY_NOTE_PREFIX = "Скорректировано:"
+PLAN_NOTE_PREFIX = "План скорректирован"
+
+_PACE_RE = re.compile(r"(\d{1,2}):(\d{2})")
+
+
+def calculate_load_factor(planned_distance: float, actual_distance: float) -> float:
+    """
+    Рассчитывает коэффициент нагрузки для оставшихся тренировок.
+
+    Половина отклонения факта от плана переносится на оставшиеся дни, при этом
+    рост ограничен 10%, а снижение — 30%.
+
+    Args:
+        planned_distance: Запланированная дистанция
+        actual_distance: Фактически выполненная дистанция
+
+    Returns:
+        float: Множитель дистанций оставшихся тренировок
+    """
+    if not planned_distance or planned_distance <= 0:
+        return 1.0
+    ratio = actual_distance / planned_distance
+    factor = 1 + (ratio - 1) * DEVIATION_WEIGHT
+    return max(1 - MAX_DECREASE, min(1 + MAX_INCREASE, factor))
+
+
+def replace_note(text: Any, prefix: str, note: str) -> str:
+    """Заменяет абзац текста, начинающийся с prefix, на note (или добавляет note в конец)."""
+    paragraphs = [part for part in str(text or "").split("\n\n") if part.strip() and not part.strip().startswith(prefix)]
+    return "\n\n".join(paragraphs + [note]).strip()
+
+
+def shift_pace(pace: str, seconds: int) -> str:
+    """
+    Сдвигает все значения темпа в строке на заданное количество секунд.
+
+    Args:
+        pace: Темп в свободной форме ("5:30/км", "5:30-6:00 мин/км")
+        seconds: Сдвиг в секундах (положительный — медленнее)
+
+    Returns:
+        str: Строка с пересчитанным темпом
+    """
+    if not pace or not seconds:
+        return pace
+
+    def _replace(match):
+        total = int(match.group(1)) * 60 + int(match.group(2)) + seconds
+        total = max(total, 120)
+        return f"{total // 60}:{total % 60:02d}"
+
+    return _PACE_RE.sub(_replace, pace)
+
+
+def _round_distance(km: float) -> float:
+    """Округляет дистанцию до 0.5 км."""
+    return max(MIN_DISTANCE_KM, round(km * 2) / 2)
+
+
+def adjust_plan_locally(current_plan: Dict[str, Any], day_num: int, planned_distance: float,
+                        actual_distance: float,
+                        processed_days: Optional[Iterable[int]] = None,
+                        training_load: Optional[Dict[str, float]] = None) -> Tuple[Dict[str, Any], List[int]]:
+    """
+    Корректирует оставшиеся дни плана без обращения к OpenAI.
+
+    Если по тренировочной нагрузке бегун устал или слишком быстро наращивает
+    объем, нагрузка оставшихся дней не увеличивается.
+
+    Args:
+        current_plan: Текущий план тренировок (словарь с training_days)
+        day_num: Номер дня (с 1), по которому получено фактическое выполнение
+        planned_distance: Запланированная дистанция этого дня
+        actual_distance: Фактическая дистанция этого дня
+        processed_days: Номера уже выполненных или отмененных дней
+        training_load: Нагрузка бегуна (training_load.load_summary)
+
+    Returns:
+        Tuple[Dict, List[int]]: Скорректированный план и индексы (с 0) измененных дней
+    """
+    plan = copy.deepcopy(current_plan)
+    training_days = plan.get("training_days", [])
+    if not 0 < day_num <= len(training_days):
+        raise ValueError(f"Некорректный номер дня тренировки: {day_num}")
+
+    processed = set(processed_days or [])
+    processed.add(day_num)
+
+    factor = calculate_load_factor(planned_distance, actual_distance)
+    load_limited = factor > 1 and limits_increase(training_load)
+    if load_limited:
+        factor = 1.0
+    # Темп меняется в противоположную сторону: больше нагрузки — быстрее
+    pace_shift = int(round((1 - factor) * 10 * PACE_SHIFT_PER_10_PERCENT))
+    logging.info(f"Локальная корректировка плана: коэффициент нагрузки {factor:.2f}, сдвиг темпа {pace_shift:+d} с/км")
+
+    changed: List[int] = []
+    total_distance = 0.0
+    for idx, day in enumerate(training_days):
+        current_km = day_distance_km(day)
+        if idx + 1 in processed or idx + 1 <= day_num or factor == 1.0 or current_km <= 0:
+            total_distance += current_km
+            continue
+
+        training_type = str(day.get("training_type", "")).lower()
+        day_factor = factor
+        if factor > 1 and any(marker in training_type for marker in NO_INCREASE_TYPES):
+            day_factor = 1.0
+
+        new_km = _round_distance(current_km * day_factor)
+        new_pace = shift_pace(str(day.get("pace", "")), pace_shift if day_factor != 1.0 else 0)
+        total_distance += new_km
+        if new_km == current_km and new_pace == day.get("pace"):
+            continue
+
+        day["distance"] = format_distance(new_km)
+        day["pace"] = new_pace
+        day[DAY_DISTANCE_KEY] = new_km
+        day[DAY_PACE_KEY] = parse_pace_seconds(new_pace)
+        day["description"] = replace_note(
+            day.get("description"), DAY_NOTE_PREFIX,
+            f"{DAY_NOTE_PREFIX} {format_distance(current_km)} → {format_distance(new_km)}."
+        )
+        changed.append(idx)
+
+    if "total_distance" in plan:
+        plan["total_distance"] = round(total_distance, 1)
+
+    # Без изменения нагрузки заметка не нужна (кроме ограничения по усталости)
+    if factor == 1.0 and not load_limited:
+        return plan, changed
+
+    if load_limited:
+        change = "сохранена, так как накопленная усталость не позволяет ее увеличить"
+    else:
+        direction = "увеличена" if factor > 1 else "снижена"
+        change = f"{direction} на {abs(factor - 1) * 100:.0f}%"
+    plan["plan_description"] = replace_note(
+        plan.get("plan_description"), PLAN_NOTE_PREFIX,
+        f"{PLAN_NOTE_PREFIX} с учетом фактического выполнения тренировки {day_num} "
+        f"({actual_distance} км вместо {planned_distance} км): нагрузка оставшихся тренировок "
+        f"{change}."
+    )
+
+    return plan, changed
+
+
+def reword_changed_days(client: Any, model_name: str, plan: Dict[str, Any], changed: List[int]) -> Dict[str, Any]:
+    """
+    Переформулирует описания только измененных дней одним запросом к модели.
+
+    При ошибке запроса план возвращается без изменений.
+
+    Args:
+        client: Клиент OpenAI
+        model_name: Модель OpenAI
+        plan: Скорректированный план
+        changed: Индексы измененных дней
+
+    Returns:
+        Dict: План с обновленными описаниями
+    """
+    if not changed:
+        return plan
+
+    days = [
+        {
+            "index": idx,
+            "training_type": plan["training_days"][idx].get("training_type", ""),
+            "distance": plan["training_days"][idx].get("distance", ""),
+            "pace": plan["training_days"][idx].get("pace", ""),
+            "description": plan["training_days"][idx].get("description", ""),
+        }
+        for idx in changed
+    ]
+    prompt = (
+        "Дистанция и темп этих тренировок были изменены. Перепиши описание каждой тренировки так, "
+        "чтобы оно соответствовало новой дистанции и темпу, сохранив структуру "
+        "(разминка, основная часть, заминка).\n\n"
+        f"{json.dumps(days, ensure_ascii=False)}\n\n"
+        "Ответь в JSON формате: {\"days\": [{\"index\": номер, \"description\": \"текст\"}]}"
+    )
+    try:
+        with REGISTRY.timed("llm_call_seconds", site="plan_adjuster.reword_changed_days"):
+            response = client.chat.completions.create(
+                model=model_name,
+                messages=[
+                    {"role": "system", "content": "Ты опытный беговой тренер. Отвечай только в указанном JSON формате на русском языке."},
+                    {"role": "user", "content": prompt},
+                ],
+                response_format={"type": "json_object"},
+                temperature=0.5,
+            )
+        answer = json.loads(response.choices[0].message.content or "{}")
+        for item in answer.get("days", []):
+            idx = item.get("index")
+            if idx in changed and item.get("description"):
+                plan["training_days"][idx]["description"] = str(item["description"])
+    except Exception as e:
+        logging.error(f"Ошибка при переформулировании описаний скорректированных дней: {e}")
+    return plan
@@ -0,0 +1,309 @@
+"""
+Индекс похожих планов тренировок.
+
+Профили, для которых уже были созданы и выполнялись планы, переводятся в
+нормализованные векторы признаков (дистанция, опыт, недельный объем,
+количество тренировок в неделю, недель до старта, комфортный темп) и хранятся
+в матрице NumPy. Поиск k ближайших планов выполняется за микросекунды.
+Очень близкий план используется напрямую после переноса дат, проверки,
+пересчета темпа по зонам нового бегуна и смены названия, похожий — как
+компактный пример в промпте.
+"""
+
+import copy
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import psycopg2
+import psycopg2.extras
+
+from config import DB_CONFIG
+from training_calendar import DEFAULT_DAYS_PER_WEEK, WEEKDAY_NAMES, parse_date
+from units import format_distance, plan_distance_km, profile_distance_km, profile_pace_seconds, profile_volume_km
+
+FEATURE_NAMES = ("distance", "level", "weekly_volume", "days_per_week", "weeks_to_race", "pace")
+# Вес признака в расстоянии между профилями (после нормализации)
+FEATURE_WEIGHTS = np.array([2.0, 1.0, 1.0, 1.5, 0.5, 1.0], dtype=np.float32)
+
+EXPERIENCE_LEVELS = {
+    "Полный новичок": 0,
+    "Менее 1 года": 1,
+    "1-3 года": 2,
+    "3-5 лет": 3,
+    "Более 5 лет": 4,
+}
+DEFAULT_LEVEL = 2
+# Недель до старта, если дата соревнования не указана (и верхняя граница признака)
+MAX_WEEKS_TO_RACE = 26
+DEFAULT_PACE_SECONDS = 390
+
+# Порог расстояния, при котором план используется напрямую
+REUSE_MAX_DISTANCE = 0.05
+# Порог расстояния, при котором план добавляется в промпт как пример
+SEED_MAX_DISTANCE = 1.0
+# Максимальное количество планов в индексе
+INDEX_MAX_PLANS = 5000
+# Время жизни загруженного индекса
+INDEX_TTL_SECONDS = 3600
+
+_index = None
+_index_loaded_at = 0.0
+_index_lock = threading.Lock()
+
+
+@dataclass
+class IndexedPlan:
+    """План из индекса вместе с ID в training_plans."""
+    plan_id: int
+    plan: Dict[str, Any]
+
+
+def profile_features(profile: Dict[str, Any], reference_date: Optional[date] = None) -> np.ndarray:
+    """
+    Переводит профиль бегуна в вектор признаков.
+
+    Args:
+        profile: Профиль бегуна в формате бота
+        reference_date: Дата, от которой считаются недели до старта (по умолчанию сегодня)
+
+    Returns:
+        np.ndarray: Вектор признаков в порядке FEATURE_NAMES
+    """
+    reference_date = reference_date or date.today()
+
+    distance = profile_distance_km(profile) or 0.0
+    level = EXPERIENCE_LEVELS.get(str(profile.get("experience") or "").strip(), DEFAULT_LEVEL)
+    weekly_volume = profile_volume_km(profile) or 0.0
+
+    try:
+        days_per_week = int(profile.get("training_days_per_week") or DEFAULT_DAYS_PER_WEEK)
+    except (TypeError, ValueError):
+        days_per_week = DEFAULT_DAYS_PER_WEEK
+
+    race_date = parse_date(profile.get("competition_date"))
+    weeks_to_race = MAX_WEEKS_TO_RACE
+    if race_date and race_date >= reference_date:
+        weeks_to_race = min((race_date - reference_date).days / 7, MAX_WEEKS_TO_RACE)
+
+    pace = profile_pace_seconds(profile) or DEFAULT_PACE_SECONDS
+
+    return np.array([np.log1p(distance), level, weekly_volume, days_per_week, weeks_to_race, pace],
+                    dtype=np.float32)
+
+
+class PlanIndex:
+    """Матрица нормализованных признаков профилей с поиском ближайших планов."""
+
+    def __init__(self, features: np.ndarray, entries: Sequence[IndexedPlan]):
+        """
+        Args:
+            features: Матрица признаков (по строке на план)
+            entries: Планы в том же порядке, что и строки матрицы
+        """
+        self.entries = list(entries)
+        features = np.asarray(features, dtype=np.float32).reshape(len(self.entries), len(FEATURE_NAMES))
+        if len(self.entries):
+            self.mean = features.mean(axis=0)
+            std = features.std(axis=0)
+        else:
+            self.mean = np.zeros(len(FEATURE_NAMES), dtype=np.float32)
+            std = np.ones(len(FEATURE_NAMES), dtype=np.float32)
+        self.scale = FEATURE_WEIGHTS / np.where(std > 1e-6, std, 1.0)
+        self.matrix = np.ascontiguousarray((features - self.mean) * self.scale)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def query(self, profile: Dict[str, Any], k: int = 3,
+              reference_date: Optional[date] = None) -> List[Tuple[float, IndexedPlan]]:
+        """
+        Возвращает k ближайших планов.
+
+        Args:
+            profile: Профиль бегуна
+            k: Количество планов
+            reference_date: Дата, от которой считаются недели до старта
+
+        Returns:
+            List[Tuple[float, IndexedPlan]]: Пары (квадрат расстояния на признак, план) по возрастанию расстояния
+        """
+        if not self.entries or k <= 0:
+            return []
+        vector = (profile_features(profile, reference_date) - self.mean) * self.scale
+        diffs = self.matrix - vector
+        distances = np.einsum("ij,ij->i", diffs, diffs) / len(FEATURE_NAMES)
+
+        k = min(k, len(self.entries))
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.argsort(distances[nearest])]
+        return [(float(distances[idx]), self.entries[idx]) for idx in nearest]
+
+
+def load_plan_index(limit: int = INDEX_MAX_PLANS) -> PlanIndex:
+    """
+    Строит индекс по планам, в которых была выполнена хотя бы одна тренировка.
+
+    Признаки берутся из последнего профиля пользователя, недели до старта
+    считаются от даты создания плана.
+
+    Args:
+        limit: Максимальное количество последних планов
+
+    Returns:
+        PlanIndex: Индекс (пустой при ошибке базы данных)
+    """
+    conn = None
+    try:
+        conn = psycopg2.connect(**DB_CONFIG)
+        with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cursor:
+            cursor.execute(
+                """
+                SELECT tp.id, tp.plan_data, tp.created_at,
+                       rp.distance, rp.experience, rp.weekly_volume, rp.training_days_per_week,
+                       rp.competition_date, rp.comfortable_pace
+                FROM training_plans tp
+                JOIN LATERAL (
+                    SELECT * FROM runner_profiles
+                    WHERE user_id = tp.user_id
+                    ORDER BY updated_at DESC
+                    LIMIT 1
+                ) rp ON TRUE
+                WHERE EXISTS (
+                    SELECT 1 FROM completed_trainings ct
+                    WHERE ct.plan_id = tp.id AND ct.status = 'completed'
+                )
+                ORDER BY tp.created_at DESC
+                LIMIT %s
+                """,
+                (limit,)
+            )
+            rows = cursor.fetchall()
+    except Exception as e:
+        logging.error(f"Ошибка при загрузке индекса планов: {e}")
+        return PlanIndex(np.empty((0, len(FEATURE_NAMES))), [])
+    finally:
+        if conn:
+            conn.close()
+
+    features = []
+    entries = []
+    for row in rows:
+        try:
+            plan = row["plan_data"]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            if not plan.get("training_days"):
+                continue
+            created_at = row["created_at"].date() if row["created_at"] else None
+            features.append(profile_features(dict(row), created_at))
+            entries.append(IndexedPlan(plan_id=row["id"], plan=plan))
+        except Exception as e:
+            logging.warning(f"План {row['id']} пропущен при построении индекса: {e}")
+
+    logging.info(f"Индекс похожих планов построен: {len(entries)} планов")
+    return PlanIndex(np.array(features, dtype=np.float32).reshape(-1, len(FEATURE_NAMES)), entries)
+
+
+def get_plan_index() -> PlanIndex:
+    """Возвращает индекс планов, перестраивая его не чаще раза в INDEX_TTL_SECONDS."""
+    global _index, _index_loaded_at
+    with _index_lock:
+        if _index is None or time.monotonic() - _index_loaded_at > INDEX_TTL_SECONDS:
+            _index = load_plan_index()
+            _index_loaded_at = time.monotonic()
+        return _index
+
+
+def rebase_plan_dates(plan: Dict[str, Any], dates: Sequence[str]) -> Dict[str, Any]:
+    """
+    Переносит план на новые даты тренировок.
+
+    Args:
+        plan: План тренировок
+        dates: Даты тренировок в формате ДД.ММ.ГГГГ (по одной на день плана)
+
+    Returns:
+        Dict: Копия плана с новыми датами и днями недели
+    """
+    rebased = copy.deepcopy(plan)
+    for day, date_str in zip(rebased.get("training_days", []), dates):
+        day["date"] = date_str
+        day["day"] = WEEKDAY_NAMES[parse_date(date_str).weekday()]
+    return rebased
+
+
+def retitle_plan(plan: Dict[str, Any], profile: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Заменяет название и описание использованного плана на составленные для нового бегуна.
+
+    Args:
+        plan: План похожего бегуна (изменяется на месте)
+        profile: Профиль нового бегуна
+
+    Returns:
+        Dict: Тот же план
+    """
+    distance = profile_distance_km(profile)
+    target = f"к дистанции {format_distance(distance)}" if distance else "к забегу"
+    sessions = len(plan.get("training_days", []))
+    plan["plan_name"] = f"План подготовки {target}"
+    plan["plan_description"] = (
+        f"Подготовка {target}. Тренировок: {sessions}, общий объем {format_distance(plan_distance_km(plan))}. "
+        f"Темп тренировок рассчитан по вашим зонам."
+    )
+    goal = profile.get("goal")
+    if goal:
+        plan["plan_description"] += f" Цель: {goal}."
+    return plan
+
+
+def format_plan_seed(plan: Dict[str, Any]) -> str:
+    """
+    Формирует компактный пример плана для промпта: одна строка на тренировку.
+
+    Args:
+        plan: План тренировок
+
+    Returns:
+        str: Текст примера
+    """
+    lines = [
+        f"- {day.get('training_type', '')}, {day.get('distance', '')}, темп {day.get('pace', '')}"
+        for day in plan.get("training_days", [])
+    ]
+    return (
+        "\nПример плана, который хорошо подошел бегуну с похожим профилем "
+        "(используй как ориентир по структуре и объему, не копируй дословно):\n"
+        + "\n".join(lines) + "\n"
+    )
+
+
+def suggest_plan(profile: Dict[str, Any], dates: Sequence[str]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Подбирает ближайший прошлый план для нового профиля.
+
+    Args:
+        profile: Профиль бегуна в формате бота
+        dates: Даты тренировок нового плана
+
+    Returns:
+        Tuple: (план для прямого использования или None, пример для промпта или None)
+    """
+    neighbours = get_plan_index().query(profile, k=1)
+    if not neighbours:
+        return None, None
+
+    distance, entry = neighbours[0]
+    if distance <= REUSE_MAX_DISTANCE and len(entry.plan["training_days"]) == len(dates):
+        logging.info(f"Используем план {entry.plan_id} похожего бегуна (расстояние {distance:.3f})")
+        return rebase_plan_dates(entry.plan, dates), None
+    if distance <= SEED_MAX_DISTANCE:
+        logging.info(f"План {entry.plan_id} похожего бегуна добавлен в промпт как пример (расстояние {distance:.3f})")
+        return None, format_plan_seed(entry.plan)
+    return None, None
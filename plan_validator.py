@@ -0,0 +1,387 @@
+"""
+Локальная валидация и восстановление планов тренировок, полученных от OpenAI.
+
+Модель иногда возвращает неполные или некорректные планы: без `training_days`,
+с неверными датами, с дистанцией в виде произвольного текста. Модуль приводит
+такой ответ к формату, который ожидает бот, исправляя типичные дефекты локально,
+и обращается к модели повторно только за теми полями, которые восстановить не удалось.
+"""
+
+import json
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+
+from metrics import REGISTRY
+from training_calendar import WEEKDAY_NAMES, parse_date
+from units import format_distance, parse_distance_km
+
+# Поля дня тренировки, без которых бот не может отобразить или учесть тренировку
+REQUIRED_DAY_FIELDS = ("training_type", "distance", "pace", "description")
+
+# Ключи, под которыми модель иногда возвращает список тренировок вместо training_days
+TRAINING_DAYS_ALIASES = ("days", "trainings", "workouts", "plan", "schedule")
+
+# Ключи, под которыми модель иногда оборачивает весь план
+PLAN_WRAPPER_KEYS = ("training_plan", "plan", "result")
+
+# Признаки дня отдыха в типе тренировки или в дистанции: такой день — 0 км без повторного запроса
+REST_MARKERS = ("отдых", "выходн", "rest")
+
+# Значения по умолчанию для полей, которые не удалось получить даже после повторного запроса
+DAY_FIELD_DEFAULTS = {
+    "training_type": "Легкий бег",
+    "pace": "Комфортный темп",
+    "description": "Легкий бег в комфортном разговорном темпе.",
+}
+
+
+class PlanDay(BaseModel):
+    """Модель дня тренировки в формате, используемом ботом."""
+    model_config = ConfigDict(extra="allow")
+
+    day: str = Field("", description="День недели")
+    date: str = Field("", description="Дата в формате ДД.ММ.ГГГГ")
+    training_type: str = Field("", description="Тип тренировки")
+    distance: str = Field("", description="Дистанция (например, '5 км')")
+    pace: str = Field("", description="Целевой темп")
+    description: str = Field("", description="Описание тренировки")
+
+    @field_validator("day", "date", "training_type", "pace", "description", mode="before")
+    @classmethod
+    def _coerce_text(cls, value: Any) -> str:
+        if value is None:
+            return ""
+        if isinstance(value, (list, tuple)):
+            return "\n".join(str(item) for item in value)
+        if isinstance(value, dict):
+            return "\n".join(f"{key}: {item}" for key, item in value.items())
+        return str(value).strip()
+
+    @field_validator("distance", mode="before")
+    @classmethod
+    def _coerce_distance(cls, value: Any) -> str:
+        km = parse_distance_km(value)
+        if km is None:
+            return ""
+        return format_distance(km)
+
+
+def is_rest_text(value: Any) -> bool:
+    """Текст обозначает день отдыха ("Отдых", "Выходной")."""
+    return isinstance(value, str) and any(marker in value.lower() for marker in REST_MARKERS)
+
+
+class PlanModel(BaseModel):
+    """Модель плана тренировок в формате, используемом ботом."""
+    model_config = ConfigDict(extra="allow")
+
+    plan_name: str = Field("План тренировок", description="Название плана")
+    plan_description: str = Field("", description="Описание плана")
+    training_days: List[PlanDay] = Field(default_factory=list, description="Дни тренировок")
+
+    @field_validator("plan_name", "plan_description", mode="before")
+    @classmethod
+    def _coerce_text(cls, value: Any) -> str:
+        return "" if value is None else str(value).strip()
+
+
+@dataclass
+class PlanValidationResult:
+    """Результат локальной проверки плана."""
+    plan: Dict[str, Any]
+    repairs: List[str] = field(default_factory=list)
+    broken_fields: List[Tuple[int, str]] = field(default_factory=list)
+
+    @property
+    def is_valid(self) -> bool:
+        return not self.broken_fields
+
+
+class PlanValidationStats:
+    """Потокобезопасные счетчики исправлений и повторных запросов."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.total = 0
+        self.repaired = 0
+        self.reprompted = 0
+        self.defaulted = 0
+
+    def record(self, repaired: bool, reprompted: bool, defaulted: bool):
+        with self._lock:
+            self.total += 1
+            self.repaired += int(repaired)
+            self.reprompted += int(reprompted)
+            self.defaulted += int(defaulted)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.total
+            return {
+                "total": total,
+                "repaired": self.repaired,
+                "reprompted": self.reprompted,
+                "defaulted": self.defaulted,
+                "repair_rate": self.repaired / total if total else 0.0,
+                "reprompt_rate": self.reprompted / total if total else 0.0,
+            }
+
+
+_stats = PlanValidationStats()
+
+
+def get_validation_stats() -> Dict[str, Any]:
+    """
+    Возвращает статистику проверок планов с момента запуска процесса.
+
+    Returns:
+        Dict: Количество проверенных планов, доли исправленных локально и
+        потребовавших повторного запроса к модели
+    """
+    return _stats.snapshot()
+
+
+def _unwrap_plan(raw: Any, repairs: List[str]) -> Dict[str, Any]:
+    """Приводит ответ модели к словарю с ключом training_days."""
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+            repairs.append("план получен строкой и разобран как JSON")
+        except (ValueError, TypeError):
+            raw = {}
+    if isinstance(raw, list):
+        repairs.append("план получен списком дней")
+        raw = {"training_days": raw}
+    if not isinstance(raw, dict):
+        repairs.append("ответ модели не является объектом JSON")
+        return {"training_days": []}
+
+    if "training_days" not in raw:
+        for key in PLAN_WRAPPER_KEYS:
+            nested = raw.get(key)
+            if isinstance(nested, dict) and any(
+                    isinstance(nested.get(k), list) for k in ("training_days",) + TRAINING_DAYS_ALIASES):
+                repairs.append(f"план извлечен из обертки '{key}'")
+                merged = {k: v for k, v in raw.items() if k != key}
+                merged.update(nested)
+                raw = merged
+                break
+
+    if "training_days" not in raw:
+        for key in TRAINING_DAYS_ALIASES:
+            if isinstance(raw.get(key), list):
+                repairs.append(f"список тренировок переименован из '{key}'")
+                raw = dict(raw)
+                raw["training_days"] = raw.pop(key)
+                break
+
+    if not isinstance(raw.get("training_days"), list):
+        if "training_days" in raw:
+            repairs.append("поле training_days имеет неверный тип")
+        raw = dict(raw)
+        raw["training_days"] = []
+
+    return raw
+
+
+def validate_plan(raw: Any, expected_dates: Optional[List[str]] = None,
+                  max_days: Optional[int] = None) -> PlanValidationResult:
+    """
+    Проверяет план, полученный от модели, и исправляет типичные дефекты локально.
+
+    Args:
+        raw: Ответ модели (словарь, список дней или строка JSON)
+        expected_dates: Даты тренировок в формате ДД.ММ.ГГГГ, рассчитанные по календарю
+        max_days: Максимальное количество дней тренировок в плане
+
+    Returns:
+        PlanValidationResult: Нормализованный план, список исправлений и
+        список полей (индекс дня, поле), которые не удалось восстановить
+    """
+    repairs: List[str] = []
+    data = _unwrap_plan(raw, repairs)
+
+    days_limit = max_days
+    if expected_dates:
+        days_limit = len(expected_dates) if days_limit is None else min(days_limit, len(expected_dates))
+
+    raw_days = [day for day in data["training_days"] if isinstance(day, dict)]
+    if len(raw_days) != len(data["training_days"]):
+        repairs.append("из плана удалены дни, не являющиеся объектами")
+
+    if days_limit is not None and len(raw_days) > days_limit:
+        repairs.append(f"количество дней сокращено с {len(raw_days)} до {days_limit}")
+        raw_days = raw_days[:days_limit]
+
+    if expected_dates and len(raw_days) < len(expected_dates):
+        repairs.append(f"добавлены недостающие дни: {len(expected_dates) - len(raw_days)}")
+        raw_days = raw_days + [{} for _ in range(len(expected_dates) - len(raw_days))]
+
+    model = PlanModel.model_validate({**data, "training_days": raw_days})
+    if not data.get("plan_name"):
+        repairs.append("добавлено название плана")
+
+    broken: List[Tuple[int, str]] = []
+    for idx, (day, raw_day) in enumerate(zip(model.training_days, raw_days)):
+        if expected_dates:
+            expected = expected_dates[idx]
+            if day.date != expected:
+                if day.date:
+                    repairs.append(f"день {idx + 1}: дата {day.date} заменена на {expected}")
+                day.date = expected
+        date_obj = parse_date(day.date)
+        if date_obj is None:
+            broken.append((idx, "date"))
+        else:
+            normalized_date = date_obj.strftime("%d.%m.%Y")
+            if normalized_date != day.date:
+                repairs.append(f"день {idx + 1}: дата приведена к формату ДД.ММ.ГГГГ")
+                day.date = normalized_date
+            weekday = WEEKDAY_NAMES[date_obj.weekday()]
+            if day.day != weekday:
+                if day.day:
+                    repairs.append(f"день {idx + 1}: день недели исправлен на {weekday}")
+                day.day = weekday
+
+        raw_distance = raw_day.get("distance")
+        if not day.distance and (is_rest_text(day.training_type) or is_rest_text(raw_distance)):
+            day.distance = format_distance(0)
+            repairs.append(f"день {idx + 1}: дистанция дня отдыха — {day.distance}")
+        elif raw_distance is not None and day.distance and str(raw_distance) != day.distance:
+            repairs.append(f"день {idx + 1}: дистанция '{raw_distance}' приведена к '{day.distance}'")
+
+        for field_name in REQUIRED_DAY_FIELDS:
+            if not getattr(day, field_name):
+                broken.append((idx, field_name))
+
+    return PlanValidationResult(
+        plan=model.model_dump(),
+        repairs=repairs,
+        broken_fields=broken,
+    )
+
+
+def _reprompt_broken_fields(client: Any, model_name: str, plan: Dict[str, Any],
+                            broken_fields: List[Tuple[int, str]],
+                            context_note: Optional[str] = None) -> Dict[int, Dict[str, Any]]:
+    """
+    Запрашивает у модели только недостающие поля плана.
+
+    Returns:
+        Dict[int, Dict[str, Any]]: Значения полей по индексу дня
+    """
+    by_day: Dict[int, List[str]] = {}
+    for idx, field_name in broken_fields:
+        if field_name == "date":
+            continue
+        by_day.setdefault(idx, []).append(field_name)
+    if not by_day:
+        return {}
+
+    days_info = []
+    for idx, fields in sorted(by_day.items()):
+        day = plan["training_days"][idx]
+        known = {k: v for k, v in day.items() if v and k not in fields}
+        days_info.append({"index": idx, "known": known, "missing": fields})
+
+    prompt = (
+        "В плане беговых тренировок не заполнены некоторые поля. "
+        "Заполни ТОЛЬКО недостающие поля для указанных дней, не меняя остальные.\n\n"
+        f"План: {plan.get('plan_name', '')}\n"
+    )
+    if context_note:
+        prompt += f"{context_note}\n"
+    prompt += (
+        f"Дни с недостающими полями:\n{json.dumps(days_info, ensure_ascii=False)}\n\n"
+        "Ответь в JSON формате: {\"days\": [{\"index\": номер, \"поле\": \"значение\", ...}]}. "
+        "Дистанцию указывай в формате '5 км', темп — в формате '5:30/км'."
+    )
+
+    with REGISTRY.timed("llm_call_seconds", site="plan_validator.reprompt_broken_fields"):
+        response = client.chat.completions.create(
+            model=model_name,
+            messages=[
+                {"role": "system", "content": "Ты опытный беговой тренер. Отвечай только в указанном JSON формате на русском языке."},
+                {"role": "user", "content": prompt},
+            ],
+            response_format={"type": "json_object"},
+            temperature=0.3,
+        )
+    content = response.choices[0].message.content
+    answer = json.loads(content) if content else {}
+
+    result: Dict[int, Dict[str, Any]] = {}
+    for item in answer.get("days", []) if isinstance(answer, dict) else []:
+        if not isinstance(item, dict):
+            continue
+        try:
+            idx = int(item.get("index"))
+        except (TypeError, ValueError):
+            continue
+        if idx in by_day:
+            result[idx] = {k: item[k] for k in by_day[idx] if k in item}
+    return result
+
+
+def repair_plan(raw: Any, client: Any = None, model_name: str = "gpt-4o",
+                expected_dates: Optional[List[str]] = None, max_days: Optional[int] = None,
+                context_note: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Проверяет и восстанавливает план, полученный от модели.
+
+    Сначала дефекты исправляются локально. Если после этого остаются пустые поля,
+    у модели запрашиваются только они; оставшиеся пробелы заполняются значениями
+    по умолчанию, чтобы план всегда можно было отобразить и учесть.
+
+    Args:
+        raw: Ответ модели
+        client: Клиент OpenAI для повторного запроса (если None, запрос не выполняется)
+        model_name: Модель для повторного запроса
+        expected_dates: Даты тренировок, рассчитанные по календарю
+        max_days: Максимальное количество дней в плане
+        context_note: Краткий контекст бегуна для повторного запроса
+
+    Returns:
+        Dict: План тренировок в формате бота
+    """
+    result = validate_plan(raw, expected_dates=expected_dates, max_days=max_days)
+    repairs = list(result.repairs)
+    reprompted = False
+    defaulted = False
+
+    if result.broken_fields and client is not None:
+        reprompted = True
+        logging.info(f"В плане не хватает полей: {result.broken_fields}. Запрашиваем только их")
+        try:
+            patches = _reprompt_broken_fields(client, model_name, result.plan,
+                                              result.broken_fields, context_note)
+            for idx, values in patches.items():
+                result.plan["training_days"][idx].update(values)
+            result = validate_plan(result.plan, expected_dates=expected_dates, max_days=max_days)
+        except Exception as e:
+            logging.error(f"Ошибка при повторном запросе недостающих полей плана: {e}")
+
+    if result.broken_fields:
+        defaulted = True
+        for idx, field_name in result.broken_fields:
+            day = result.plan["training_days"][idx]
+            if field_name == "distance":
+                day["distance"] = format_distance(0)
+            elif field_name in DAY_FIELD_DEFAULTS:
+                day[field_name] = DAY_FIELD_DEFAULTS[field_name]
+        logging.warning(f"Поля плана заполнены значениями по умолчанию: {result.broken_fields}")
+
+    _stats.record(repaired=bool(repairs), reprompted=reprompted, defaulted=defaulted)
+    if repairs:
+        logging.info(f"План исправлен локально: {'; '.join(repairs)}")
+    stats = _stats.snapshot()
+    logging.info(
+        f"Проверка плана: всего {stats['total']}, "
+        f"доля исправлений {stats['repair_rate']:.0%}, доля повторных запросов {stats['reprompt_rate']:.0%}"
+    )
+
+    return result.plan
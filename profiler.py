@@ -0,0 +1,242 @@
+"""
+Профилирование работающего процесса бота по запросу администратора.
+
+Сеанс запускается командой /profile [секунды] (только ADMIN_TELEGRAM_IDS) или
+сигналом SIGUSR2 (main.py, bot_runner.py, обработчики вебхука). На время
+сеанса отдельный поток раз в SAMPLE_INTERVAL секунд снимает стеки всех потоков
+(sys._current_frames), а tracemalloc отслеживает выделения памяти. Вне сеанса
+профилировщик ничего не делает.
+
+Отчеты пишутся в PROFILE_DIR:
+    profile-<время>-<pid>.folded     — свернутые стеки (flamegraph.pl, speedscope)
+    profile-<время>-<pid>.alloc.txt  — строки с наибольшим приростом памяти
+Одновременно выполняется только один сеанс.
+"""
+
+import asyncio
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from telegram.ext import CommandHandler, filters
+
+from config import ADMIN_TELEGRAM_IDS, PROFILE_DIR
+
+# Длительность сеанса по умолчанию и наибольшая (секунды)
+DEFAULT_SECONDS = 30
+PROFILE_MAX_SECONDS = 300
+# Период снятия стеков (секунды)
+SAMPLE_INTERVAL = 0.01
+# Глубина стека выделений tracemalloc
+TRACEMALLOC_FRAMES = 1
+# Количество строк выделений в отчете и самых частых функций в сводке
+ALLOCATIONS_KEPT = 50
+SUMMARY_TOP = 5
+# Группа команды: раньше обработчиков диалогов, после update_dedup и метрик
+PROFILE_GROUP = -10
+
+
+def frame_label(code) -> str:
+    """Имя кадра стека: функция и файл с первой строкой функции."""
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def sample_stacks(stacks: Counter, skip: int, names: Dict[int, str]) -> None:
+    """
+    Добавляет текущие стеки всех потоков, кроме skip, в свернутом виде: поток;внешний;...;внутренний.
+
+    Args:
+        names: Имена потоков по идентификатору; дополняется при появлении нового потока
+    """
+    for ident, frame in sys._current_frames().items():
+        if ident == skip:
+            continue
+        if ident not in names:
+            names.update((thread.ident, thread.name) for thread in threading.enumerate())
+        stack = []
+        while frame is not None:
+            stack.append(frame_label(frame.f_code).replace(";", ","))
+            frame = frame.f_back
+        stack.append(names.get(ident, str(ident)))
+        stacks[";".join(reversed(stack))] += 1
+
+
+@dataclass
+class ProfileReport:
+    """Результат сеанса профилирования."""
+    seconds: float
+    samples: int
+    stacks_path: str
+    allocations_path: str
+    hot: List[Tuple[str, int]] = field(default_factory=list)
+    allocations: List[str] = field(default_factory=list)
+
+    def summary(self) -> str:
+        lines = [f"Профилирование процесса {os.getpid()}: {self.seconds:g} с, {self.samples} снимков стеков",
+                 f"Стеки: {self.stacks_path}", f"Память: {self.allocations_path}", "", "Чаще всего на вершине стека:"]
+        for label, count in self.hot:
+            lines.append(f"  {count * 100 / max(self.samples, 1):5.1f}%  {label}")
+        lines.append("Наибольший прирост памяти:")
+        lines.extend(f"  {line}" for line in self.allocations[:SUMMARY_TOP])
+        return "\n".join(lines)
+
+
+class Profiler:
+    """
+    Сеансы профилирования процесса, не больше одного одновременно.
+
+    Args:
+        directory: Каталог отчетов
+        interval: Период снятия стеков (секунды)
+    """
+
+    def __init__(self, directory: str = PROFILE_DIR, interval: float = SAMPLE_INTERVAL):
+        self.directory = directory
+        self.interval = interval
+        self._lock = threading.Lock()
+        self.running = False
+
+    def start(self, seconds: float, on_done: Optional[Callable[[ProfileReport], None]] = None) -> bool:
+        """
+        Запускает сеанс в отдельном потоке.
+
+        Args:
+            seconds: Длительность сеанса (не больше PROFILE_MAX_SECONDS)
+            on_done: Вызывается с отчетом в потоке профилировщика
+
+        Returns:
+            bool: False, если сеанс уже выполняется
+        """
+        with self._lock:
+            if self.running:
+                return False
+            self.running = True
+
+        def run():
+            try:
+                report = self._profile(seconds)
+                logging.info(report.summary())
+                if on_done is not None:
+                    on_done(report)
+            except Exception as e:
+                logging.error(f"Ошибка профилирования: {e}", exc_info=True)
+            finally:
+                self.running = False
+
+        threading.Thread(target=run, name="profiler", daemon=True).start()
+        return True
+
+    def run(self, seconds: float) -> Optional[ProfileReport]:
+        """Выполняет сеанс в текущем потоке; None, если сеанс уже выполняется."""
+        with self._lock:
+            if self.running:
+                return None
+            self.running = True
+        try:
+            return self._profile(seconds)
+        finally:
+            self.running = False
+
+    def _profile(self, seconds: float) -> ProfileReport:
+        seconds = min(seconds, PROFILE_MAX_SECONDS)
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        baseline = tracemalloc.take_snapshot()
+
+        stacks: Counter = Counter()
+        names: Dict[int, str] = {}
+        samples = 0
+        me = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            sample_stacks(stacks, me, names)
+            samples += 1
+            time.sleep(self.interval)
+
+        snapshot = tracemalloc.take_snapshot()
+        if started_tracing:
+            tracemalloc.stop()
+        ignored = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        growth = [stat for stat in snapshot.filter_traces(ignored).compare_to(baseline.filter_traces(ignored), "lineno")
+                  if stat.size_diff > 0][:ALLOCATIONS_KEPT]
+        return self._write(seconds, samples, stacks, [str(stat) for stat in growth])
+
+    def _write(self, seconds: float, samples: int, stacks: Counter, allocations: List[str]) -> ProfileReport:
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, f"profile-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+        report = ProfileReport(seconds=seconds, samples=samples, stacks_path=f"{base}.folded",
+                               allocations_path=f"{base}.alloc.txt", allocations=allocations)
+        with open(report.stacks_path, "w", encoding="utf-8") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(report.allocations_path, "w", encoding="utf-8") as f:
+            f.write(f"Прирост памяти за {seconds:g} с (tracemalloc), процесс {os.getpid()}\n")
+            f.write("\n".join(allocations) + "\n")
+
+        leaves: Counter = Counter()
+        for stack, count in stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        report.hot = leaves.most_common(SUMMARY_TOP)
+        return report
+
+
+PROFILER = Profiler()
+
+
+def parse_seconds(args: List[str]) -> Optional[float]:
+    """Длительность из аргументов команды; None при неверном значении."""
+    if not args:
+        return DEFAULT_SECONDS
+    try:
+        seconds = float(args[0])
+    except ValueError:
+        return None
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        return None
+    return seconds
+
+
+async def profile_command(update, context):
+    """Команда /profile [секунды]: сеанс профилирования, отчет приходит сообщением."""
+    seconds = parse_seconds(context.args)
+    if seconds is None:
+        await update.message.reply_text(f"Использование: /profile [секунды от 1 до {PROFILE_MAX_SECONDS}]")
+        return
+    loop = asyncio.get_running_loop()
+    chat_id = update.effective_chat.id
+
+    def send_report(report):
+        asyncio.run_coroutine_threadsafe(context.bot.send_message(chat_id=chat_id, text=report.summary()), loop)
+
+    if not PROFILER.start(seconds, on_done=send_report):
+        await update.message.reply_text("Профилирование уже выполняется")
+        return
+    await update.message.reply_text(f"Профилирование процесса {os.getpid()} на {seconds:g} с запущено")
+
+
+def install_profile_command(application) -> None:
+    """Регистрирует /profile для администраторов; без ADMIN_TELEGRAM_IDS команда никому не доступна."""
+    application.add_handler(
+        CommandHandler("profile", profile_command, filters=filters.User(user_id=ADMIN_TELEGRAM_IDS)),
+        group=PROFILE_GROUP,
+    )
+
+
+def install_profile_signal(loop: asyncio.AbstractEventLoop, seconds: float = DEFAULT_SECONDS) -> None:
+    """Сеанс профилирования по сигналу SIGUSR2 (kill -USR2 <pid>); отчет пишется в журнал."""
+    if not hasattr(signal, "SIGUSR2"):
+        return
+
+    def on_signal():
+        if not PROFILER.start(seconds):
+            logging.warning("Профилирование уже выполняется")
+
+    loop.add_signal_handler(signal.SIGUSR2, on_signal)
@@ -112,11 +112,10 @@ def initialize_request():
 @app.route('/initialize')
 def initialize():
     """Маршрут для инициализации бота."""
-    with app.app_context():
-        # Импортируем модели и создаем таблицы
-        import models
-        db.create_all()
-        add_log("БД инициализирована", "INFO")
+    # Применяем недостающие миграции схемы
+    from migrations import ensure_schema
+    ensure_schema()
+    add_log("БД инициализирована", "INFO")
     return jsonify({"status": "success", "message": "БД успешно инициализирована"})
 
 @app.route('/')
@@ -187,11 +186,10 @@ def status():
 
 if __name__ == '__main__':
     # Инициализируем БД перед запуском
-    with app.app_context():
-        # Импортируем модели и создаем таблицы
-        import models
-        db.create_all()
-        add_log("БД инициализирована", "INFO")
+    # Применяем недостающие миграции схемы
+    from migrations import ensure_schema
+    ensure_schema()
+    add_log("БД инициализирована", "INFO")
 
     # Запускаем бота при старте приложения
     start_bot()
@@ -1,11 +1,16 @@
 """
-Скрипт для отправки команды создания нового профиля пользователю @Ploskym.
+Скрипт для отправки команды создания нового профиля пользователю по username.
+
+Сообщение отправляется кампанией broadcast.py с аудиторией "username", поэтому
+повторный запуск для того же пользователя не дублирует сообщение.
+
+    python send_command_to_user.py [username]
 """
-import os
-import sys
-import logging
+import argparse
 import asyncio
-from telegram import Bot
+import logging
+
+from broadcast import BroadcastManager, run_campaign
 
 # Настройка логирования
 logging.basicConfig(
@@ -14,51 +19,30 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-async def send_message_to_user():
-    """Отправляет сообщение пользователю @Ploskym для начала создания профиля."""
-    try:
-        # Получаем токен из переменных окружения
-        token = os.environ.get("TELEGRAM_TOKEN")
-        if not token:
-            logger.error("TELEGRAM_TOKEN не найден в переменных окружения")
-            return
-        
-        # Создаем экземпляр бота
-        bot = Bot(token=token)
-        
-        # Получаем ID пользователя из базы данных
-        import psycopg2
-        conn = psycopg2.connect(os.environ.get('DATABASE_URL'))
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT telegram_id FROM users WHERE username = %s', ('Ploskym',))
-        user = cursor.fetchone()
-        
-        if not user:
-            logger.error('Пользователь @Ploskym не найден')
-            return
-            
-        telegram_id = user[0]
-        logger.info(f"Найден пользователь @Ploskym с telegram_id: {telegram_id}")
-        
-        # Отправляем сообщение для начала создания профиля
-        message = "Давайте создадим ваш профиль! Для начала, скажите, на какую дистанцию вы тренируетесь? (например, 5 км, 10 км, полумарафон, марафон)"
-        
-        await bot.send_message(
-            chat_id=telegram_id, 
-            text=message
-        )
-        
-        logger.info(f"Сообщение успешно отправлено пользователю @Ploskym (telegram_id: {telegram_id})")
-        
-    except Exception as e:
-        logger.error(f"Ошибка при отправке сообщения: {e}", exc_info=True)
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'conn' in locals():
-            conn.close()
+PROFILE_START_MESSAGE = (
+    "Давайте создадим ваш профиль! Для начала, скажите, на какую дистанцию вы тренируетесь? "
+    "(например, 5 км, 10 км, полумарафон, марафон)"
+)
+
+
+async def send_message_to_user(username):
+    """Отправляет пользователю сообщение для начала создания профиля."""
+    campaign_name = f"profile_start_{username}"
+    campaign_id = BroadcastManager.create_campaign(
+        campaign_name, "username", PROFILE_START_MESSAGE, {"username": username}
+    )
+    if campaign_id is None:
+        return
+
+    progress = await run_campaign(campaign_name)
+    if progress is not None and progress.total == 0:
+        logger.info(f"Пользователь @{username} не найден или сообщение ему уже отправлено")
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Отправка команды создания профиля пользователю")
+    parser.add_argument("username", nargs="?", default="Ploskym", help="Username без @")
+    args = parser.parse_args()
+
     # Запускаем отправку сообщения
-    asyncio.run(send_message_to_user())
\ No newline at end of file
+    asyncio.run(send_message_to_user(args.username.lstrip("@")))
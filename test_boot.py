@@ -0,0 +1,107 @@
+"""
+Тест быстрого запуска: замер фаз, параллельный прогрев и отметка первого
+обновления. Не обращается к базе данных и Telegram.
+"""
+
+import asyncio
+import logging
+import subprocess
+import sys
+import time
+
+import boot
+from boot import BOOT_PROBE_GROUP, BootTimer, install_boot_probe, prewarm
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+
+class FakeBot:
+    async def initialize(self):
+        await asyncio.sleep(0.2)
+
+
+class FakeApplication:
+    def __init__(self):
+        self.bot = FakeBot()
+        self.handlers = {}
+
+    def add_handler(self, handler, group=0):
+        self.handlers.setdefault(group, []).append(handler)
+
+
+def test_phases():
+    """Проверяет запись последовательных и параллельных фаз."""
+    timer = BootTimer(started=time.perf_counter())
+    timer.checkpoint("импорт модулей")
+
+    async def phase():
+        await asyncio.sleep(0.01)
+        return "ok"
+
+    assert asyncio.run(timer.timed("база данных", phase())) == "ok"
+    assert [name for name, _ in timer.phases] == ["импорт модулей", "база данных"]
+    assert timer.phases[1][1] >= 0.01
+    assert "база данных" in timer.report("Polling запущен")
+
+
+def test_prewarm_is_parallel():
+    """Проверяет, что база данных и Telegram прогреваются одновременно, а ошибка не останавливает запуск."""
+    timer = BootTimer(started=time.perf_counter())
+    warm_database = boot._warm_database
+
+    def slow_database():
+        time.sleep(0.2)
+        raise ConnectionError("database is down")
+
+    boot._warm_database = slow_database
+    try:
+        started = time.perf_counter()
+        asyncio.run(prewarm(FakeApplication(), timer))
+        elapsed = time.perf_counter() - started
+    finally:
+        boot._warm_database = warm_database
+
+    assert elapsed < 0.35
+    assert sorted(name for name, _ in timer.phases[:2]) == ["Telegram API", "база данных"]
+    assert timer.phases[2][0] == "прогрев"
+
+
+def test_first_update_probe():
+    """Проверяет, что отмечается только первое обновление, раньше захвата update_dedup."""
+    timer = BootTimer(started=time.perf_counter())
+    application = FakeApplication()
+    install_boot_probe(application, timer)
+    probe = application.handlers[BOOT_PROBE_GROUP][0].callback
+
+    asyncio.run(probe(None, None))
+    first = timer.first_update
+    asyncio.run(probe(None, None))
+    assert first is not None and timer.first_update == first
+
+
+def test_openai_is_lazy():
+    """Проверяет, что модуль бота не импортирует OpenAI при запуске."""
+    code = "import sys, bot_modified; print('openai' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, timeout=60)
+    assert result.stdout.strip().splitlines()[-1] == "False"
+
+
+def main():
+    """Основная функция для запуска тестов."""
+    print("=" * 60)
+    print("Тест быстрого запуска")
+    print("=" * 60)
+
+    test_phases()
+    test_prewarm_is_parallel()
+    test_first_update_probe()
+    test_openai_is_lazy()
+
+    print("\n✅ Тесты быстрого запуска успешно пройдены")
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
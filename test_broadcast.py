@@ -0,0 +1,108 @@
+"""
+Тест рассылок: подстановка имени, разбор ошибок Bot API, ограничение скорости
+и параллельная отправка пачки. Не обращается к базе данных и Telegram.
+"""
+
+import asyncio
+import logging
+from datetime import timedelta
+
+from telegram.error import BadRequest, Forbidden, RetryAfter, TimedOut
+
+from broadcast import BroadcastProgress, Delivery, RateLimiter, classify_error, render_message, send_batch
+from migrations import MIGRATIONS, SCHEMA_CAPABILITIES
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+
+class FakeBot:
+    """Бот, который отвечает заданными ошибками по chat_id."""
+
+    def __init__(self, errors):
+        self.errors = {chat_id: list(chat_errors) for chat_id, chat_errors in errors.items()}
+        self.sent = []
+
+    async def send_message(self, chat_id, text):
+        errors = self.errors.get(chat_id)
+        if errors:
+            raise errors.pop(0)
+        self.sent.append((chat_id, text))
+
+
+def test_render_message():
+    """Проверяет подстановку имени и сохранение остальных скобок."""
+    template = "Привет{name_suffix}! {first_name} {x}"
+    assert render_message(template, "Анна") == "Привет, Анна! Анна {x}"
+    assert render_message(template, None) == "Привет!  {x}"
+
+
+def test_classify_error():
+    """Проверяет, какие ошибки повторяются, а какие завершают доставку."""
+    assert classify_error(RetryAfter(timedelta(seconds=3))) == ("retry", 3.0)
+    assert classify_error(Forbidden("bot was blocked by the user")) == ("blocked", None)
+    assert classify_error(BadRequest("chat not found")) == ("failed", None)
+    assert classify_error(TimedOut()) == ("retry", None)
+
+
+def test_rate_limiter():
+    """Проверяет запас, очередь резервирований и паузу после RetryAfter."""
+    now = [100.0]
+    limiter = RateLimiter(10, burst=2, clock=lambda: now[0])
+    assert [round(limiter.reserve(), 3) for _ in range(4)] == [0.0, 0.0, 0.1, 0.2]
+
+    # Через секунду очередь рассосалась, запас снова полный
+    now[0] += 1.0
+    assert limiter.reserve() == 0.0
+    limiter.pause(5)
+    assert limiter.reserve() == 5.0
+
+
+def test_send_batch():
+    """Проверяет статусы пачки: доставлено, повтор после RetryAfter, блокировка, ошибка."""
+    bot = FakeBot({
+        2: [RetryAfter(timedelta(milliseconds=20))],
+        3: [Forbidden("bot was blocked by the user")],
+        4: [BadRequest("chat not found")],
+    })
+    deliveries = [Delivery(user_id, user_id, name) for user_id, name in
+                  ((1, "Анна"), (2, None), (3, "Иван"), (4, None))]
+    progress = BroadcastProgress(total=len(deliveries))
+
+    async def run():
+        return await send_batch(bot, "Привет{name_suffix}!", deliveries, RateLimiter(1000),
+                                asyncio.Semaphore(2), progress)
+
+    results = asyncio.run(run())
+    assert [(user_id, status) for user_id, status, _ in results] == [
+        (1, "sent"), (2, "sent"), (3, "blocked"), (4, "failed")]
+    assert sorted(bot.sent) == [(1, "Привет, Анна!"), (2, "Привет!")]
+    assert progress.done == 4 and progress.counts["sent"] == 2
+
+
+def test_broadcast_migration():
+    """Проверяет таблицы кампаний и состояния доставки в миграции."""
+    sql = MIGRATIONS[SCHEMA_CAPABILITIES["broadcast_campaigns"] - 1].sql
+    assert "CREATE TABLE IF NOT EXISTS broadcast_campaigns" in sql
+    assert "PRIMARY KEY (campaign_id, user_id)" in sql
+
+
+def main():
+    """Основная функция для запуска тестов."""
+    print("=" * 60)
+    print("Тест рассылок")
+    print("=" * 60)
+
+    test_render_message()
+    test_classify_error()
+    test_rate_limiter()
+    test_send_batch()
+    test_broadcast_migration()
+
+    print("\n✅ Тесты рассылок успешно пройдены")
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Тест отпечатков черновиков продолжения плана.
+Не обращается к базе данных и OpenAI API: менеджеры и генерация подменяются.
+"""
+
+import logging
+import threading
+from datetime import timedelta
+
+import continuation_drafts
+from continuation_drafts import _is_draft_current, build_fingerprint
+from training_calendar import today_moscow
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+PROFILE = {"id": 1, "distance": "10", "weekly_volume": "20", "updated_at": "2025-05-10 10:00:00"}
+PLAN_DATA = {
+    "plan_name": "План",
+    "training_days": [
+        {"date": "12.05.2025", "distance": "5 км"},
+        {"date": "14.05.2025", "distance": "8 км"},
+    ],
+}
+
+
+def test_fingerprint_tracks_final_day_outcome():
+    """Проверяет, что отмена последнего дня вместо выполнения делает черновик устаревшим."""
+    projected = build_fingerprint(PROFILE, 7, PLAN_DATA, [1, 2], [])
+
+    assert build_fingerprint(PROFILE, 7, PLAN_DATA, [2, 1], []) == projected
+    assert build_fingerprint(PROFILE, 7, PLAN_DATA, [1], [2]) != projected
+
+
+def test_fingerprint_ignores_weekly_volume():
+    """Проверяет, что обновление недельного объема не сбрасывает черновик."""
+    updated_profile = dict(PROFILE, weekly_volume="33.0", updated_at="2025-05-14 20:00:00")
+
+    assert build_fingerprint(updated_profile, 7, PLAN_DATA, [1, 2], []) == \
+        build_fingerprint(PROFILE, 7, PLAN_DATA, [1, 2], [])
+    assert build_fingerprint(dict(PROFILE, distance="21.1"), 7, PLAN_DATA, [1, 2], []) != \
+        build_fingerprint(PROFILE, 7, PLAN_DATA, [1, 2], [])
+
+
+def test_draft_with_past_dates_is_stale():
+    """Проверяет, что черновик с прошедшими датами не выдается."""
+    today = today_moscow()
+    future = {"training_days": [{"date": (today + timedelta(days=1)).strftime("%d.%m.%Y")}]}
+    past = {"training_days": [{"date": (today - timedelta(days=1)).strftime("%d.%m.%Y")}]}
+
+    assert _is_draft_current(future)
+    assert not _is_draft_current(past)
+
+
+def test_take_waits_for_in_flight_draft():
+    """Проверяет, что нажатие во время предгенерации дожидается ее, а не генерирует план заново."""
+    today = today_moscow()
+    draft = {"training_days": [{"date": (today + timedelta(days=1)).strftime("%d.%m.%Y")}]}
+    started = threading.Event()
+    release = threading.Event()
+    drafts = {}
+    generations = []
+    pruned = []
+
+    def fake_pregenerate(user_id, plan_id):
+        started.set()
+        release.wait(5)
+        generations.append(plan_id)
+        drafts[(user_id, plan_id)] = draft
+        return True
+
+    manager = continuation_drafts.ContinuationDraftManager
+    plans = continuation_drafts.TrainingPlanManager
+    saved = (continuation_drafts.pregenerate_continuation, manager.pop_draft, manager.prune_drafts,
+             plans.get_completed_trainings, plans.get_canceled_trainings)
+    continuation_drafts.pregenerate_continuation = fake_pregenerate
+    manager.pop_draft = staticmethod(lambda user_id, plan_id, fingerprint: drafts.pop((user_id, plan_id), None))
+    manager.prune_drafts = staticmethod(lambda user_id: pruned.append(user_id))
+    plans.get_completed_trainings = staticmethod(lambda user_id, plan_id: [1, 2])
+    plans.get_canceled_trainings = staticmethod(lambda user_id, plan_id: [])
+    try:
+        assert continuation_drafts.schedule_continuation_draft(1, 7, 2, [1])
+        assert not continuation_drafts.schedule_continuation_draft(1, 7, 2, [1])
+        assert started.wait(5)
+        assert continuation_drafts.continuation_in_flight(1, 7)
+
+        threading.Timer(0.1, release.set).start()
+        taken = continuation_drafts.take_continuation_draft(1, 7, PROFILE, {"plan_data": PLAN_DATA})
+    finally:
+        (continuation_drafts.pregenerate_continuation, manager.pop_draft, manager.prune_drafts,
+         plans.get_completed_trainings, plans.get_canceled_trainings) = saved
+
+    assert taken == draft
+    assert generations == [7]
+    assert pruned == [1]
+    assert not continuation_drafts.continuation_in_flight(1, 7)
+
+
+def main():
+    """Основная функция для запуска тестов."""
+    print("=" * 60)
+    print("Тест черновиков продолжения плана")
+    print("=" * 60)
+
+    test_fingerprint_tracks_final_day_outcome()
+    test_fingerprint_ignores_weekly_volume()
+    test_draft_with_past_dates_is_stale()
+    test_take_waits_for_in_flight_draft()
+
+    print("\n✅ Тесты черновиков продолжения успешно пройдены")
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Тест выбора лидера: одна реплика получает роль, резервная забирает ее после
+потери сессии лидера, а лидер без аренды останавливает работу роли; вебхук
+принимает только лидер роли webhook.
+Вместо базы данных используется имитация advisory-блокировок.
+"""
+
+import asyncio
+import logging
+
+from leader_election import LeaderLease
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+
+class FakeDatabase:
+    """Advisory-блокировки, которые снимаются при закрытии сессии."""
+
+    def __init__(self):
+        self.locks = {}
+        self.sessions = 0
+
+    def connect(self, role):
+        self.sessions += 1
+        return FakeConnection(self, self.sessions)
+
+
+class FakeConnection:
+    def __init__(self, database, session):
+        self.database = database
+        self.session = session
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        self.closed = True
+        self.database.locks = {key: owner for key, owner in self.database.locks.items() if owner != self.session}
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.result = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, sql, params):
+        if self.connection.closed:
+            raise ConnectionError("connection closed")
+        locks = self.connection.database.locks
+        if "pg_try_advisory_lock" in sql:
+            owner = locks.setdefault(params, self.connection.session)
+            self.result = (owner == self.connection.session,)
+        else:
+            self.result = (locks.get(params) == self.connection.session,)
+
+    def fetchone(self):
+        return self.result
+
+
+def test_single_leader_and_failover():
+    """Проверяет, что роль держит одна реплика и переходит к резервной после обрыва сессии."""
+    database = FakeDatabase()
+    first = LeaderLease("poller", connect=database.connect)
+    second = LeaderLease("poller", connect=database.connect)
+    other_role = LeaderLease("reminders", connect=database.connect)
+
+    assert first.try_acquire()
+    assert not second.try_acquire()
+    assert other_role.try_acquire()
+    assert first.renew()
+
+    # Сессия лидера оборвалась: блокировка снята, аренда не продлевается
+    first._conn.close()
+    assert not first.renew() and not first.is_leader
+    assert second.try_acquire()
+    assert not first.try_acquire()
+
+
+def test_leader_stops_work_without_lease():
+    """Проверяет, что работа роли отменяется, когда аренда потеряна, и переходит к резервной реплике."""
+    database = FakeDatabase()
+    leader = LeaderLease("reminders", renew_interval=0.01, retry_interval=0.01, connect=database.connect)
+    standby = LeaderLease("reminders", renew_interval=0.01, retry_interval=0.01, connect=database.connect)
+    started = []
+    cancelled = []
+
+    def work(name):
+        async def run():
+            started.append(name)
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.append(name)
+                raise
+        return run
+
+    async def scenario():
+        leader_task = asyncio.create_task(leader.run_as_leader(work("leader")))
+        await asyncio.sleep(0.05)
+        standby_task = asyncio.create_task(standby.run_as_leader(work("standby")))
+        await asyncio.sleep(0.05)
+        assert started == ["leader"]
+
+        # Лидер потерял связь с базой
+        leader._conn.close()
+        await asyncio.sleep(0.05)
+        leader_task.cancel()
+        standby_task.cancel()
+        await asyncio.gather(leader_task, standby_task, return_exceptions=True)
+
+    asyncio.run(scenario())
+    assert started[:2] == ["leader", "standby"]
+    assert cancelled[0] == "leader"
+    assert database.locks == {}
+
+
+def test_single_webhook_server():
+    """Проверяет, что вебхук принимает только реплика, которая держит роль webhook."""
+    from webhook_server import WebhookServer
+
+    database = FakeDatabase()
+    serving = []
+
+    class Replica(WebhookServer):
+        async def serve(self):
+            serving.append(self)
+            await asyncio.Event().wait()
+
+    replicas = [Replica("https://bot.example.com", workers=1, secret="test-secret", health_port=0) for _ in range(2)]
+
+    async def scenario():
+        tasks = []
+        for replica in replicas:
+            lease = LeaderLease("webhook", renew_interval=0.01, retry_interval=0.01, connect=database.connect)
+            tasks.append(asyncio.create_task(replica.run(reminders=False, lease=lease)))
+            await asyncio.sleep(0.05)
+        assert serving == [replicas[0]]
+
+        # Лидер остановлен: роль и прием вебхука переходят к резервной реплике
+        replicas[0].stop()
+        await asyncio.sleep(0.1)
+        assert serving == replicas
+        replicas[1].stop()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+    assert database.locks == {}
+
+
+def main():
+    """Основная функция для запуска тестов."""
+    print("=" * 60)
+    print("Тест выбора лидера")
+    print("=" * 60)
+
+    test_single_leader_and_failover()
+    test_leader_stops_work_without_lease()
+    test_single_webhook_server()
+
+    print("\n✅ Тесты выбора лидера успешно пройдены")
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Тест живости процесса: остановка цикла событий записывается со стеком
+блокирующего вызова, а эндпоинт отвечает и при заблокированном цикле.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+
+from liveness import LivenessMonitor, probe
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+
+def blocking_openai_call(seconds):
+    """Синхронный вызов внутри обработчика, который держит цикл событий."""
+    time.sleep(seconds)
+
+
+def test_stall_is_recorded_with_stack():
+    """Проверяет запись остановки цикла, стек вызова и состояние эндпоинта во время остановки."""
+    monitor = LivenessMonitor(queue_depth=lambda: 7, interval=0.05, blocked_after=0.2, unhealthy_after=0.5)
+    during_stall = {}
+
+    async def run():
+        monitor.start(host=None)
+        port = monitor.serve("127.0.0.1", 0)
+        await asyncio.sleep(0.2)
+        assert probe("127.0.0.1", port)["status"] == "ok"
+
+        # Эндпоинт опрашивается из другого потока, пока цикл заблокирован
+        poller = threading.Timer(0.8, lambda: during_stall.update(probe("127.0.0.1", port)))
+        poller.start()
+        blocking_openai_call(1.0)
+        poller.join()
+        await asyncio.sleep(0.2)
+        monitor.stop()
+
+    asyncio.run(run())
+    assert during_stall["status"] == "blocked"
+    assert during_stall["pending_updates"] == 7
+    assert "blocking_openai_call" in "".join(during_stall["current_stall"]["stack"])
+
+    assert len(monitor.slow) == 1
+    assert monitor.slow[0].duration >= 0.8
+    assert "blocking_openai_call" in monitor.slow[0].stack
+    assert monitor.snapshot()["status"] == "ok"
+
+
+def test_handle():
+    """Проверяет ответы эндпоинта."""
+    monitor = LivenessMonitor(unhealthy_after=60)
+    assert monitor.handle("/healthz")[0] == 200
+    assert monitor.handle("/debug/slow")[0] == 200
+    assert monitor.handle("/other")[0] == 404
+    monitor.heartbeat -= 120
+    assert monitor.handle("/healthz")[0] == 503
+
+
+def main():
+    """Основная функция для запуска тестов."""
+    print("=" * 60)
+    print("Тест живости процесса")
+    print("=" * 60)
+
+    test_stall_is_recorded_with_stack()
+    test_handle()
+
+    print("\n✅ Тесты живости процесса успешно пройдены")
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
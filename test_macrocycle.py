@@ -0,0 +1,124 @@
+"""
+Тест расчета макроцикла, материализации недельного плана и продолжения плана
+из макроцикла. Не обращается к базе данных и OpenAI API.
+"""
+
+import logging
+from datetime import date
+
+import macrocycle as macrocycle_module
+from macrocycle import build_macrocycle, materialize_week, plan_continuation_from_macrocycle
+from pace_calculator import PACE_TOLERANCE, pace_profile, training_zone
+from units import parse_pace_seconds
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+PROFILE = {
+    "id": 1,
+    "distance": "21.1",
+    "competition_date": "28.02.2027",
+    "weekly_volume": "20",
+    "comfortable_pace": "6:00",
+    "training_days_per_week": "3",
+    "preferred_training_days": "Вторник, Четверг, Воскресенье",
+}
+START = date(2026, 11, 2)
+
+
+def test_phases_and_volume():
+    """Проверяет порядок этапов, правило 10% и подводку перед стартом."""
+    macrocycle = build_macrocycle(PROFILE, START)
+    weeks = macrocycle["weeks"]
+    phases = [week["phase"] for week in weeks]
+
+    assert phases == sorted(phases, key=["base", "build", "peak", "taper"].index)
+    assert phases[-2:] == ["taper", "taper"]
+    assert weeks[-1]["end_date"] == "28.02.2027"
+    for prev, week in zip(weeks, weeks[1:]):
+        if not prev["recovery"] and week["phase"] != "taper":
+            assert week["volume_km"] <= prev["volume_km"] * 1.1 + 0.5
+    assert weeks[-1]["volume_km"] < max(week["volume_km"] for week in weeks)
+    assert build_macrocycle(dict(PROFILE, competition_date="Не знаю"), START) is None
+
+
+def test_materialize_week():
+    """Проверяет построение недели по предпочитаемым дням и ключевым тренировкам."""
+    macrocycle = build_macrocycle(PROFILE, START)
+    plan = materialize_week(macrocycle, PROFILE, date(2026, 11, 2))
+    days = plan["training_days"]
+
+    assert [day["day"] for day in days] == ["Вторник", "Четверг", "Воскресенье"]
+    assert days[0]["training_type"] == "Фартлек"
+    assert days[-1]["training_type"] == "Длительный бег"
+    assert days[0]["pace"] == "5:45"
+    assert plan["macrocycle_week"] == 1
+
+
+def test_race_week():
+    """Проверяет, что в неделю старта последним днем стоит соревнование."""
+    macrocycle = build_macrocycle(PROFILE, START)
+    plan = materialize_week(macrocycle, PROFILE, date(2027, 2, 23))
+    days = plan["training_days"]
+
+    assert days[-1]["training_type"] == "Соревнование"
+    assert days[-1]["date"] == "28.02.2027"
+    assert all(day["distance"] == "3 км" for day in days if day["training_type"] == "Легкий бег")
+    assert materialize_week(macrocycle, PROFILE, date(2027, 3, 1)) is None
+
+
+def continuation(profile, total_distance, training_load=None, recent_runs=()):
+    """Продолжение плана из макроцикла без обращения к базе данных."""
+    saved = macrocycle_module.get_or_create_macrocycle, macrocycle_module.recent_performances
+    macrocycle_module.get_or_create_macrocycle = build_macrocycle
+    macrocycle_module.recent_performances = lambda profile: list(recent_runs)
+    current_plan = {"training_days": [{"distance": "5 км"}, {"distance": "5 км"}, {"distance": "10 км"}]}
+    try:
+        return plan_continuation_from_macrocycle(profile, current_plan, total_distance, training_load=training_load)
+    finally:
+        macrocycle_module.get_or_create_macrocycle, macrocycle_module.recent_performances = saved
+
+
+def test_continuation_with_unknown_pace():
+    """Проверяет, что непонятный комфортный темп не попадает в план, а темп берется из зон."""
+    plan = continuation(dict(PROFILE, comfortable_pace="Не знаю"), 20, recent_runs=[(10.0, 45 * 60)])
+    paces = [day["pace"] for day in plan["training_days"]]
+
+    assert all("Не знаю" not in pace and parse_pace_seconds(pace) for pace in paces)
+    # Уровень по 10 км за 45 минут: темп каждого дня в пределах его зоны
+    zones = pace_profile(PROFILE, [(10.0, 45 * 60)]).zones
+    for day in plan["training_days"]:
+        fast, slow = zones[training_zone(day["training_type"])]
+        assert fast - PACE_TOLERANCE <= parse_pace_seconds(day["pace"]) <= slow + PACE_TOLERANCE
+
+
+def test_continuation_respects_fatigue():
+    """Проверяет, что при отрицательной свежести объем недели не растет."""
+    tired = {"acute_load": 45.0, "chronic_load": 30.0, "freshness": -15.0, "ramp_rate": 1.7}
+    fresh = continuation(PROFILE, 30)
+    limited = continuation(PROFILE, 30, training_load=tired)
+    planned = continuation(PROFILE, 20)
+
+    assert fresh["total_distance"] > planned["total_distance"]
+    assert limited["total_distance"] == planned["total_distance"]
+
+
+def main():
+    """Основная функция для запуска тестов."""
+    print("=" * 60)
+    print("Тест макроцикла")
+    print("=" * 60)
+
+    test_phases_and_volume()
+    test_materialize_week()
+    test_race_week()
+    test_continuation_with_unknown_pace()
+    test_continuation_respects_fatigue()
+
+    print("\n✅ Тесты макроцикла успешно пройдены")
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
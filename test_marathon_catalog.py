@@ -0,0 +1,107 @@
+"""
+Тест каталога марафонов: разбор дат, скрытие прошедших событий, страницы,
+индекс по типу дистанции и перечитывание файла при изменении.
+"""
+
+import logging
+import os
+import tempfile
+from datetime import date
+
+from marathon_utils import MarathonCatalog, parse_distance_types, parse_event_dates
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+HEADER = "Название,Дата,Место,Тип,Сайт\n"
+ROWS = [
+    'Весенний марафон,10–11 мая 2025,"Город А","марафон, полумарафон",https://a.example\n',
+    'Горный марафон,17 мая 2025,"Город Б",марафон (горный),https://b.example\n',
+    'Осенний полумарафон,2 ноября 2025,"Город В",полумарафон,https://c.example\n',
+    'Новогодний забег,1 января 2026,"Город Г","марафон, полумарафон",https://d.example\n',
+    'Забег без даты,скоро,"Город Д",марафон,https://e.example\n',
+]
+
+
+def _write_catalog(path, rows, mtime):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(HEADER + "".join(rows))
+    os.utime(path, (mtime, mtime))
+
+
+def test_parse_event_dates():
+    """Проверяет разбор дат и диапазонов с русскими названиями месяцев."""
+    assert parse_event_dates("17 мая 2025") == (date(2025, 5, 17), date(2025, 5, 17))
+    assert parse_event_dates("10–11 мая 2025") == (date(2025, 5, 10), date(2025, 5, 11))
+    assert parse_event_dates("10-11 Мая 2025") == (date(2025, 5, 10), date(2025, 5, 11))
+    assert parse_event_dates("30 апреля – 1 мая 2025") == (date(2025, 4, 30), date(2025, 5, 1))
+    assert parse_event_dates("31 февраля 2025") is None
+    assert parse_event_dates("скоро") is None
+
+    assert parse_distance_types("марафон, полумарафон") == ("марафон", "полумарафон")
+    assert parse_distance_types("марафон (горный)") == ("марафон",)
+
+
+def test_upcoming_and_pages():
+    """Проверяет сортировку по дате, скрытие прошедших событий и страницы."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "marathons.csv")
+        _write_catalog(path, ROWS, 1_000_000)
+        catalog = MarathonCatalog(path)
+
+        # Двухдневный марафон еще идет 11 мая; строка без даты пропускается
+        names = [event.name for event in catalog.upcoming(date(2025, 5, 11))]
+        assert names == ["Весенний марафон", "Горный марафон", "Осенний полумарафон", "Новогодний забег"]
+        assert [event.name for event in catalog.upcoming(date(2025, 5, 12))][0] == "Горный марафон"
+
+        half = [event.name for event in catalog.upcoming(date(2025, 5, 12), "полумарафон")]
+        assert half == ["Осенний полумарафон", "Новогодний забег"]
+
+        events, page, pages = catalog.page(1, page_size=3, today=date(2025, 1, 1))
+        assert (page, pages) == (1, 2)
+        assert [event.name for event in events] == ["Новогодний забег"]
+        # Номер страницы вне диапазона приводится к последней странице
+        assert catalog.page(5, page_size=3, today=date(2025, 1, 1))[1] == 1
+        assert catalog.page(0, today=date(2027, 1, 1)) == ([], 0, 1)
+
+
+def test_ids_and_reload():
+    """Проверяет короткие ID событий и перечитывание файла при изменении."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "marathons.csv")
+        _write_catalog(path, ROWS, 1_000_000)
+        catalog = MarathonCatalog(path)
+
+        event = catalog.upcoming(date(2025, 1, 1))[0]
+        assert len(f"set_marathon_{event.id}".encode("utf-8")) <= 64
+        assert catalog.get(event.id) == event
+        assert catalog.get("10–11 мая 2025") is None
+
+        # Без изменения времени файла каталог не перечитывается
+        _write_catalog(path, ROWS[1:], 1_000_000)
+        assert catalog.get(event.id) == event
+
+        # После изменения ID сохраняются для оставшихся строк, удаленная строка исчезает
+        other = catalog.upcoming(date(2025, 1, 1))[1]
+        _write_catalog(path, ROWS[1:], 1_000_100)
+        assert catalog.get(event.id) is None
+        assert catalog.get(other.id) == other
+
+
+def main():
+    """Основная функция для запуска тестов."""
+    print("=" * 60)
+    print("Тест каталога марафонов")
+    print("=" * 60)
+
+    test_parse_event_dates()
+    test_upcoming_and_pages()
+    test_ids_and_reload()
+
+    print("\n✅ Тесты каталога марафонов успешно пройдены")
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
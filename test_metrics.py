@@ -0,0 +1,144 @@
+"""
+Тест метрик процесса: гистограммы и квантили, маршруты кнопок, формат
+Prometheus, сложение снимков процессов и сводка за интервал для bot_metrics.
+"""
+
+import asyncio
+import logging
+from types import SimpleNamespace
+
+from metrics import (BUCKETS, MetricsRegistry, REGISTRY, callback_route, instrument_methods, interval_summary,
+                     merge_snapshots, quantile, render_prometheus, _instrument_handler)
+from migrations import MIGRATIONS, SCHEMA_CAPABILITIES
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+
+def test_registry_and_quantile():
+    """Проверяет счетчик ошибок timed и квантили по корзинам."""
+    registry = MetricsRegistry()
+    for _ in range(99):
+        registry.observe("llm_call_seconds", 0.3, site="plan")
+    registry.observe("llm_call_seconds", 20.0, site="plan")
+    try:
+        with registry.timed("llm_call_seconds", site="plan"):
+            raise TimeoutError("timeout")
+    except TimeoutError:
+        pass
+
+    snapshot = registry.snapshot()
+    assert snapshot["counters"]["llm_call_errors_total"] == [[{"site": "plan"}, 1]]
+    labels, counts, total, count = snapshot["histograms"]["llm_call_seconds"][0]
+    assert count == 101
+    assert 0.25 <= quantile(counts, 0.5) <= 0.5
+    assert 10.0 <= quantile(counts, 0.995) <= 30.0
+    assert quantile([0] * (len(BUCKETS) + 1), 0.5) is None
+
+
+def test_callback_route():
+    """Проверяет маршрут кнопки без идентификаторов."""
+    assert callback_route("complete_12_3") == "complete_N_N"
+    assert callback_route("update_profile") == "update_profile"
+    assert callback_route(None) == "none"
+
+
+def test_render_and_merge():
+    """Проверяет сложение снимков двух процессов и текст Prometheus."""
+    first, second = MetricsRegistry(), MetricsRegistry()
+    first.inc("bot_updates_total", type="message")
+    second.inc("bot_updates_total", 2, type="message")
+    first.observe("db_query_seconds", 0.02, query="DBManager.get_user_id")
+    second.observe("db_query_seconds", 0.2, query="DBManager.get_user_id")
+
+    merged = merge_snapshots([first.snapshot(), second.snapshot()])
+    assert merged["counters"]["bot_updates_total"] == [[{"type": "message"}, 3]]
+    text = render_prometheus(merged)
+    assert "# TYPE db_query_seconds histogram" in text
+    assert 'bot_updates_total{type="message"} 3' in text
+    assert 'db_query_seconds_bucket{query="DBManager.get_user_id",le="0.025"} 1' in text
+    assert 'db_query_seconds_bucket{query="DBManager.get_user_id",le="+Inf"} 2' in text
+    assert 'db_query_seconds_count{query="DBManager.get_user_id"} 2' in text
+
+
+def test_interval_summary():
+    """Проверяет, что сводка считает только наблюдения за интервал."""
+    registry = MetricsRegistry()
+    registry.inc("bot_updates_total", 5, type="message")
+    registry.observe("bot_handler_seconds", 0.01, handler="start")
+    previous = registry.snapshot()
+
+    registry.inc("bot_updates_total", 2, type="callback_query")
+    registry.inc("bot_handler_errors_total", handler="start")
+    registry.observe("bot_handler_seconds", 3.0, handler="start")
+    summary = interval_summary(previous, registry.snapshot())
+
+    assert summary["processed_messages"] == 2
+    assert summary["errors_count"] == 1
+    series = summary["series"]['bot_handler_seconds{handler="start"}']
+    assert series["count"] == 1
+    assert 2.5 <= series["p50"] <= 5.0
+    assert interval_summary(previous, previous)["series"] == {}
+
+
+def test_instrument_methods_and_handler():
+    """Проверяет измерение методов менеджера и обработчика кнопки."""
+
+    class FakeManager:
+        @staticmethod
+        def get_user_id(telegram_id):
+            return telegram_id + 1
+
+    instrument_methods(FakeManager)
+    assert FakeManager.get_user_id(1) == 2
+    histograms = REGISTRY.snapshot()["histograms"]["db_query_seconds"]
+    assert any(labels == {"query": "FakeManager.get_user_id"} for labels, *_ in histograms)
+
+    from telegram.ext import CallbackQueryHandler
+
+    async def on_button(update, context):
+        raise ValueError("broken")
+
+    handler = CallbackQueryHandler(on_button)
+    _instrument_handler(handler)
+    _instrument_handler(handler)
+    update = SimpleNamespace(callback_query=SimpleNamespace(data="complete_7_2"))
+    try:
+        asyncio.run(handler.callback(update, None))
+    except ValueError:
+        pass
+
+    snapshot = REGISTRY.snapshot()
+    name = "test_instrument_methods_and_handler.on_button"
+    assert [[{"handler": name}, 1]] == [item for item in snapshot["counters"]["bot_handler_errors_total"]
+                                       if item[0] == {"handler": name}]
+    routes = [labels for labels, *_ in snapshot["histograms"]["bot_callback_seconds"]]
+    assert {"route": "complete_N_N"} in routes
+
+
+def test_migration():
+    """Проверяет миграцию таблицы bot_metrics."""
+    sql = MIGRATIONS[SCHEMA_CAPABILITIES["bot_metrics"] - 1].sql
+    assert "instance" in sql and "details" in sql
+
+
+def main():
+    """Основная функция для запуска тестов."""
+    print("=" * 60)
+    print("Тест метрик процесса")
+    print("=" * 60)
+
+    test_registry_and_quantile()
+    test_callback_route()
+    test_render_and_merge()
+    test_interval_summary()
+    test_instrument_methods_and_handler()
+    test_migration()
+
+    print("\n✅ Тесты метрик процесса успешно пройдены")
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Тест списка миграций, кэша возможностей схемы и перехвата запросов бенчмарка.
+Не обращается к базе данных.
+"""
+
+import json
+import logging
+import re
+
+import psycopg2
+
+import migrations
+from benchmark_hot_queries import HOT_CALLS, CapturingConnection, capture_connections, check_plan
+from migrations import LATEST_VERSION, MIGRATIONS, SCHEMA_CAPABILITIES, get_schema_version, has_capability
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+
+def test_migration_versions():
+    """Проверяет, что версии уникальны, идут по порядку и не пропускаются."""
+    versions = [migration.version for migration in MIGRATIONS]
+    assert versions == list(range(1, len(MIGRATIONS) + 1))
+    assert LATEST_VERSION == versions[-1]
+    assert all(migration.description and migration.sql.strip() for migration in MIGRATIONS)
+
+
+def test_capabilities_reference_migrations():
+    """Проверяет, что каждая возможность схемы появляется в существующей миграции."""
+    versions = {migration.version for migration in MIGRATIONS}
+    assert set(SCHEMA_CAPABILITIES.values()) <= versions
+    assert "updated_at" in MIGRATIONS[SCHEMA_CAPABILITIES["training_plans.updated_at"] - 1].sql
+
+
+def test_weekly_volume_column_holds_text():
+    """Проверяет, что столбец weekly_volume переводится в текст не позже функций, записывающих в него текст."""
+    text_version = SCHEMA_CAPABILITIES["runner_profiles.weekly_volume_text"]
+    assert "ALTER COLUMN weekly_volume TYPE VARCHAR(50)" in MIGRATIONS[text_version - 1].sql
+    for function in ("record_training_status", "refresh_weekly_volume"):
+        writers = [migration.version for migration in MIGRATIONS
+                   if f"FUNCTION {function}(" in migration.sql and "weekly_volume = to_char(" in migration.sql]
+        assert writers and min(writers) >= text_version, function
+
+
+def test_weekly_volume_decays_without_workouts():
+    """Проверяет, что без тренировок за четыре недели объем профиля снижается, но не ниже минимума макроцикла."""
+    from macrocycle import MIN_WEEKLY_VOLUME
+
+    sql = next(migration.sql for migration in MIGRATIONS if "FUNCTION refresh_weekly_volume(" in migration.sql)
+    body = sql[sql.index("FUNCTION refresh_weekly_volume("):]
+    body = body[:body.index("$$;")]
+    fallback = body[body.index("IF v_volume IS NULL THEN"):body.index("UPDATE runner_profiles")]
+    floor = float(MIN_WEEKLY_VOLUME)
+    assert f"GREATEST({floor:g}, rp.weekly_volume_km * 0.5)" in fallback
+    assert f"WHEN rp.weekly_volume_km > {floor:g}" in fallback
+    # Профиль обновляется и в ветке снижения: RETURN NULL только без сохраненного объема
+    assert fallback.count("RETURN NULL") == 1 and "IF v_volume IS NULL THEN\n            RETURN NULL" in fallback
+
+
+def test_malformed_plan_data_is_quarantined():
+    """Проверяет, что строка с неразбираемым plan_data переносится в карантин до приведения к jsonb."""
+    sql = MIGRATIONS[SCHEMA_CAPABILITIES["training_plans.jsonb"] - 1].sql
+    quarantine = sql.index("INSERT INTO training_plans_quarantine")
+    assert sql.index("CREATE TABLE IF NOT EXISTS training_plans_quarantine") < quarantine
+    assert quarantine < sql.index("ALTER COLUMN plan_data TYPE JSONB")
+    # Неразбираемая строка заменяется пустым планом, который приводится к jsonb
+    replacement = re.search(r"SET plan_data = '(.*?)' WHERE", sql).group(1)
+    assert json.loads(replacement) == {"training_days": []}
+    assert "EXCEPTION WHEN others" in sql
+
+
+def test_has_capability_uses_cached_version():
+    """Проверяет, что возможности определяются по кэшированной версии без запросов к базе."""
+    saved = migrations._schema_version
+    try:
+        migrations._schema_version = 1
+        assert get_schema_version() == 1
+        assert not has_capability("training_plans.updated_at")
+
+        migrations._schema_version = LATEST_VERSION
+        assert all(has_capability(name) for name in SCHEMA_CAPABILITIES)
+    finally:
+        migrations._schema_version = saved
+
+
+def test_hot_query_plan_check():
+    """Проверяет разбор плана запроса в бенчмарке горячих запросов."""
+    index_plan = {"Node Type": "Limit", "Plans": [
+        {"Node Type": "Index Scan", "Relation Name": "runner_profiles",
+         "Index Name": "idx_runner_profiles_user_updated"},
+    ]}
+    seq_plan = {"Node Type": "Sort", "Plans": [
+        {"Node Type": "Seq Scan", "Relation Name": "completed_trainings"},
+    ]}
+    assert check_plan(index_plan) is None
+    assert "completed_trainings" in check_plan(seq_plan)
+
+    # Каждая проверяемая таблица горячих запросов получает индекс в миграции
+    index_sql = next(migration.sql for migration in MIGRATIONS if migration.description == "indexes for hot queries")
+    assert all(callable(getattr(call.manager, call.method)) for call in HOT_CALLS)
+    assert {param for call in HOT_CALLS for param in call.params} == {
+        "telegram_id", "user_id", "profile", "payment_agreed", "plan_id", "training_day", "session_date"}
+    for table in ("users", "runner_profiles", "user_payments", "training_plans", "completed_trainings"):
+        assert f"ON {table} (" in index_sql
+
+
+class FakeCursor:
+    """Курсор без базы данных: подставляет параметры и возвращает одну строку."""
+
+    def __init__(self, executed):
+        self.executed = executed
+
+    def mogrify(self, query, vars=None):
+        return (query % tuple(repr(value) for value in vars or ())).encode()
+
+    def execute(self, query, vars=None):
+        self.executed.append(query)
+
+    def fetchone(self):
+        return (7,)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """Соединение бенчмарка без базы данных."""
+
+    def __init__(self):
+        self.executed = []
+        self.autocommit = False
+
+    def cursor(self, *args, **kwargs):
+        return FakeCursor(self.executed)
+
+
+def test_benchmark_captures_manager_queries():
+    """Проверяет, что бенчмарк выполняет запросы настоящих методов менеджеров в своем соединении."""
+    conn = FakeConnection()
+    statements, errors = [], []
+    get_user_id = next(getattr(call.manager, call.method) for call in HOT_CALLS if call.method == "get_user_id")
+    with capture_connections(conn, statements, errors):
+        assert get_user_id(42) == 7
+        proxy = psycopg2.connect()
+        proxy.autocommit = True
+        proxy.close()
+
+    assert isinstance(proxy, CapturingConnection)
+    assert statements == ["SELECT id FROM users WHERE telegram_id = 42"]
+    assert conn.executed == ["SELECT id FROM users WHERE telegram_id = %s"]
+    assert not conn.autocommit and not errors
+
+
+def main():
+    """Основная функция для запуска тестов."""
+    print("=" * 60)
+    print("Тест миграций схемы")
+    print("=" * 60)
+
+    test_migration_versions()
+    test_capabilities_reference_migrations()
+    test_weekly_volume_column_holds_text()
+    test_weekly_volume_decays_without_workouts()
+    test_malformed_plan_data_is_quarantined()
+    test_has_capability_uses_cached_version()
+    test_hot_query_plan_check()
+    test_benchmark_captures_manager_queries()
+
+    print("\n✅ Тесты миграций схемы успешно пройдены")
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Тест локального расчета прогнозов и зон темпа по VDOT.
+Не обращается к базе данных и OpenAI API.
+"""
+
+import logging
+
+from pace_calculator import (apply_pace_zones, pace_profile, parse_race_time, predict_race_seconds,
+                             training_zone, vdot_from_performance, zone_paces)
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+
+def test_vdot_tables():
+    """Проверяет VDOT и прогнозы по таблицам Дэниелса."""
+    # VDOT 50: 5 км за 19:57, марафон за 3:10:49
+    assert abs(vdot_from_performance(5, 19 * 60 + 57) - 50) < 0.1
+    assert abs(predict_race_seconds(50, 5) - (19 * 60 + 57)) < 5
+    assert abs(predict_race_seconds(50, 42.195) - (3 * 3600 + 10 * 60 + 49)) < 30
+
+    # Нестандартная дистанция лежит между соседними стандартными
+    assert predict_race_seconds(50, 10) < predict_race_seconds(50, 15) < predict_race_seconds(50, 21.0975)
+
+    zones = zone_paces(50)
+    assert zones["interval"][1] < zones["tempo"][0] < zones["tempo"][1] < zones["easy"][0]
+    assert all(fast < slow for fast, slow in zones.values())
+    assert abs(zones["tempo"][1] - 255) < 15  # пороговый темп VDOT 50 ≈ 4:15/км
+
+
+def test_pace_profile():
+    """Проверяет уровень по комфортному темпу, пробежкам и целевому времени."""
+    assert parse_race_time("1:50", 21.1) == 6600
+    assert parse_race_time("25:00", 5) == 1500
+
+    paces = pace_profile({"comfortable_pace": "6:30", "target_time": "1:50", "distance": "21.1"})
+    assert 35 < paces.vdot < 45
+    assert paces.target_vdot is not None and paces.target_vdot > paces.vdot
+    assert list(paces.predictions) == [5.0, 10.0, 21.0975, 42.195]
+    assert "темповой" in paces.format_for_prompt()
+
+    # Быстрая недавняя пробежка повышает уровень, короткая не учитывается
+    faster = pace_profile({"comfortable_pace": "6:30"}, recent_runs=[(10, 45 * 60), (1, 180)])
+    assert faster.vdot > paces.vdot
+    assert pace_profile({}) is None
+
+
+def test_apply_pace_zones():
+    """Проверяет заполнение пустого темпа и замену темпа вне зоны."""
+    paces = pace_profile({"comfortable_pace": "6:00"})
+    easy = paces.zone_text("easy")
+    plan = {"training_days": [
+        {"training_type": "Легкий бег", "pace": "Комфортный темп"},
+        {"training_type": "Интервальная тренировка", "pace": "6:00/км"},
+        {"training_type": "Темповой бег", "pace": paces.zone_text("tempo")},
+        {"training_type": "Кросс", "pace": "5:50"},
+        {"training_type": "Отдых", "pace": "Комфортный темп"},
+        {"training_type": "Отдых", "pace": "-"},
+    ]}
+    assert training_zone("Длительная пробежка") == "long"
+    assert apply_pace_zones(plan, paces) == [0, 1, 4]
+    assert plan["training_days"][0]["pace"] == easy
+    assert plan["training_days"][1]["pace"] == paces.zone_text("interval")
+    assert plan["training_days"][3]["pace"] == "5:50"
+    assert plan["training_days"][4]["pace"] == "-"
+    assert apply_pace_zones(plan, None) == []
+
+
+def main():
+    """Основная функция для запуска тестов."""
+    print("=" * 60)
+    print("Тест расчета зон темпа")
+    print("=" * 60)
+
+    test_vdot_tables()
+    test_pace_profile()
+    test_apply_pace_zones()
+
+    print("\n✅ Тесты расчета зон темпа успешно пройдены")
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Тест хранения состояния диалогов: пакетная запись измененных данных,
+временные флаги, повтор после ошибки и восстановление после перезапуска.
+Вместо базы данных используется хранилище в памяти.
+"""
+
+import asyncio
+import json
+import logging
+
+from migrations import MIGRATIONS, SCHEMA_CAPABILITIES
+from persistence import PostgresPersistence, decode_conversation_key, encode_conversation_key
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+NAME = "runner_profile_conversation"
+
+
+class FakeStore:
+    """Таблицы bot_user_data и bot_conversations в памяти."""
+
+    def __init__(self):
+        self.users = {}
+        self.conversations = {}
+        self.batches = []
+        self.fail = False
+
+    def load_user_data(self):
+        return dict(self.users)
+
+    def load_conversations(self, name):
+        return {decode_conversation_key(key): json.loads(state)
+                for (stored_name, key), state in self.conversations.items() if stored_name == name}
+
+    def write(self, users, conversations):
+        if self.fail:
+            return False
+        self.batches.append((dict(users), dict(conversations)))
+        for user_id, data in users.items():
+            if data is None:
+                self.users.pop(user_id, None)
+            else:
+                self.users[user_id] = data
+        for key, state in conversations.items():
+            if state is None:
+                self.conversations.pop(key, None)
+            else:
+                self.conversations[key] = state
+        return True
+
+
+def test_batched_write_and_restart():
+    """Проверяет, что изменения пишутся одним пакетом и восстанавливаются после перезапуска."""
+    store = FakeStore()
+
+    async def first_run():
+        persistence = PostgresPersistence(store, write_delay=0.01)
+        await persistence.get_user_data()
+        await persistence.update_user_data(1, {"profile_data": {"distance": 42.2}, "is_generating_plan": True})
+        await persistence.update_user_data(2, {"awaiting_payment_confirmation": True})
+        await persistence.update_conversation(NAME, (10, 1), 3)
+        await asyncio.sleep(0.05)
+        # Неизмененные данные не пишутся повторно
+        await persistence.update_user_data(2, {"awaiting_payment_confirmation": True})
+        await asyncio.sleep(0.05)
+
+    asyncio.run(first_run())
+    assert len(store.batches) == 1
+    assert "is_generating_plan" not in json.loads(store.users[1])
+
+    async def second_run():
+        persistence = PostgresPersistence(store, write_delay=0.01)
+        user_data = await persistence.get_user_data()
+        conversations = await persistence.get_conversations(NAME)
+        # Конец диалога удаляет его состояние
+        await persistence.update_conversation(NAME, (10, 1), None)
+        await persistence.flush()
+        return user_data, conversations
+
+    user_data, conversations = asyncio.run(second_run())
+    assert user_data == {1: {"profile_data": {"distance": 42.2}}, 2: {"awaiting_payment_confirmation": True}}
+    assert conversations == {(10, 1): 3}
+    assert store.conversations == {}
+
+
+def test_failed_write_is_retried_at_flush():
+    """Проверяет, что после ошибки записи изменения не теряются и сохраняются при остановке."""
+    store = FakeStore()
+
+    async def run():
+        persistence = PostgresPersistence(store, update_interval=60, write_delay=0.01)
+        store.fail = True
+        await persistence.update_user_data(1, {"payment_agreed": True})
+        await asyncio.sleep(0.05)
+        await persistence.update_user_data(1, {"payment_agreed": False})
+        store.fail = False
+        await persistence.flush()
+
+    asyncio.run(run())
+    assert json.loads(store.users[1]) == {"payment_agreed": False}
+    assert len(store.batches) == 1
+
+
+def test_conversation_key():
+    """Проверяет преобразование ключа диалога и таблицы миграции."""
+    assert decode_conversation_key(encode_conversation_key((-100123, 42))) == (-100123, 42)
+    sql = MIGRATIONS[SCHEMA_CAPABILITIES["bot_persistence"] - 1].sql
+    assert "bot_user_data" in sql and "bot_conversations" in sql
+
+
+def main():
+    """Основная функция для запуска тестов."""
+    print("=" * 60)
+    print("Тест хранения состояния диалогов")
+    print("=" * 60)
+
+    test_batched_write_and_restart()
+    test_failed_write_is_retried_at_flush()
+    test_conversation_key()
+
+    print("\n✅ Тесты хранения состояния диалогов успешно пройдены")
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
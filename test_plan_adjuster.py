@@ -0,0 +1,139 @@
+"""
+Тест локальной корректировки плана тренировок по фактическому выполнению.
+Не делает запросов к OpenAI API.
+"""
+
+import logging
+
+from plan_adjuster import adjust_plan_locally, calculate_load_factor, shift_pace
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+PLAN = {
+    "plan_name": "План на 10 км",
+    "plan_description": "Базовый план",
+    "total_distance": 32,
+    "training_days": [
+        {"day": "Понедельник", "date": "12.05.2025", "training_type": "Легкий бег",
+         "distance": "6 км", "pace": "6:00/км", "description": "Легкий бег"},
+        {"day": "Среда", "date": "14.05.2025", "training_type": "Темповой бег",
+         "distance": "8 км", "pace": "5:10/км", "description": "Темповой бег"},
+        {"day": "Четверг", "date": "15.05.2025", "training_type": "Восстановительный бег",
+         "distance": "4 км", "pace": "6:30/км", "description": "Восстановление"},
+        {"day": "Суббота", "date": "17.05.2025", "training_type": "Длительная",
+         "distance": "14 км", "pace": "6:10/км", "description": "Длительный бег"},
+    ],
+}
+
+
+def test_load_factor_limits():
+    """Проверяет ограничения роста и снижения нагрузки."""
+    assert calculate_load_factor(10, 20) == 1.1
+    assert calculate_load_factor(10, 0) == 0.7
+    assert calculate_load_factor(0, 5) == 1.0
+    assert shift_pace("5:55-6:10 мин/км", 10) == "6:05-6:20 мин/км"
+
+
+def test_reduce_remaining_days():
+    """Проверяет, что меняются только оставшиеся необработанные дни."""
+    plan, changed = adjust_plan_locally(PLAN, 1, 6, 3, processed_days=[3])
+    days = plan["training_days"]
+
+    assert changed == [1, 3], f"Изменены не те дни: {changed}"
+    assert days[0] == PLAN["training_days"][0], "Выполненный день изменен"
+    assert days[2] == PLAN["training_days"][2], "Обработанный день изменен"
+    assert days[1]["distance"] == "6 км"
+    assert days[1]["pace"] == "5:22/км"
+    assert days[3]["distance"] == "10.5 км"
+    assert "Скорректировано" in days[3]["description"]
+    assert plan["total_distance"] == 26.5
+    assert PLAN["training_days"][1]["distance"] == "8 км", "Исходный план изменен"
+
+
+def test_increase_keeps_recovery_easy():
+    """Проверяет, что восстановительные тренировки не увеличиваются."""
+    plan, changed = adjust_plan_locally(PLAN, 1, 6, 9)
+
+    assert 2 not in changed
+    assert plan["training_days"][3]["distance"] == "15.5 км"
+
+
+
+def test_fatigue_blocks_increase():
+    """Проверяет, что при усталости нагрузка не растет, а снижение сохраняется."""
+    tired = {"acute_load": 45.0, "chronic_load": 30.0, "freshness": -15.0, "ramp_rate": 1.7}
+    plan, changed = adjust_plan_locally(PLAN, 1, 6, 9, training_load=tired)
+    assert changed == []
+    assert plan["training_days"][3]["distance"] == "14 км"
+    assert "сохранена" in plan["plan_description"]
+
+    plan, changed = adjust_plan_locally(PLAN, 1, 6, 3, training_load=tired)
+    assert changed == [1, 2, 3]
+
+
+def test_repeated_adjustment_replaces_notes():
+    """Проверяет, что повторная корректировка заменяет заметки, а без изменения нагрузки заметки нет."""
+    first, _ = adjust_plan_locally(PLAN, 1, 6, 3)
+    second, _ = adjust_plan_locally(first, 2, 6, 3, processed_days=[1])
+
+    assert second["training_days"][3]["description"].count("Скорректировано:") == 1
+    assert second["training_days"][3]["description"].startswith("Длительный бег")
+    assert second["plan_description"].count("План скорректирован") == 1
+    assert "тренировки 2" in second["plan_description"]
+
+    unchanged, changed = adjust_plan_locally(PLAN, 1, 6, 6)
+    assert changed == []
+    assert unchanged["plan_description"] == "Базовый план"
+
+
+def test_explicit_note_skips_local_adjustment():
+    """Проверяет, что явная заметка и принудительный режим передаются MCP-инструменту, а не теряются."""
+    import agent.adapter as adapter_module
+
+    received = []
+
+    def generate_plan_tool(profile):
+        received.append(profile)
+        return {"plan_name": "Скорректированный", "plan_description": "", "training_days": []}
+
+    def unexpected(*args, **kwargs):
+        raise AssertionError("локальная корректировка не учитывает заметку")
+
+    saved = adapter_module.adjust_plan_locally
+    adapter_module.adjust_plan_locally = unexpected
+    adapter = adapter_module.AgentAdapter()
+    adapter._generate_plan_tool = generate_plan_tool
+    profile = {"distance": 10, "competition_date": "01.09.2025", "gender": "Мужской", "age": 30,
+               "height": 180, "weight": 75, "experience": "1-2 года", "goal": "Финишировать",
+               "fitness_level": "Средний", "weekly_volume": "20", "training_days_per_week": 4}
+    try:
+        adapter.adjust_training_plan(profile, PLAN, 1, 6, 3, explicit_adjustment_note="Болит колено")
+        adapter.adjust_training_plan(profile, PLAN, 1, 6, 3, force_adjustment_mode=True)
+    finally:
+        adapter_module.adjust_plan_locally = saved
+
+    assert received[0].explicit_adjustment_note == "Болит колено"
+    assert received[1].force_adjustment_mode
+
+
+def main():
+    """Основная функция для запуска тестов."""
+    print("=" * 60)
+    print("Тест локальной корректировки плана")
+    print("=" * 60)
+
+    test_load_factor_limits()
+    test_reduce_remaining_days()
+    test_increase_keeps_recovery_easy()
+    test_fatigue_blocks_increase()
+    test_repeated_adjustment_replaces_notes()
+    test_explicit_note_skips_local_adjustment()
+
+    print("\n✅ Тесты корректировки плана успешно пройдены")
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
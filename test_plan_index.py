@@ -0,0 +1,144 @@
+"""
+Тест индекса похожих планов тренировок.
+Индекс строится в памяти, без обращения к базе данных.
+"""
+
+import logging
+import time
+from datetime import date
+
+import numpy as np
+
+from plan_index import IndexedPlan, PlanIndex, format_plan_seed, profile_features, rebase_plan_dates, retitle_plan
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+REFERENCE_DATE = date(2025, 5, 1)
+
+
+def make_profile(distance, volume, days, pace, experience="1-3 года"):
+    return {
+        "distance": distance,
+        "experience": experience,
+        "weekly_volume": str(volume),
+        "training_days_per_week": str(days),
+        "competition_date": "Не знаю",
+        "comfortable_pace": pace,
+    }
+
+
+def make_plan(name, days):
+    return {
+        "plan_name": name,
+        "training_days": [
+            {"day": "Понедельник", "date": "05.05.2025", "training_type": "Легкий бег",
+             "distance": "5 км", "pace": "6:00", "description": "Легкий бег"}
+            for _ in range(days)
+        ],
+    }
+
+
+PROFILES = [
+    (make_profile(5, 10, 3, "7:00", "Полный новичок"), make_plan("5 км новичок", 3)),
+    (make_profile(10, 25, 4, "6:00"), make_plan("10 км", 4)),
+    (make_profile(21.1, 40, 4, "5:30"), make_plan("Полумарафон", 4)),
+    (make_profile(42.2, 60, 5, "5:15", "Более 5 лет"), make_plan("Марафон", 5)),
+]
+
+
+def build_index():
+    features = np.array([profile_features(profile, REFERENCE_DATE) for profile, _ in PROFILES])
+    entries = [IndexedPlan(plan_id=idx + 1, plan=plan) for idx, (_, plan) in enumerate(PROFILES)]
+    return PlanIndex(features, entries)
+
+
+def test_nearest_plan():
+    """Проверяет, что ближайшим оказывается план бегуна с похожим профилем."""
+    index = build_index()
+    neighbours = index.query(make_profile(21.1, 38, 4, "5:35"), k=2, reference_date=REFERENCE_DATE)
+
+    assert len(neighbours) == 2
+    assert neighbours[0][1].plan["plan_name"] == "Полумарафон"
+    assert neighbours[0][0] <= neighbours[1][0]
+
+    exact = index.query(PROFILES[1][0], k=1, reference_date=REFERENCE_DATE)
+    assert exact[0][0] < 1e-6
+    assert PlanIndex(np.empty((0, 6)), []).query(PROFILES[0][0]) == []
+
+
+def test_query_speed():
+    """Проверяет, что поиск по нескольким тысячам планов занимает доли миллисекунды."""
+    rng = np.random.default_rng(0)
+    features = rng.normal(size=(5000, 6)).astype(np.float32)
+    entries = [IndexedPlan(plan_id=idx, plan=PROFILES[0][1]) for idx in range(5000)]
+    index = PlanIndex(features, entries)
+
+    start = time.perf_counter()
+    for _ in range(100):
+        index.query(PROFILES[2][0], k=3)
+    elapsed = (time.perf_counter() - start) / 100
+    assert elapsed < 0.005, f"Слишком медленный поиск: {elapsed * 1e6:.0f} мкс"
+
+
+def test_rebase_and_seed():
+    """Проверяет перенос дат и компактный пример для промпта."""
+    plan = PROFILES[0][1]
+    rebased = rebase_plan_dates(plan, ["13.05.2025", "15.05.2025", "18.05.2025"])
+
+    assert [day["day"] for day in rebased["training_days"]] == ["Вторник", "Четверг", "Воскресенье"]
+    assert plan["training_days"][0]["date"] == "05.05.2025"
+    assert format_plan_seed(plan).count("Легкий бег, 5 км") == 3
+
+    retitled = retitle_plan(rebased, dict(PROFILES[1][0], goal="Пробежать дистанцию"))
+    assert retitled["plan_name"] == "План подготовки к дистанции 10 км"
+    assert "Тренировок: 3, общий объем 15 км" in retitled["plan_description"]
+    assert retitled["plan_description"].endswith("Цель: Пробежать дистанцию.")
+    assert plan["plan_name"] == "5 км новичок"
+
+
+def test_reused_plan_reads_recent_runs_once():
+    """Проверяет, что при повторном использовании плана недавние пробежки читаются из базы один раз."""
+    import agent.tools.generate_plan as generate_plan_module
+
+    reads = []
+
+    def recent_performances(profile):
+        reads.append(profile)
+        return [(10.0, 50 * 60)]
+
+    def suggest_plan(profile, dates):
+        return rebase_plan_dates(PROFILES[1][1], dates), None
+
+    saved = generate_plan_module.recent_performances, generate_plan_module.suggest_plan
+    generate_plan_module.recent_performances = recent_performances
+    generate_plan_module.suggest_plan = suggest_plan
+    try:
+        use_case = generate_plan_module.GeneratePlanUseCase(api_key="test")
+        plan = use_case._generate_plan(dict(PROFILES[1][0], preferred_training_days="Понедельник, Среда, "
+                                            "Пятница, Воскресенье"), allow_reuse=True)
+    finally:
+        generate_plan_module.recent_performances, generate_plan_module.suggest_plan = saved
+
+    assert len(reads) == 1
+    assert plan["plan_name"] == "План подготовки к дистанции 10 км"
+
+
+def main():
+    """Основная функция для запуска тестов."""
+    print("=" * 60)
+    print("Тест индекса похожих планов")
+    print("=" * 60)
+
+    test_nearest_plan()
+    test_query_speed()
+    test_rebase_and_seed()
+    test_reused_plan_reads_recent_runs_once()
+
+    print("\n✅ Тесты индекса планов успешно пройдены")
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Тест локальной валидации и восстановления планов тренировок.
+Не делает запросов к OpenAI API: повторный запрос недостающих полей
+проверяется на заглушке клиента.
+"""
+
+import json
+import logging
+
+from plan_validator import validate_plan, repair_plan, get_validation_stats
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+EXPECTED_DATES = ["12.05.2025", "14.05.2025", "17.05.2025"]
+
+BROKEN_PLAN = {
+    "plan": {
+        "plan_name": "План на 10 км",
+        "days": [
+            {"day": "Вторник", "date": "2025-05-12", "training_type": "Легкий бег",
+             "distance": 5, "pace": "6:00/км", "description": "Легкий бег"},
+            {"day": "Среда", "date": "14.05.2025", "training_type": "Интервалы",
+             "distance": "8,5 километров", "pace": "5:00/км", "description": "6 x 800 м"},
+            {"day": "Суббота", "date": "17.05.2025", "training_type": "Длительная",
+             "distance": "около 12 км", "pace": "6:15/км", "description": "Длительный бег"},
+            {"day": "Воскресенье", "date": "18.05.2025", "training_type": "Лишний день",
+             "distance": "5 км", "pace": "6:00/км", "description": "Лишний день"},
+        ],
+    }
+}
+
+
+class FakeCompletions:
+    """Заглушка chat.completions, возвращающая только запрошенные поля."""
+
+    def __init__(self):
+        self.calls = []
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        content = json.dumps({"days": [{"index": 1, "pace": "5:10/км", "description": "Темповой бег"}]})
+        message = type("Message", (), {"content": content})
+        choice = type("Choice", (), {"message": message})
+        return type("Response", (), {"choices": [choice]})
+
+
+class FakeClient:
+    def __init__(self):
+        self.chat = type("Chat", (), {"completions": FakeCompletions()})
+
+
+def test_local_repairs():
+    """Проверяет исправление обертки, дат, дней недели, дистанций и количества дней."""
+    result = validate_plan(BROKEN_PLAN, expected_dates=EXPECTED_DATES)
+    days = result.plan["training_days"]
+
+    assert result.is_valid, f"Остались неисправленные поля: {result.broken_fields}"
+    assert len(days) == 3, "Количество дней не ограничено календарем"
+    assert [day["date"] for day in days] == EXPECTED_DATES
+    assert [day["day"] for day in days] == ["Понедельник", "Среда", "Суббота"]
+    assert [day["distance"] for day in days] == ["5 км", "8.5 км", "12 км"]
+    assert result.repairs, "Исправления не зарегистрированы"
+
+
+def test_reprompt_only_broken_fields():
+    """Проверяет, что у модели запрашиваются только недостающие поля."""
+    plan = {
+        "plan_name": "План",
+        "training_days": [
+            {"training_type": "Легкий бег", "distance": "5 км", "pace": "6:00/км", "description": "Легкий бег"},
+            {"training_type": "Темповой", "distance": "7 км"},
+        ],
+    }
+    client = FakeClient()
+    repaired = repair_plan(plan, client, expected_dates=EXPECTED_DATES[:2])
+
+    calls = client.chat.completions.calls
+    assert len(calls) == 1, "Ожидался один повторный запрос"
+    assert '"missing": ["pace", "description"]' in calls[0]["messages"][1]["content"]
+    assert repaired["training_days"][1]["pace"] == "5:10/км"
+    assert repaired["training_days"][1]["description"] == "Темповой бег"
+    assert get_validation_stats()["reprompted"] >= 1
+
+
+def test_defaults_without_client():
+    """Проверяет, что пустой ответ превращается в отображаемый план без обращения к модели."""
+    repaired = repair_plan("не JSON", expected_dates=EXPECTED_DATES)
+    days = repaired["training_days"]
+
+    assert len(days) == 3
+    assert all(day["distance"] == "0 км" and day["description"] for day in days)
+
+
+def test_rest_day_distance():
+    """Проверяет, что день отдыха получает 0 км локально, без повторного запроса."""
+    plan = {"training_days": [
+        {"day": "Понедельник", "date": "12.05.2025", "training_type": "Отдых",
+         "distance": "Отдых", "pace": "-", "description": "День отдыха"},
+        {"day": "Среда", "date": "14.05.2025", "training_type": "Отдых",
+         "pace": "-", "description": "Восстановление"},
+        {"day": "Суббота", "date": "17.05.2025", "training_type": "Легкий бег",
+         "distance": "выходной", "pace": "-", "description": "Прогулка"},
+    ]}
+    result = validate_plan(plan, expected_dates=EXPECTED_DATES)
+
+    assert result.is_valid, f"Остались неисправленные поля: {result.broken_fields}"
+    assert [day["distance"] for day in result.plan["training_days"]] == ["0 км", "0 км", "0 км"]
+
+
+def main():
+    """Основная функция для запуска тестов."""
+    print("=" * 60)
+    print("Тест валидации планов тренировок")
+    print("=" * 60)
+
+    test_local_repairs()
+    test_reprompt_only_broken_fields()
+    test_defaults_without_client()
+    test_rest_day_distance()
+
+    print("\n✅ Тесты валидации планов успешно пройдены")
+    print(f"Статистика: {get_validation_stats()}")
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
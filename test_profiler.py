@@ -0,0 +1,81 @@
+"""
+Тест профилирования по запросу: свернутые стеки занятого потока, прирост
+памяти, один сеанс одновременно и разбор аргумента команды /profile.
+"""
+
+import logging
+import tempfile
+import threading
+import time
+
+from profiler import PROFILE_MAX_SECONDS, DEFAULT_SECONDS, Profiler, parse_seconds
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+retained = []
+
+
+def busy_plan_generation(stop):
+    """Горячая функция: считает и держит выделенную память."""
+    while not stop.is_set():
+        retained.append(bytearray(4096))
+        sum(i * i for i in range(2000))
+
+
+def test_profile_session():
+    """Проверяет отчеты сеанса и отказ второго сеанса."""
+    directory = tempfile.mkdtemp()
+    profiler = Profiler(directory, interval=0.005)
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_plan_generation, args=(stop,), name="plan-worker")
+    worker.start()
+    try:
+        assert profiler.start(0.5)
+        assert not profiler.start(0.5)
+        assert profiler.run(0.1) is None
+        while profiler.running:
+            time.sleep(0.05)
+        report = profiler.run(0.3)
+    finally:
+        stop.set()
+        worker.join()
+        retained.clear()
+
+    assert report.samples > 10
+    with open(report.stacks_path, encoding="utf-8") as f:
+        stacks = f.read().splitlines()
+    hot = [line for line in stacks if line.startswith("plan-worker;") and "busy_plan_generation (test_profiler.py" in line]
+    assert hot
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in stacks)
+    with open(report.allocations_path, encoding="utf-8") as f:
+        assert "test_profiler.py" in f.read()
+    assert any("test_profiler.py" in label for label, _ in report.hot)
+    assert report.stacks_path in report.summary()
+
+
+def test_parse_seconds():
+    """Проверяет аргумент команды /profile."""
+    assert parse_seconds([]) == DEFAULT_SECONDS
+    assert parse_seconds(["10"]) == 10
+    assert parse_seconds(["abc"]) is None
+    assert parse_seconds(["0"]) is None
+    assert parse_seconds([str(PROFILE_MAX_SECONDS + 1)]) is None
+
+
+def main():
+    """Основная функция для запуска тестов."""
+    print("=" * 60)
+    print("Тест профилирования по запросу")
+    print("=" * 60)
+
+    test_profile_session()
+    test_parse_seconds()
+
+    print("\n✅ Тесты профилирования по запросу успешно пройдены")
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Тест трассировки обновлений: дерево интервалов обработчика, запросов к базе
+и Bot API, выборка трасс, формат OTLP/JSON и сводки slowest/flame.
+Bot API подменяется транспортом httpx в памяти.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import tempfile
+
+import httpx
+from telegram import Update
+from telegram.ext import ApplicationBuilder, CommandHandler
+
+from metrics import instrument_application, instrument_methods
+from tracing import Tracer, TRACER, flame, format_trace, read_traces, slowest, span
+from update_tracing import TracedApplication, TracedRequest
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Bot", "username": "test_bot"}
+
+
+class FakePlanManager:
+    """Менеджер, чьи методы измеряются как запросы к базе."""
+
+    @staticmethod
+    def get_latest_plan(user_id):
+        return {"user_id": user_id}
+
+
+instrument_methods(FakePlanManager)
+
+
+def bot_api(request):
+    """Ответы Bot API в памяти."""
+    method = request.url.path.rsplit("/", 1)[-1]
+    if method == "getMe":
+        result = BOT_USER
+    else:
+        result = {"message_id": 2, "date": 0, "chat": {"id": 42, "type": "private"}, "text": "ok"}
+    return httpx.Response(200, json={"ok": True, "result": result})
+
+
+def traced_request():
+    request = TracedRequest()
+    request._client = httpx.AsyncClient(transport=httpx.MockTransport(bot_api))
+    return request
+
+
+def command_update(update_id, text="/plan"):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": 1, "date": 0, "text": text,
+            "chat": {"id": 42, "type": "private"},
+            "from": {"id": 42, "is_bot": False, "first_name": "Runner"},
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(text)}],
+        },
+    }
+
+
+def test_update_trace():
+    """Проверяет дерево интервалов обновления и чтение трассы из файла."""
+    path = os.path.join(tempfile.mkdtemp(), "traces.jsonl")
+    saved = TRACER.path, TRACER.sample_rate
+    TRACER.configure(path)
+    TRACER.sample_rate = 1.0
+
+    async def plan(update, context):
+        await asyncio.to_thread(FakePlanManager.get_latest_plan, update.effective_user.id)
+        await update.message.reply_text("План готов")
+
+    async def run():
+        application = (ApplicationBuilder().token("1:test").application_class(TracedApplication)
+                       .request(traced_request()).get_updates_request(traced_request()).build())
+        application.add_handler(CommandHandler("plan", plan))
+        instrument_application(application)
+        await application.initialize()
+        await application.process_update(Update.de_json(command_update(7), application.bot))
+        await application.shutdown()
+
+    try:
+        asyncio.run(run())
+    finally:
+        TRACER.configure(saved[0])
+        TRACER.sample_rate = saved[1]
+
+    with open(path, encoding="utf-8") as f:
+        assert "resourceSpans" in json.loads(f.readline())
+    traces = read_traces([path])
+    assert len(traces) == 1
+    spans = {item["name"]: item for item in traces[0]}
+    root = spans["update message"]
+    assert root["attributes"] == {"update.id": 7, "telegram.user_id": 42, "telegram.command": "/plan"}
+    handler = spans["handler test_update_trace.plan"]
+    assert handler["parent_id"] == root["span_id"]
+    assert spans["db FakePlanManager.get_latest_plan"]["parent_id"] == handler["span_id"]
+    assert spans["telegram sendMessage"]["parent_id"] == handler["span_id"]
+    # getMe при инициализации — вне обновления
+    assert "telegram getMe" not in spans
+
+    assert "handler test_update_trace.plan" in format_trace(traces[0])
+    stacks = flame(traces)
+    assert "update message;handler test_update_trace.plan;telegram sendMessage" in stacks
+
+
+def test_sampling():
+    """Проверяет, что сохраняются медленные трассы и трассы с ошибкой, а обычные — по выборке."""
+    path = os.path.join(tempfile.mkdtemp(), "traces.jsonl")
+    tracer = Tracer(path, sample_rate=0.0, slow_seconds=0.05)
+
+    with tracer.trace("update message", **{"telegram.user_id": 1}):
+        with span("db fast"):
+            pass
+    with tracer.trace("update message", **{"telegram.user_id": 2}):
+        with span("llm slow"):
+            asyncio.run(asyncio.sleep(0.06))
+    with tracer.trace("update callback_query", **{"telegram.user_id": 3}):
+        try:
+            with span("db broken"):
+                raise ValueError("connection lost")
+        except ValueError:
+            pass
+
+    traces = read_traces([path])
+    assert len(traces) == 2
+    assert [item["name"] for item in slowest(traces, 1)[0]] == ["update message", "llm slow"]
+    broken = slowest(traces, user_id=3)[0]
+    assert broken[1]["error"] == "ValueError: connection lost"
+
+    # Вне трассы интервалы не создаются
+    with span("telegram sendMessage") as outside:
+        assert outside is None
+
+
+def main():
+    """Основная функция для запуска тестов."""
+    print("=" * 60)
+    print("Тест трассировки обновлений")
+    print("=" * 60)
+
+    test_update_trace()
+    test_sampling()
+
+    print("\n✅ Тесты трассировки обновлений успешно пройдены")
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Тест календаря тренировок.
+Проверяет разбор дат, выбор дней недели и расчет дат тренировок.
+"""
+
+import logging
+from datetime import date, timedelta
+
+from training_calendar import (date_variants, parse_date, parse_weekdays,
+                               schedule_for_profile, session_dates, weekday_mask)
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+TODAY = date(2026, 5, 6)  # среда
+
+
+def walk_dates(start, weekdays, count):
+    """Прежний расчет: перебор дней подряд начиная с даты начала."""
+    dates = []
+    day = start
+    while len(dates) < count:
+        if day.weekday() in weekdays:
+            dates.append(day)
+        day += timedelta(days=1)
+    return tuple(dates)
+
+
+def test_parse_date():
+    """Проверяет поддерживаемые форматы дат."""
+    assert parse_date("13.05.2026") == date(2026, 5, 13)
+    assert parse_date("2026-05-13") == date(2026, 5, 13)
+    assert parse_date("13/05/2026") == date(2026, 5, 13)
+    assert parse_date("13.05", default_year=2026) == date(2026, 5, 13)
+    assert parse_date("Сегодня") is None
+    assert parse_date("не знаю") is None
+    assert parse_date("31.02.2026") is None
+    assert parse_date(None) is None
+
+    # Все варианты записи даты для поиска в базе разбираются обратно в ту же дату
+    for text in date_variants(date(2026, 5, 13)):
+        assert parse_date(text, default_year=2026) == date(2026, 5, 13)
+
+
+def test_parse_weekdays():
+    """Проверяет порядок пользователя, дополнение и обрезку дней недели."""
+    assert parse_weekdays("Вс, вторник, Пт", 2) == (1, 6)
+    assert parse_weekdays("Суббота", 3) == (0, 1, 5)
+    assert parse_weekdays("", 3) == (0, 1, 2)
+    assert parse_weekdays("пн; ср", 2) == (0, 2)
+    assert parse_weekdays([6, 0, 6], 2) == (0, 6)
+    assert parse_weekdays("Вс, вторник, Пт", 2, keep_all=True) == (1, 4, 6)
+    assert parse_weekdays("Суббота", 3, keep_all=True) == (0, 1, 5)
+
+
+def test_session_dates_match_day_walk():
+    """Проверяет, что арифметический расчет совпадает с перебором дней."""
+    for start_offset in range(7):
+        start = TODAY + timedelta(days=start_offset)
+        for mask in range(1, 128):
+            weekdays = [weekday for weekday in range(7) if mask >> weekday & 1]
+            for count in (1, 3, 5, 10):
+                assert session_dates(start, mask, count) == walk_dates(start, weekdays, count)
+
+
+def test_schedule_for_profile():
+    """Проверяет расчет расписания по профилю и кэширование дат."""
+    profile = {
+        "training_start_date_text": "01.05.2026",
+        "training_days_per_week": "3",
+        "preferred_training_days": "Вторник, Четверг, Воскресенье",
+    }
+    session_dates.cache_clear()
+    schedule = schedule_for_profile(profile, today=TODAY)
+    schedule_for_profile(profile, today=TODAY)
+
+    assert schedule.requested_start == date(2026, 5, 1)
+    assert schedule.start == TODAY
+    assert schedule.date_strings == ["07.05.2026", "10.05.2026", "12.05.2026"]
+    assert schedule.dates_with_weekdays(with_short=True)["10.05.2026"] == "Воскресенье (Вс)"
+    assert session_dates.cache_info().hits == 1
+
+
+def test_continuation_keeps_all_preferred_days():
+    """Проверяет, что продолжение плана ставит тренировки в ближайшие из всех предпочитаемых дней."""
+    profile = {
+        "training_days_per_week": "3",
+        "preferred_training_days": "Вторник, Четверг, Суббота, Воскресенье",
+    }
+    schedule = schedule_for_profile(profile, today=TODAY)
+    continuation = schedule_for_profile(profile, today=TODAY, continuation=True)
+
+    assert schedule.weekdays == (1, 3, 5)
+    assert schedule.date_strings == ["07.05.2026", "09.05.2026", "12.05.2026"]
+    assert continuation.weekdays == (1, 3, 5, 6)
+    assert continuation.date_strings == ["07.05.2026", "09.05.2026", "10.05.2026"]
+
+
+def main():
+    """Основная функция для запуска тестов."""
+    print("=" * 60)
+    print("Тест календаря тренировок")
+    print("=" * 60)
+
+    test_parse_date()
+    test_parse_weekdays()
+    test_session_dates_match_day_walk()
+    test_schedule_for_profile()
+    test_continuation_keeps_all_preferred_days()
+
+    print("\n✅ Тесты календаря тренировок успешно пройдены")
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Тест тренировочной нагрузки: нагрузка тренировки, пошаговое обновление и пересчет NumPy.
+Не обращается к базе данных.
+"""
+
+import logging
+import math
+from datetime import date, timedelta
+
+from migrations import MIGRATIONS, SCHEMA_CAPABILITIES
+from training_load import (ACUTE_DAYS, CHRONIC_DAYS, MAX_INTENSITY, MIN_INTENSITY, apply_load, compute_loads,
+                           format_load_summary, limits_increase, load_summary, session_load)
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+EVENTS = [
+    (1, date(2026, 9, 1), 10.0),
+    (2, date(2026, 9, 3), 6.0),
+    (1, date(2026, 9, 5), 8.0),
+    (1, date(2026, 9, 2), 5.0),  # записано задним числом
+    (1, date(2026, 9, 5), -8.0),  # отмена тренировки
+    (2, date(2026, 9, 10), 12.0),
+]
+
+
+def test_session_load():
+    """Проверяет, что быстрый темп увеличивает нагрузку, а выбросы ограничены."""
+    assert session_load(10, 360, 360) == 10
+    assert session_load(10, None, 360) == 10
+    assert math.isclose(session_load(10, 300, 360), 14.4)
+    assert math.isclose(session_load(10, 60, 360), 10 * MAX_INTENSITY ** 2)
+    assert math.isclose(session_load(10, 900, 360), 10 * MIN_INTENSITY ** 2)
+    assert session_load(None, 300, 360) == 0
+
+
+def test_incremental_matches_bulk():
+    """Проверяет, что пошаговое обновление совпадает с пересчетом всех пользователей."""
+    states = {}
+    for user_id, day, load in EVENTS:
+        states[user_id] = apply_load(states.get(user_id), day, load)
+
+    as_of = date(2026, 9, 12)
+    users, acute, chronic = compute_loads([e[0] for e in EVENTS], [e[1].toordinal() for e in EVENTS],
+                                          [e[2] for e in EVENTS], as_of.toordinal())
+    assert list(users) == [1, 2]
+    for index, user_id in enumerate(users):
+        summary = load_summary(states[user_id], as_of)
+        bulk = load_summary({"acute_load": acute[index], "chronic_load": chronic[index], "load_date": as_of}, as_of)
+        assert summary == bulk
+
+
+def test_summary_and_limits():
+    """Проверяет свежесть, рост и ограничение нагрузки при усталости."""
+    state = None
+    start = date(2026, 6, 1)
+    # Шесть недель по 5 км в день, затем неделя по 12 км в день
+    for offset in range(49):
+        state = apply_load(state, start + timedelta(days=offset), 5.0 if offset < 42 else 12.0)
+
+    summary = load_summary(state, start + timedelta(days=48))
+    assert summary["acute_load"] > summary["chronic_load"]
+    assert summary["freshness"] < 0 and summary["ramp_rate"] > 0
+    assert limits_increase(summary)
+    assert "не увеличивай" in format_load_summary(summary)
+
+    # После двух недель отдыха бегун восстановился
+    rested = load_summary(state, start + timedelta(days=62))
+    assert rested["freshness"] > 0
+    assert not limits_increase(rested)
+    assert format_load_summary(None) == ""
+
+
+def test_migration_matches_constants():
+    """Проверяет, что триггер использует те же окна средних, что и модуль."""
+    sql = MIGRATIONS[SCHEMA_CAPABILITIES["training_loads"] - 1].sql
+    assert f"exp(-1.0 / {ACUTE_DAYS})" in sql
+    assert f"exp(-1.0 / {CHRONIC_DAYS})" in sql
+    assert f"LEAST({MAX_INTENSITY}, GREATEST({MIN_INTENSITY}," in sql
+
+
+def main():
+    """Основная функция для запуска тестов."""
+    print("=" * 60)
+    print("Тест тренировочной нагрузки")
+    print("=" * 60)
+
+    test_session_load()
+    test_incremental_matches_bulk()
+    test_summary_and_limits()
+    test_migration_matches_constants()
+
+    print("\n✅ Тесты тренировочной нагрузки успешно пройдены")
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Тест разбора единиц измерения: дистанции, темпа, длительности и объема.
+Не обращается к базе данных и OpenAI API.
+"""
+
+import logging
+
+from units import (day_distance_km, normalize_plan, normalize_profile, normalize_workout, parse_distance_km,
+                   parse_duration_seconds, parse_pace_seconds, parse_volume_km, plan_distance_km)
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+
+def test_parse_values():
+    """Проверяет разбор дистанции, объема, темпа и длительности."""
+    assert parse_distance_km("5 км") == 5.0
+    assert parse_distance_km("5,5") == 5.5
+    assert parse_distance_km("800 м") == 0.8
+    assert parse_distance_km(None) is None
+
+    assert parse_volume_km("20,5") == 20.5
+    assert parse_volume_km("10-20") == 15.0
+    assert parse_volume_km(12) == 12.0
+
+    assert parse_pace_seconds("5:30/км") == 330
+    assert parse_pace_seconds("5:30-6:00 мин/км") == 345
+    assert parse_pace_seconds("Комфортный темп") is None
+
+    assert parse_duration_seconds("32:15") == 1935
+    assert parse_duration_seconds("1:05:30") == 3930
+    assert parse_duration_seconds("1 ч 5 мин") == 3900
+    assert parse_duration_seconds("") is None
+
+
+def test_normalize_plan():
+    """Проверяет, что числа записываются в план и используются вместо текста."""
+    plan = {"training_days": [
+        {"distance": "5 км", "pace": "6:00"},
+        {"distance": "10,5 км", "pace": "5:30-6:00"},
+        {"distance": "Отдых", "pace": ""},
+    ]}
+    normalize_plan(plan)
+
+    assert [day["distance_km"] for day in plan["training_days"]] == [5.0, 10.5, None]
+    assert [day["pace_sec_per_km"] for day in plan["training_days"]] == [360, 345, None]
+    assert plan_distance_km(plan) == 15.5
+
+    # Сохраненное число важнее текста; для старых планов текст разбирается
+    assert day_distance_km({"distance": "7 км", "distance_km": 6.0}) == 6.0
+    assert day_distance_km({"distance": "7 км"}) == 7.0
+
+
+def test_normalize_profile_and_workout():
+    """Проверяет числовые поля профиля и результата анализа скриншота."""
+    profile = normalize_profile({"weekly_volume": "0-10", "comfortable_pace": "6:30", "distance": "21.1"})
+    assert profile["weekly_volume_km"] == 5.0
+    assert profile["comfortable_pace_sec"] == 390
+    assert profile["goal_distance_km"] == 21.1
+
+    workout = normalize_workout({"дистанция_км": "10.0", "длительность": "55:00"})
+    assert workout["distance_km"] == 10.0
+    assert workout["duration_sec"] == 3300
+    assert workout["pace_sec_per_km"] == 330
+
+
+def main():
+    """Основная функция для запуска тестов."""
+    print("=" * 60)
+    print("Тест единиц измерения")
+    print("=" * 60)
+
+    test_parse_values()
+    test_normalize_plan()
+    test_normalize_profile_and_workout()
+
+    print("\n✅ Тесты единиц измерения успешно пройдены")
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
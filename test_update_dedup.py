@@ -0,0 +1,111 @@
+"""
+Тест идемпотентной обработки обновлений: кэш процесса, общее хранилище и
+подключение к приложению бота. Не обращается к базе данных и Telegram.
+"""
+
+import asyncio
+import logging
+
+from telegram import Update
+from telegram.ext import ApplicationBuilder, ApplicationHandlerStop
+
+from migrations import MIGRATIONS, SCHEMA_CAPABILITIES
+from update_dedup import COMPLETE_GROUP, DEDUP_GROUP, UpdateDeduplicator, install_update_dedup
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+
+class FakeStore:
+    """Общее хранилище захватов нескольких процессов."""
+
+    def __init__(self):
+        self.claimed = set()
+        self.completed = set()
+
+    def claim(self, update_id):
+        if update_id in self.claimed:
+            return False
+        self.claimed.add(update_id)
+        return True
+
+    def complete(self, update_id):
+        self.completed.add(update_id)
+        return True
+
+
+def test_claims_across_processes():
+    """Проверяет, что повтор отсекается кэшем процесса и хранилищем другого процесса."""
+    store = FakeStore()
+    first = UpdateDeduplicator(store, capacity=2)
+    second = UpdateDeduplicator(store, capacity=2)
+
+    async def run():
+        return [await first.claim(1), await first.claim(1), await second.claim(1), await second.claim(2)]
+
+    assert asyncio.run(run()) == [True, False, False, True]
+    assert (first.duplicates, second.duplicates) == (1, 1)
+
+
+def test_lru_is_bounded():
+    """Проверяет, что кэш процесса не растет больше заданного размера."""
+    deduplicator = UpdateDeduplicator(capacity=3)
+
+    async def run():
+        return [await deduplicator.claim(update_id) for update_id in (1, 2, 3, 4, 1)]
+
+    # Без хранилища вытесненный из кэша update_id снова считается новым
+    assert asyncio.run(run()) == [True, True, True, True, True]
+    assert list(deduplicator._seen) == [3, 4, 1]
+
+
+def test_handlers_run_once():
+    """Проверяет, что повтор останавливается перед обработчиками бота, а обработанное отмечается."""
+    store = FakeStore()
+    application = ApplicationBuilder().token("123456:TEST").build()
+    install_update_dedup(application, UpdateDeduplicator(store))
+    groups = sorted(application.handlers)
+    assert groups[0] == DEDUP_GROUP and groups[-1] == COMPLETE_GROUP
+    claim = application.handlers[DEDUP_GROUP][0].callback
+    complete = application.handlers[COMPLETE_GROUP][0].callback
+
+    async def run():
+        processed = []
+        for update_id in (10, 10, 11):
+            update = Update(update_id)
+            try:
+                await claim(update, None)
+            except ApplicationHandlerStop:
+                continue
+            processed.append(update_id)
+            await complete(update, None)
+        return processed
+
+    assert asyncio.run(run()) == [10, 11]
+    assert store.completed == {10, 11}
+
+
+def test_processed_updates_migration():
+    """Проверяет таблицу захватов обновлений в миграции."""
+    sql = MIGRATIONS[SCHEMA_CAPABILITIES["processed_updates"] - 1].sql
+    assert "update_id BIGINT PRIMARY KEY" in sql
+
+
+def main():
+    """Основная функция для запуска тестов."""
+    print("=" * 60)
+    print("Тест идемпотентной обработки обновлений")
+    print("=" * 60)
+
+    test_claims_across_processes()
+    test_lru_is_bounded()
+    test_handlers_run_once()
+    test_processed_updates_migration()
+
+    print("\n✅ Тесты идемпотентной обработки обновлений успешно пройдены")
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Тест режима вебхука: ключ распределения по чату, проверка секрета,
+переполнение очереди, HTTP-обработка запроса и эндпоинт живости основного
+процесса. Не обращается к Telegram.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import queue
+import tempfile
+
+from liveness import LivenessMonitor, probe
+from webhook_server import (SECRET_HEADER, WebhookDispatcher, WebhookServer, affinity_key, derive_secret,
+                            serve_connection, worker_index)
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+SECRET = "test-secret"
+PATH = "/telegram/webhook"
+
+
+def _update(update_id, chat_id=None, callback=False):
+    if chat_id is None:
+        return {"update_id": update_id}
+    if callback:
+        return {"update_id": update_id, "callback_query": {"id": "1", "from": {"id": chat_id},
+                                                           "message": {"chat": {"id": chat_id}}}}
+    return {"update_id": update_id, "message": {"message_id": 1, "chat": {"id": chat_id}, "text": "hi"}}
+
+
+def test_affinity_key():
+    """Проверяет, что сообщения и кнопки одного чата попадают в один обработчик."""
+    assert affinity_key(_update(1, 555)) == 555
+    assert affinity_key(_update(2, 555, callback=True)) == 555
+    assert affinity_key({"update_id": 3, "callback_query": {"id": "1", "from": {"id": 777}}}) == 777
+    assert affinity_key(_update(4)) == 4
+    # Группы имеют отрицательные ID
+    assert worker_index(-1001, 4) == worker_index(1001, 4)
+    assert {worker_index(chat_id, 4) for chat_id in range(100)} == {0, 1, 2, 3}
+
+
+def test_derive_secret():
+    """Проверяет, что секрет одинаков для одного токена и допустим для Telegram."""
+    secret = derive_secret("123:token")
+    assert secret == derive_secret("123:token")
+    assert secret != derive_secret("123:other")
+    assert len(secret) == 64 and all(char in "0123456789abcdef" for char in secret)
+
+
+def test_dispatcher():
+    """Проверяет секрет, путь, разбор тела и ответ 503 при переполненной очереди."""
+    queues = [queue.Queue(maxsize=1), queue.Queue(maxsize=1)]
+    dispatcher = WebhookDispatcher(SECRET, PATH, queues)
+    headers = {SECRET_HEADER: SECRET}
+    body = json.dumps(_update(1, 10)).encode()
+
+    assert dispatcher.handle("POST", PATH, {SECRET_HEADER: "wrong"}, body)[0] == 403
+    assert dispatcher.handle("POST", PATH, {}, body)[0] == 403
+    assert dispatcher.handle("POST", "/other", headers, body)[0] == 404
+    assert dispatcher.handle("GET", PATH, headers, b"")[0] == 405
+    assert dispatcher.handle("POST", PATH, headers, b"not json")[0] == 400
+
+    assert dispatcher.handle("POST", PATH, headers, body)[0] == 200
+    assert queues[worker_index(10, 2)].get_nowait() == body
+    dispatcher.handle("POST", PATH, headers, body)
+    assert dispatcher.handle("POST", PATH, headers, body)[0] == 503
+    assert (dispatcher.received, dispatcher.rejected) == (2, 1)
+
+    status, payload = dispatcher.handle("GET", "/healthz", {}, b"")
+    assert status == 200 and json.loads(payload)["received"] == 2
+
+
+def test_http_keep_alive():
+    """Проверяет два запроса в одном соединении через HTTP-сервер."""
+    queues = [queue.Queue()]
+    dispatcher = WebhookDispatcher(SECRET, PATH, queues)
+
+    async def run():
+        server = await asyncio.start_server(
+            lambda reader, writer: serve_connection(dispatcher, reader, writer), "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        statuses = []
+        for update_id in (1, 2):
+            body = json.dumps(_update(update_id, 42)).encode()
+            writer.write(f"POST {PATH} HTTP/1.1\r\nHost: localhost\r\n"
+                         f"X-Telegram-Bot-Api-Secret-Token: {SECRET}\r\n"
+                         f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+            await writer.drain()
+            statuses.append((await reader.readline()).decode().split()[1])
+            while (await reader.readline()) != b"\r\n":
+                pass
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return statuses
+
+    assert asyncio.run(run()) == ["200", "200"]
+    assert [json.loads(queues[0].get_nowait())["update_id"] for _ in range(2)] == [1, 2]
+
+
+def test_parent_health_endpoint():
+    """Проверяет, что эндпоинт основного процесса отдает сумму очередей обработчиков."""
+    server = WebhookServer("https://bot.example.com", workers=2, secret=SECRET, health_port=0)
+    server.queues = [queue.Queue(), queue.Queue()]
+    server.queues[0].put(b"{}")
+    server.queues[1].put(b"{}")
+    server.queues[1].put(b"{}")
+    assert server.pending_updates() == 3
+
+    async def run():
+        monitor = LivenessMonitor(server.pending_updates)
+        monitor.start(host=None)
+        port = monitor.serve("127.0.0.1", 0)
+        try:
+            return await asyncio.to_thread(probe, "127.0.0.1", port)
+        finally:
+            monitor.stop()
+
+    health = asyncio.run(run())
+    assert health["status"] == "ok" and health["pending_updates"] == 3
+
+
+def test_monitors_skip_disabled_health_port():
+    """Проверяет, что при HEALTH_PORT=0 мониторы не опрашивают эндпоинт и не перезапускают бота."""
+    import bot_monitor
+    # bot_health_monitor при импорте открывает bot_monitor.log в текущем каталоге
+    cwd = os.getcwd()
+    os.chdir(tempfile.mkdtemp())
+    try:
+        import bot_health_monitor
+    finally:
+        os.chdir(cwd)
+
+    def unexpected(*args, **kwargs):
+        raise AssertionError("эндпоинт живости отключен")
+
+    saved = (bot_monitor.HEALTH_PORT, bot_monitor.probe, bot_health_monitor.HEALTH_PORT, bot_health_monitor.probe,
+             bot_health_monitor.is_bot_running, bot_health_monitor.stop_bot, bot_health_monitor.start_bot)
+    bot_monitor.HEALTH_PORT = bot_health_monitor.HEALTH_PORT = 0
+    bot_monitor.probe = bot_health_monitor.probe = unexpected
+    bot_health_monitor.is_bot_running = lambda: (True, 1)
+    bot_health_monitor.stop_bot = bot_health_monitor.start_bot = unexpected
+    try:
+        assert bot_monitor.check_bot_health()
+        bot_health_monitor.check_and_restart()
+    finally:
+        (bot_monitor.HEALTH_PORT, bot_monitor.probe, bot_health_monitor.HEALTH_PORT, bot_health_monitor.probe,
+         bot_health_monitor.is_bot_running, bot_health_monitor.stop_bot, bot_health_monitor.start_bot) = saved
+
+
+def test_health_monitor_tolerates_unknown_health():
+    """Проверяет, что неответ эндпоинта живости перезапускает бота только после нескольких опросов подряд."""
+    cwd = os.getcwd()
+    os.chdir(tempfile.mkdtemp())
+    try:
+        import bot_health_monitor
+    finally:
+        os.chdir(cwd)
+
+    responses = []
+    restarts = []
+    saved = (bot_health_monitor.HEALTH_PORT, bot_health_monitor.probe, bot_health_monitor.is_bot_running,
+             bot_health_monitor.stop_bot, bot_health_monitor.start_bot, bot_health_monitor.last_start_time,
+             bot_health_monitor.health_failures)
+    bot_health_monitor.HEALTH_PORT = 8081
+    bot_health_monitor.probe = lambda: responses.pop(0)
+    bot_health_monitor.is_bot_running = lambda: (True, 1)
+    bot_health_monitor.stop_bot = restarts.append
+    bot_health_monitor.start_bot = lambda: None
+    bot_health_monitor.health_failures = 0
+    try:
+        # Бот только что запущен: неответ не считается
+        bot_health_monitor.last_start_time = bot_health_monitor.time.monotonic()
+        responses.append(None)
+        bot_health_monitor.check_and_restart()
+        assert restarts == [] and bot_health_monitor.health_failures == 0
+
+        # После периода запуска ответ сбрасывает счетчик неответов
+        bot_health_monitor.last_start_time -= bot_health_monitor.STARTUP_GRACE_PERIOD
+        responses.extend([None, {"status": "ok"}] + [None] * (bot_health_monitor.HEALTH_FAILURES_BEFORE_RESTART - 1))
+        for _ in range(bot_health_monitor.HEALTH_FAILURES_BEFORE_RESTART + 1):
+            bot_health_monitor.check_and_restart()
+        assert restarts == []
+
+        # Очередной неответ подряд достигает порога и перезапускает бота
+        responses.append(None)
+        bot_health_monitor.check_and_restart()
+        assert restarts == [1]
+
+        # Заблокированный цикл событий перезапускается сразу
+        bot_health_monitor.health_failures = 0
+        responses.append({"status": "blocked", "current_stall": None})
+        bot_health_monitor.check_and_restart()
+        assert restarts == [1, 1]
+    finally:
+        (bot_health_monitor.HEALTH_PORT, bot_health_monitor.probe, bot_health_monitor.is_bot_running,
+         bot_health_monitor.stop_bot, bot_health_monitor.start_bot, bot_health_monitor.last_start_time,
+         bot_health_monitor.health_failures) = saved
+
+
+def main():
+    """Основная функция для запуска тестов."""
+    print("=" * 60)
+    print("Тест режима вебхука")
+    print("=" * 60)
+
+    test_affinity_key()
+    test_derive_secret()
+    test_dispatcher()
+    test_http_keep_alive()
+    test_parent_health_endpoint()
+    test_monitors_skip_disabled_health_port()
+    test_health_monitor_tolerates_unknown_health()
+
+    print("\n✅ Тесты режима вебхука успешно пройдены")
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
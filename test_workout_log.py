@@ -0,0 +1,101 @@
+"""
+Тест журнала тренировок: серии недель, динамика объема по агрегатам и
+недавние пробежки для зон темпа. Не обращается к базе данных.
+"""
+
+import logging
+from datetime import date
+
+from migrations import MIGRATIONS, SCHEMA_CAPABILITIES
+from pace_calculator import pace_profile
+from workout_log import WorkoutLogManager, current_streak_weeks, fill_weeks, recent_performances, volume_trend, week_start
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+
+def test_current_streak_weeks():
+    """Проверяет, что серия прерывается, если прошлая неделя пропущена."""
+    today = date(2026, 10, 15)  # четверг
+    assert week_start(today) == date(2026, 10, 12)
+
+    stats = {"last_active_week": date(2026, 10, 5), "streak_weeks": 4}
+    assert current_streak_weeks(stats, today) == 4
+    assert current_streak_weeks(dict(stats, last_active_week=date(2026, 10, 12)), today) == 4
+    assert current_streak_weeks(dict(stats, last_active_week=date(2026, 9, 28)), today) == 0
+    assert current_streak_weeks(None, today) == 0
+
+
+def test_weekly_volumes_and_trend():
+    """Проверяет заполнение пустых недель и сравнение последней полной недели."""
+    today = date(2026, 10, 15)
+    rows = [
+        {"week_start": date(2026, 9, 21), "distance_km": 20.0, "workouts": 3},
+        {"week_start": date(2026, 10, 5), "distance_km": 22.0, "workouts": 3},
+        {"week_start": date(2026, 10, 12), "distance_km": 5.0, "workouts": 1},
+    ]
+    weekly = fill_weeks(rows, 4, today)
+    assert [week["week_start"] for week in weekly] == [
+        date(2026, 9, 21), date(2026, 9, 28), date(2026, 10, 5), date(2026, 10, 12)]
+    assert [week["distance_km"] for week in weekly] == [20.0, 0.0, 22.0, 5.0]
+
+    # Текущая неделя не учитывается: 22 км против среднего 10 км за две предыдущие
+    assert volume_trend(weekly) == 1.2
+    assert volume_trend(fill_weeks([], 4, today)) is None
+
+
+def test_event_log_migration():
+    """Проверяет, что журнал защищен от изменений и агрегаты можно пересчитать."""
+    version = SCHEMA_CAPABILITIES["workout_events"]
+    sql = MIGRATIONS[version - 1].sql
+    assert "BEFORE UPDATE OR DELETE ON workout_events" in sql
+    assert "AFTER INSERT ON workout_events" in sql
+    assert "FUNCTION rebuild_workout_rollups" in sql
+    assert "FUNCTION record_training_status" in sql
+
+    backfill = next(migration for migration in MIGRATIONS if migration.version > version
+                    and "workout_events" in migration.sql)
+    assert "rebuild_workout_rollups()" in backfill.sql
+
+
+def test_recent_performances():
+    """Проверяет, что зоны темпа учитывают недавние пробежки пользователя из журнала."""
+    profile = {"user_id": 5, "comfortable_pace": "6:30"}
+    requested = []
+
+    def fake_recent_runs(user_id):
+        requested.append(user_id)
+        return [{"workout_date": date(2026, 5, 4), "distance_km": 10.0, "duration_seconds": 45 * 60}]
+
+    saved = WorkoutLogManager.get_recent_runs
+    WorkoutLogManager.get_recent_runs = staticmethod(fake_recent_runs)
+    try:
+        runs = recent_performances(profile)
+        assert recent_performances({"comfortable_pace": "6:30"}) == []
+    finally:
+        WorkoutLogManager.get_recent_runs = saved
+
+    assert requested == [5]
+    assert runs == [(10.0, 45 * 60)]
+    assert pace_profile(profile, runs).vdot > pace_profile(profile).vdot
+    assert "workout_durations" in MIGRATIONS[SCHEMA_CAPABILITIES["workout_durations"] - 1].sql
+
+
+def main():
+    """Основная функция для запуска тестов."""
+    print("=" * 60)
+    print("Тест журнала тренировок")
+    print("=" * 60)
+
+    test_current_streak_weeks()
+    test_weekly_volumes_and_trend()
+    test_event_log_migration()
+    test_recent_performances()
+
+    print("\n✅ Тесты журнала тренировок успешно пройдены")
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+"""
+Трассировка обработки обновлений: дерево интервалов (span) на каждое обновление.
+
+Корневой интервал открывается на каждое обновление Telegram (update_tracing.py).
+Дочерние интервалы — обработчики бота, методы DBManager, TrainingPlanManager и
+других менеджеров, вызовы OpenAI (все замеры MetricsRegistry.timed, см.
+metrics.py) и запросы к Bot API. Текущий интервал хранится в contextvars,
+поэтому вызовы через asyncio.to_thread попадают в свою трассу; вне обновления
+span() ничего не делает.
+
+Завершенная трасса сохраняется, если она медленнее TRACE_SLOW_SECONDS, в ней
+есть ошибка или она попала в выборку TRACE_SAMPLE_RATE. Трассы пишутся в
+TRACE_FILE по строке на трассу в формате OTLP/JSON (как у файлового экспортера
+OpenTelemetry Collector), файл ротируется.
+
+Просмотр:
+    python tracing.py slowest [-n 10] [--user TELEGRAM_ID] [файлы]
+    python tracing.py flame [файлы] > traces.folded    # flamegraph.pl, speedscope
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import random
+import secrets
+import socket
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from config import TRACE_FILE, TRACE_SAMPLE_RATE, TRACE_SLOW_SECONDS
+
+# Размер файла трасс до ротации (байты)
+TRACE_FILE_MAX_BYTES = 20 * 1024 * 1024
+# Количество файлов трасс после ротации
+TRACE_FILE_BACKUPS = 5
+# Наибольшее число интервалов в трассе; остальные только считаются
+MAX_SPANS = 500
+# Имя сервиса в ресурсе OTLP
+SERVICE_NAME = "pumpun-bot"
+# Количество трасс в выводе slowest по умолчанию
+DEFAULT_SLOWEST = 10
+
+
+class Trace:
+    """Интервалы одного обновления; первый — корневой."""
+    __slots__ = ("trace_id", "spans", "dropped")
+
+    def __init__(self):
+        self.trace_id = secrets.token_hex(16)
+        self.spans: List["Span"] = []
+        self.dropped = 0
+
+
+class Span:
+    """Интервал трассы: имя, начало и конец (нс), атрибуты и ошибка."""
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start", "end", "attributes", "error")
+
+    def __init__(self, trace: Trace, name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self.end: Optional[int] = None
+        self.start = time.time_ns()
+
+    @property
+    def duration(self) -> float:
+        """Длительность в секундах (до текущего момента, если интервал не завершен)."""
+        return ((self.end or time.time_ns()) - self.start) / 1e9
+
+
+_current: ContextVar[Optional[Span]] = ContextVar("trace_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    """Текущий интервал или None вне трассы."""
+    return _current.get()
+
+
+@contextmanager
+def _enter(child: Span) -> Iterator[Span]:
+    token = _current.set(child)
+    try:
+        yield child
+    except Exception as e:
+        child.error = f"{type(e).__name__}: {e}"[:200]
+        raise
+    finally:
+        child.end = time.time_ns()
+        _current.reset(token)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Дочерний интервал текущего интервала; вне трассы ничего не делает."""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    trace = parent.trace
+    if len(trace.spans) >= MAX_SPANS:
+        trace.dropped += 1
+        yield None
+        return
+    child = Span(trace, name, parent.span_id, attributes)
+    trace.spans.append(child)
+    with _enter(child):
+        yield child
+
+
+def _attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        encoded = {"boolValue": value}
+    elif isinstance(value, int):
+        encoded = {"intValue": str(value)}
+    elif isinstance(value, float):
+        encoded = {"doubleValue": value}
+    else:
+        encoded = {"stringValue": str(value)}
+    return {"key": key, "value": encoded}
+
+
+def encode_otlp(trace: Trace, resource: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Трасса в формате OTLP/JSON (ExportTraceServiceRequest).
+
+    Незавершенные к концу трассы интервалы (фоновые задачи) обрезаются
+    концом корневого интервала и помечаются атрибутом unfinished.
+    """
+    root_end = trace.spans[0].end or time.time_ns()
+    spans = []
+    for item in trace.spans:
+        attributes = dict(item.attributes)
+        if item.end is None:
+            attributes["unfinished"] = True
+        if item is trace.spans[0] and trace.dropped:
+            attributes["spans.dropped"] = trace.dropped
+        encoded = {
+            "traceId": trace.trace_id,
+            "spanId": item.span_id,
+            "name": item.name,
+            "startTimeUnixNano": str(item.start),
+            "endTimeUnixNano": str(item.end or root_end),
+            "attributes": [_attribute(key, value) for key, value in attributes.items()],
+            "status": {"code": 2, "message": item.error} if item.error else {},
+        }
+        if item.parent_id:
+            encoded["parentSpanId"] = item.parent_id
+        spans.append(encoded)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [_attribute(key, value) for key, value in resource.items()]},
+            "scopeSpans": [{"scope": {"name": "tracing"}, "spans": spans}],
+        }]
+    }
+
+
+class Tracer:
+    """
+    Трассы обновлений процесса: выборка завершенных трасс и запись в файл.
+
+    Args:
+        path: Файл трасс (пустой — трассировка отключена)
+        sample_rate: Доля сохраняемых обычных трасс
+        slow_seconds: Трассы не быстрее этого срока сохраняются всегда (секунды)
+    """
+
+    def __init__(self, path: Optional[str] = TRACE_FILE, sample_rate: float = TRACE_SAMPLE_RATE,
+                 slow_seconds: float = TRACE_SLOW_SECONDS):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        self.resource = {"service.name": SERVICE_NAME, "host.name": socket.gethostname(), "process.pid": os.getpid()}
+        self._handler: Optional[RotatingFileHandler] = None
+        self._lock = threading.Lock()
+
+    def configure(self, path: Optional[str]) -> None:
+        """Меняет файл трасс (у каждого обработчика вебхука — свой файл)."""
+        with self._lock:
+            if self._handler is not None:
+                self._handler.close()
+                self._handler = None
+            self.path = path
+            self.resource["process.pid"] = os.getpid()
+
+    @contextmanager
+    def trace(self, name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+        """Корневой интервал новой трассы; по завершении трасса проходит выборку."""
+        if not self.path:
+            yield None
+            return
+        trace = Trace()
+        root = Span(trace, name, None, attributes)
+        trace.spans.append(root)
+        try:
+            with _enter(root):
+                yield root
+        finally:
+            self.finish(trace)
+
+    def keep(self, trace: Trace) -> bool:
+        """Сохранять ли трассу: медленная, с ошибкой или попала в выборку."""
+        if trace.spans[0].duration >= self.slow_seconds:
+            return True
+        if any(item.error for item in trace.spans):
+            return True
+        return random.random() < self.sample_rate
+
+    def finish(self, trace: Trace) -> None:
+        if not self.keep(trace):
+            return
+        try:
+            self._write(json.dumps(encode_otlp(trace, self.resource), ensure_ascii=False))
+        except Exception as e:
+            logging.error(f"Не удалось записать трассу: {e}")
+
+    def _write(self, line: str) -> None:
+        with self._lock:
+            if not self.path:
+                return
+            if self._handler is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._handler = RotatingFileHandler(self.path, maxBytes=TRACE_FILE_MAX_BYTES,
+                                                    backupCount=TRACE_FILE_BACKUPS, encoding="utf-8")
+                self._handler.setFormatter(logging.Formatter("%(message)s"))
+            self._handler.handle(logging.makeLogRecord({"msg": line}))
+
+
+TRACER = Tracer()
+
+
+def _value(encoded: Dict[str, Any]) -> Any:
+    kind, value = next(iter(encoded.items()))
+    return int(value) if kind == "intValue" else value
+
+
+def read_traces(paths: Iterable[str]) -> List[List[Dict[str, Any]]]:
+    """
+    Читает трассы из файлов OTLP/JSON.
+
+    Returns:
+        List[List[Dict[str, Any]]]: Трассы — списки интервалов с ключами span_id,
+            parent_id, name, start, end (нс), attributes и error
+    """
+    traces = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    data = json.loads(line)
+                except ValueError:
+                    # Строка, оборванная при остановке процесса
+                    continue
+                for resource_spans in data.get("resourceSpans", []):
+                    for scope_spans in resource_spans.get("scopeSpans", []):
+                        spans = [{
+                            "span_id": item["spanId"],
+                            "parent_id": item.get("parentSpanId"),
+                            "name": item["name"],
+                            "start": int(item["startTimeUnixNano"]),
+                            "end": int(item["endTimeUnixNano"]),
+                            "attributes": {attr["key"]: _value(attr["value"]) for attr in item.get("attributes", [])},
+                            "error": item.get("status", {}).get("message"),
+                        } for item in scope_spans.get("spans", [])]
+                        if spans:
+                            traces.append(spans)
+    return traces
+
+
+def _root(spans: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return next((item for item in spans if not item["parent_id"]), spans[0])
+
+
+def _children(spans: List[Dict[str, Any]]) -> Dict[Optional[str], List[Dict[str, Any]]]:
+    children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    for item in sorted(spans, key=lambda item: item["start"]):
+        children.setdefault(item["parent_id"], []).append(item)
+    return children
+
+
+def slowest(traces: List[List[Dict[str, Any]]], limit: int = DEFAULT_SLOWEST,
+            user_id: Optional[int] = None) -> List[List[Dict[str, Any]]]:
+    """Самые долгие трассы (по корневому интервалу), при необходимости одного пользователя."""
+    if user_id is not None:
+        traces = [spans for spans in traces if _root(spans)["attributes"].get("telegram.user_id") == user_id]
+    return sorted(traces, key=lambda spans: _root(spans)["end"] - _root(spans)["start"], reverse=True)[:limit]
+
+
+def format_trace(spans: List[Dict[str, Any]]) -> str:
+    """Дерево интервалов трассы: смещение от начала, длительность и имя."""
+    root = _root(spans)
+    children = _children(spans)
+    started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(root["start"] / 1e9))
+    attributes = " ".join(f"{key}={value}" for key, value in root["attributes"].items())
+    lines = [f"{(root['end'] - root['start']) / 1e9:.2f} с  {started}  {root['name']}  {attributes}"]
+
+    def walk(item, depth):
+        offset = (item["start"] - root["start"]) / 1e6
+        duration = (item["end"] - item["start"]) / 1e6
+        error = f"  ! {item['error']}" if item["error"] else ""
+        lines.append(f"  {offset:>8.1f} {duration:>9.1f} мс  {'  ' * depth}{item['name']}{error}")
+        for child in children.get(item["span_id"], []):
+            walk(child, depth + 1)
+
+    walk(root, 0)
+    return "\n".join(lines)
+
+
+def flame(traces: List[List[Dict[str, Any]]]) -> Dict[str, int]:
+    """
+    Сводка трасс для flame graph: собственное время каждого стека интервалов.
+
+    Returns:
+        Dict[str, int]: Стек имен через ";" -> собственное время (мкс)
+    """
+    totals: Dict[str, int] = {}
+    for spans in traces:
+        children = _children(spans)
+
+        def walk(item, prefix):
+            stack = prefix + [item["name"].replace(";", ",")]
+            nested = children.get(item["span_id"], [])
+            own = (item["end"] - item["start"]) - sum(child["end"] - child["start"] for child in nested)
+            key = ";".join(stack)
+            totals[key] = totals.get(key, 0) + max(0, own) // 1000
+            for child in nested:
+                walk(child, stack)
+
+        walk(_root(spans), [])
+    return totals
+
+
+def main():
+    """Просмотр сохраненных трасс."""
+    files = argparse.ArgumentParser(add_help=False)
+    files.add_argument("files", nargs="*", help="Файлы трасс (по умолчанию TRACE_FILE и его ротации)")
+    parser = argparse.ArgumentParser(description="Трассы обработки обновлений бота")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    slow = commands.add_parser("slowest", parents=[files], help="Самые долгие трассы с деревом интервалов")
+    slow.add_argument("-n", type=int, default=DEFAULT_SLOWEST, help="Количество трасс")
+    slow.add_argument("--user", type=int, default=None, help="Telegram ID пользователя")
+
+    commands.add_parser("flame", parents=[files], help="Свернутые стеки для flamegraph.pl (мкс)")
+
+    args = parser.parse_args()
+    paths = args.files or sorted(glob.glob(f"{TRACE_FILE}*"))
+    traces = read_traces(paths)
+    if not traces:
+        print("Трассы не найдены")
+        return 1
+
+    if args.command == "slowest":
+        for spans in slowest(traces, args.n, args.user):
+            print(format_trace(spans))
+            print()
+        return 0
+
+    for stack, micros in sorted(flame(traces).items(), key=lambda item: item[1], reverse=True):
+        if micros:
+            print(f"{stack} {micros}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
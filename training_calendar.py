@@ -0,0 +1,243 @@
+"""
+Календарь тренировок.
+
+Единый расчет дат тренировок по дате начала, предпочитаемым дням недели и
+количеству тренировок в неделю. Строки дат разбираются один раз (с кэшем),
+даты тренировок вычисляются арифметически по маске дней недели и кэшируются
+по (дата начала, маска, количество).
+"""
+
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+import pytz
+
+# Московский часовой пояс
+MOSCOW_TZ = pytz.timezone('Europe/Moscow')
+
+WEEKDAY_NAMES = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота", "Воскресенье"]
+WEEKDAY_SHORT_NAMES = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
+
+DAY_NAME_TO_NUMBER = {name.lower(): idx for idx, name in enumerate(WEEKDAY_NAMES)}
+DAY_NAME_TO_NUMBER.update({name.lower(): idx for idx, name in enumerate(WEEKDAY_SHORT_NAMES)})
+
+DATE_FORMATS = ("%d.%m.%Y", "%Y-%m-%d", "%d/%m/%Y")
+# Значения даты начала, означающие "начать сразу"
+START_NOW_VALUES = ("сегодня", "не знаю")
+DEFAULT_DAYS_PER_WEEK = 3
+
+_DAY_MONTH_RE = re.compile(r"^(\d{1,2})\.(\d{1,2})$")
+_DAYS_SEPARATOR_RE = re.compile(r"[,;]")
+
+
+def today_moscow() -> date:
+    """Возвращает текущую дату по Москве."""
+    return datetime.now(MOSCOW_TZ).date()
+
+
+@lru_cache(maxsize=4096)
+def _parse_date_text(text: str, default_year: int) -> Optional[date]:
+    """Разбирает строку даты; результат кэшируется."""
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    match = _DAY_MONTH_RE.match(text)
+    if match:
+        try:
+            return date(default_year, int(match.group(2)), int(match.group(1)))
+        except ValueError:
+            return None
+    return None
+
+
+def parse_date(value: Any, default_year: Optional[int] = None) -> Optional[date]:
+    """
+    Преобразует дату из профиля или плана в объект date.
+
+    Поддерживаются форматы ДД.ММ.ГГГГ, ГГГГ-ММ-ДД, ДД/ММ/ГГГГ и ДД.ММ
+    (с текущим годом), а также объекты date и datetime.
+
+    Args:
+        value: Значение даты
+        default_year: Год для формата ДД.ММ (по умолчанию текущий)
+
+    Returns:
+        Optional[date]: Дата или None, если значение не распознано
+    """
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if not isinstance(value, str):
+        return None
+    text = value.strip()
+    if not text or text.lower() in START_NOW_VALUES:
+        return None
+    return _parse_date_text(text, default_year or today_moscow().year)
+
+
+def date_variants(value: date) -> List[str]:
+    """
+    Возвращает запись даты во всех форматах, которые понимает parse_date.
+
+    Нужна для поиска дня плана по дате на стороне базы данных, где дата хранится
+    строкой в том виде, в котором ее вернула модель.
+    """
+    return [value.strftime(fmt) for fmt in DATE_FORMATS] + [value.strftime("%d.%m")]
+
+
+def parse_weekdays(preferred_days: Union[str, Iterable[Any], None], count: int,
+                   keep_all: bool = False) -> Tuple[int, ...]:
+    """
+    Определяет дни недели тренировок (0 — понедельник).
+
+    Берутся первые count дней в порядке, указанном пользователем; если дней
+    не хватает, добавляются ближайшие к началу недели.
+
+    Args:
+        preferred_days: Строка вида "пн, ср, пт" или последовательность номеров/названий дней
+        count: Количество тренировок в неделю
+        keep_all: Не сокращать список до count (продолжение плана: тренировки
+            ставятся в ближайшие из всех предпочитаемых дней)
+
+    Returns:
+        Tuple[int, ...]: Отсортированные номера дней недели
+    """
+    if isinstance(preferred_days, str):
+        items = _DAYS_SEPARATOR_RE.split(preferred_days)
+    else:
+        items = list(preferred_days or [])
+
+    weekdays: List[int] = []
+    for item in items:
+        if isinstance(item, int):
+            weekday = item if 0 <= item < 7 else None
+        else:
+            weekday = DAY_NAME_TO_NUMBER.get(str(item).strip().lower())
+        if weekday is not None and weekday not in weekdays:
+            weekdays.append(weekday)
+
+    count = max(1, min(count, 7))
+    for weekday in range(7):
+        if len(weekdays) >= count:
+            break
+        if weekday not in weekdays:
+            weekdays.append(weekday)
+    if keep_all:
+        return tuple(sorted(weekdays))
+    return tuple(sorted(weekdays[:count]))
+
+
+def weekday_mask(weekdays: Iterable[int]) -> int:
+    """Переводит номера дней недели в битовую маску (бит 0 — понедельник)."""
+    mask = 0
+    for weekday in weekdays:
+        mask |= 1 << weekday
+    return mask
+
+
+@lru_cache(maxsize=4096)
+def session_dates(start: date, mask: int, count: int) -> Tuple[date, ...]:
+    """
+    Рассчитывает даты тренировок начиная с start по маске дней недели.
+
+    Args:
+        start: Первый день, с которого можно ставить тренировки
+        mask: Битовая маска дней недели
+        count: Количество тренировок
+
+    Returns:
+        Tuple[date, ...]: Даты тренировок по возрастанию
+    """
+    offsets = sorted((weekday - start.weekday()) % 7 for weekday in range(7) if mask >> weekday & 1)
+    if not offsets or count <= 0:
+        return ()
+    per_week = len(offsets)
+    return tuple(start + timedelta(days=offsets[k % per_week] + 7 * (k // per_week)) for k in range(count))
+
+
+def days_per_week(value: Any) -> int:
+    """Разбирает количество тренировок в неделю (от 1 до 7, по умолчанию 3)."""
+    try:
+        return max(1, min(int(value), 7))
+    except (TypeError, ValueError):
+        return DEFAULT_DAYS_PER_WEEK
+
+
+def _weekday_name(weekday: int, with_short: bool) -> str:
+    """Название дня недели, при необходимости с сокращением."""
+    if with_short:
+        return f"{WEEKDAY_NAMES[weekday]} ({WEEKDAY_SHORT_NAMES[weekday]})"
+    return WEEKDAY_NAMES[weekday]
+
+
+@dataclass(frozen=True)
+class TrainingSchedule:
+    """Результат расчета дат тренировок для профиля."""
+    requested_start: date
+    start: date
+    weekdays: Tuple[int, ...]
+    dates: Tuple[date, ...]
+
+    @property
+    def date_strings(self) -> List[str]:
+        """Даты тренировок в формате ДД.ММ.ГГГГ."""
+        return [day.strftime("%d.%m.%Y") for day in self.dates]
+
+    @property
+    def first_date(self) -> Optional[date]:
+        """Дата первой тренировки."""
+        return self.dates[0] if self.dates else None
+
+    def weekday_names(self, with_short: bool = False) -> List[str]:
+        """
+        Названия предпочитаемых дней недели.
+
+        Args:
+            with_short: Добавлять сокращение дня недели, например "Вторник (Вт)"
+        """
+        return [_weekday_name(weekday, with_short) for weekday in self.weekdays]
+
+    def dates_with_weekdays(self, with_short: bool = False) -> Dict[str, str]:
+        """
+        Словарь "дата -> день недели" для промптов.
+
+        Args:
+            with_short: Добавлять сокращение дня недели, например "Вторник (Вт)"
+        """
+        return {day.strftime("%d.%m.%Y"): _weekday_name(day.weekday(), with_short) for day in self.dates}
+
+
+def schedule_for_profile(profile: Dict[str, Any], today: Optional[date] = None,
+                         continuation: bool = False) -> TrainingSchedule:
+    """
+    Рассчитывает даты тренировок для профиля бегуна.
+
+    Дата начала берется из training_start_date_text или training_start_date;
+    прошедшая или не указанная дата заменяется сегодняшней.
+
+    Args:
+        profile: Профиль бегуна в формате бота
+        today: Текущая дата (по умолчанию сегодня по Москве)
+        continuation: Продолжение плана — список предпочитаемых дней не сокращается
+
+    Returns:
+        TrainingSchedule: Даты тренировок и дни недели
+    """
+    today = today or today_moscow()
+    requested = parse_date(profile.get("training_start_date_text", profile.get("training_start_date"))) or today
+    start = max(requested, today)
+    count = days_per_week(profile.get("training_days_per_week", DEFAULT_DAYS_PER_WEEK))
+    weekdays = parse_weekdays(profile.get("preferred_training_days", ""), count, keep_all=continuation)
+    return TrainingSchedule(
+        requested_start=requested,
+        start=start,
+        weekdays=weekdays,
+        dates=session_dates(start, weekday_mask(weekdays), count),
+    )
+
@@ -0,0 +1,292 @@
+"""
+Тренировочная нагрузка: острая (ATL), хроническая (CTL), свежесть (TSB) и рост.
+
+Нагрузка тренировки — дистанция, умноженная на квадрат интенсивности
+(комфортный темп / темп тренировки). Острая и хроническая нагрузки —
+экспоненциальные средние дневной нагрузки за 7 и 42 дня. Триггер базы данных
+обновляет их при каждой записи в журнал тренировок (migrations.TRAINING_LOAD_SQL),
+здесь те же формулы используются для чтения на текущую дату и для пересчета
+всех пользователей одним векторизованным проходом NumPy:
+
+    python training_load.py
+
+Вместо истории пробежек в корректировку плана и в запрос продолжения плана
+передаются несколько чисел (load_summary / format_load_summary).
+"""
+
+import logging
+import math
+import sys
+from datetime import date
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import psycopg2
+import psycopg2.extras
+
+from config import DB_CONFIG
+from metrics import instrument_methods
+from training_calendar import today_moscow
+
+# Окна экспоненциальных средних (дни) и коэффициенты затухания за день
+ACUTE_DAYS = 7
+CHRONIC_DAYS = 42
+ACUTE_DECAY = math.exp(-1 / ACUTE_DAYS)
+CHRONIC_DECAY = math.exp(-1 / CHRONIC_DAYS)
+# Границы интенсивности: темп, распознанный с ошибкой, не должен давать выбросов
+MIN_INTENSITY = 0.7
+MAX_INTENSITY = 1.4
+# Усталость: свежесть ниже 30% хронической нагрузки
+FATIGUE_RATIO = 0.3
+# Слишком быстрый рост: хроническая нагрузка растет более чем на 10% за неделю
+MAX_RAMP_RATIO = 0.1
+
+
+def session_load(distance_km: Optional[float], pace_sec: Optional[float],
+                 comfortable_pace_sec: Optional[float]) -> float:
+    """
+    Рассчитывает нагрузку тренировки.
+
+    Args:
+        distance_km: Дистанция в километрах
+        pace_sec: Темп тренировки (секунды на км)
+        comfortable_pace_sec: Комфортный темп бегуна (секунды на км)
+
+    Returns:
+        float: Нагрузка в километрах, приведенных к комфортному темпу
+    """
+    if not distance_km:
+        return 0.0
+    intensity = 1.0
+    if pace_sec and comfortable_pace_sec and pace_sec > 0 and comfortable_pace_sec > 0:
+        intensity = min(MAX_INTENSITY, max(MIN_INTENSITY, comfortable_pace_sec / pace_sec))
+    return distance_km * intensity ** 2
+
+
+def apply_load(state: Optional[Dict[str, Any]], load_date: date, load: float) -> Dict[str, Any]:
+    """
+    Добавляет нагрузку одного дня к состоянию (как триггер apply_training_load).
+
+    Нагрузка, записанная задним числом, добавляется с затуханием на свой возраст,
+    поэтому результат не зависит от порядка записи событий.
+
+    Args:
+        state: Состояние (acute_load, chronic_load, load_date) или None
+        load_date: Дата тренировки
+        load: Нагрузка тренировки (отрицательная для отмены)
+
+    Returns:
+        Dict: Новое состояние
+    """
+    if not state:
+        return {"acute_load": load * (1 - ACUTE_DECAY), "chronic_load": load * (1 - CHRONIC_DECAY),
+                "load_date": load_date}
+
+    age = (state["load_date"] - load_date).days
+    if age <= 0:
+        return {
+            "acute_load": state["acute_load"] * ACUTE_DECAY ** -age + load * (1 - ACUTE_DECAY),
+            "chronic_load": state["chronic_load"] * CHRONIC_DECAY ** -age + load * (1 - CHRONIC_DECAY),
+            "load_date": load_date,
+        }
+    return {
+        "acute_load": state["acute_load"] + load * (1 - ACUTE_DECAY) * ACUTE_DECAY ** age,
+        "chronic_load": state["chronic_load"] + load * (1 - CHRONIC_DECAY) * CHRONIC_DECAY ** age,
+        "load_date": state["load_date"],
+    }
+
+
+def compute_loads(user_ids: Sequence[int], days: Sequence[int], loads: Sequence[float],
+                  as_of: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Рассчитывает острую и хроническую нагрузки всех пользователей сразу.
+
+    Экспоненциальное среднее линейно, поэтому вклад каждого события — его
+    нагрузка с затуханием на возраст; суммы по пользователям считаются через
+    np.bincount без цикла по дням.
+
+    Args:
+        user_ids: ID пользователя каждого события
+        days: Дата каждого события (порядковый номер дня, date.toordinal())
+        loads: Нагрузка каждого события
+        as_of: Дата, на которую считается состояние (порядковый номер дня)
+
+    Returns:
+        Tuple: (уникальные ID пользователей, острые нагрузки, хронические нагрузки)
+    """
+    users, index = np.unique(np.asarray(user_ids, dtype=np.int64), return_inverse=True)
+    age = as_of - np.asarray(days, dtype=np.int64)
+    weights = np.asarray(loads, dtype=np.float64)
+    acute = np.bincount(index, weights * (1 - ACUTE_DECAY) * ACUTE_DECAY ** age, minlength=len(users))
+    chronic = np.bincount(index, weights * (1 - CHRONIC_DECAY) * CHRONIC_DECAY ** age, minlength=len(users))
+    return users, acute, chronic
+
+
+def load_summary(state: Optional[Dict[str, Any]], today: date) -> Optional[Dict[str, float]]:
+    """
+    Приводит состояние нагрузки к текущей дате.
+
+    Значения выражены в километрах в неделю (дневное среднее × 7), чтобы их
+    можно было сравнивать с недельным объемом.
+
+    Args:
+        state: Состояние (acute_load, chronic_load, load_date) или None
+        today: Текущая дата
+
+    Returns:
+        Optional[Dict]: acute_load, chronic_load, freshness (хроническая минус острая)
+        и ramp_rate (ожидаемый рост хронической нагрузки за неделю при текущей
+        острой) или None, если нагрузки нет
+    """
+    if not state:
+        return None
+    idle_days = max(0, (today - state["load_date"]).days)
+    acute = state["acute_load"] * ACUTE_DECAY ** idle_days * 7
+    chronic = state["chronic_load"] * CHRONIC_DECAY ** idle_days * 7
+    return {
+        "acute_load": round(acute, 1),
+        "chronic_load": round(chronic, 1),
+        "freshness": round(chronic - acute, 1),
+        "ramp_rate": round((acute - chronic) * (1 - CHRONIC_DECAY ** 7), 1),
+    }
+
+
+def limits_increase(summary: Optional[Dict[str, float]]) -> bool:
+    """
+    Проверяет, нельзя ли увеличивать нагрузку: бегун устал или объем растет слишком быстро.
+
+    Args:
+        summary: Результат load_summary
+
+    Returns:
+        bool: True, если увеличение нагрузки нужно ограничить
+    """
+    if not summary or summary["chronic_load"] <= 0:
+        return False
+    chronic = summary["chronic_load"]
+    return summary["freshness"] < -FATIGUE_RATIO * chronic or summary["ramp_rate"] > MAX_RAMP_RATIO * chronic
+
+
+def format_load_summary(summary: Optional[Dict[str, float]]) -> str:
+    """
+    Форматирует нагрузку для запроса к модели одной-двумя строками.
+
+    Args:
+        summary: Результат load_summary
+
+    Returns:
+        str: Строки для промпта или пустая строка, если нагрузки нет
+    """
+    if not summary:
+        return ""
+    text = (
+        f"- Острая нагрузка (7 дней): {summary['acute_load']} км/нед, "
+        f"хроническая (42 дня): {summary['chronic_load']} км/нед, "
+        f"свежесть: {summary['freshness']:+.1f}, рост хронической: {summary['ramp_rate']:+.1f} км/нед за неделю\n"
+    )
+    if limits_increase(summary):
+        text += "- Бегун накопил усталость или слишком быстро наращивает объем: не увеличивай нагрузку\n"
+    return text
+
+
+class TrainingLoadManager:
+    """Manager for the training load state maintained from the workout log."""
+
+    @staticmethod
+    def get_summary(user_id, today=None):
+        """
+        Get the training load of a user as of today.
+
+        Args:
+            user_id: Database user ID
+            today: Date to decay the load to (Moscow today if None)
+
+        Returns:
+            Dictionary from load_summary if the user has logged workouts, None otherwise
+        """
+        conn = None
+        try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+                cursor.execute(
+                    "SELECT acute_load, chronic_load, load_date FROM training_loads WHERE user_id = %s",
+                    (user_id,)
+                )
+                row = cursor.fetchone()
+                return load_summary(dict(row) if row else None, today or today_moscow())
+        except Exception as e:
+            logging.error(f"Error getting training load: {e}")
+            return None
+        finally:
+            if conn:
+                conn.close()
+
+    @staticmethod
+    def rebuild_all(as_of=None):
+        """
+        Recompute the training load of every user from the workout log.
+
+        Args:
+            as_of: Date the state is computed for (Moscow today if None)
+
+        Returns:
+            Number of users rebuilt if successful, None otherwise
+        """
+        as_of = as_of or today_moscow()
+        conn = None
+        try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            with conn.cursor() as cursor:
+                # Новые события не должны попасть между чтением журнала и записью состояния
+                cursor.execute("LOCK TABLE workout_events IN SHARE MODE")
+                cursor.execute(
+                    """
+                    SELECT user_id, event_date, SUM(training_load)
+                    FROM workout_events
+                    WHERE event_date <= %s
+                    GROUP BY user_id, event_date
+                    """,
+                    (as_of,)
+                )
+                rows = cursor.fetchall()
+                if rows:
+                    user_ids, days, loads = zip(*((row[0], row[1].toordinal(), row[2] or 0.0) for row in rows))
+                    users, acute, chronic = compute_loads(user_ids, days, loads, as_of.toordinal())
+                else:
+                    users, acute, chronic = (), (), ()
+
+                cursor.execute("DELETE FROM training_loads")
+                psycopg2.extras.execute_values(
+                    cursor,
+                    "INSERT INTO training_loads (user_id, acute_load, chronic_load, load_date) VALUES %s",
+                    [(int(user), float(a), float(c), as_of) for user, a, c in zip(users, acute, chronic)]
+                )
+            conn.commit()
+            return len(users)
+        except Exception as e:
+            logging.error(f"Error rebuilding training loads: {e}")
+            if conn:
+                conn.rollback()
+            return None
+        finally:
+            if conn:
+                conn.close()
+
+
+# Длительность каждого запроса попадает в db_query_seconds (см. metrics.py)
+instrument_methods(TrainingLoadManager)
+
+
+def main():
+    """Пересчитывает тренировочную нагрузку всех пользователей."""
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    users = TrainingLoadManager.rebuild_all()
+    if users is None:
+        return 1
+    print(f"Нагрузка пересчитана для пользователей: {users}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
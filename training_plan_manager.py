@@ -2,6 +2,13 @@ import psycopg2
 import psycopg2.extras
 import json
 from config import DB_CONFIG, logging
+from migrations import has_capability
+from training_calendar import date_variants
+from units import day_distance_km, normalize_plan
+from metrics import instrument_methods
+
+TRAINING_STATUSES = ("completed", "canceled")
+
 
 class TrainingPlanManager:
     """Manager for training plan operations."""
@@ -34,36 +41,17 @@ class TrainingPlanManager:
             cursor = connection.cursor()
             
             # Convert plan data to JSON string
-            plan_json = json.dumps(plan_data, ensure_ascii=False)
+            plan_json = json.dumps(normalize_plan(plan_data), ensure_ascii=False)
             
-            # Update the plan
-            # First check if the updated_at column exists
-            try:
-                check_query = """
-                    SELECT column_name FROM information_schema.columns 
-                    WHERE table_name = 'training_plans' AND column_name = 'updated_at'
+            # Update the plan; schema support for updated_at is known from the migration version
+            if has_capability("training_plans.updated_at"):
+                query = """
+                    UPDATE training_plans
+                    SET plan_data = %s, updated_at = NOW()
+                    WHERE id = %s AND user_id = %s
+                    RETURNING id
                 """
-                cursor.execute(check_query)
-                has_updated_at = cursor.fetchone() is not None
-
-                if has_updated_at:
-                    query = """
-                        UPDATE training_plans
-                        SET plan_data = %s, updated_at = NOW()
-                        WHERE id = %s AND user_id = %s
-                        RETURNING id
-                    """
-                else:
-                    # Для обратной совместимости, если колонка еще не создана
-                    query = """
-                        UPDATE training_plans
-                        SET plan_data = %s
-                        WHERE id = %s AND user_id = %s
-                        RETURNING id
-                    """
-                    logging.warning("Column updated_at does not exist in training_plans table. Using backward compatible query.")
-            except Exception as e:
-                logging.error(f"Error checking for updated_at column: {e}")
+            else:
                 query = """
                     UPDATE training_plans
                     SET plan_data = %s
@@ -113,7 +101,7 @@ class TrainingPlanManager:
                     "user_id": user_id,
                     "plan_name": plan_data.get("plan_name", "Беговой план"),
                     "plan_description": plan_data.get("plan_description", ""),
-                    "plan_data": json.dumps(plan_data)
+                    "plan_data": json.dumps(normalize_plan(plan_data))
                 })
                 
                 plan_id = cursor.fetchone()[0]
@@ -262,6 +250,9 @@ class TrainingPlanManager:
         """
         Mark a training day as completed.
         
+        Goes through record_training_status, so the change is written to the
+        workout log and the weekly volume is refreshed.
+        
         Args:
             user_id: Database user ID
             plan_id: Training plan ID
@@ -270,61 +261,17 @@ class TrainingPlanManager:
         Returns:
             True if successful, False otherwise
         """
-        conn = None
-        try:
-            conn = TrainingPlanManager.get_connection()
-            with conn.cursor() as cursor:
-                # Check if this training day is already marked
-                cursor.execute(
-                    """
-                    SELECT id FROM completed_trainings 
-                    WHERE user_id = %s AND plan_id = %s AND training_day = %s
-                    """,
-                    (user_id, plan_id, training_day)
-                )
-                
-                existing = cursor.fetchone()
-                
-                if existing:
-                    # Already marked, update status and timestamp
-                    cursor.execute(
-                        """
-                        UPDATE completed_trainings 
-                        SET status = 'completed', updated_at = CURRENT_TIMESTAMP 
-                        WHERE id = %s
-                        """,
-                        (existing[0],)
-                    )
-                else:
-                    # New completion
-                    cursor.execute(
-                        """
-                        INSERT INTO completed_trainings (
-                            user_id, plan_id, training_day, status
-                        ) VALUES (
-                            %s, %s, %s, 'completed'
-                        )
-                        """,
-                        (user_id, plan_id, training_day)
-                    )
-                
-                conn.commit()
-                return True
-                
-        except Exception as e:
-            logging.error(f"Error marking training as completed: {e}")
-            if conn:
-                conn.rollback()
-            return False
-        finally:
-            if conn:
-                conn.close()
+        progress = TrainingPlanManager.record_training_status(user_id, plan_id, training_day, 'completed')
+        return progress is not None
                 
     @staticmethod
     def mark_training_canceled(user_id, plan_id, training_day):
         """
         Mark a training day as canceled.
         
+        Goes through record_training_status, so the change is written to the
+        workout log and the weekly volume is refreshed.
+        
         Args:
             user_id: Database user ID
             plan_id: Training plan ID
@@ -333,52 +280,59 @@ class TrainingPlanManager:
         Returns:
             True if successful, False otherwise
         """
+        progress = TrainingPlanManager.record_training_status(user_id, plan_id, training_day, 'canceled')
+        return progress is not None
+                
+    @staticmethod
+    def record_training_status(user_id, plan_id, training_day, status, distance_km=None, source="plan"):
+        """
+        Mark a training day as completed or canceled and return the plan progress.
+        
+        The status, the workout log event, the processed days, the completed
+        distance and the weekly volume refresh are handled by one server-side
+        function call, so the whole operation is a single round-trip and a single
+        transaction. Concurrent calls for the same plan are serialized by a row
+        lock on the plan; repeated calls with the same status are not logged again.
+        
+        Args:
+            user_id: Database user ID
+            plan_id: Training plan ID
+            training_day: Day number in the training plan (1-based)
+            status: 'completed' or 'canceled'
+            distance_km: Actual distance for the workout log (planned distance if None)
+            source: Where the status came from: 'plan' (buttons) or 'screenshot'
+            
+        Returns:
+            Dictionary with completed_days, canceled_days, processed_days, total_days,
+            total_distance, plan_finished, just_finished, weekly_volume and
+            weekly_volume_km if successful, None otherwise
+        """
+        if status not in TRAINING_STATUSES:
+            logging.error(f"Unknown training status: {status}")
+            return None
+        
         conn = None
         try:
             conn = TrainingPlanManager.get_connection()
-            with conn.cursor() as cursor:
-                # Check if this training day is already marked
+            # The function runs as its own transaction: no separate BEGIN/COMMIT round-trips
+            conn.autocommit = True
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
                 cursor.execute(
-                    """
-                    SELECT id FROM completed_trainings 
-                    WHERE user_id = %s AND plan_id = %s AND training_day = %s
-                    """,
-                    (user_id, plan_id, training_day)
+                    "SELECT * FROM record_training_status(%s, %s, %s, %s, %s, %s)",
+                    (user_id, plan_id, training_day, status, distance_km, source)
                 )
+                row = cursor.fetchone()
+                if not row:
+                    logging.warning(f"Plan {plan_id} not found for user {user_id}")
+                    return None
                 
-                existing = cursor.fetchone()
-                
-                if existing:
-                    # Already marked, update status and timestamp
-                    cursor.execute(
-                        """
-                        UPDATE completed_trainings 
-                        SET status = 'canceled', updated_at = CURRENT_TIMESTAMP 
-                        WHERE id = %s
-                        """,
-                        (existing[0],)
-                    )
-                else:
-                    # New cancellation
-                    cursor.execute(
-                        """
-                        INSERT INTO completed_trainings (
-                            user_id, plan_id, training_day, status
-                        ) VALUES (
-                            %s, %s, %s, 'canceled'
-                        )
-                        """,
-                        (user_id, plan_id, training_day)
-                    )
-                
-                conn.commit()
-                return True
+                result = dict(row)
+                result["processed_days"] = sorted(set(result["completed_days"]) | set(result["canceled_days"]))
+                return result
                 
         except Exception as e:
-            logging.error(f"Error marking training as canceled: {e}")
-            if conn:
-                conn.rollback()
-            return False
+            logging.error(f"Error recording training status: {e}")
+            return None
         finally:
             if conn:
                 conn.close()
@@ -496,6 +450,9 @@ class TrainingPlanManager:
         """
         Calculate the total distance of completed trainings for a specific plan.
         
+        Only the distance fields of completed days are read from the plan;
+        the document itself is not loaded.
+        
         Args:
             user_id: Database user ID
             plan_id: Training plan ID
@@ -507,70 +464,180 @@ class TrainingPlanManager:
         try:
             conn = TrainingPlanManager.get_connection()
             with conn.cursor() as cursor:
-                # Get the plan data
                 cursor.execute(
                     """
-                    SELECT plan_data 
-                    FROM training_plans 
-                    WHERE id = %s AND user_id = %s
+                    SELECT ct.training_day,
+                           jsonb_build_object('distance', td.value->'distance',
+                                              'distance_km', td.value->'distance_km')
+                    FROM training_plans tp
+                    JOIN completed_trainings ct
+                        ON ct.user_id = tp.user_id AND ct.plan_id = tp.id AND ct.status = 'completed'
+                    JOIN LATERAL jsonb_array_elements(tp.plan_data->'training_days')
+                        WITH ORDINALITY AS td(value, num) ON td.num = ct.training_day
+                    WHERE tp.id = %s AND tp.user_id = %s
+                    ORDER BY ct.training_day
                     """,
                     (plan_id, user_id)
                 )
                 
-                plan_data_row = cursor.fetchone()
-                if not plan_data_row:
+                rows = cursor.fetchall()
+                if not rows:
                     return 0
                 
-                plan_data = plan_data_row[0]
-                if isinstance(plan_data, str):
-                    plan_data = json.loads(plan_data)
+                logging.info(f"Расчет дистанции для плана {plan_id}. Завершенные дни: {[row[0] for row in rows]}")
+                # Дистанция разобрана в число при сохранении плана
+                total_distance = sum(day_distance_km(day) for _, day in rows)
+                
+                logging.info(f"Итоговая дистанция для плана {plan_id}: {total_distance} км")
+                return total_distance
                 
-                # Get completed trainings
+        except Exception as e:
+            logging.error(f"Error calculating total distance: {e}")
+            return 0
+        finally:
+            if conn:
+                conn.close()
+    
+    @staticmethod
+    def get_plan_days(user_id, plan_id, day_numbers=None, fields=None):
+        """
+        Get selected training days of a plan without loading the whole document.
+        
+        The days and their fields are extracted from plan_data on the server.
+        
+        Args:
+            user_id: Database user ID
+            plan_id: Training plan ID
+            day_numbers: Day numbers to return (1-based), all days if None
+            fields: Day fields to return, all fields if None
+            
+        Returns:
+            Dictionary {day number: day data}, empty if the plan is not found
+        """
+        conn = None
+        try:
+            conn = TrainingPlanManager.get_connection()
+            with conn.cursor() as cursor:
                 cursor.execute(
                     """
-                    SELECT training_day 
-                    FROM completed_trainings 
-                    WHERE user_id = %s AND plan_id = %s AND status = 'completed'
-                    ORDER BY training_day
+                    SELECT td.num,
+                           CASE WHEN %(fields)s::text[] IS NULL THEN td.value
+                                ELSE (SELECT COALESCE(jsonb_object_agg(f.key, f.value), '{}'::jsonb)
+                                      FROM jsonb_each(td.value) AS f
+                                      WHERE f.key = ANY(%(fields)s::text[]))
+                           END
+                    FROM training_plans tp
+                    CROSS JOIN LATERAL jsonb_array_elements(tp.plan_data->'training_days')
+                        WITH ORDINALITY AS td(value, num)
+                    WHERE tp.id = %(plan_id)s AND tp.user_id = %(user_id)s
+                      AND (%(days)s::int[] IS NULL OR td.num = ANY(%(days)s::int[]))
+                    ORDER BY td.num
                     """,
-                    (user_id, plan_id)
+                    {
+                        "user_id": user_id,
+                        "plan_id": plan_id,
+                        "days": list(day_numbers) if day_numbers is not None else None,
+                        "fields": list(fields) if fields is not None else None,
+                    }
                 )
+                return {day_number: day for day_number, day in cursor.fetchall()}
                 
-                completed_days = [row[0] for row in cursor.fetchall()]
-                if not completed_days:
-                    return 0
-                
-                # Calculate total distance
-                total_distance = 0
-                logging.info(f"Расчет дистанции для плана {plan_id}. Завершенные дни: {completed_days}")
-                
-                for day_num in completed_days:
-                    day_idx = day_num - 1
-                    if day_idx < 0 or day_idx >= len(plan_data.get('training_days', [])):
-                        logging.warning(f"Индекс дня {day_idx} за пределами тренировочных дней")
-                        continue
-                    
-                    day_data = plan_data['training_days'][day_idx]
-                    distance_raw = day_data.get('distance', '0 км')
-                    logging.info(f"Дистанция для дня {day_num}: '{distance_raw}'")
-                    
-                    try:
-                        # Разбиваем строку и берем первое значение (число) перед единицами измерения
-                        distance_str = distance_raw.split()[0].replace(',', '.')
-                        distance = float(distance_str)
-                        total_distance += distance
-                        logging.info(f"  Добавлено {distance} км")
-                    except (ValueError, TypeError, IndexError) as e:
-                        # Skip if distance cannot be parsed as float
-                        logging.warning(f"  Не удалось распарсить дистанцию '{distance_raw}': {e}")
-                        continue
+        except Exception as e:
+            logging.error(f"Error getting plan days: {e}")
+            return {}
+        finally:
+            if conn:
+                conn.close()
+    
+    @staticmethod
+    def get_sessions_on_date(session_date):
+        """
+        Find unprocessed training days scheduled on a date in the users' latest plans.
+        
+        Candidate plans are found through the GIN index on session dates.
+        
+        Args:
+            session_date: Date of the training sessions (datetime.date)
+            
+        Returns:
+            List of dictionaries with telegram_id, user_id, plan_id, day_number and day
+        """
+        dates = date_variants(session_date)
+        conn = None
+        try:
+            conn = TrainingPlanManager.get_connection()
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+                cursor.execute(
+                    """
+                    SELECT u.telegram_id, tp.user_id, tp.id AS plan_id, td.num AS day_number, td.value AS day
+                    FROM training_plans tp
+                    JOIN users u ON u.id = tp.user_id
+                    CROSS JOIN LATERAL jsonb_array_elements(tp.plan_data->'training_days')
+                        WITH ORDINALITY AS td(value, num)
+                    WHERE jsonb_path_query_array(tp.plan_data, '$.training_days[*].date') ?| %(dates)s
+                      AND td.value->>'date' = ANY(%(dates)s)
+                      AND NOT EXISTS (
+                          SELECT 1 FROM training_plans newer
+                          WHERE newer.user_id = tp.user_id AND newer.created_at > tp.created_at
+                      )
+                      AND NOT EXISTS (
+                          SELECT 1 FROM completed_trainings ct
+                          WHERE ct.user_id = tp.user_id AND ct.plan_id = tp.id AND ct.training_day = td.num
+                      )
+                    ORDER BY tp.user_id, td.num
+                    """,
+                    {"dates": dates}
+                )
+                return [dict(row) for row in cursor.fetchall()]
                 
-                logging.info(f"Итоговая дистанция для плана {plan_id}: {total_distance} км")
-                return total_distance
+        except Exception as e:
+            logging.error(f"Error getting sessions on date: {e}")
+            return []
+        finally:
+            if conn:
+                conn.close()
+    
+    @staticmethod
+    def get_plans_near_completion(remaining_days):
+        """
+        Find the users' latest plans with exactly remaining_days unprocessed days.
+        
+        Args:
+            remaining_days: Number of days that are neither completed nor canceled
+            
+        Returns:
+            List of dictionaries with user_id, plan_id, total_days and processed_days
+        """
+        conn = None
+        try:
+            conn = TrainingPlanManager.get_connection()
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+                cursor.execute(
+                    """
+                    SELECT tp.user_id, tp.id AS plan_id, tp.total_days,
+                           COALESCE(array_agg(DISTINCT ct.training_day)
+                                        FILTER (WHERE ct.training_day IS NOT NULL), '{}') AS processed_days
+                    FROM (
+                        SELECT DISTINCT ON (user_id) id, user_id,
+                               jsonb_array_length(COALESCE(plan_data->'training_days', '[]'::jsonb)) AS total_days
+                        FROM training_plans
+                        ORDER BY user_id, created_at DESC
+                    ) tp
+                    LEFT JOIN completed_trainings ct ON ct.user_id = tp.user_id AND ct.plan_id = tp.id
+                    GROUP BY tp.user_id, tp.id, tp.total_days
+                    HAVING tp.total_days - COUNT(DISTINCT ct.training_day) = %s
+                    """,
+                    (remaining_days,)
+                )
+                return [dict(row) for row in cursor.fetchall()]
                 
         except Exception as e:
-            logging.error(f"Error calculating total distance: {e}")
-            return 0
+            logging.error(f"Error getting plans near completion: {e}")
+            return []
         finally:
             if conn:
-                conn.close()
\ No newline at end of file
+                conn.close()
+
+
+# Длительность каждого запроса попадает в db_query_seconds (см. metrics.py)
+instrument_methods(TrainingPlanManager)
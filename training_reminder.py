@@ -12,8 +12,8 @@ from datetime import datetime, timedelta
 from telegram import Bot
 from telegram.error import TelegramError
 
-from db_manager import DBManager
 from training_plan_manager import TrainingPlanManager
+from continuation_drafts import schedule_continuation_draft
 from config import TELEGRAM_TOKEN
 
 # Настройка логирования
@@ -45,51 +45,19 @@ async def get_next_day_trainings():
         
         logging.info(f"Ищем тренировки на дату: {tomorrow_str}")
         
-        # Получаем всех пользователей с активными планами тренировок
-        all_users = []
-        try:
-            all_users = DBManager.get_all_users_with_plans()
-            logging.info(f"Найдено {len(all_users)} пользователей с планами тренировок")
-        except Exception as e:
-            logging.error(f"Ошибка при получении пользователей с планами: {e}")
-            return []
+        # Планы, в которых остался один необработанный день: заранее готовим их продолжение
+        for plan in TrainingPlanManager.get_plans_near_completion(remaining_days=1):
+            schedule_continuation_draft(plan['user_id'], plan['plan_id'], plan['total_days'],
+                                        plan['processed_days'])
         
-        # Результаты - список кортежей: (telegram_id, plan_id, training_day)
+        # Необработанные дни последних планов с тренировкой на завтра ищутся одним запросом
+        # по индексу дат тренировок; документ плана целиком не загружается
         results = []
-        
-        for user in all_users:
-            try:
-                user_id = user['id']
-                telegram_id = user['telegram_id']
-                
-                # Получаем последний план пользователя
-                latest_plan = TrainingPlanManager.get_latest_training_plan(user_id)
-                if not latest_plan:
-                    logging.info(f"У пользователя {telegram_id} нет активного плана тренировок")
-                    continue
-                
-                plan_id = latest_plan['id']
-                training_days = latest_plan['plan_data'].get('training_days', [])
-                
-                # Получаем обработанные тренировки
-                completed = TrainingPlanManager.get_completed_trainings(user_id, plan_id)
-                canceled = TrainingPlanManager.get_canceled_trainings(user_id, plan_id)
-                processed_days = completed + canceled
-                
-                # Ищем тренировки на следующий день
-                for idx, day in enumerate(training_days):
-                    day_num = idx + 1
-                    
-                    # Пропускаем уже обработанные дни
-                    if day_num in processed_days:
-                        continue
-                    
-                    # Если дата совпадает с завтрашней
-                    if day.get('date') == tomorrow_str:
-                        logging.info(f"Найдена тренировка для пользователя {telegram_id}: День {day_num}, {day.get('training_type')}")
-                        results.append((telegram_id, plan_id, day))
-            except Exception as e:
-                logging.error(f"Ошибка при обработке пользователя {user.get('telegram_id', 'Unknown')}: {e}")
+        for session in TrainingPlanManager.get_sessions_on_date(tomorrow):
+            day = session['day']
+            logging.info(f"Найдена тренировка для пользователя {session['telegram_id']}: "
+                         f"День {session['day_number']}, {day.get('training_type')}")
+            results.append((session['telegram_id'], session['plan_id'], day))
         
         logging.info(f"Всего найдено {len(results)} тренировок на завтра")
         return results
@@ -211,11 +179,6 @@ async def main():
     """
     logging.info("Запуск сервиса напоминаний о тренировках")
     
-    # Добавляем метод в DBManager для получения всех пользователей с планами
-    if not hasattr(DBManager, 'get_all_users_with_plans'):
-        logging.warning("Метод get_all_users_with_plans отсутствует в DBManager. Напоминания не будут работать!")
-        return
-    
     # Запускаем бесконечный цикл планирования
     await schedule_reminders()
 
@@ -0,0 +1,270 @@
+"""
+Единицы измерения: дистанция, темп, длительность и недельный объем.
+
+Бот хранит эти значения в виде текста ("5 км", "5:30/км", "20,5", "0-10").
+Модуль разбирает текст в числа один раз — при сохранении профиля, плана и
+результатов анализа скриншота — и записывает числовые значения рядом с
+текстовыми. Потребители используют сохраненные числа и разбирают текст только
+для старых записей, в которых чисел еще нет.
+"""
+
+import re
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+# Числовые поля дня плана
+DAY_DISTANCE_KEY = "distance_km"
+DAY_PACE_KEY = "pace_sec_per_km"
+# Числовые поля профиля (колонки runner_profiles)
+PROFILE_VOLUME_KEY = "weekly_volume_km"
+PROFILE_PACE_KEY = "comfortable_pace_sec"
+PROFILE_DISTANCE_KEY = "goal_distance_km"
+# Числовые поля результата анализа скриншота
+WORKOUT_DISTANCE_KEY = "distance_km"
+WORKOUT_DURATION_KEY = "duration_sec"
+WORKOUT_PACE_KEY = "pace_sec_per_km"
+
+# Темп быстрее 2:00/км считается ошибкой распознавания
+MIN_PACE_SECONDS = 120
+
+_NUMBER_RE = re.compile(r"(\d+(?:[.,]\d+)?)")
+_RANGE_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s*[-–—]\s*(\d+(?:[.,]\d+)?)")
+_PACE_RE = re.compile(r"(\d{1,2}):(\d{2})")
+_CLOCK_RE = re.compile(r"^(\d{1,2}):(\d{2})(?::(\d{2}))?$")
+_MINUTES_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s*(?:мин|min|m\b)", re.IGNORECASE)
+_HOURS_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s*(?:ч|h)", re.IGNORECASE)
+_SECONDS_RE = re.compile(r"(\d+)\s*(?:сек|с\b|sec|s\b)", re.IGNORECASE)
+
+
+def _to_float(text: str) -> float:
+    return float(text.replace(",", "."))
+
+
+@lru_cache(maxsize=4096)
+def _parse_distance_text(text: str) -> Optional[float]:
+    """Разбирает текст дистанции; результат кэшируется."""
+    match = _NUMBER_RE.search(text)
+    if not match:
+        return None
+    number = _to_float(match.group(1))
+    # Дистанция в метрах ("800 м", "5000m") встречается в интервальных тренировках
+    unit = text[match.end():].strip().lower()
+    if unit.startswith(("м", "m")) and not unit.startswith(("ми", "mi")) and number >= 100:
+        number = number / 1000
+    return number
+
+
+def parse_distance_km(value: Any) -> Optional[float]:
+    """Извлекает дистанцию в километрах из числа или строки ("5 км", "5,5", "10km")."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        return _parse_distance_text(value)
+    return None
+
+
+def format_distance(km: float) -> str:
+    """Форматирует дистанцию в формате бота ("5 км", "5.5 км")."""
+    return f"{round(km, 1):g} км"
+
+
+def parse_volume_km(value: Any) -> Optional[float]:
+    """
+    Разбирает недельный объем бега в километрах.
+
+    Диапазон из анкеты ("10-20") заменяется его серединой.
+
+    Args:
+        value: Объем в виде числа или строки ("20", "20,5", "10-20 км")
+
+    Returns:
+        Optional[float]: Объем в километрах или None, если значение не распознано
+    """
+    if isinstance(value, str):
+        match = _RANGE_RE.search(value)
+        if match:
+            return (_to_float(match.group(1)) + _to_float(match.group(2))) / 2
+    return parse_distance_km(value)
+
+
+@lru_cache(maxsize=4096)
+def _parse_pace_text(text: str) -> Optional[int]:
+    """Разбирает текст темпа; результат кэшируется."""
+    values = [int(minutes) * 60 + int(seconds) for minutes, seconds in _PACE_RE.findall(text)]
+    values = [value for value in values if value >= MIN_PACE_SECONDS]
+    if not values:
+        return None
+    return round(sum(values) / len(values))
+
+
+def parse_pace_seconds(value: Any) -> Optional[int]:
+    """
+    Разбирает темп в секундах на километр.
+
+    Для диапазона ("5:30-6:00 мин/км") возвращается середина.
+
+    Args:
+        value: Темп в виде строки или числа секунд
+
+    Returns:
+        Optional[int]: Секунды на километр или None, если темп не распознан
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value) if value >= MIN_PACE_SECONDS else None
+    if isinstance(value, str):
+        return _parse_pace_text(value)
+    return None
+
+
+def format_pace(seconds: int) -> str:
+    """Форматирует темп в формате бота ("5:30")."""
+    seconds = int(round(seconds))
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+@lru_cache(maxsize=4096)
+def _parse_duration_text(text: str) -> Optional[int]:
+    """Разбирает текст длительности; результат кэшируется."""
+    match = _CLOCK_RE.match(text)
+    if match:
+        first, second, third = match.groups()
+        if third is None:
+            return int(first) * 60 + int(second)
+        return int(first) * 3600 + int(second) * 60 + int(third)
+
+    total = 0.0
+    found = False
+    for regex, multiplier in ((_HOURS_RE, 3600), (_MINUTES_RE, 60), (_SECONDS_RE, 1)):
+        match = regex.search(text)
+        if match:
+            total += _to_float(match.group(1)) * multiplier
+            found = True
+    return round(total) if found else None
+
+
+def parse_duration_seconds(value: Any) -> Optional[int]:
+    """
+    Разбирает длительность тренировки в секундах.
+
+    Поддерживаются форматы ММ:СС, ЧЧ:ММ:СС и текст вида "1 ч 5 мин", "45 мин".
+
+    Args:
+        value: Длительность в виде строки или числа секунд
+
+    Returns:
+        Optional[int]: Длительность в секундах или None
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        return _parse_duration_text(value.strip().lower())
+    return None
+
+
+def normalize_plan(plan_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Записывает числовые дистанцию и темп в каждый день плана.
+
+    Значения пересчитываются из текста при каждом сохранении, поэтому после
+    корректировки плана они не устаревают.
+
+    Args:
+        plan_data: План тренировок (изменяется на месте)
+
+    Returns:
+        Dict: Тот же план
+    """
+    for day in plan_data.get("training_days", []) or []:
+        if not isinstance(day, dict):
+            continue
+        day[DAY_DISTANCE_KEY] = parse_distance_km(day.get("distance"))
+        day[DAY_PACE_KEY] = parse_pace_seconds(day.get("pace"))
+    return plan_data
+
+
+def day_distance_km(day: Dict[str, Any]) -> float:
+    """
+    Возвращает дистанцию дня плана в километрах.
+
+    Используется сохраненное число; текст разбирается только для планов,
+    сохраненных до появления числовых полей.
+    """
+    km = day.get(DAY_DISTANCE_KEY)
+    if km is None:
+        km = parse_distance_km(day.get("distance"))
+    return km or 0.0
+
+
+def plan_distance_km(plan_data: Dict[str, Any]) -> float:
+    """Суммарная дистанция всех дней плана в километрах."""
+    return sum(day_distance_km(day) for day in (plan_data or {}).get("training_days", []))
+
+
+def normalize_profile(profile_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Добавляет в данные профиля числовые объем, комфортный темп и дистанцию цели.
+
+    Args:
+        profile_data: Данные профиля (изменяются на месте)
+
+    Returns:
+        Dict: Те же данные профиля
+    """
+    profile_data[PROFILE_VOLUME_KEY] = parse_volume_km(profile_data.get("weekly_volume"))
+    profile_data[PROFILE_PACE_KEY] = parse_pace_seconds(profile_data.get("comfortable_pace"))
+    profile_data[PROFILE_DISTANCE_KEY] = parse_distance_km(profile_data.get("distance"))
+    return profile_data
+
+
+def profile_volume_km(profile: Dict[str, Any]) -> Optional[float]:
+    """Недельный объем из профиля: сохраненное число или разобранный текст."""
+    volume = profile.get(PROFILE_VOLUME_KEY)
+    if volume is None:
+        volume = parse_volume_km(profile.get("weekly_volume"))
+    return volume
+
+
+def profile_pace_seconds(profile: Dict[str, Any]) -> Optional[int]:
+    """Комфортный темп из профиля: сохраненное число или разобранный текст."""
+    pace = profile.get(PROFILE_PACE_KEY)
+    if pace is None:
+        pace = parse_pace_seconds(profile.get("comfortable_pace"))
+    return pace
+
+
+def profile_distance_km(profile: Dict[str, Any]) -> Optional[float]:
+    """Дистанция цели из профиля: сохраненное число или разобранный текст."""
+    distance = profile.get(PROFILE_DISTANCE_KEY)
+    if distance is None:
+        distance = parse_distance_km(profile.get("distance"))
+    return distance
+
+
+def normalize_workout(workout_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Добавляет числовые значения в результат анализа скриншота тренировки.
+
+    Если темп не распознан, он рассчитывается по дистанции и длительности.
+
+    Args:
+        workout_data: Данные тренировки от модели (изменяются на месте)
+
+    Returns:
+        Dict: Те же данные тренировки
+    """
+    distance = parse_distance_km(workout_data.get("дистанция_км"))
+    duration = parse_duration_seconds(workout_data.get("длительность"))
+    pace = parse_pace_seconds(workout_data.get("темп"))
+    if pace is None and distance and duration:
+        pace = round(duration / distance)
+
+    workout_data[WORKOUT_DISTANCE_KEY] = distance
+    workout_data[WORKOUT_DURATION_KEY] = duration
+    workout_data[WORKOUT_PACE_KEY] = pace
+    return workout_data
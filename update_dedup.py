@@ -0,0 +1,220 @@
+"""
+Идемпотентная обработка обновлений Telegram по update_id.
+
+Telegram доставляет обновления как минимум один раз: после перезапуска polling
+или повторной доставки вебхука то же обновление может прийти снова, в том числе
+в другой процесс-обработчик или реплику. Перед обработчиками бота (группа
+DEDUP_GROUP) обновление захватывается: сначала проверяется ограниченный LRU-кэш
+процесса, затем таблица processed_updates (INSERT ... ON CONFLICT). Повторное
+обновление останавливается до обработчиков. После обработчиков (группа
+COMPLETE_GROUP) обновление отмечается завершенным. Если процесс упал во время
+обработки, захват становится брошенным через CLAIM_TTL, и повторная доставка
+обрабатывается заново.
+
+При ошибке базы данных обновление обрабатывается (лучше повтор, чем потеря).
+Пока в схеме нет таблицы processed_updates, повторы отсекает только кэш процесса.
+"""
+
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import suppress
+from typing import Optional
+
+import psycopg2
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, TypeHandler
+
+from config import DB_CONFIG
+from migrations import has_capability
+
+# Группы обработчиков: захват раньше всех обработчиков бота, завершение после всех
+DEDUP_GROUP = -100
+COMPLETE_GROUP = 100
+# Количество update_id в памяти процесса
+LRU_CAPACITY = 10000
+# Незавершенный захват старше этого срока считается брошенным (секунды)
+CLAIM_TTL = 600
+# Telegram хранит недоставленные обновления сутки; записи старше удаляются
+RETENTION_HOURS = 48
+# Старые записи удаляются раз в столько захватов
+PRUNE_EVERY = 1000
+
+
+class UpdateDedupStore:
+    """Postgres table of claimed and completed Telegram updates."""
+
+    def __init__(self):
+        self._conn = None
+        self._lock = threading.Lock()
+        self._claims = 0
+
+    def _cursor(self):
+        # Одно соединение на процесс: захват выполняется для каждого обновления
+        if self._conn is None or self._conn.closed:
+            self._conn = psycopg2.connect(**DB_CONFIG, options="-c statement_timeout=2000")
+            self._conn.autocommit = True
+        return self._conn.cursor()
+
+    def _reset(self):
+        if self._conn is not None:
+            with suppress(Exception):
+                self._conn.close()
+        self._conn = None
+
+    def warm(self):
+        """
+        Open the connection ahead of the first update.
+
+        Returns:
+            True if the connection is open, False otherwise
+        """
+        if not has_capability("processed_updates"):
+            return False
+        with self._lock:
+            try:
+                self._cursor().close()
+                return True
+            except Exception as e:
+                logging.error(f"Error connecting update store: {e}")
+                self._reset()
+                return False
+
+    def claim(self, update_id):
+        """
+        Claim an update for processing.
+
+        Args:
+            update_id: Telegram update ID
+
+        Returns:
+            True if the update is new or its previous claim was abandoned,
+            False if it was already processed or is being processed;
+            True on database errors or before the table exists
+        """
+        if not has_capability("processed_updates"):
+            return True
+        with self._lock:
+            try:
+                with self._cursor() as cursor:
+                    cursor.execute(
+                        """
+                        INSERT INTO processed_updates AS p (update_id) VALUES (%s)
+                        ON CONFLICT (update_id) DO UPDATE SET claimed_at = NOW()
+                        WHERE p.completed_at IS NULL AND p.claimed_at < NOW() - %s * INTERVAL '1 second'
+                        RETURNING update_id
+                        """,
+                        (update_id, CLAIM_TTL)
+                    )
+                    claimed = cursor.fetchone() is not None
+                    self._claims += 1
+                    if self._claims % PRUNE_EVERY == 0:
+                        cursor.execute(
+                            "DELETE FROM processed_updates WHERE claimed_at < NOW() - %s * INTERVAL '1 hour'",
+                            (RETENTION_HOURS,)
+                        )
+                    return claimed
+            except Exception as e:
+                logging.error(f"Error claiming update {update_id}: {e}")
+                self._reset()
+                return True
+
+    def complete(self, update_id):
+        """
+        Mark a claimed update as processed.
+
+        Returns:
+            True if successful, False otherwise
+        """
+        if not has_capability("processed_updates"):
+            return False
+        with self._lock:
+            try:
+                with self._cursor() as cursor:
+                    cursor.execute(
+                        "UPDATE processed_updates SET completed_at = NOW() WHERE update_id = %s",
+                        (update_id,)
+                    )
+                return True
+            except Exception as e:
+                logging.error(f"Error completing update {update_id}: {e}")
+                self._reset()
+                return False
+
+
+# Хранилище процесса; соединение открывается при первом обращении
+STORE = UpdateDedupStore()
+
+
+class UpdateDeduplicator:
+    """
+    Захват обновлений: LRU-кэш процесса поверх общего хранилища.
+
+    Args:
+        store: Хранилище захватов (UpdateDedupStore) или None, чтобы проверять только кэш
+        capacity: Количество update_id в кэше
+    """
+
+    def __init__(self, store: Optional[UpdateDedupStore] = None, capacity: int = LRU_CAPACITY):
+        self.store = store
+        self.capacity = capacity
+        self._seen: "OrderedDict[int, None]" = OrderedDict()
+        self.duplicates = 0
+
+    def _remember(self, update_id: int) -> None:
+        self._seen[update_id] = None
+        self._seen.move_to_end(update_id)
+        while len(self._seen) > self.capacity:
+            self._seen.popitem(last=False)
+
+    async def claim(self, update_id: int) -> bool:
+        """
+        Захватывает обновление.
+
+        Returns:
+            bool: True, если обновление нужно обработать, False для повтора
+        """
+        if update_id in self._seen:
+            self._seen.move_to_end(update_id)
+            self.duplicates += 1
+            return False
+        # До ответа хранилища повтор в этом же процессе уже считается дубликатом
+        self._remember(update_id)
+        if self.store is not None and not await asyncio.to_thread(self.store.claim, update_id):
+            self.duplicates += 1
+            return False
+        return True
+
+    async def complete(self, update_id: int) -> None:
+        """Отмечает обновление обработанным."""
+        if self.store is not None:
+            await asyncio.to_thread(self.store.complete, update_id)
+
+
+def install_update_dedup(application, deduplicator: Optional[UpdateDeduplicator] = None) -> UpdateDeduplicator:
+    """
+    Подключает захват обновлений ко всем обработчикам приложения.
+
+    Args:
+        application: Приложение python-telegram-bot
+        deduplicator: Готовый дедупликатор (по умолчанию — с хранилищем процесса STORE)
+
+    Returns:
+        UpdateDeduplicator: Подключенный дедупликатор
+    """
+    if deduplicator is None:
+        deduplicator = UpdateDeduplicator(STORE)
+
+    async def claim_update(update, context):
+        if update.update_id is not None and not await deduplicator.claim(update.update_id):
+            logging.info(f"Повторное обновление {update.update_id} пропущено")
+            raise ApplicationHandlerStop
+
+    async def complete_update(update, context):
+        if update.update_id is not None:
+            await deduplicator.complete(update.update_id)
+
+    application.add_handler(TypeHandler(Update, claim_update), group=DEDUP_GROUP)
+    application.add_handler(TypeHandler(Update, complete_update), group=COMPLETE_GROUP)
+    return deduplicator
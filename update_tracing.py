@@ -0,0 +1,57 @@
+"""
+Трассы обновлений Telegram (см. tracing.py).
+
+TracedApplication открывает корневой интервал на каждое обновление: тип
+обновления, update_id, Telegram ID пользователя и маршрут кнопки или команда
+(текст сообщений не записывается). TracedRequest делает каждый запрос к Bot API
+дочерним интервалом текущей трассы. Получение обновлений (getUpdates) идет
+через отдельный запрос ApplicationBuilder и не трассируется.
+"""
+
+from typing import Any, Dict, Tuple
+
+from telegram import Update
+from telegram.ext import Application
+from telegram.request import HTTPXRequest
+
+from metrics import callback_route, update_type
+from tracing import TRACER, span
+
+# Размер пула соединений Bot API (как у ApplicationBuilder по умолчанию)
+CONNECTION_POOL_SIZE = 256
+
+
+def update_attributes(update: Update) -> Tuple[str, Dict[str, Any]]:
+    """
+    Тип и атрибуты корневого интервала обновления.
+
+    Returns:
+        Tuple[str, Dict[str, Any]]: Тип обновления и атрибуты трассы
+    """
+    attributes: Dict[str, Any] = {"update.id": update.update_id}
+    if update.effective_user:
+        attributes["telegram.user_id"] = update.effective_user.id
+    if update.callback_query:
+        attributes["telegram.route"] = callback_route(update.callback_query.data)
+    elif update.effective_message and (update.effective_message.text or "").startswith("/"):
+        attributes["telegram.command"] = update.effective_message.text.split()[0][:32]
+    return update_type(update), attributes
+
+
+class TracedApplication(Application):
+    """Application, обрабатывающее каждое обновление в своей трассе."""
+
+    async def process_update(self, update: object) -> None:
+        if not isinstance(update, Update):
+            return await super().process_update(update)
+        kind, attributes = update_attributes(update)
+        with TRACER.trace(f"update {kind}", **attributes):
+            await super().process_update(update)
+
+
+class TracedRequest(HTTPXRequest):
+    """Запросы к Bot API как интервалы текущей трассы: "telegram sendMessage"."""
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        with span(f"telegram {url.rsplit('/', 1)[-1]}"):
+            return await super().do_request(url, method, request_data, **kwargs)
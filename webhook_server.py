@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+Прием обновлений Telegram через вебхук с обработкой в нескольких процессах.
+
+Основной процесс принимает POST-запросы Telegram асинхронным HTTP-сервером,
+проверяет заголовок X-Telegram-Bot-Api-Secret-Token и передает тело обновления
+одному из WEBHOOK_WORKERS процессов-обработчиков. Процесс выбирается по ID чата
+(affinity_key), поэтому обновления одного пользователя всегда обрабатываются
+одним процессом по порядку, а разные пользователи обрабатываются параллельно на
+всех ядрах. Каждый обработчик запускает то же приложение, что и polling
+(bot_modified.setup_bot). Упавший обработчик перезапускается, а при переполнении
+очереди сервер отвечает 503, и Telegram повторяет доставку позже.
+
+Вебхук обслуживает ровно один экземпляр сервера. Порядок обновлений чата
+соблюдается только внутри процесса (worker_index), а состояние диалогов
+обработчики загружают при запуске, поэтому два сервера за балансировщиком
+перемешали бы обновления одного чата и работали бы с устаревшим состоянием.
+Прием вебхука — роль webhook (leader_election.py): порт WEBHOOK_PORT слушает и
+обработчики запускает только лидер роли, резервные реплики ждут ее и при
+получении роли запускают обработчики со свежим состоянием.
+
+Вебхук не удаляется при остановке: пока сервер перезапускается, Telegram
+накапливает обновления и доставляет их после запуска. Секрет вебхука берется из
+WEBHOOK_SECRET или выводится из токена бота, поэтому не меняется при перезапуске
+и переносе сервера на другую машину.
+
+Эндпоинт живости основного процесса слушает HEALTH_PORT, как и при polling, —
+его опрашивают мониторы; pending_updates в нем — сумма очередей обработчиков.
+Обработчики слушают следующие порты (HEALTH_PORT + 1 + номер).
+
+    WEBHOOK_URL=https://bot.example.com python webhook_server.py
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import multiprocessing
+import queue
+import signal
+import sys
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import (HEALTH_HOST, HEALTH_PORT, TELEGRAM_TOKEN, WEBHOOK_HOST, WEBHOOK_PATH, WEBHOOK_PORT,
+                    WEBHOOK_SECRET, WEBHOOK_URL, WEBHOOK_WORKERS)
+
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+# Контекст HMAC, которым секрет вебхука выводится из токена бота
+SECRET_CONTEXT = b"telegram-webhook-secret"
+# Максимальный размер тела запроса (обновления Telegram намного меньше)
+MAX_BODY_BYTES = 1024 * 1024
+# Необработанных обновлений в очереди одного обработчика
+WORKER_QUEUE_SIZE = 1000
+# Простаивающее keep-alive соединение закрывается через столько секунд
+IDLE_TIMEOUT = 60
+# Интервал проверки процессов-обработчиков (секунды)
+SUPERVISE_INTERVAL = 1.0
+# Одновременных соединений Telegram с вебхуком
+MAX_CONNECTIONS = 40
+
+# Поля обновления, в которых находится чат или пользователь (по порядку проверки)
+_CHAT_PATHS = (
+    ("message", "chat", "id"),
+    ("edited_message", "chat", "id"),
+    ("callback_query", "message", "chat", "id"),
+    ("callback_query", "from", "id"),
+    ("my_chat_member", "chat", "id"),
+    ("chat_member", "chat", "id"),
+    ("pre_checkout_query", "from", "id"),
+    ("shipping_query", "from", "id"),
+    ("inline_query", "from", "id"),
+    ("chosen_inline_result", "from", "id"),
+    ("poll_answer", "user", "id"),
+)
+
+
+class RequestTooLarge(Exception):
+    """Тело запроса больше MAX_BODY_BYTES."""
+
+
+_STATUS_TEXT = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+                405: "Method Not Allowed", 413: "Payload Too Large", 503: "Service Unavailable"}
+
+
+def affinity_key(update: Dict[str, Any]) -> int:
+    """
+    Ключ распределения обновления: ID чата или пользователя, иначе update_id.
+
+    Args:
+        update: Обновление Telegram в виде словаря
+
+    Returns:
+        int: Ключ, одинаковый для всех обновлений одного чата
+    """
+    for path in _CHAT_PATHS:
+        value: Any = update
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        if isinstance(value, int):
+            return value
+    return int(update.get("update_id") or 0)
+
+
+def worker_index(key: int, workers: int) -> int:
+    """Номер процесса-обработчика для ключа распределения."""
+    return abs(key) % workers
+
+
+class WebhookDispatcher:
+    """
+    Проверяет запросы вебхука и раскладывает обновления по очередям обработчиков.
+
+    Args:
+        secret: Ожидаемое значение заголовка X-Telegram-Bot-Api-Secret-Token
+        path: Путь вебхука
+        queues: Очереди процессов-обработчиков
+        alive: Проверка, что все обработчики работают (для /healthz)
+    """
+
+    def __init__(self, secret: str, path: str, queues: List[Any], alive: Optional[Callable[[], bool]] = None):
+        self.secret = secret.encode("utf-8")
+        self.path = path
+        self.queues = queues
+        self.alive = alive or (lambda: True)
+        self.received = 0
+        self.rejected = 0
+
+    def handle(self, method: str, path: str, headers: Dict[str, str], body: bytes) -> Tuple[int, bytes]:
+        """
+        Обрабатывает HTTP-запрос.
+
+        Returns:
+            Tuple[int, bytes]: Код ответа и тело ответа
+        """
+        if path == "/healthz" and method == "GET":
+            healthy = self.alive()
+            payload = {"status": "ok" if healthy else "degraded", "received": self.received,
+                       "rejected": self.rejected, "workers": len(self.queues)}
+            return (200 if healthy else 503), json.dumps(payload).encode("utf-8")
+        if path != self.path:
+            return 404, b""
+        if method != "POST":
+            return 405, b""
+        if not hmac.compare_digest(headers.get(SECRET_HEADER, "").encode("utf-8"), self.secret):
+            logging.warning("Запрос вебхука с неверным секретом отклонен")
+            return 403, b""
+        try:
+            update = json.loads(body)
+        except ValueError:
+            return 400, b""
+        if not isinstance(update, dict):
+            return 400, b""
+
+        target = self.queues[worker_index(affinity_key(update), len(self.queues))]
+        try:
+            target.put_nowait(body)
+        except queue.Full:
+            # Telegram повторит доставку, порядок обновлений чата сохранится
+            self.rejected += 1
+            return 503, b""
+        self.received += 1
+        return 200, b""
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, str, Dict[str, str], bytes]]:
+    """Читает один HTTP/1.1 запрос; None, если соединение закрыто."""
+    request_line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+    if not request_line.strip():
+        return None
+    method, path, version = request_line.decode("latin-1").split()
+    headers = {}
+    while True:
+        line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length") or 0)
+    if length > MAX_BODY_BYTES:
+        raise RequestTooLarge()
+    body = await asyncio.wait_for(reader.readexactly(length), IDLE_TIMEOUT) if length else b""
+    return method, path.split("?", 1)[0], version, headers, body
+
+
+async def serve_connection(dispatcher: WebhookDispatcher, reader: asyncio.StreamReader,
+                           writer: asyncio.StreamWriter) -> None:
+    """Обслуживает keep-alive соединение: запросы читаются и обрабатываются по очереди."""
+    try:
+        while True:
+            try:
+                request = await _read_request(reader)
+            except (RequestTooLarge, ValueError) as e:
+                status = 413 if isinstance(e, RequestTooLarge) else 400
+                writer.write(f"HTTP/1.1 {status} {_STATUS_TEXT[status]}\r\n"
+                             f"Content-Length: 0\r\nConnection: close\r\n\r\n".encode("latin-1"))
+                await writer.drain()
+                break
+            if request is None:
+                break
+            method, path, version, headers, body = request
+            status, payload = dispatcher.handle(method, path, headers, body)
+            keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+            writer.write(
+                f"HTTP/1.1 {status} {_STATUS_TEXT.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + payload
+            )
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+def worker_main(index: int, updates: Any) -> None:
+    """Точка входа процесса-обработчика."""
+    logging.basicConfig(level=logging.INFO,
+                        format=f'%(asctime)s - worker-{index} - %(name)s - %(levelname)s - %(message)s')
+    # Остановку выполняет основной процесс через очередь
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        asyncio.run(_run_worker(index, updates))
+    except Exception as e:
+        logging.error(f"Обработчик {index} завершился с ошибкой: {e}", exc_info=True)
+        sys.exit(1)
+
+
+async def _run_worker(index: int, updates: Any) -> None:
+    """Передает обновления из очереди в приложение бота до получения None."""
+    from boot import BOOT, prewarm
+    from telegram import Update
+    from bot_modified import setup_bot
+    from config import TRACE_FILE
+    from leader_election import replica_name
+    from liveness import LivenessMonitor
+    from metrics import MetricsFlusher
+    from profiler import install_profile_signal
+    from tracing import TRACER
+
+    # У каждого обработчика свой файл трасс: ротация файла не делится между процессами
+    TRACER.configure(f"{TRACE_FILE}.worker-{index}" if TRACE_FILE else None)
+    application = setup_bot(check_schema=False)
+    # Эндпоинт живости обработчика: следующий порт после HEALTH_PORT
+    monitor = LivenessMonitor(lambda: application.update_queue.qsize() + updates.qsize())
+    monitor.start(HEALTH_HOST, HEALTH_PORT + 1 + index if HEALTH_PORT else 0)
+    flusher = MetricsFlusher(f"{replica_name()}/worker-{index}").start()
+    BOOT.checkpoint("сборка приложения")
+    await prewarm(application)
+    await application.initialize()
+    await application.start()
+    BOOT.report(f"Обработчик {index} запущен")
+    loop = asyncio.get_running_loop()
+    # kill -USR2 <pid обработчика> — сеанс профилирования (см. profiler.py)
+    install_profile_signal(loop)
+    try:
+        while True:
+            body = await loop.run_in_executor(None, updates.get)
+            if body is None:
+                break
+            try:
+                update = Update.de_json(json.loads(body), application.bot)
+            except Exception as e:
+                logging.error(f"Не удалось разобрать обновление: {e}")
+                continue
+            await application.update_queue.put(update)
+    finally:
+        # Обновления, уже переданные приложению, обрабатываются до остановки
+        await application.stop()
+        await application.shutdown()
+        monitor.stop()
+        await asyncio.to_thread(flusher.stop)
+        logging.info(f"Обработчик {index} остановлен")
+
+
+def derive_secret(token: str) -> str:
+    """
+    Секрет вебхука, выведенный из токена бота (HMAC-SHA256).
+
+    Секрет зависит только от токена: вебхук, зарегистрированный до перезапуска
+    или на другой машине, принимается без повторной регистрации. Допустимые
+    символы — только [0-9a-f].
+    """
+    return hmac.new(token.encode("utf-8"), SECRET_CONTEXT, hashlib.sha256).hexdigest()
+
+
+class WebhookServer:
+    """
+    Основной процесс режима вебхука: HTTP-сервер, обработчики и регистрация вебхука.
+
+    Args:
+        url: Публичный URL сервера (без пути)
+        workers: Число процессов-обработчиков
+        secret: Секрет вебхука (по умолчанию выводится из токена бота)
+        health_port: Порт эндпоинта живости основного процесса (0 — без эндпоинта)
+    """
+
+    def __init__(self, url: str, workers: int = WEBHOOK_WORKERS, secret: Optional[str] = None,
+                 host: str = WEBHOOK_HOST, port: int = WEBHOOK_PORT, path: str = WEBHOOK_PATH,
+                 health_port: int = HEALTH_PORT):
+        self.url = url.rstrip("/") + path
+        self.host = host
+        self.port = port
+        self.health_port = health_port
+        # Секрет не меняется между запусками: обновления, доставляемые во время перезапуска, принимаются
+        self.secret = secret or derive_secret(TELEGRAM_TOKEN)
+        self._context = multiprocessing.get_context("spawn")
+        self.queues = [self._context.Queue(WORKER_QUEUE_SIZE) for _ in range(max(1, workers))]
+        self.processes: List[Any] = [None] * len(self.queues)
+        self.dispatcher = WebhookDispatcher(self.secret, path, self.queues, alive=self._workers_alive)
+        self._stopping = False
+        self._stop = asyncio.Event()
+
+    def pending_updates(self) -> int:
+        """Число обновлений в очередях всех обработчиков."""
+        return sum(updates.qsize() for updates in self.queues)
+
+    def _workers_alive(self) -> bool:
+        return all(process is not None and process.is_alive() for process in self.processes)
+
+    def _start_worker(self, index: int) -> None:
+        process = self._context.Process(target=worker_main, args=(index, self.queues[index]),
+                                        name=f"webhook-worker-{index}", daemon=True)
+        process.start()
+        self.processes[index] = process
+
+    async def _supervise(self) -> None:
+        """Перезапускает упавшие обработчики; их очереди сохраняются."""
+        while not self._stopping:
+            for index, process in enumerate(self.processes):
+                if not self._stopping and not process.is_alive():
+                    logging.error(f"Обработчик {index} завершился с кодом {process.exitcode}, перезапуск")
+                    self._start_worker(index)
+            await asyncio.sleep(SUPERVISE_INTERVAL)
+
+    async def _set_webhook(self) -> None:
+        from telegram import Bot, Update
+
+        async with Bot(token=TELEGRAM_TOKEN) as bot:
+            await bot.set_webhook(url=self.url, secret_token=self.secret, allowed_updates=Update.ALL_TYPES,
+                                  max_connections=MAX_CONNECTIONS, drop_pending_updates=False)
+        logging.info(f"Вебхук зарегистрирован: {self.url}")
+
+    async def serve(self) -> None:
+        """Принимает вебхук, пока задача не отменена (выполняется лидером роли webhook)."""
+        # Очереди прошлого срока лидерства могут содержать обновления и сигналы остановки
+        self.queues[:] = [self._context.Queue(WORKER_QUEUE_SIZE) for _ in self.queues]
+        self._stopping = False
+        for index in range(len(self.queues)):
+            self._start_worker(index)
+        server = await asyncio.start_server(
+            lambda reader, writer: serve_connection(self.dispatcher, reader, writer), self.host, self.port)
+        logging.info(f"Сервер вебхука слушает {self.host}:{self.port}, обработчиков: {len(self.queues)}")
+        supervisor = asyncio.create_task(self._supervise())
+        try:
+            await self._set_webhook()
+            await asyncio.Event().wait()
+        finally:
+            self._stopping = True
+            logging.info("Остановка приема вебхука...")
+            server.close()
+            await server.wait_closed()
+            supervisor.cancel()
+            for updates in self.queues:
+                updates.put(None)
+            loop = asyncio.get_running_loop()
+            for process in self.processes:
+                await loop.run_in_executor(None, process.join, 30)
+                if process.is_alive():
+                    process.terminate()
+            logging.info("Прием вебхука остановлен")
+
+    def stop(self) -> None:
+        """Останавливает сервер, запущенный run."""
+        self._stop.set()
+
+    async def run(self, reminders: bool = True, lease: Optional[Any] = None) -> None:
+        """
+        Работает до SIGTERM/SIGINT или stop: вебхук принимается, пока реплика держит роль webhook.
+
+        Args:
+            reminders: Запускать планировщик напоминаний (роль reminders)
+            lease: Аренда роли webhook (по умолчанию LeaderLease("webhook"))
+        """
+        from leader_election import LeaderLease
+        from liveness import LivenessMonitor
+
+        # Эндпоинт живости для мониторов на HEALTH_PORT, как у процесса polling;
+        # резервная реплика тоже отвечает, пока ее цикл событий работает
+        monitor = LivenessMonitor(self.pending_updates)
+        monitor.start(HEALTH_HOST, self.health_port)
+
+        self._stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, self._stop.set)
+
+        tasks = [asyncio.create_task((lease or LeaderLease("webhook")).run_as_leader(self.serve))]
+        if reminders:
+            # Напоминания отправляет только одна реплика сервера
+            from training_reminder import schedule_reminders
+            tasks.append(asyncio.create_task(LeaderLease("reminders").run_as_leader(schedule_reminders)))
+        try:
+            await self._stop.wait()
+        finally:
+            logging.info("Остановка сервера вебхука...")
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            monitor.stop()
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                loop.remove_signal_handler(signum)
+            logging.info("Сервер вебхука остановлен")
+
+
+def main():
+    """Запускает бота в режиме вебхука."""
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if not TELEGRAM_TOKEN or not WEBHOOK_URL:
+        logging.critical("Для режима вебхука нужны переменные окружения TELEGRAM_TOKEN и WEBHOOK_URL")
+        return 1
+    asyncio.run(WebhookServer(WEBHOOK_URL, secret=WEBHOOK_SECRET).run())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
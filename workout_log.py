@@ -0,0 +1,327 @@
+"""
+Журнал тренировок и агрегаты объема.
+
+Каждая отметка дня плана (выполнение, отмена, сопоставление скриншота) пишется
+в таблицу workout_events, которая только дополняется; смена статуса записывается
+отдельным событием с обратными приращениями. Триггер базы данных при вставке
+события обновляет дневные и недельные агрегаты и статистику пользователя, поэтому
+объем, серия недель и динамика читаются по первичному ключу без пересчета.
+Длительность пробежек со скриншотов хранится в workout_durations: по ней
+оценивается текущий уровень бегуна (pace_calculator.pace_profile).
+Если логика агрегатов изменится, они пересчитываются из журнала:
+
+    python workout_log.py [--user-id ID]
+"""
+
+import argparse
+import logging
+import sys
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import psycopg2
+import psycopg2.extras
+
+from config import DB_CONFIG
+from migrations import has_capability
+from training_calendar import today_moscow
+
+# Количество недель для динамики объема по умолчанию
+DEFAULT_TREND_WEEKS = 8
+# Пробежки для оценки уровня бегуна: период (дни) и наибольшее количество
+RECENT_RUNS_DAYS = 42
+RECENT_RUNS_LIMIT = 10
+
+
+def week_start(day: date) -> date:
+    """Возвращает понедельник недели, к которой относится дата."""
+    return day - timedelta(days=day.weekday())
+
+
+def current_streak_weeks(stats: Optional[Dict[str, Any]], today: date) -> int:
+    """
+    Текущая серия недель с тренировками.
+
+    Серия из статистики продолжается, пока последняя активная неделя — текущая
+    или предыдущая; иначе серия прервана.
+
+    Args:
+        stats: Статистика пользователя из workout_user_stats
+        today: Текущая дата
+
+    Returns:
+        int: Количество недель подряд с тренировками
+    """
+    if not stats or not stats.get("last_active_week"):
+        return 0
+    if stats["last_active_week"] < week_start(today) - timedelta(weeks=1):
+        return 0
+    return stats.get("streak_weeks") or 0
+
+
+def fill_weeks(rows: List[Dict[str, Any]], weeks: int, today: date) -> List[Dict[str, Any]]:
+    """
+    Дополняет недельные агрегаты неделями без тренировок.
+
+    Args:
+        rows: Недельные агрегаты (week_start, distance_km, workouts)
+        weeks: Количество недель, включая текущую
+        today: Текущая дата
+
+    Returns:
+        List[Dict]: Недели от старой к текущей с дистанцией и числом тренировок
+    """
+    by_week = {row["week_start"]: row for row in rows}
+    first = week_start(today) - timedelta(weeks=weeks - 1)
+    result = []
+    for offset in range(weeks):
+        start = first + timedelta(weeks=offset)
+        row = by_week.get(start, {})
+        result.append({
+            "week_start": start,
+            "distance_km": round(row.get("distance_km") or 0.0, 1),
+            "workouts": row.get("workouts") or 0,
+        })
+    return result
+
+
+def volume_trend(weekly: List[Dict[str, Any]]) -> Optional[float]:
+    """
+    Изменение объема последней полной недели относительно средней за предыдущие.
+
+    Args:
+        weekly: Недели от старой к текущей (результат fill_weeks)
+
+    Returns:
+        Optional[float]: Относительное изменение (0.1 — рост на 10%) или None,
+        если для сравнения нет данных
+    """
+    # Текущая неделя еще не закончилась и в сравнении не участвует
+    completed = weekly[:-1]
+    if len(completed) < 2:
+        return None
+    previous = [week["distance_km"] for week in completed[:-1]]
+    baseline = sum(previous) / len(previous)
+    if baseline <= 0:
+        return None
+    return round(completed[-1]["distance_km"] / baseline - 1, 3)
+
+
+def recent_performances(profile: Dict[str, Any]) -> List[Tuple[float, float]]:
+    """
+    Недавние пробежки бегуна для оценки уровня (pace_calculator.pace_profile).
+
+    Args:
+        profile: Профиль бегуна из базы данных (нужен user_id)
+
+    Returns:
+        List[Tuple[float, float]]: Пары (дистанция в км, время в секундах)
+    """
+    user_id = profile.get("user_id") if profile else None
+    if not user_id:
+        return []
+    return [(run["distance_km"], run["duration_seconds"]) for run in WorkoutLogManager.get_recent_runs(user_id)]
+
+
+class WorkoutLogManager:
+    """Manager for the workout event log and its rollups."""
+
+    @staticmethod
+    def get_stats(user_id):
+        """
+        Get the lifetime totals and week streaks of a user.
+
+        Args:
+            user_id: Database user ID
+
+        Returns:
+            Dictionary with total_distance_km, total_workouts, last_active_week,
+            streak_weeks and longest_streak_weeks if found, None otherwise
+        """
+        conn = None
+        try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+                cursor.execute(
+                    """
+                    SELECT total_distance_km, total_workouts, last_active_week,
+                           streak_weeks, longest_streak_weeks
+                    FROM workout_user_stats
+                    WHERE user_id = %s
+                    """,
+                    (user_id,)
+                )
+                row = cursor.fetchone()
+                return dict(row) if row else None
+        except Exception as e:
+            logging.error(f"Error getting workout stats: {e}")
+            return None
+        finally:
+            if conn:
+                conn.close()
+
+    @staticmethod
+    def get_weekly_volumes(user_id, weeks=DEFAULT_TREND_WEEKS):
+        """
+        Get the weekly distance of a user for the last weeks, including empty weeks.
+
+        Args:
+            user_id: Database user ID
+            weeks: Number of weeks including the current one
+
+        Returns:
+            List of dictionaries with week_start, distance_km and workouts,
+            oldest first; an empty list on error
+        """
+        today = today_moscow()
+        conn = None
+        try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+                cursor.execute(
+                    """
+                    SELECT week_start, distance_km, workouts
+                    FROM workout_weekly_rollups
+                    WHERE user_id = %s AND week_start >= %s
+                    ORDER BY week_start
+                    """,
+                    (user_id, week_start(today) - timedelta(weeks=weeks - 1))
+                )
+                return fill_weeks([dict(row) for row in cursor.fetchall()], weeks, today)
+        except Exception as e:
+            logging.error(f"Error getting weekly volumes: {e}")
+            return []
+        finally:
+            if conn:
+                conn.close()
+
+    @staticmethod
+    def save_duration(user_id, plan_id, training_day, distance_km, duration_seconds):
+        """
+        Save the actual distance and duration of a completed plan day.
+
+        Args:
+            user_id: Database user ID
+            plan_id: Training plan ID
+            training_day: Day number in the training plan (1-based)
+            distance_km: Actual distance in kilometers
+            duration_seconds: Actual duration in seconds
+
+        Returns:
+            True if successful, False otherwise
+        """
+        if not has_capability("workout_durations"):
+            return False
+        conn = None
+        try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    INSERT INTO workout_durations (user_id, plan_id, training_day, distance_km, duration_seconds)
+                    VALUES (%s, %s, %s, %s, %s)
+                    ON CONFLICT (user_id, plan_id, training_day) DO UPDATE
+                    SET distance_km = EXCLUDED.distance_km,
+                        duration_seconds = EXCLUDED.duration_seconds,
+                        workout_date = EXCLUDED.workout_date
+                    """,
+                    (user_id, plan_id, training_day, distance_km, duration_seconds)
+                )
+            conn.commit()
+            return True
+        except Exception as e:
+            logging.error(f"Error saving workout duration: {e}")
+            if conn:
+                conn.rollback()
+            return False
+        finally:
+            if conn:
+                conn.close()
+
+    @staticmethod
+    def get_recent_runs(user_id, days=RECENT_RUNS_DAYS, limit=RECENT_RUNS_LIMIT):
+        """
+        Get the recent timed runs of a user whose plan days are still completed.
+
+        Args:
+            user_id: Database user ID
+            days: Number of days to look back
+            limit: Maximum number of runs
+
+        Returns:
+            List of dictionaries with workout_date, distance_km and duration_seconds,
+            newest first; an empty list on error
+        """
+        if not has_capability("workout_durations"):
+            return []
+        conn = None
+        try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+                cursor.execute(
+                    """
+                    SELECT wd.workout_date, wd.distance_km, wd.duration_seconds
+                    FROM workout_durations wd
+                    JOIN completed_trainings ct
+                      ON ct.user_id = wd.user_id AND ct.plan_id = wd.plan_id
+                     AND ct.training_day = wd.training_day AND ct.status = 'completed'
+                    WHERE wd.user_id = %s AND wd.workout_date >= %s
+                    ORDER BY wd.workout_date DESC
+                    LIMIT %s
+                    """,
+                    (user_id, today_moscow() - timedelta(days=days), limit)
+                )
+                return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logging.error(f"Error getting recent runs: {e}")
+            return []
+        finally:
+            if conn:
+                conn.close()
+
+    @staticmethod
+    def rebuild_rollups(user_id=None):
+        """
+        Rebuild the rollups by replaying the workout event log.
+
+        Args:
+            user_id: Database user ID, or None to rebuild every user
+
+        Returns:
+            Number of users rebuilt if successful, None otherwise
+        """
+        conn = None
+        try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT rebuild_workout_rollups(%s)", (user_id,))
+                users = cursor.fetchone()[0]
+            conn.commit()
+            return users
+        except Exception as e:
+            logging.error(f"Error rebuilding workout rollups: {e}")
+            if conn:
+                conn.rollback()
+            return None
+        finally:
+            if conn:
+                conn.close()
+
+
+def main():
+    """Пересчитывает агрегаты из журнала тренировок."""
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Пересчет агрегатов журнала тренировок")
+    parser.add_argument("--user-id", type=int, default=None, help="ID пользователя (по умолчанию все)")
+    args = parser.parse_args()
+
+    users = WorkoutLogManager.rebuild_rollups(args.user_id)
+    if users is None:
+        return 1
+    print(f"Агрегаты пересчитаны для пользователей: {users}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())